@@ -1,11 +1,10 @@
 import streamlit as st
 import pandas as pd
-import time
 from datetime import datetime
-import json
 import logging
 import os
 import sys
+from io import BytesIO
 
 # Настройка страницы должна быть первой командой Streamlit
 st.set_page_config(
@@ -33,17 +32,53 @@ logger.info("Логирование настроено с кодировкой U
 # Импорт модулей приложения
 from src.core.excel_handler import ExcelHandler
 from src.core.file_processor import FileProcessor
+from src.core.excel_loader import DEFAULT_LAZY_THRESHOLD_MB, DEFAULT_PREVIEW_ROWS, file_size_mb, scan_sheet
+from src.core.table_groups import GROUP_PERIODS
 from src.services.prompt_library import get_business_prompts, customize_prompt
 from src.ui.views.llm_settings import llm_settings_ui
+from src.ui.views.export import render_word_report
 from src.config.profile_manager import ProfileManager
 from src.config.manager import ConfigManager
+from src.core.analysis_engine import AnalysisEngine, create_llm_provider
+from src.core.workbook_runner import WorkbookRunner, write_workbook_result
+from src.services.progress import estimate_duration, format_duration
 
 # Кэширование загрузки Excel-файла
 @st.cache_data
-def cached_load_excel(file):
-    """Кэшированная загрузка Excel файла"""
+def cached_load_excel(file, columns=None, nrows=None, engine=None, workers=None, sheet=0):
+    """Кэшированная загрузка Excel файла (при необходимости - только части столбцов и строк)"""
     excel_handler = ExcelHandler()
-    return excel_handler.load_excel(file)
+    return excel_handler.load_excel(file, columns=columns, nrows=nrows, engine=engine, workers=workers, sheet=sheet)
+
+# Кэширование чтения заголовка и количества строк большого файла
+@st.cache_data
+def cached_scan_excel(file, sheet=0):
+    """Кэшированное чтение заголовка и количества строк Excel файла"""
+    return scan_sheet(file, sheet)
+
+# Кэширование списка листов книги
+@st.cache_data
+def cached_list_sheets(file):
+    """Кэшированное чтение названий листов Excel файла"""
+    return ExcelHandler.list_sheets(file)
+
+
+def load_selected_columns(df, columns):
+    """
+    Загружает из большого файла все строки только нужных столбцов.
+
+    Для больших файлов на вкладке загрузки читается только начало листа
+    (excel_source в session_state); перед обработкой дочитываются все строки
+    выбранных столбцов. Для небольших файлов возвращается df без изменений.
+    """
+    source = st.session_state.get("excel_source")
+    if source is None:
+        return df
+    needed = [col for col in df.columns if col in set(columns)] if columns else list(df.columns)
+    with st.spinner(f"Загрузка столбцов ({len(needed)} из {len(df.columns)}) для {source['rows'] or 'всех'} строк..."):
+        return cached_load_excel(
+            source["file"], columns=needed, engine=source["engine"], workers=source["workers"], sheet=source["sheet"]
+        )
 
 # Кэширование анализа DataFrame
 @st.cache_data
@@ -67,106 +102,63 @@ def get_unified_llm_provider(settings):
     """
     
     try:
-        from src.llm.unified_provider import UnifiedLLM as UnifiedLLMProvider
-        # Проверяем наличие и валидность API ключа
-        if settings["provider_type"] == "cloud" and not settings.get("api_key"):
-            st.error("API ключ не указан для облачного провайдера")
-            return None
-            
         # Проверяем URL
         base_url = settings.get("cloud_base_url", "https://api.deepseek.com")
         if not base_url.startswith("https://api.deepseek.com"):
             st.warning(f"Базовый URL '{base_url}' может быть неправильным. Рекомендуемое значение: 'https://api.deepseek.com'")
             
-        return UnifiedLLMProvider({
-            "provider_type": settings["provider_type"],
-            "cloud_api_key": settings.get("api_key", ""),  # Безопасно получаем api_key, используя пустую строку как значение по умолчанию
-            "cloud_base_url": base_url,
-            "local_provider": settings.get("local_provider", "ollama"),  # Добавляем значение по умолчанию
-            "local_base_url": settings.get("local_base_url", "http://localhost:11434"),  # Добавляем значение по умолчанию
-            "local_model": settings.get("local_model", "llama2")  # Добавляем модель для локального провайдера
-        })
+        return create_llm_provider(settings, st.session_state.get("config_manager"))
+    except ValueError as e:
+        # Не указан API ключ для облачного провайдера
+        st.error(str(e))
+        return None
     except ImportError as e:
         st.error(f"Ошибка импорта модулей: {e}")
         return None
 
-# Функция для анализа всей таблицы
-def analyze_full_table(df, llm_provider, prompt, settings, context_files=None):
+def create_analysis_engine(llm_provider, llm_settings, progress_text):
     """
-    Анализирует таблицу целиком и возвращает обобщенный результат
+    Создает движок анализа, выводящий прогресс и сообщения в интерфейс.
     
     Args:
-        df: DataFrame для анализа
         llm_provider: Провайдер LLM
-        prompt: Текст промпта
-        settings: Настройки LLM
-        context_files: Дополнительные файлы контекста
+        llm_settings: Настройки LLM
+        progress_text: Начальный текст индикатора прогресса
         
     Returns:
-        tuple: (результат, ошибка)
+        AnalysisEngine: Движок анализа
     """
-    # Подготовка контекстной информации о таблице используя кэшированный анализ
-    stats = cached_analyze_dataframe(df)
+    my_bar = st.progress(0, text=progress_text)
+    messages = {"info": st.info, "warning": st.warning, "error": st.error}
     
-    # Подготовка дополнительных файлов контекста
-    file_processor = FileProcessor()
-    context_text = file_processor.prepare_context_for_analysis(context_files) if context_files else ""
+    def on_progress(done, total, text):
+        my_bar.progress(int(done / total * 100) if total else 100, text=text)
     
-    # Создание сообщения для LLM
-    messages = [
-        {"role": "system", "content": "Вы – эксперт по анализу данных и бизнес-аналитике."},
-        {"role": "user", "content": f"""
-        {prompt}
-        
-        Структура таблицы:
-        - Название: {getattr(df, 'name', 'Таблица данных')}
-        - Количество строк: {len(df)}
-        - Количество столбцов: {len(df.columns)}
-        - Столбцы: {', '.join(df.columns.tolist())}
-        
-        Информация о столбцах:
-        {json.dumps(stats["dtypes"], ensure_ascii=False, indent=2)}
-        
-        Статистика по пропущенным значениям:
-        {json.dumps(stats["missing_percentage"], ensure_ascii=False, indent=2)}
-        
-        Первые 5 строк таблицы:
-        {df.head(5).to_string()}
-        
-        {context_text}
-        
-        Проведи тщательный анализ и предоставь детальные, структурированные результаты с выводами и рекомендациями.
-        """}
-    ]
+    return AnalysisEngine(
+        llm_provider,
+        llm_settings,
+        config_manager=st.session_state.get("config_manager"),
+        on_progress=on_progress,
+        on_message=lambda level, text: messages.get(level, st.info)(text),
+        table_stats=cached_analyze_dataframe
+    )
+
+def show_analysis_result(result):
+    """Сохраняет результат движка анализа в session_state и переходит к вкладке результатов."""
+    for error in result.errors:
+        st.error(error)
+        logging.error(error)
     
-    # Используем параметры из settings, проверяя их наличие
-    if isinstance(settings, dict):
-        # Явно передаем параметры, сохраняя model в неизменном виде
-        params = {
-            "temperature": settings.get("temperature", 0.7),
-            "max_tokens": settings.get("max_tokens", 300),
-            "top_p": settings.get("top_p", 1.0),
-            "frequency_penalty": settings.get("frequency_penalty", 0.0),
-            "presence_penalty": settings.get("presence_penalty", 0.0)
-        }
-        
-        # Добавляем model только если он присутствует в settings
-        if "model" in settings:
-            params["model"] = settings["model"]
-    else:
-        # Дефолтные параметры в случае, если settings не словарь
-        params = {
-            "temperature": 0.7,
-            "max_tokens": 300,
-            "top_p": 1.0,
-            "frequency_penalty": 0.0,
-            "presence_penalty": 0.0
-        }
+    st.session_state["logs"].extend(result.logs)
+    st.session_state["result_df"] = result.result_df
+    st.session_state["run_summary"] = result.summary
+    if result.summary.get("throughput", {}).get("rows_per_second"):
+        # Измеренная скорость используется для оценки времени следующего запуска
+        st.session_state["last_throughput"] = result.summary["throughput"]
     
-    return llm_provider.chat_completion(
-        messages=messages,
-        **params
-    )
+    # Переходим к вкладке с результатами
+    st.session_state["active_tab"] = "tab3"
+    st.experimental_rerun()
 
 # Основная функция приложения
 def main():
@@ -186,6 +178,8 @@ def main():
         st.session_state["logs"] = []
     if "df" not in st.session_state:
         st.session_state["df"] = None
+    if "excel_source" not in st.session_state:
+        st.session_state["excel_source"] = None
     if "result_df" not in st.session_state:
         st.session_state["result_df"] = None
     if "table_analysis_result" not in st.session_state:
@@ -200,6 +194,16 @@ def main():
     # Добавляем хранение контекстных файлов в session_state
     if "context_files" not in st.session_state:
         st.session_state["context_files"] = None
+    if "run_summary" not in st.session_state:
+        st.session_state["run_summary"] = None
+    if "group_reports" not in st.session_state:
+        st.session_state["group_reports"] = None
+    if "last_throughput" not in st.session_state:
+        st.session_state["last_throughput"] = None
+    if "selected_sheets" not in st.session_state:
+        st.session_state["selected_sheets"] = []
+    if "workbook_result" not in st.session_state:
+        st.session_state["workbook_result"] = None
     
     # Боковая панель
     with st.sidebar:
@@ -271,9 +275,49 @@ def main():
         
         if excel_file is not None:
             try:
-                # Используем кэшированную загрузку и анализ
-                df = cached_load_excel(excel_file)
+                # Листы книги: столбцы и настройки анализа берутся из первого выбранного листа
+                sheet_names = cached_list_sheets(excel_file)
+                selected_sheets = sheet_names[:1]
+                if len(sheet_names) > 1:
+                    selected_sheets = st.multiselect(
+                        "Листы для анализа",
+                        sheet_names,
+                        default=sheet_names[:1],
+                        help="Все выбранные листы анализируются с одними настройками, для каждого листа создается свой лист результата"
+                    ) or sheet_names[:1]
+                st.session_state["selected_sheets"] = selected_sheets
+                sheet = selected_sheets[0]
+                if len(selected_sheets) > 1:
+                    st.info(
+                        f"Выбрано листов: {len(selected_sheets)}. Ниже показан лист '{sheet}': по его столбцам "
+                        "задаются настройки анализа, остальные листы должны содержать те же столбцы."
+                    )
+                
+                # Большие файлы: сначала только начало листа, нужные столбцы - при запуске обработки
+                lazy_threshold = config_manager.get("excel_loader.lazy_threshold_mb", DEFAULT_LAZY_THRESHOLD_MB)
+                if file_size_mb(excel_file) > lazy_threshold:
+                    scan = cached_scan_excel(excel_file, sheet)
+                    df = cached_load_excel(
+                        excel_file, nrows=config_manager.get("excel_loader.preview_rows", DEFAULT_PREVIEW_ROWS), sheet=sheet
+                    )
+                    st.session_state["excel_source"] = {
+                        "file": excel_file,
+                        "sheet": sheet,
+                        "rows": scan["rows"],
+                        "engine": config_manager.get("excel_loader.engine"),
+                        "workers": config_manager.get("excel_loader.parse_workers")
+                    }
+                    st.info(
+                        f"Файл больше {lazy_threshold} МБ: загружены первые {len(df)} строк из "
+                        f"{scan['rows'] if scan['rows'] is not None else 'неизвестного числа'}. "
+                        "При запуске обработки будут загружены все строки только выбранных столбцов."
+                    )
+                else:
+                    # Используем кэшированную загрузку и анализ
+                    df = cached_load_excel(excel_file, sheet=sheet)
+                    st.session_state["excel_source"] = None
                 st.session_state["df"] = df
+                st.session_state["excel_file"] = excel_file
                 
                 # Кэшированный анализ DataFrame
                 stats = cached_analyze_dataframe(df)
@@ -404,6 +448,40 @@ def main():
                     help="Данные из этих столбцов будут добавлены для контекста"
                 )
                 
+                batch_rows = st.checkbox(
+                    "Пакетная обработка (несколько строк в одном запросе)",
+                    key="batch_rows",
+                    help="Строки упаковываются в один запрос в пределах контекстного окна модели. "
+                         "Сокращает количество запросов и повторную отправку общего промпта."
+                )
+                
+                deduplicate_rows = st.checkbox(
+                    "Объединять одинаковые строки",
+                    value=True,
+                    key="deduplicate_rows",
+                    help="Строки с одинаковыми значениями выбранных столбцов (без учета регистра и лишних пробелов) "
+                         "обрабатываются одним запросом, ответ копируется во все такие строки."
+                )
+
+                near_duplicates = st.checkbox(
+                    "Объединять почти одинаковые тексты",
+                    value=config_manager.get("near_duplicates.enabled", False),
+                    key="near_duplicates",
+                    disabled=not deduplicate_rows,
+                    help="Тексты целевого столбца, отличающиеся знаками препинания или отдельными словами "
+                         "(шаблонные жалобы, копии отзывов), обрабатываются одним запросом."
+                )
+                near_duplicate_threshold = st.slider(
+                    "Порог сходства текстов",
+                    min_value=0.5,
+                    max_value=1.0,
+                    value=float(config_manager.get("near_duplicates.threshold", 0.8)),
+                    step=0.05,
+                    key="near_duplicate_threshold",
+                    disabled=not (deduplicate_rows and near_duplicates),
+                    help="Коэффициент Жаккара по фрагментам из 5 символов: чем выше, тем более похожими должны быть тексты."
+                )
+                
                 # Пример данных из выбранных столбцов
                 st.subheader("Пример выбранных данных")
                 example_data = df[[target_column] + additional_columns].head(2)
@@ -432,6 +510,44 @@ def main():
                     help="Модель будет уделять особое внимание выбранным столбцам при анализе"
                 )
                 
+                table_map_reduce = st.checkbox(
+                    "Анализировать все строки (map-reduce)",
+                    value=config_manager.get("table_map_reduce.enabled", False),
+                    key="table_map_reduce",
+                    help="Таблица делится на части в пределах контекста модели, части анализируются параллельно, "
+                         "а частичные отчеты объединяются в итоговый. Без этой опции модель видит только "
+                         "структуру таблицы и первые строки."
+                )
+                
+                table_queries = st.checkbox(
+                    "Разрешить модели запросы к таблице (SQL)",
+                    value=config_manager.get("table_query.enabled", False),
+                    key="table_queries",
+                    disabled=table_map_reduce,
+                    help="Модель запрашивает у таблицы агрегаты на SQL, запросы выполняются локально в DuckDB "
+                         "по всем строкам. Объем запросов к модели зависит от числа вопросов, а не от размера таблицы."
+                )
+                
+                # Анализ по группам строк (значения столбца или периоды дат)
+                group_col1, group_col2 = st.columns(2)
+                with group_col1:
+                    group_column = st.selectbox(
+                        "Анализировать по группам",
+                        ["Нет"] + list(df.columns),
+                        index=0,
+                        help="Таблица делится на группы по значениям столбца, группы анализируются параллельно, "
+                             "а их отчеты объединяются в итоговый. Отчеты по неизменившимся группам берутся из кэша."
+                    )
+                with group_col2:
+                    group_period_label = st.selectbox(
+                        "Период для столбца дат",
+                        ["Значения столбца"] + list(GROUP_PERIODS.values()),
+                        index=0,
+                        disabled=group_column == "Нет"
+                    )
+                group_period = next((code for code, label in GROUP_PERIODS.items() if label == group_period_label), None)
+                group_column = None if group_column == "Нет" else group_column
+                
                 # Предпросмотр промпта для всей таблицы
                 with st.expander("Предпросмотр промпта для всей таблицы"):
                     # Используем модуль промптов для кастомизации
@@ -480,6 +596,14 @@ def main():
                     help="Модель будет уделять особое внимание этим столбцам при анализе всей таблицы"
                 )
                 
+                table_map_reduce = st.checkbox(
+                    "Анализировать все строки таблицы (map-reduce)",
+                    value=config_manager.get("table_map_reduce.enabled", False),
+                    key="table_map_reduce",
+                    help="Таблица делится на части в пределах контекста модели, части анализируются параллельно, "
+                         "а частичные отчеты объединяются в итоговый."
+                )
+                
                 # Порядок выполнения
                 st.markdown("**Порядок выполнения**")
                 execution_order = st.radio(
@@ -488,6 +612,15 @@ def main():
                      "Сначала анализ всей таблицы, затем построчный анализ"],
                     help="Порядок выполнения может влиять на качество результатов"
                 )
+                table_brief = st.checkbox(
+                    "Начинать построчный анализ после краткого описания таблицы",
+                    value=config_manager.get("combined.table_brief", False),
+                    key="table_brief",
+                    disabled=not execution_order.startswith("Сначала анализ всей таблицы"),
+                    help="Быстрее: подробный отчет формируется параллельно со строками. Требует дополнительного "
+                         "запроса к модели, а строки получают краткое описание таблицы вместо подробного отчета, "
+                         "поэтому их результаты могут отличаться."
+                )
             
             # Кнопка запуска обработки
             st.subheader("Запуск обработки")
@@ -503,7 +636,13 @@ def main():
                 )
             
             with start_col2:
-                estimated_time = "3-5 мин" if st.session_state["mode"] == "Анализ всей таблицы" else f"{df.shape[0] // 2 + 1}-{df.shape[0]} мин" 
+                if st.session_state["mode"] == "Анализ всей таблицы":
+                    estimated_time = "3-5 мин"
+                else:
+                    # Оценка по скорости, измеренной в предыдущем запуске
+                    throughput = st.session_state["last_throughput"] or {}
+                    estimate = estimate_duration(df.shape[0], throughput.get("rows_per_second"))
+                    estimated_time = f"~{format_duration(estimate)}" if estimate is not None else "появится после первого запуска"
                 st.info(f"Ожидаемое время: {estimated_time}")
             
             if llm_settings["provider_type"] == "cloud" and not llm_settings["api_key"]:
@@ -526,28 +665,137 @@ def main():
                     else:
                         st.session_state["processing"] = True
                         st.session_state["logs"] = []
+                        st.session_state["workbook_result"] = None
                         
                         # Получаем контекстные файлы из session_state
                         context_files = st.session_state.get("context_files")
+                        # Несколько листов анализируются с одним профилем запуска
+                        multi_sheet = len(st.session_state.get("selected_sheets") or []) > 1
                         
                         if st.session_state["mode"] == "Построчный анализ":
                             # Реализация построчного анализа
-                            result_df = process_row_by_row(df, llm_provider, llm_settings, target_column, additional_columns, context_files)
+                            llm_settings["batch_rows"] = batch_rows
+                            llm_settings["deduplicate_rows"] = deduplicate_rows
+                            llm_settings["near_duplicates"] = near_duplicates
+                            llm_settings["near_duplicate_threshold"] = near_duplicate_threshold
+                            if multi_sheet:
+                                process_workbook(llm_provider, llm_settings, {
+                                    "mode": st.session_state["mode"],
+                                    "custom_prompt": st.session_state["custom_prompt"],
+                                    "target_column": target_column,
+                                    "additional_columns": additional_columns
+                                }, [target_column] + additional_columns, context_files)
+                            else:
+                                df = load_selected_columns(df, [target_column] + additional_columns)
+                                result_df = process_row_by_row(df, llm_provider, llm_settings, target_column, additional_columns, context_files)
                             
                         elif st.session_state["mode"] == "Анализ всей таблицы":
                             # Реализация анализа всей таблицы
-                            result_df = process_full_table(df, llm_provider, llm_settings, focus_columns, context_files)
+                            llm_settings["table_map_reduce"] = table_map_reduce
+                            llm_settings["table_queries"] = table_queries and not table_map_reduce
+                            # Без ключевых столбцов анализируется вся таблица
+                            table_columns = list(focus_columns) + ([group_column] if group_column else []) if focus_columns else None
+                            if multi_sheet:
+                                process_workbook(llm_provider, llm_settings, {
+                                    "mode": st.session_state["mode"],
+                                    "custom_prompt": st.session_state["custom_prompt"],
+                                    "focus_columns": list(focus_columns),
+                                    "group_column": group_column,
+                                    "group_period": group_period
+                                }, table_columns, context_files)
+                            else:
+                                df = load_selected_columns(df, table_columns)
+                                result_df = process_full_table(df, llm_provider, llm_settings, focus_columns, context_files, group_column, group_period)
                             
                         else:  # Комбинированный анализ
-                            result_df = process_combined_analysis(df, llm_provider, llm_settings, target_column, additional_columns, focus_columns_table, execution_order, context_files)
+                            llm_settings["table_map_reduce"] = table_map_reduce
+                            llm_settings["table_brief"] = table_brief
+                            combined_columns = [target_column] + additional_columns + list(focus_columns_table)
+                            if multi_sheet:
+                                process_workbook(llm_provider, llm_settings, {
+                                    "mode": st.session_state["mode"],
+                                    "custom_prompt": st.session_state["custom_prompt"],
+                                    "target_column": target_column,
+                                    "additional_columns": additional_columns,
+                                    "focus_columns": list(focus_columns_table),
+                                    "execution_order": execution_order
+                                }, combined_columns, context_files)
+                            else:
+                                df = load_selected_columns(df, combined_columns)
+                                result_df = process_combined_analysis(df, llm_provider, llm_settings, target_column, additional_columns, focus_columns_table, execution_order, context_files)
     
     # ======================== Вкладка 3: Результаты ========================
     else:
-        if st.session_state["result_df"] is None and st.session_state["table_analysis_result"] is None:
+        if (
+            st.session_state["result_df"] is None
+            and st.session_state["table_analysis_result"] is None
+            and st.session_state["workbook_result"] is None
+        ):
             st.info("После обработки данных здесь появятся результаты")
         else:
             st.header("Результаты обработки")
             
+            # Сводка последнего запуска
+            run_summary = st.session_state.get("run_summary")
+            if run_summary:
+                with st.expander("Сводка запуска", expanded=False):
+                    if run_summary.get("sheets"):
+                        st.write(f"Листов проанализировано: {run_summary['sheets'] - run_summary['failed_sheets']} из {run_summary['sheets']}")
+                    if run_summary.get("groups"):
+                        st.write(f"Групп проанализировано: {run_summary['groups']}, отчетов из кэша: {run_summary['cached_groups']}")
+                    if run_summary.get("resumed_rows"):
+                        st.write(f"Восстановлено из контрольной точки: {run_summary['resumed_rows']} строк")
+                    if run_summary.get("unique_rows") is not None:
+                        dedup_col1, dedup_col2, dedup_col3 = st.columns(3)
+                        dedup_col1.metric("Строк обработано", run_summary["rows"])
+                        dedup_col2.metric("Уникальных строк", run_summary["unique_rows"])
+                        dedup_col3.metric("Доля дубликатов", f"{run_summary['dedup_ratio']:.0%}")
+                    
+                    cache_stats = run_summary.get("cache")
+                    if cache_stats and cache_stats.get("enabled"):
+                        cache_col1, cache_col2, cache_col3 = st.columns(3)
+                        cache_col1.metric("Ответов из кэша", cache_stats["hits"])
+                        cache_col2.metric("Запросов к модели", cache_stats["misses"])
+                        cache_col3.metric("Доля попаданий в кэш", f"{cache_stats['hit_rate']:.0%}")
+                    else:
+                        st.write("Кэш ответов отключен")
+                    
+                    throughput = run_summary.get("throughput")
+                    if throughput and throughput.get("rows_per_second"):
+                        speed_col1, speed_col2, speed_col3 = st.columns(3)
+                        speed_col1.metric("Время обработки", format_duration(throughput["elapsed"]))
+                        speed_col2.metric("Строк в секунду", f"{throughput['rows_per_second']:.2f}")
+                        speed_col3.metric("Токенов в секунду", f"{throughput['tokens_per_second']:.0f}")
+                    
+                    rate_stats = run_summary.get("rate")
+                    if rate_stats:
+                        st.write(
+                            f"Скорость запросов к {rate_stats['endpoint']}: {rate_stats['requests_per_second']} запр./сек., "
+                            f"ответов 429: {rate_stats['rate_limited']}, ожидание лимитов: {rate_stats['total_wait']} сек."
+                        )
+            
+            # Отображение результатов анализа нескольких листов, если есть
+            workbook_result = st.session_state["workbook_result"]
+            if workbook_result is not None:
+                st.subheader("Результаты по листам")
+                for sheet, error in workbook_result.errors.items():
+                    st.error(f"Лист '{sheet}': {error}")
+                for sheet, item in workbook_result.results.items():
+                    with st.expander(f"Лист '{sheet}'", expanded=False):
+                        if item.result_df is not None and any(col.endswith("_Обработано") for col in item.result_df.columns):
+                            st.dataframe(item.result_df, use_container_width=True)
+                        if item.table_analysis:
+                            st.markdown(item.table_analysis)
+                
+                workbook_output = BytesIO()
+                write_workbook_result(workbook_result, workbook_output)
+                st.download_button(
+                    label="📥 Скачать результаты по листам (Excel)",
+                    data=workbook_output.getvalue(),
+                    file_name=f"processed_sheets_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+            
             # Отображение результатов построчного анализа, если есть
             if st.session_state["result_df"] is not None:
                 df_result = st.session_state["result_df"]
@@ -590,6 +838,23 @@ def main():
                         file_name=filename,
                         mime="text/markdown"
                     )
+                
+                group_reports = st.session_state.get("group_reports")
+                if group_reports:
+                    with st.expander(f"Отчеты по группам ({len(group_reports)})", expanded=False):
+                        for label, report in group_reports.items():
+                            st.markdown(f"**{label}**")
+                            st.markdown(report)
+            
+            # Отчет Word: анализ таблицы, сводка, диаграммы и начало таблицы результатов
+            if st.session_state["result_df"] is not None or st.session_state["table_analysis_result"] is not None:
+                st.subheader("Отчет Word")
+                render_word_report(
+                    st.session_state["result_df"],
+                    st.session_state["table_analysis_result"],
+                    st.session_state.get("group_reports"),
+                    base_filename=f"processed_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                )
             
             # Скачивание логов (если есть)
             if st.session_state["logs"]:
@@ -636,123 +901,18 @@ def main():
 def process_row_by_row(df, llm_provider, llm_settings, target_column, additional_columns, context_files):
     """Обработка данных построчно"""
     st.session_state["table_analysis_result"] = None
-    
-    # Показываем прогресс-бар
-    progress_text = "Выполняется построчный анализ... Это может занять несколько минут."
-    my_bar = st.progress(0, text=progress_text)
+    st.session_state["group_reports"] = None
     
     try:
-        # Подготовка DataFrame для результатов
-        result_df = df.copy()
-        result_col = f"{target_column}_Обработано"
-        result_df[result_col] = ""
-        
-        # Получаем параметры модели из настроек
-        model = llm_settings.get("model", llm_settings.get("local_model", "llama2"))  # Безопасно получаем модель
-        model_params = {
-            "model": model,  # Убедимся, что передаем модель в параметрах
-            "temperature": llm_settings.get("temperature", 0.7),
-            "max_tokens": llm_settings.get("max_tokens", 300),
-            "top_p": llm_settings.get("top_p", 1.0),
-            "frequency_penalty": llm_settings.get("frequency_penalty", 0.0),
-            "presence_penalty": llm_settings.get("presence_penalty", 0.0)
-        }
-        
-        # Подготовка контекста из дополнительных файлов
-        file_processor = FileProcessor()
-        context_files_processed = file_processor.process_context_files(context_files) if context_files else None
-        context_text = file_processor.prepare_context_for_analysis(context_files_processed) if context_files_processed else ""
-        
-        for i, row in df.iterrows():
-            # Обновляем прогресс-бар
-            progress = int((i + 1) / len(df) * 100)
-            my_bar.progress(progress, text=f"Обрабатывается строка {i+1} из {len(df)}...")
-            
-            # Подготовка данных для LLM
-            text_for_llm = str(row[target_column])
-            additional_context_str = ""
-            if additional_columns:
-                additional_context = [f"{col}: {row[col]}" for col in additional_columns]
-                additional_context_str = "\n".join(additional_context)
-            
-            # Подготовка промпта с использованием модуля prompt_library
-            context = {
-                "target_column": target_column,
-                "additional_columns": additional_columns,
-                "row_data": {col: row[col] for col in [target_column] + additional_columns}
-            }
-            prompt = customize_prompt(st.session_state["custom_prompt"], context)
-            
-            # Формирование сообщений для LLM
-            messages = [
-                {"role": "system", "content": "Вы – полезный аналитический ассистент."},
-                {
-                    "role": "user",
-                    "content": (
-                        f"{prompt}\n\n"
-                        f"{context_text}"
-                    )
-                }
-            ]
-            
-            # Логирование попыток для данной строки
-            row_log = {"row_index": i, "attempts": []}
-            max_retries = 3
-            attempt = 0
-            success = False
-            llm_answer = ""
-            
-            while not success and attempt < max_retries:
-                attempt += 1
-                attempt_log = {
-                    "attempt_number": attempt,
-                    "messages": messages,
-                    "raw_response": None,
-                    "parsed_answer": None,
-                    "error": None
-                }
-                
-                try:
-                    # Запрос к LLM-провайдеру
-                    response, error = llm_provider.chat_completion(
-                        messages=messages,
-                        **model_params
-                    )
-                    
-                    if error:
-                        attempt_log["error"] = error
-                    else:
-                        attempt_log["raw_response"] = "Success"
-                        attempt_log["parsed_answer"] = response
-                        llm_answer = response
-                        success = True
-                
-                except Exception as e:
-                    attempt_log["error"] = f"Ошибка при вызове LLM: {e}"
-                
-                # Добавляем лог по данной попытке
-                row_log["attempts"].append(attempt_log)
-                
-                if not success:
-                    time.sleep(2)  # Небольшая задержка перед повторной попыткой
-            
-            # Записываем результат в DataFrame
-            if success:
-                result_df.at[i, result_col] = llm_answer
-            else:
-                result_df.at[i, result_col] = f"Не удалось получить ответ после {max_retries} попыток"
-            
-            st.session_state["logs"].append(row_log)
-            time.sleep(0.5)  # Пауза между обработкой строк
-        
-        # Сохраняем результаты в session_state
-        st.session_state["result_df"] = result_df
-        
-        # Переходим к вкладке с результатами
-        st.session_state["active_tab"] = "tab3"
-        st.experimental_rerun()
+        engine = create_analysis_engine(
+            llm_provider, llm_settings, "Выполняется построчный анализ... Это может занять несколько минут."
+        )
+        result = engine.process_row_by_row(
+            df, target_column, additional_columns, st.session_state["custom_prompt"], context_files
+        )
+        show_analysis_result(result)
         
-        return result_df # Возвращаем DataFrame с результатами
+        return result.result_df # Возвращаем DataFrame с результатами
     
     except Exception as e:
         st.error(f"Произошла ошибка при выполнении построчного анализа: {e}")
@@ -762,69 +922,30 @@ def process_row_by_row(df, llm_provider, llm_settings, target_column, additional
         # Гарантированный сброс флага обработки
         st.session_state["processing"] = False
 
-def process_full_table(df, llm_provider, llm_settings, focus_columns, context_files):
+def process_full_table(df, llm_provider, llm_settings, focus_columns, context_files, group_column=None, group_period=None):
     """Обработка всей таблицы целиком"""
     try:
         with st.spinner("Выполняется анализ всей таблицы... Это может занять несколько минут."):
-            # Подготовка параметров для анализа всей таблицы
-            # Если llm_settings - это словарь, копируем из него значения
-            if isinstance(llm_settings, dict):
-                # Получаем параметры модели из настроек
-                model = llm_settings.get("model", llm_settings.get("local_model", "llama2"))  # Безопасно получаем модель
-                table_model_params = {
-                    "model": model,  # Явно указываем модель
-                    "temperature": llm_settings.get("temperature", 0.7),
-                    "max_tokens": max(1500, llm_settings.get("max_tokens", 300)),  # Увеличиваем max_tokens для анализа всей таблицы
-                    "top_p": llm_settings.get("top_p", 1.0),
-                    "frequency_penalty": llm_settings.get("frequency_penalty", 0.0),
-                    "presence_penalty": llm_settings.get("presence_penalty", 0.0)
-                }
-            else:
-                # Создаем параметры по умолчанию
-                table_model_params = {
-                    "model": "llama2",
-                    "temperature": 0.7,
-                    "max_tokens": 1500,
-                    "top_p": 1.0,
-                    "frequency_penalty": 0.0,
-                    "presence_penalty": 0.0
-                }
-            
-            # Подготовка промпта для всей таблицы
-            focus_text = ""
-            if focus_columns:
-                focus_text = f"Обрати особое внимание на следующие столбцы: {', '.join(focus_columns)}"
-            
-            # Используем модуль промптов для кастомизации
-            context = {
-                "focus_columns": focus_columns
-            }
-            full_prompt = customize_prompt(st.session_state["custom_prompt"], context)
-            
-            # Обработка контекстных файлов, если есть
-            file_processor = FileProcessor()
-            context_files_processed = file_processor.process_context_files(context_files) if context_files else None
-            
-            # Вызов функции анализа всей таблицы
-            result, error = analyze_full_table(
-                df, 
-                llm_provider, 
-                full_prompt,
-                table_model_params,
-                context_files_processed
+            engine = AnalysisEngine(
+                llm_provider,
+                llm_settings,
+                config_manager=st.session_state.get("config_manager"),
+                table_stats=cached_analyze_dataframe
+            )
+            result = engine.process_full_table(
+                df, focus_columns, st.session_state["custom_prompt"], context_files,
+                group_column=group_column, group_period=group_period
             )
             
-            if error:
-                st.error(f"Ошибка при анализе всей таблицы: {error}")
-                logging.error(f"Ошибка анализа всей таблицы: {error}")
+            if result.table_analysis is None:
+                for error in result.errors:
+                    st.error(error)
+                    logging.error(error)
             else:
-                # Сохраняем результат анализа всей таблицы
-                st.session_state["table_analysis_result"] = result
-                st.session_state["result_df"] = df  # Оригинальный DataFrame
-                
-                # Переходим к вкладке с результатами
-                st.session_state["active_tab"] = "tab3"
-                st.experimental_rerun()
+                # Сохраняем результат анализа всей таблицы (при частичном успехе - вместе с ошибками)
+                st.session_state["table_analysis_result"] = result.table_analysis
+                st.session_state["group_reports"] = result.group_reports
+                show_analysis_result(result)
     
     except Exception as e:
         st.error(f"Произошла ошибка при выполнении анализа всей таблицы: {e}")
@@ -837,191 +958,82 @@ def process_full_table(df, llm_provider, llm_settings, focus_columns, context_fi
 def process_combined_analysis(df, llm_provider, llm_settings, target_column, additional_columns, focus_columns_table, execution_order, context_files):
     """Обработка данных комбинированным способом"""
     try:
-        # Подготовка DataFrame для результатов
-        result_df = df.copy()
-        result_col = f"{target_column}_Обработано"
-        result_df[result_col] = ""
+        engine = create_analysis_engine(
+            llm_provider, llm_settings, "Выполняется комбинированный анализ... Это может занять несколько минут."
+        )
+        result = engine.process_combined(
+            df,
+            target_column,
+            additional_columns,
+            focus_columns_table,
+            execution_order,
+            st.session_state["custom_prompt"],
+            context_files
+        )
         
-        # Получаем параметры модели из настроек
-        model = llm_settings.get("model", llm_settings.get("local_model", "llama2"))  # Безопасно получаем модель
-        model_params = {
-            "model": model,  # Явно указываем модель
-            "temperature": llm_settings.get("temperature", 0.7),
-            "max_tokens": llm_settings.get("max_tokens", 300),
-            "top_p": llm_settings.get("top_p", 1.0),
-            "frequency_penalty": llm_settings.get("frequency_penalty", 0.0),
-            "presence_penalty": llm_settings.get("presence_penalty", 0.0)
-        }
+        if result.table_analysis is not None:
+            # Сохраняем результат анализа всей таблицы
+            st.session_state["table_analysis_result"] = result.table_analysis
+            st.session_state["group_reports"] = None
+        show_analysis_result(result)
+    
+    except Exception as e:
+        st.error(f"Произошла ошибка при выполнении комбинированного анализа: {e}")
+        logging.error(f"Ошибка комбинированного анализа: {e}", exc_info=True)
+    
+    finally:
+        # Гарантированный сброс флага обработки
+        st.session_state["processing"] = False
+
+def process_workbook(llm_provider, llm_settings, profile, columns, context_files):
+    """
+    Анализ выбранных листов книги с одним профилем запуска.
+    
+    Args:
+        llm_provider: Провайдер LLM
+        llm_settings: Настройки LLM
+        profile: Профиль запуска (как у AnalysisEngine.run)
+        columns: Столбцы, которые читаются из больших файлов (None - все)
+        context_files: Дополнительные файлы контекста
+    """
+    try:
+        sheets = st.session_state["selected_sheets"]
+        source = st.session_state.get("excel_source")
+        my_bar = st.progress(0, text=f"Выполняется анализ листов ({len(sheets)})... Это может занять несколько минут.")
+        messages = {"info": st.info, "warning": st.warning, "error": st.error}
         
-        # Параметры для анализа всей таблицы (увеличенное max_tokens)
-        table_model_params = model_params.copy()
-        table_model_params["max_tokens"] = max(1500, model_params["max_tokens"])
-        # Не нужно добавлять model снова, он уже есть в model_params и был скопирован
+        def on_progress(done, total, text):
+            my_bar.progress(int(done / total * 100) if total else 100, text=text)
         
-        # Подготовка контекстных файлов, если есть
-        file_processor = FileProcessor()
-        context_files_processed = file_processor.process_context_files(context_files) if context_files else None
+        def load_sheet(file, sheet):
+            # Листы читаются в фоновом потоке, поэтому без кэша Streamlit
+            if source is None:
+                return ExcelHandler.load_excel(file, sheet=sheet)
+            return ExcelHandler.load_excel(file, columns=columns, engine=source["engine"], workers=source["workers"], sheet=sheet)
         
-        if execution_order.startswith("Сначала анализ всей таблицы"):
-            # 1. Сначала анализ всей таблицы
-            with st.spinner("Выполняется анализ всей таблицы... Это может занять несколько минут."):
-                # Подготовка промпта для всей таблицы
-                context = {
-                    "focus_columns": focus_columns_table
-                }
-                full_prompt = customize_prompt(st.session_state["custom_prompt"], context)
-                
-                # Вызов функции анализа всей таблицы
-                result, error = analyze_full_table(
-                    df, 
-                    llm_provider, 
-                    full_prompt,
-                    table_model_params,
-                    context_files_processed
-                )
-                
-                if error:
-                    st.error(f"Ошибка при анализе всей таблицы: {error}")
-                else:
-                    # Сохраняем результат анализа всей таблицы
-                    st.session_state["table_analysis_result"] = result
-            
-            # 2. Затем построчный анализ
-            progress_text = "Выполняется построчный анализ... Это может занять несколько минут."
-            my_bar = st.progress(0, text=progress_text)
-            
-            # Добавляем результат анализа всей таблицы как контекст для каждой строки
-            table_analysis_context = st.session_state["table_analysis_result"]
-            
-            # Обрезаем контекст, если он слишком длинный
-            if table_analysis_context and len(table_analysis_context) > 2000:
-                table_analysis_context = table_analysis_context[:2000] + "... [продолжение обрезано]"
-            
-            for i, row in df.iterrows():
-                # Обновляем прогресс-бар
-                progress = int((i + 1) / len(df) * 100)
-                my_bar.progress(progress, text=f"Обрабатывается строка {i+1} из {len(df)}...")
-                
-                # Подготовка данных для LLM с учетом результата анализа всей таблицы
-                context = {
-                    "target_column": target_column,
-                    "additional_columns": additional_columns,
-                    "row_data": {col: row[col] for col in [target_column] + additional_columns}
-                }
-                
-                prompt = customize_prompt(st.session_state["custom_prompt"], context)
-                
-                messages = [
-                    {"role": "system", "content": "Вы – полезный аналитический ассистент."},
-                    {
-                        "role": "user",
-                        "content": (
-                            f"{prompt}\n\n"
-                            f"Результат анализа всей таблицы (используй как контекст):\n{table_analysis_context}"
-                        )
-                    }
-                ]
-                
-                # Запрос к LLM-провайдеру
-                response, error = llm_provider.chat_completion(
-                    messages=messages,
-                    **table_model_params
-                )
-                
-                # Записываем результат в DataFrame
-                if error:
-                    result_df.at[i, result_col] = f"Ошибка: {error}"
-                else:
-                    result_df.at[i, result_col] = response
-                
-                time.sleep(0.5)  # Пауза между обработкой строк
-        
-        else:
-            # 1. Сначала построчный анализ
-            progress_text = "Выполняется построчный анализ... Это может занять несколько минут."
-            my_bar = st.progress(0, text=progress_text)
-            
-            for i, row in df.iterrows():
-                # Обновляем прогресс-бар
-                progress = int((i + 1) / len(df) * 100)
-                my_bar.progress(progress, text=f"Обрабатывается строка {i+1} из {len(df)}...")
-                
-                # Построчный анализ
-                context = {
-                    "target_column": target_column,
-                    "additional_columns": additional_columns,
-                    "row_data": {col: row[col] for col in [target_column] + additional_columns}
-                }
-                
-                prompt = customize_prompt(st.session_state["custom_prompt"], context)
-                
-                messages = [
-                    {"role": "system", "content": "Вы – полезный аналитический ассистент."},
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-                
-                # Запрос к LLM-провайдеру
-                response, error = llm_provider.chat_completion(
-                    messages=messages,
-                    **table_model_params
-                )
-                
-                # Записываем результат в DataFrame
-                if error:
-                    result_df.at[i, result_col] = f"Ошибка: {error}"
-                else:
-                    result_df.at[i, result_col] = response
-                
-                time.sleep(0.5)  # Пауза между обработкой строк
-            
-            # 2. Затем анализ всей таблицы с учетом результатов построчного анализа
-            with st.spinner("Выполняется анализ всей таблицы... Это может занять несколько минут."):
-                # Подготовка промпта для всей таблицы, включающего результаты построчного анализа
-                context = {
-                    "focus_columns": focus_columns_table
-                }
-                
-                prompt = customize_prompt(st.session_state["custom_prompt"], context)
-                
-                full_prompt = f"""
-                {prompt}
-                
-                Обрати внимание, что каждая строка уже была проанализирована по отдельности, 
-                и результаты находятся в столбце '{result_col}'. 
-                Используй эти результаты для формирования общих выводов и закономерностей.
-                
-                Проведи комплексный анализ данных и предоставь структурированный отчет 
-                с ключевыми выводами, закономерностями и рекомендациями.
-                """
-                
-                # Вызов функции анализа всей таблицы с учетом результатов построчного анализа
-                result, error = analyze_full_table(
-                    result_df,  # Передаем DataFrame с результатами построчного анализа
-                    llm_provider, 
-                    full_prompt,
-                    table_model_params,
-                    context_files_processed
-                )
-                
-                if error:
-                    st.error(f"Ошибка при анализе всей таблицы: {error}")
-                else:
-                    # Сохраняем результат анализа всей таблицы
-                    st.session_state["table_analysis_result"] = result
+        runner = WorkbookRunner(
+            llm_provider,
+            llm_settings,
+            config_manager=st.session_state.get("config_manager"),
+            on_progress=on_progress,
+            on_message=lambda level, text: messages.get(level, st.info)(text),
+            load_sheet=load_sheet
+        )
+        result = runner.run(st.session_state["excel_file"], sheets, profile, context_files)
         
-        # Сохраняем результаты в session_state
-        st.session_state["result_df"] = result_df
+        st.session_state["workbook_result"] = result
+        st.session_state["result_df"] = None
+        st.session_state["table_analysis_result"] = None
+        st.session_state["group_reports"] = None
+        st.session_state["run_summary"] = result.summary
         
         # Переходим к вкладке с результатами
         st.session_state["active_tab"] = "tab3"
         st.experimental_rerun()
     
     except Exception as e:
-        st.error(f"Произошла ошибка при выполнении комбинированного анализа: {e}")
-        logging.error(f"Ошибка комбинированного анализа: {e}", exc_info=True)
+        st.error(f"Произошла ошибка при анализе листов: {e}")
+        logging.error(f"Ошибка анализа листов: {e}", exc_info=True)
     
     finally:
         # Гарантированный сброс флага обработки
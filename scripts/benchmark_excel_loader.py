@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# scripts/benchmark_excel_loader.py
+"""
+Сравнивает скорость чтения большого листа xlsx разными движками.
+
+Пример:
+    python scripts/benchmark_excel_loader.py --rows 100000 500000 1000000 --workers 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Добавляем корневую директорию проекта в path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+import pandas as pd
+from openpyxl import Workbook
+
+from src.core.excel_loader import CALAMINE_AVAILABLE, read_excel_columns
+from src.core.excel_shards import read_excel_sharded
+
+def make_workbook(path, rows, text_columns, number_columns):
+    """Создает книгу с текстовыми, числовыми столбцами и датами (потоковая запись openpyxl)"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Данные")
+    sheet.append(
+        [f"Текст {i}" for i in range(text_columns)] + [f"Число {i}" for i in range(number_columns)] + ["Дата"]
+    )
+    start = pd.Timestamp("2024-01-01")
+    for row in range(rows):
+        sheet.append(
+            [f"Отзыв {row % 997} о товаре {i}" for i in range(text_columns)]
+            + [row * (i + 1) * 0.5 for i in range(number_columns)]
+            + [(start + pd.Timedelta(minutes=row)).to_pydatetime()]
+        )
+    workbook.save(path)
+
+def measure(name, read):
+    """Замеряет время чтения и возвращает строку результата"""
+    started = time.perf_counter()
+    df = read()
+    elapsed = time.perf_counter() - started
+    print(f"  {name:<32} {elapsed:8.1f} сек.  {df.shape[0]} x {df.shape[1]}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение движков чтения Excel")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 500000, 1000000], help="Размеры листов в строках")
+    parser.add_argument("--text-columns", type=int, default=4, help="Текстовых столбцов")
+    parser.add_argument("--number-columns", type=int, default=8, help="Числовых столбцов")
+    parser.add_argument("--workers", type=int, default=None, help="Процессов для параллельного разбора (по умолчанию по числу ядер)")
+    parser.add_argument("--skip-openpyxl", action="store_true", help="Не замерять pandas.read_excel через openpyxl (самый медленный)")
+    args = parser.parse_args()
+
+    print(f"Ядер: {os.cpu_count()}, процессов разбора: {args.workers or os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for rows in args.rows:
+            path = os.path.join(temp_dir, f"bench_{rows}.xlsx")
+            make_workbook(path, rows, args.text_columns, args.number_columns)
+            print(f"{rows} строк, {os.path.getsize(path) / (1024 * 1024):.1f} МБ:")
+            if not args.skip_openpyxl:
+                measure("pandas.read_excel (openpyxl)", lambda: pd.read_excel(path, engine="openpyxl"))
+            if CALAMINE_AVAILABLE:
+                measure("pandas.read_excel (calamine)", lambda: pd.read_excel(path, engine="calamine"))
+            measure("read_excel_sharded", lambda: read_excel_sharded(path, workers=args.workers))
+            measure("read_excel_sharded (2 столбца)", lambda: read_excel_sharded(path, columns=["Текст 0", "Дата"], workers=args.workers))
+            measure("read_excel_columns (2 столбца)", lambda: read_excel_columns(path, columns=["Текст 0", "Дата"]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+# src/cli.py
+"""
+Пакетный запуск анализа Excel без интерфейса.
+
+Пример:
+    python -m src.cli data.xlsx profiles/Отзывы.json results.xlsx --target-column Отзыв
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from contextlib import ExitStack
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from src.config.manager import ConfigManager
+from src.core.analysis_engine import AnalysisEngine, MODE_COMBINED, MODE_ROWS, MODE_TABLE, create_llm_provider
+from src.core.excel_loader import list_sheets, read_excel_columns
+from src.core.excel_shards import read_excel_sharded
+from src.core.excel_writer import write_sheets
+from src.core.table_groups import GROUP_PERIODS
+from src.core.workbook_runner import WorkbookRunner, write_workbook_result
+from src.services.progress import format_duration
+
+# Переменные окружения с API ключом облачного провайдера
+API_KEY_ENV_VARS = ("DEEPSEEK_API_KEY", "OPENAI_API_KEY")
+
+
+def load_profile(path: str) -> Dict[str, Any]:
+    """
+    Загружает профиль запуска.
+
+    Поддерживаются профили, сохраненные в интерфейсе (настройки LLM на верхнем
+    уровне), и конфигурации задач планировщика (настройки LLM в "llm_settings").
+
+    Args:
+        path (str): Путь к JSON-файлу профиля
+
+    Returns:
+        Dict[str, Any]: Профиль запуска с настройками LLM в "llm_settings"
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        profile = json.load(f)
+
+    if not isinstance(profile, dict):
+        raise ValueError(f"Профиль {path} должен быть JSON-объектом")
+
+    profile = {key: value for key, value in profile.items() if not key.startswith("_")}
+    if "llm_settings" not in profile:
+        profile["llm_settings"] = dict(profile)
+    return profile
+
+
+def split_columns(value: Optional[str]) -> Optional[List[str]]:
+    """Разбирает список столбцов, перечисленных через запятую."""
+    if value is None:
+        return None
+    return [column.strip() for column in value.split(",") if column.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Создает разбор аргументов командной строки."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli",
+        description="Анализ Excel-книги с помощью LLM без интерфейса Streamlit"
+    )
+    parser.add_argument("workbook", help="Путь к Excel-книге")
+    parser.add_argument("profile", help="JSON-профиль с настройками LLM, режимом и промптом")
+    parser.add_argument("output", help="Путь к Excel-файлу с результатами")
+    parser.add_argument("--sheet", default=0, help="Лист книги (название или номер, по умолчанию первый)")
+    parser.add_argument("--sheets", help="Анализ нескольких листов: названия через запятую или * (все листы); "
+                                         "результат - по листу на каждый исходный лист")
+    parser.add_argument("--mode", choices=[MODE_ROWS, MODE_TABLE, MODE_COMBINED], help="Режим анализа (по умолчанию из профиля)")
+    parser.add_argument("--target-column", help="Целевой столбец")
+    parser.add_argument("--additional-columns", help="Дополнительные столбцы через запятую")
+    parser.add_argument("--focus-columns", help="Столбцы для анализа всей таблицы через запятую")
+    parser.add_argument("--execution-order", help="Порядок комбинированного анализа")
+    parser.add_argument("--table-brief", action="store_true",
+                        help="Комбинированный анализ \"сначала таблица\": начинать строки после краткого описания таблицы "
+                             "(дополнительный запрос; строки получают краткое описание вместо подробного отчета)")
+    parser.add_argument("--map-reduce", action="store_true", help="Анализ всей таблицы по всем строкам (map-reduce)")
+    parser.add_argument("--table-queries", action="store_true", help="Разрешить модели запросы SQL к таблице (DuckDB) при анализе всей таблицы")
+    parser.add_argument("--group-by", help="Анализ всей таблицы по группам строк: столбец группировки")
+    parser.add_argument("--group-period", choices=list(GROUP_PERIODS), help="Период группировки для столбца дат")
+    parser.add_argument("--near-duplicates", action="store_true", help="Объединять почти одинаковые тексты целевого столбца")
+    parser.add_argument("--similarity-threshold", type=float, help="Порог сходства почти одинаковых текстов (по умолчанию из конфигурации)")
+    parser.add_argument("--only-used-columns", action="store_true", help="Читать из книги только столбцы, нужные для анализа")
+    parser.add_argument("--sharded-parse", action="store_true", help="Разбирать лист параллельно в нескольких процессах (очень большие xlsx)")
+    parser.add_argument("--prompt-file", help="Файл с промптом (вместо custom_prompt из профиля)")
+    parser.add_argument("--context", nargs="*", default=[], help="Дополнительные файлы контекста")
+    parser.add_argument("--api-key", help=f"API ключ облачного провайдера (по умолчанию из {' или '.join(API_KEY_ENV_VARS)})")
+    parser.add_argument("--config", default="config/default_config.json", help="Файл конфигурации приложения")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Подробный вывод")
+    return parser
+
+
+def used_columns(profile: Dict[str, Any]) -> Optional[List[str]]:
+    """
+    Возвращает столбцы, нужные для анализа по профилю.
+
+    Args:
+        profile (Dict[str, Any]): Профиль запуска
+
+    Returns:
+        Optional[List[str]]: Столбцы без повторов или None, если нужна вся таблица
+            (анализ всей таблицы без ключевых столбцов)
+    """
+    mode = profile.get("mode", MODE_ROWS)
+    focus_columns = list(profile.get("focus_columns") or [])
+    if mode == MODE_TABLE and not focus_columns:
+        return None
+
+    if mode == MODE_TABLE:
+        columns = focus_columns + [profile.get("group_column")]
+    else:
+        columns = [profile.get("target_column")] + list(profile.get("additional_columns") or []) + focus_columns
+    return list(dict.fromkeys(col for col in columns if col))
+
+
+def apply_arguments(profile: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Дополняет профиль значениями из аргументов командной строки.
+
+    Args:
+        profile (Dict[str, Any]): Профиль запуска
+        args (argparse.Namespace): Аргументы командной строки
+
+    Returns:
+        Dict[str, Any]: Профиль с примененными аргументами
+    """
+    overrides = {
+        "mode": args.mode,
+        "target_column": args.target_column,
+        "additional_columns": split_columns(args.additional_columns),
+        "focus_columns": split_columns(args.focus_columns),
+        "execution_order": args.execution_order,
+        "group_column": args.group_by,
+        "group_period": args.group_period
+    }
+    profile.update({key: value for key, value in overrides.items() if value is not None})
+
+    if args.prompt_file:
+        with open(args.prompt_file, "r", encoding="utf-8") as f:
+            profile["custom_prompt"] = f.read()
+
+    llm_settings = profile["llm_settings"]
+    if args.map_reduce:
+        llm_settings["table_map_reduce"] = True
+    if args.table_brief:
+        llm_settings["table_brief"] = True
+    if args.table_queries:
+        llm_settings["table_queries"] = True
+    if args.near_duplicates:
+        llm_settings["near_duplicates"] = True
+    if args.similarity_threshold is not None:
+        llm_settings["near_duplicate_threshold"] = args.similarity_threshold
+    api_key = args.api_key or next((os.environ[name] for name in API_KEY_ENV_VARS if os.environ.get(name)), None)
+    if api_key:
+        llm_settings["api_key"] = api_key
+    return profile
+
+
+def save_result(result, output: str) -> None:
+    """
+    Сохраняет результат анализа.
+
+    Таблица записывается на первый лист, результат анализа всей таблицы -
+    на лист "Анализ таблицы", отчеты по группам - на лист "Отчеты по группам".
+
+    Args:
+        result (AnalysisResult): Результат анализа
+        output (str): Путь к Excel-файлу
+    """
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    sheets = {}
+    if result.result_df is not None:
+        sheets["Результаты"] = result.result_df
+    if result.table_analysis:
+        sheets["Анализ таблицы"] = pd.DataFrame({"Анализ таблицы": [result.table_analysis]})
+    if result.group_reports:
+        sheets["Отчеты по группам"] = pd.DataFrame({
+            "Группа": list(result.group_reports),
+            "Отчет": list(result.group_reports.values())
+        })
+    write_sheets(sheets, output)
+
+
+def make_progress_logger(logger: logging.Logger):
+    """Функция прогресса, которая пишет в лог не чаще одного раза на процент."""
+    last_percent = -1
+
+    def on_progress(done, total, text):
+        nonlocal last_percent
+        percent = int(done / total * 100) if total else 100
+        if percent != last_percent:
+            last_percent = percent
+            logger.info(text)
+
+    return on_progress
+
+
+def run_sheets(args: argparse.Namespace, profile: Dict[str, Any], logger: logging.Logger) -> int:
+    """
+    Анализирует несколько листов книги (--sheets) и сохраняет по листу результата на каждый.
+
+    Args:
+        args (argparse.Namespace): Аргументы командной строки
+        profile (Dict[str, Any]): Профиль запуска
+        logger (logging.Logger): Лог консольного запуска
+
+    Returns:
+        int: Код завершения (0 - успех)
+    """
+    columns = used_columns(profile) if args.only_used_columns else None
+    read_sheet = read_excel_sharded if args.sharded_parse else read_excel_columns
+
+    try:
+        available = list_sheets(args.workbook)
+        sheets = available if args.sheets.strip() == "*" else split_columns(args.sheets)
+        missing = [sheet for sheet in sheets if sheet not in available]
+        if missing:
+            raise ValueError(f"Листы отсутствуют в книге: {', '.join(missing)}")
+
+        config_manager = ConfigManager(args.config)
+        llm_settings = profile["llm_settings"]
+        runner = WorkbookRunner(
+            create_llm_provider(llm_settings, config_manager),
+            llm_settings,
+            config_manager,
+            on_progress=make_progress_logger(logger),
+            load_sheet=lambda file, sheet: read_sheet(file, sheet, columns)
+        )
+        with ExitStack() as stack:
+            context_files = [stack.enter_context(open(path, "rb")) for path in args.context]
+            result = runner.run(args.workbook, sheets, profile, context_files or None)
+    except (OSError, ValueError) as e:
+        logger.error(str(e))
+        return 2
+
+    for sheet, error in result.errors.items():
+        logger.error(f"Лист '{sheet}': {error}")
+    if not result.results:
+        return 1
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    write_workbook_result(result, args.output)
+    logger.info(f"Результаты сохранены: {args.output} (листов: {len(result.results)} из {len(sheets)})")
+
+    cache_stats = result.summary.get("cache") or {}
+    if cache_stats.get("enabled"):
+        logger.info(f"Кэш ответов: попаданий {cache_stats['hits']}, промахов {cache_stats['misses']}")
+    return 1 if result.errors or any(item.errors for item in result.results.values()) else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Точка входа консольного запуска.
+
+    Args:
+        argv (Optional[List[str]]): Аргументы командной строки (по умолчанию sys.argv)
+
+    Returns:
+        int: Код завершения (0 - успех)
+    """
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    logger = logging.getLogger("cli")
+
+    if args.sheets:
+        try:
+            profile = apply_arguments(load_profile(args.profile), args)
+        except (OSError, ValueError) as e:
+            logger.error(str(e))
+            return 2
+        return run_sheets(args, profile, logger)
+
+    try:
+        profile = apply_arguments(load_profile(args.profile), args)
+        sheet = int(args.sheet) if str(args.sheet).isdigit() else args.sheet
+        columns = used_columns(profile) if args.only_used_columns else None
+        if args.sharded_parse:
+            df = read_excel_sharded(args.workbook, sheet, columns)
+        else:
+            df = read_excel_columns(args.workbook, sheet, columns)
+        df.attrs["name"] = os.path.basename(args.workbook)
+
+        config_manager = ConfigManager(args.config)
+        llm_settings = profile["llm_settings"]
+        llm_provider = create_llm_provider(llm_settings, config_manager)
+
+        engine = AnalysisEngine(llm_provider, llm_settings, config_manager, on_progress=make_progress_logger(logger))
+
+        with ExitStack() as stack:
+            context_files = [stack.enter_context(open(path, "rb")) for path in args.context]
+            result = engine.run(df, profile, context_files or None)
+    except (OSError, ValueError) as e:
+        logger.error(str(e))
+        return 2
+
+    for error in result.errors:
+        logger.error(error)
+
+    if result.result_df is None and not result.table_analysis:
+        return 1
+
+    save_result(result, args.output)
+    logger.info(f"Результаты сохранены: {args.output}")
+
+    summary = result.summary
+    if "rows" in summary:
+        logger.info(
+            f"Строк обработано: {summary['rows']}, уникальных: {summary['unique_rows']}, "
+            f"продолжено с контрольной точки: {summary.get('resumed_rows', 0)}"
+        )
+    throughput = summary.get("throughput") or {}
+    if throughput.get("rows_per_second"):
+        logger.info(
+            f"Время обработки: {format_duration(throughput['elapsed'])}, "
+            f"{throughput['rows_per_second']:.2f} строк/с, {throughput['tokens_per_second']:.0f} токенов/с"
+        )
+    cache_stats = summary.get("cache") or {}
+    if cache_stats.get("enabled"):
+        logger.info(f"Кэш ответов: попаданий {cache_stats['hits']}, промахов {cache_stats['misses']}")
+
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
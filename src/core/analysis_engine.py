@@ -0,0 +1,1339 @@
+# src/core/analysis_engine.py
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from src.config.manager import ConfigManager
+from src.core.dataset_digest import DEFAULT_DIGEST_TOKENS, describe_dataframe
+from src.core.file_processor import FileProcessor
+from src.core.row_sampling import DEFAULT_SAMPLE_ROWS, DEFAULT_SAMPLE_TOKENS, describe_sample
+from src.core.table_findings import DEFAULT_FINDINGS_TOKENS, describe_findings
+from src.core.table_groups import DEFAULT_MAX_GROUPS, GROUP_PERIODS, group_report_key, split_table
+from src.services.checkpoint import CheckpointStore, make_run_id
+from src.services.progress import DEFAULT_UPDATES_PER_SECOND, ProgressReporter, format_progress
+from src.services.prompt_library import customize_prompt
+from src.services.rate_governor import estimate_request_tokens
+from src.services.response_cache import DEFAULT_CACHE_PATH, get_response_cache
+from src.services.row_batching import RowBatcher, estimate_tokens, get_context_limit
+from src.services.row_dedup import (
+    DEFAULT_NEAR_DUPLICATE_THRESHOLD,
+    DEFAULT_NUM_PERM,
+    DEFAULT_SHINGLE_SIZE,
+    dedup_ratio,
+    group_duplicate_rows,
+    group_near_duplicate_rows
+)
+from src.services.row_executor import RowExecutor, get_concurrency
+from src.services.table_mapreduce import StreamingTableReducer, TableMapReducer, serialize_row, table_header
+from src.services.table_query import TableQueryLoop, table_query_available
+from src.services.tokenizer import DEFAULT_CACHE_SIZE, DEFAULT_TOKENIZER_PATH, configure_tokenizer, count_message_tokens
+
+# Режимы анализа (совпадают с названиями в интерфейсе и профилях)
+MODE_ROWS = "Построчный анализ"
+MODE_TABLE = "Анализ всей таблицы"
+MODE_COMBINED = "Комбинированный анализ"
+
+# Порядок выполнения комбинированного анализа по умолчанию
+TABLE_FIRST_ORDER = "Сначала анализ всей таблицы, затем построчный"
+
+# Размер краткого описания таблицы, с которым начинается построчный анализ
+DEFAULT_CONTEXT_TOKENS = 400
+# Максимальная длина результата анализа таблицы в промпте строки (символов)
+MAX_TABLE_CONTEXT_CHARS = 2000
+
+ROW_SYSTEM_PROMPT = "Вы – полезный аналитический ассистент."
+TABLE_SYSTEM_PROMPT = "Вы – эксперт по анализу данных и бизнес-аналитике."
+
+
+@dataclass
+class AnalysisResult:
+    """
+    Результат запуска анализа.
+
+    Attributes:
+        result_df: Таблица с результатами (для анализа всей таблицы - исходные данные)
+        table_analysis: Результат анализа всей таблицы
+        logs: Логи запросов по строкам в порядке строк
+        summary: Сводка запуска (кэш, дубликаты, контрольная точка)
+        errors: Ошибки, не прервавшие запуск
+        group_reports: Отчеты по группам строк при анализе по группам (ключ группы -> отчет)
+    """
+    result_df: Optional[pd.DataFrame] = None
+    table_analysis: Optional[str] = None
+    logs: List[Dict[str, Any]] = field(default_factory=list)
+    summary: Dict[str, Any] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+    group_reports: Dict[str, str] = field(default_factory=dict)
+
+
+def create_llm_provider(settings: Dict[str, Any], config_manager: Optional[ConfigManager] = None):
+    """
+    Создает унифицированный LLM провайдер по настройкам LLM.
+
+    Args:
+        settings: Настройки LLM (provider_type, api_key, cloud_base_url, local_provider, ...)
+        config_manager: Менеджер конфигурации
+
+    Returns:
+        UnifiedLLM: Провайдер LLM
+
+    Raises:
+        ValueError: Если для облачного провайдера не указан API ключ
+    """
+    from src.llm.unified_provider import UnifiedLLM
+
+    config_manager = config_manager or ConfigManager()
+    provider_type = settings.get("provider_type", "cloud")
+
+    # Счетчик токенов для пакетирования, проверок контекста и лимитов токенов
+    configure_tokenizer(
+        config_manager.get("tokenizer.path", DEFAULT_TOKENIZER_PATH),
+        config_manager.get("tokenizer.cache_size", DEFAULT_CACHE_SIZE)
+    )
+
+    if provider_type == "cloud" and not settings.get("api_key"):
+        raise ValueError("API ключ не указан для облачного провайдера")
+
+    return UnifiedLLM({
+        "provider_type": provider_type,
+        "cloud_api_key": settings.get("api_key", ""),
+        "cloud_base_url": settings.get("cloud_base_url", "https://api.deepseek.com"),
+        "local_provider": settings.get("local_provider", "ollama"),
+        "local_base_url": settings.get("local_base_url", "http://localhost:11434"),
+        "local_model": settings.get("local_model", "llama2"),
+        "use_cache": config_manager.get("cache.enabled", True) and settings.get("use_cache", True),
+        "cache_path": config_manager.get("cache.path", "cache/llm_responses.sqlite"),
+        "cache_ttl_hours": config_manager.get("cache.ttl_hours", 168),
+        "cache_max_size_mb": config_manager.get("cache.max_size_mb", 200),
+        "rate_limits": config_manager.get(f"rate_limits.{provider_type}"),
+        "retry": config_manager.get("retry")
+    })
+
+
+def build_model_params(llm_settings: Dict[str, Any], min_max_tokens: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Формирует параметры модели из настроек LLM.
+
+    Args:
+        llm_settings: Настройки LLM
+        min_max_tokens: Минимальное значение max_tokens (для анализа всей таблицы)
+
+    Returns:
+        Dict[str, Any]: Параметры для chat_completion
+    """
+    if not isinstance(llm_settings, dict):
+        llm_settings = {}
+
+    params = {
+        "model": llm_settings.get("model", llm_settings.get("local_model", "llama2")),
+        "temperature": llm_settings.get("temperature", 0.7),
+        "max_tokens": llm_settings.get("max_tokens", 300),
+        "top_p": llm_settings.get("top_p", 1.0),
+        "frequency_penalty": llm_settings.get("frequency_penalty", 0.0),
+        "presence_penalty": llm_settings.get("presence_penalty", 0.0)
+    }
+    if min_max_tokens:
+        params["max_tokens"] = max(min_max_tokens, params["max_tokens"])
+    return params
+
+
+def build_run_summary(llm_provider, **extra) -> Dict[str, Any]:
+    """
+    Формирует сводку запуска.
+
+    Args:
+        llm_provider: Провайдер LLM, выполнявший запросы
+        **extra: Дополнительные показатели запуска
+
+    Returns:
+        dict: Сводка запуска
+    """
+    summary = dict(extra)
+    if hasattr(llm_provider, "get_cache_stats"):
+        summary["cache"] = llm_provider.get_cache_stats()
+    if hasattr(llm_provider, "get_rate_stats"):
+        summary["rate"] = llm_provider.get_rate_stats()
+    return summary
+
+
+def build_row_messages(row, target_column, additional_columns, prompt_template, extra_content=""):
+    """
+    Формирует сообщения для LLM по одной строке таблицы.
+
+    Args:
+        row: Строка DataFrame
+        target_column: Целевой столбец
+        additional_columns: Дополнительные столбцы для контекста
+        prompt_template: Шаблон промпта
+        extra_content: Дополнительный текст в конце промпта (контекстные файлы, результат анализа таблицы)
+
+    Returns:
+        list: Сообщения для chat_completion
+    """
+    context = {
+        "target_column": target_column,
+        "additional_columns": additional_columns,
+        "row_data": {col: row[col] for col in [target_column] + additional_columns}
+    }
+    prompt = customize_prompt(prompt_template, context)
+    content = f"{prompt}\n\n{extra_content}" if extra_content else prompt
+
+    return [
+        {"role": "system", "content": ROW_SYSTEM_PROMPT},
+        {"role": "user", "content": content}
+    ]
+
+
+def request_row_completion(llm_provider, row_index, messages, model_params):
+    """
+    Выполняет запрос к LLM для одной строки.
+
+    Повторные попытки, паузы и предохранитель при недоступности API
+    обеспечивает провайдер, поэтому здесь выполняется один вызов.
+    Функция вызывается из рабочих потоков RowExecutor.
+
+    Returns:
+        tuple: (ответ, успех, лог строки)
+    """
+    attempt_log = {
+        "attempt_number": 1,
+        "messages": messages,
+        "raw_response": None,
+        "parsed_answer": None,
+        "error": None
+    }
+
+    try:
+        response, error = llm_provider.chat_completion(
+            messages=messages,
+            **model_params
+        )
+    except Exception as e:
+        response, error = None, f"Ошибка при вызове LLM: {e}"
+
+    return finish_row_attempt(row_index, attempt_log, response, error)
+
+
+async def arequest_row_completion(llm_provider, row_index, messages, model_params):
+    """
+    Асинхронный вариант request_row_completion для провайдеров с achat_completion.
+
+    Returns:
+        tuple: (ответ, успех, лог строки)
+    """
+    attempt_log = {
+        "attempt_number": 1,
+        "messages": messages,
+        "raw_response": None,
+        "parsed_answer": None,
+        "error": None
+    }
+
+    try:
+        response, error = await llm_provider.achat_completion(
+            messages=messages,
+            **model_params
+        )
+    except Exception as e:
+        response, error = None, f"Ошибка при вызове LLM: {e}"
+
+    return finish_row_attempt(row_index, attempt_log, response, error)
+
+
+def finish_row_attempt(row_index, attempt_log, response, error):
+    """Заполняет лог попытки по результату запроса и возвращает (ответ, успех, лог строки)."""
+    if error:
+        attempt_log["error"] = error
+    else:
+        attempt_log["raw_response"] = "Success"
+        attempt_log["parsed_answer"] = response
+
+    return (None if error else response), not error, {"row_index": row_index, "attempts": [attempt_log]}
+
+
+def estimate_row_log_tokens(row_log):
+    """
+    Оценивает токены, потраченные на строку, по ее логу.
+
+    Строки-дубликаты не отправлялись в модель и не учитываются. Строкам
+    пакета засчитывается доля общего промпта пакетного запроса (batch_prompt_tokens).
+    """
+    if "duplicate_of" in row_log:
+        return 0
+    tokens = row_log.get("batch_prompt_tokens", 0)
+    for attempt in row_log.get("attempts", []):
+        if attempt.get("messages"):
+            tokens += estimate_request_tokens(attempt["messages"])
+        if attempt.get("parsed_answer"):
+            tokens += estimate_tokens(str(attempt["parsed_answer"]))
+    return tokens
+
+
+def make_batch_options(llm_settings, model_params, prompt_template, target_column, additional_columns, context_text=""):
+    """
+    Подготавливает параметры пакетного режима построчного анализа.
+
+    Returns:
+        dict: batcher, header и columns для AnalysisEngine.run_rows_concurrently
+    """
+    batcher = RowBatcher(
+        context_limit=get_context_limit(model_params.get("model")),
+        row_output_tokens=model_params.get("max_tokens", 300),
+        max_batch_size=llm_settings.get("batch_size", 20)
+    )
+    instruction = customize_prompt(prompt_template, {
+        "target_column": target_column,
+        "additional_columns": additional_columns
+    })
+    return {
+        "batcher": batcher,
+        "header": batcher.build_header(instruction, context_text),
+        "columns": [target_column] + additional_columns
+    }
+
+
+def plan_row_batches(df, batch_options):
+    """Разбивает строки DataFrame на пакеты с учетом бюджета токенов модели."""
+    columns = batch_options["columns"]
+    records = [
+        (i, dict(zip(columns, values)))
+        for i, values in zip(df.index, df[columns].itertuples(index=False, name=None))
+    ]
+    return batch_options["batcher"].plan_batches(records, batch_options["header"])
+
+
+def request_batch_completion(llm_provider, batch, batch_options, build_messages, model_params):
+    """
+    Отправляет пакет строк одним запросом и разбирает ответ по строкам.
+
+    Строки без корректного ответа в JSON отправляются повторно по одной.
+    Токены промпта пакета делятся между его строками (batch_prompt_tokens в логе
+    строки), чтобы скорость в токенах учитывала общий промпт.
+
+    Returns:
+        list: [(индекс, ответ, успех, лог строки)]
+    """
+    batcher = batch_options["batcher"]
+    messages = batcher.build_messages(batch, batch_options["header"])
+    params = {**model_params, "max_tokens": batcher.completion_tokens(len(batch))}
+    share, remainder = divmod(count_message_tokens(messages), len(batch))
+
+    response, success, batch_log = request_row_completion(
+        llm_provider, [key for key, _ in batch], messages, params
+    )
+    answers = batcher.parse_response(response, batch) if success else {}
+
+    results = []
+    for position, (key, record) in enumerate(batch):
+        if key in answers:
+            row_log = {"row_index": key, "attempts": [{
+                "attempt_number": len(batch_log["attempts"]),
+                "raw_response": f"Пакетный запрос ({len(batch)} строк)",
+                "parsed_answer": answers[key]
+            }]}
+            results.append((key, answers[key], True, row_log))
+        else:
+            # Ответ для строки не разобран - отправляем ее отдельно
+            answer, row_success, row_log = request_row_completion(
+                llm_provider, key, build_messages(record), model_params
+            )
+            results.append((key, answer, row_success, row_log))
+        row_log["batch_prompt_tokens"] = share + (1 if position < remainder else 0)
+
+    return results
+
+
+def analyze_full_table(
+    df, llm_provider, prompt, settings, context_files=None, stats=None, digest_tokens=DEFAULT_DIGEST_TOKENS,
+    sample_rows=DEFAULT_SAMPLE_ROWS, sample_tokens=DEFAULT_SAMPLE_TOKENS, findings_tokens=DEFAULT_FINDINGS_TOKENS,
+    query_settings=None
+):
+    """
+    Анализирует таблицу целиком и возвращает обобщенный результат.
+
+    Args:
+        df: DataFrame для анализа
+        llm_provider: Провайдер LLM
+        prompt: Текст промпта
+        settings: Параметры модели
+        context_files: Дополнительные файлы контекста (подготовленные FileProcessor)
+        stats: Готовая статистика ExcelHandler.analyze_dataframe (вычисляется, если не передана)
+        digest_tokens: Максимальный размер сводки по таблице в токенах
+        sample_rows: Количество представительных строк с весами (0 - без выборки)
+        sample_tokens: Максимальный размер выборки в токенах
+        findings_tokens: Максимальный размер локальных расчетов в токенах (0 - без расчетов)
+        query_settings: Параметры TableQueryLoop или None. Если заданы, модель может
+            запрашивать у таблицы агрегаты на SQL (DuckDB) перед итоговым отчетом
+
+    Returns:
+        tuple: (результат, ошибка)
+    """
+    if stats is None:
+        from src.core.excel_handler import ExcelHandler
+        stats = ExcelHandler.analyze_dataframe(df)
+
+    # Подготовка дополнительных файлов контекста
+    file_processor = FileProcessor()
+    context_text = file_processor.prepare_context_for_analysis(context_files) if context_files else ""
+
+    sample_text = describe_sample(df, sample_rows, sample_tokens)
+    if sample_text:
+        sample_text = (
+            "Представительные строки (вес - сколько строк таблицы похожи на эту строку, "
+            f"учитывай веса в выводах):\n{sample_text}"
+        )
+
+    # Создание сообщения для LLM
+    messages = [
+        {"role": "system", "content": TABLE_SYSTEM_PROMPT},
+        {"role": "user", "content": f"""
+        {prompt}
+
+        Таблица: {table_name(df)}
+
+        Сводка по всем строкам таблицы:
+        {describe_dataframe(df, stats, digest_tokens)}
+
+        {findings_section(df, findings_tokens)}
+
+        {sample_text}
+
+        {context_text}
+
+        Проведи тщательный анализ и предоставь детальные, структурированные результаты с выводами и рекомендациями.
+        """}
+    ]
+
+    # Используем параметры из settings, проверяя их наличие
+    if isinstance(settings, dict):
+        # Явно передаем параметры, сохраняя model в неизменном виде
+        params = {
+            "temperature": settings.get("temperature", 0.7),
+            "max_tokens": settings.get("max_tokens", 300),
+            "top_p": settings.get("top_p", 1.0),
+            "frequency_penalty": settings.get("frequency_penalty", 0.0),
+            "presence_penalty": settings.get("presence_penalty", 0.0)
+        }
+
+        # Добавляем model только если он присутствует в settings
+        if "model" in settings:
+            params["model"] = settings["model"]
+    else:
+        # Дефолтные параметры в случае, если settings не словарь
+        params = {
+            "temperature": 0.7,
+            "max_tokens": 300,
+            "top_p": 1.0,
+            "frequency_penalty": 0.0,
+            "presence_penalty": 0.0
+        }
+
+    if query_settings is not None:
+        # Модель уточняет числа запросами к таблице, итоговый отчет - последний ответ
+        query_loop = TableQueryLoop(llm_provider, params, **query_settings)
+        messages[-1]["content"] += f"\n\n{query_loop.instructions(df)}"
+        result, error, _ = query_loop.run(df, messages)
+        return result, error
+
+    return llm_provider.chat_completion(
+        messages=messages,
+        **params
+    )
+
+
+def table_name(df):
+    """
+    Название таблицы для промптов.
+
+    Имя файла хранится в df.attrs["name"]: атрибут df.name pandas не поддерживает
+    (UserWarning), и он теряется при копировании таблицы.
+
+    Args:
+        df: DataFrame для анализа
+
+    Returns:
+        str: Название таблицы или "Таблица данных"
+    """
+    return str(df.attrs.get("name") or "Таблица данных")
+
+
+def findings_section(df, findings_tokens=DEFAULT_FINDINGS_TOKENS):
+    """
+    Раздел промпта с локальными расчетами по всем строкам (выбросы, тренды, сезонность, сдвиги).
+
+    Args:
+        df: DataFrame для анализа
+        findings_tokens: Максимальный размер расчетов в токенах (0 - без расчетов)
+
+    Returns:
+        str: Текст раздела или пустая строка, если заметных результатов нет
+    """
+    findings = describe_findings(df, findings_tokens)
+    if not findings:
+        return ""
+    return (
+        "Результаты расчетов по всем строкам (вычислены точно: объясняй и используй эти числа, "
+        f"не пересчитывай и не придумывай другие):\n{findings}"
+    )
+
+
+def describe_table(df, stats, prompt, context_text="", digest_tokens=DEFAULT_DIGEST_TOKENS, findings_tokens=DEFAULT_FINDINGS_TOKENS):
+    """
+    Формирует задание для анализа всех строк: промпт, структура таблицы и контекст.
+
+    Args:
+        df: DataFrame для анализа
+        stats: Статистика ExcelHandler.analyze_dataframe
+        prompt: Текст промпта
+        context_text: Текст дополнительных файлов контекста
+        digest_tokens: Максимальный размер сводки по таблице в токенах
+        findings_tokens: Максимальный размер локальных расчетов в токенах (0 - без расчетов)
+
+    Returns:
+        str: Задание для TableMapReducer
+    """
+    instruction = f"""{prompt}
+
+Таблица: {table_name(df)}
+
+Сводка по всем строкам таблицы:
+{describe_dataframe(df, stats, digest_tokens)}"""
+    findings = findings_section(df, findings_tokens)
+    if findings:
+        instruction += f"\n\n{findings}"
+    if context_text:
+        instruction += f"\n\n{context_text}"
+    return instruction
+
+
+
+def summarize_table_context(df, llm_provider, prompt, settings, stats, context_text="", max_tokens=DEFAULT_CONTEXT_TOKENS, digest_tokens=DEFAULT_DIGEST_TOKENS):
+    """
+    Кратко описывает таблицу для использования в промптах строк.
+
+    Первый этап комбинированного анализа "сначала таблица" при combined.table_brief:
+    короткий ответ готов раньше подробного отчета, поэтому построчный анализ
+    начинается, пока подробный отчет еще формируется. Это отдельный запрос к модели.
+
+    Args:
+        df: DataFrame для анализа
+        llm_provider: Провайдер LLM
+        prompt: Текст промпта анализа всей таблицы
+        settings: Параметры модели
+        stats: Статистика ExcelHandler.analyze_dataframe
+        context_text: Текст дополнительных файлов контекста
+        max_tokens: Максимальный размер описания в токенах
+        digest_tokens: Максимальный размер сводки по таблице в токенах
+
+    Returns:
+        tuple: (описание, ошибка)
+    """
+    instruction = f"""{prompt}
+
+Таблица: {table_name(df)}
+
+Сводка по всем строкам таблицы:
+{describe_dataframe(df, stats, digest_tokens)}"""
+    if context_text:
+        instruction += f"\n\n{context_text}"
+    instruction += """
+
+Кратко, в нескольких пунктах, изложи выводы о таблице, которые понадобятся при анализе отдельных строк:
+типичные значения, категории, закономерности и аномалии. Подробный отчет будет составлен отдельно."""
+    messages = [
+        {"role": "system", "content": TABLE_SYSTEM_PROMPT},
+        {"role": "user", "content": instruction}
+    ]
+    params = {**(settings if isinstance(settings, dict) else {}), "max_tokens": max_tokens}
+    return llm_provider.chat_completion(messages=messages, **params)
+
+class AnalysisEngine:
+    """
+    Выполнение построчного, табличного и комбинированного анализа без интерфейса.
+
+    Движок не обращается к Streamlit: прогресс и сообщения передаются через
+    обратные вызовы, а результаты возвращаются в AnalysisResult. Его
+    используют приложение Streamlit, TaskScheduler и консольный запуск (src/cli.py).
+    """
+
+    def __init__(
+        self,
+        llm_provider,
+        llm_settings: Optional[Dict[str, Any]] = None,
+        config_manager: Optional[ConfigManager] = None,
+        on_progress: Optional[Callable[[int, int, str], None]] = None,
+        on_message: Optional[Callable[[str, str], None]] = None,
+        table_stats: Optional[Callable[[pd.DataFrame], Dict[str, Any]]] = None
+    ):
+        """
+        Инициализирует движок анализа.
+
+        Args:
+            llm_provider: Провайдер LLM
+            llm_settings: Настройки LLM и обработки (concurrency, batch_rows, deduplicate_rows, ...)
+            config_manager: Менеджер конфигурации
+            on_progress: Функция (обработано, всего, текст) для отображения прогресса
+            on_message: Функция (уровень, текст); уровень - "info", "warning" или "error"
+            table_stats: Функция расчета статистики таблицы (например, кэшированная в интерфейсе)
+        """
+        self.llm_provider = llm_provider
+        self.llm_settings = llm_settings if isinstance(llm_settings, dict) else {}
+        self.config_manager = config_manager or ConfigManager()
+        self.on_progress = on_progress or (lambda done, total, text: None)
+        self.on_message = on_message or self._log_message
+        self.table_stats = table_stats
+        self.logger = logging.getLogger("AnalysisEngine")
+
+    def _log_message(self, level: str, text: str) -> None:
+        """Сообщения по умолчанию записываются в лог."""
+        getattr(self.logger, level if level in ("info", "warning", "error") else "info")(text)
+
+    def _prepare_context(self, context_files) -> tuple:
+        """Возвращает (подготовленные файлы, текст контекста) для дополнительных файлов."""
+        if not context_files:
+            return None, ""
+        file_processor = FileProcessor()
+        processed = file_processor.process_context_files(context_files)
+        return processed, (file_processor.prepare_context_for_analysis(processed) if processed else "")
+
+    def create_progress_reporter(self, total, initial=0):
+        """
+        Создает отчет о прогрессе построчной обработки.
+
+        Обновления передаются в on_progress не чаще
+        processing.progress_updates_per_second раз в секунду.
+
+        Args:
+            total: Общее количество строк
+            initial: Строки, обработанные до запуска
+
+        Returns:
+            ProgressReporter: Отчет о прогрессе
+        """
+        return ProgressReporter(
+            total,
+            lambda snapshot: self.on_progress(snapshot["done"], snapshot["total"], format_progress(snapshot)),
+            max_updates_per_second=self.config_manager.get(
+                "processing.progress_updates_per_second", DEFAULT_UPDATES_PER_SECOND
+            ),
+            initial=initial
+        )
+
+    def use_table_map_reduce(self) -> bool:
+        """Возвращает True, если анализ всей таблицы выполняется по всем строкам (map-reduce)."""
+        enabled = self.llm_settings.get("table_map_reduce")
+        if enabled is None:
+            enabled = self.config_manager.get("table_map_reduce.enabled", False)
+        return bool(enabled)
+
+    def use_table_brief(self) -> bool:
+        """
+        Возвращает True, если при комбинированном анализе "сначала таблица" строки
+        начинаются после краткого описания таблицы, а не после подробного отчета.
+        """
+        enabled = self.llm_settings.get("table_brief")
+        if enabled is None:
+            enabled = self.config_manager.get("combined.table_brief", False)
+        return bool(enabled)
+
+    def get_table_query_settings(self):
+        """
+        Возвращает параметры TableQueryLoop, если включены запросы модели к таблице.
+
+        Returns:
+            Optional[dict]: Параметры или None (запросы выключены или DuckDB не установлен)
+        """
+        enabled = self.llm_settings.get("table_queries")
+        if enabled is None:
+            enabled = self.config_manager.get("table_query.enabled", False)
+        if not enabled:
+            return None
+        if not table_query_available():
+            self.logger.warning("Запросы к таблице недоступны: не установлен пакет duckdb, используется сводка по таблице")
+            return None
+        return {
+            "max_rounds": self.config_manager.get("table_query.max_rounds", 4),
+            "max_queries": self.config_manager.get("table_query.max_queries", 3),
+            "max_result_rows": self.config_manager.get("table_query.max_result_rows", 50),
+            "max_result_tokens": self.config_manager.get("table_query.max_result_tokens", 1500),
+            "timeout": self.config_manager.get("table_query.timeout_seconds", 10)
+        }
+
+    def get_table_stats(self, df):
+        """Возвращает статистику таблицы (table_stats или ExcelHandler.analyze_dataframe)."""
+        if self.table_stats:
+            return self.table_stats(df)
+        from src.core.excel_handler import ExcelHandler
+        return ExcelHandler.analyze_dataframe(df)
+
+    def create_table_reducer(self, model_params):
+        """Создает TableMapReducer с параметрами из конфигурации."""
+        return TableMapReducer(
+            self.llm_provider,
+            model_params,
+            context_limit=get_context_limit(model_params.get("model")),
+            partition_output_tokens=self.config_manager.get("table_map_reduce.partition_output_tokens", 600),
+            fan_in=self.config_manager.get("table_map_reduce.fan_in", 4),
+            max_workers=get_concurrency(self.llm_settings.get("provider_type", "cloud"), self.llm_settings, self.config_manager),
+            max_partition_tokens=self.config_manager.get("table_map_reduce.max_partition_tokens")
+        )
+
+    def _analyze_table(self, df, prompt, model_params, context_files_processed, stats=None, on_progress=None):
+        """
+        Анализирует таблицу целиком.
+
+        В режиме map-reduce в модель передаются все строки таблицы, иначе -
+        сводка по таблице и представительные строки с весами (analyze_full_table),
+        а при включенных запросах модель может запрашивать у таблицы агрегаты на SQL.
+
+        Args:
+            stats: Готовая статистика таблицы (вычисляется, если не передана)
+            on_progress: Функция прогресса map-reduce (по умолчанию on_progress движка)
+
+        Returns:
+            tuple: (результат, ошибка); при частичном успехе map-reduce заполнены оба
+        """
+        if stats is None:
+            stats = self.get_table_stats(df)
+
+        digest_tokens = self.config_manager.get("table_digest.max_tokens", DEFAULT_DIGEST_TOKENS)
+        findings_tokens = self.config_manager.get("table_findings.max_tokens", DEFAULT_FINDINGS_TOKENS)
+        if not self.use_table_map_reduce():
+            return analyze_full_table(
+                df, self.llm_provider, prompt, model_params, context_files_processed, stats, digest_tokens,
+                sample_rows=self.config_manager.get("table_sample.rows", DEFAULT_SAMPLE_ROWS),
+                sample_tokens=self.config_manager.get("table_sample.max_tokens", DEFAULT_SAMPLE_TOKENS),
+                findings_tokens=findings_tokens,
+                query_settings=self.get_table_query_settings()
+            )
+
+        context_text = FileProcessor().prepare_context_for_analysis(context_files_processed) if context_files_processed else ""
+        reducer = self.create_table_reducer(model_params)
+        result, error, stats = reducer.run(df, describe_table(df, stats, prompt, context_text, digest_tokens, findings_tokens), on_progress or self.on_progress)
+        self.logger.info(
+            f"Анализ всей таблицы map-reduce: частей {stats['partitions']}, уровней {stats['levels']}, запросов {stats['requests']}"
+        )
+        return result, error
+
+    def run_rows_concurrently(self, df, build_messages, model_params, on_result, batch_options=None, dedup_columns=None):
+        """
+        Обрабатывает строки DataFrame через ограниченный пул запросов к LLM.
+
+        Args:
+            df: DataFrame со строками для обработки
+            build_messages: Функция (row) -> messages
+            model_params: Параметры модели
+            on_result: Функция (index, answer, success, row_log, done_count), вызывается
+                в вызывающем потоке по мере поступления ответов
+            batch_options: Параметры пакетного режима (batcher, header, columns) или None
+            dedup_columns: Столбцы для объединения одинаковых строк или None. Запрос
+                выполняется один раз на группу, ответ копируется во все строки группы
+                (см. group_rows)
+
+        Returns:
+            dict: Количество строк (rows) и отправленных на обработку уникальных строк (unique_rows)
+        """
+        concurrency = get_concurrency(
+            self.llm_settings.get("provider_type", "cloud"),
+            self.llm_settings,
+            self.config_manager
+        )
+        executor = RowExecutor(max_workers=concurrency)
+        llm_provider = self.llm_provider
+
+        # Одинаковые строки обрабатываются один раз
+        groups = self.group_rows(df, dedup_columns) if dedup_columns else None
+        unique_df = df.loc[list(groups)] if groups is not None else df
+        done_count = 0
+
+        def deliver(i, answer, success, row_log):
+            nonlocal done_count
+            for member in (groups[i] if groups is not None else [i]):
+                done_count += 1
+                member_log = row_log if member == i else {**row_log, "row_index": member, "duplicate_of": i}
+                on_result(member, answer, success, member_log, done_count)
+
+        stats = {"rows": len(df), "unique_rows": len(unique_df)}
+
+        if batch_options:
+            # В пакетном режиме единица работы - пакет строк, ответ разбирается на строки;
+            # ключ пакета - индексы его строк
+            results = executor.run(
+                ((tuple(key for key, _ in batch), batch) for batch in plan_row_batches(unique_df, batch_options)),
+                lambda batch: request_batch_completion(llm_provider, batch, batch_options, build_messages, model_params)
+            )
+            for batch_keys, batch_results, error in results:
+                if error is not None:
+                    # Исключение в обработчике пакета - ошибка для каждой строки пакета
+                    for i in batch_keys:
+                        deliver(i, None, False, {"row_index": i, "attempts": [{"attempt_number": 1, "error": str(error)}]})
+                    continue
+                for i, answer, success, row_log in batch_results:
+                    deliver(i, answer, success, row_log)
+            return stats
+
+        # Промпты строятся лениво по мере освобождения слотов
+        items = ((i, (i, build_messages(row))) for i, row in unique_df.iterrows())
+
+        def worker(payload):
+            row_index, messages = payload
+            return request_row_completion(llm_provider, row_index, messages, model_params)
+
+        async def aworker(payload):
+            row_index, messages = payload
+            return await arequest_row_completion(llm_provider, row_index, messages, model_params)
+
+        # Асинхронный режим: все запросы выполняются в одном цикле событий
+        if self.config_manager.get("processing.async_requests", False) and hasattr(llm_provider, "achat_completion"):
+            results = executor.run_async(items, aworker)
+        else:
+            results = executor.run(items, worker)
+
+        for i, result, error in results:
+            if error is not None:
+                deliver(i, None, False, {"row_index": i, "attempts": [{"attempt_number": 1, "error": str(error)}]})
+            else:
+                answer, success, row_log = result
+                deliver(i, answer, success, row_log)
+
+        return stats
+
+    def get_dedup_columns(self, target_column, additional_columns):
+        """
+        Возвращает столбцы для объединения одинаковых строк или None, если объединение отключено.
+
+        Args:
+            target_column: Целевой столбец
+            additional_columns: Дополнительные столбцы, попадающие в промпт
+        """
+        enabled = self.llm_settings.get("deduplicate_rows")
+        if enabled is None:
+            enabled = self.config_manager.get("processing.deduplicate_rows", True)
+        return [target_column] + list(additional_columns) if enabled else None
+
+    def get_near_duplicate_threshold(self):
+        """
+        Возвращает порог сходства для объединения почти одинаковых строк или None, если оно отключено.
+        """
+        enabled = self.llm_settings.get("near_duplicates")
+        if enabled is None:
+            enabled = self.config_manager.get("near_duplicates.enabled", False)
+        if not enabled:
+            return None
+        threshold = self.llm_settings.get("near_duplicate_threshold")
+        if threshold is None:
+            threshold = self.config_manager.get("near_duplicates.threshold", DEFAULT_NEAR_DUPLICATE_THRESHOLD)
+        return float(threshold)
+
+    def group_rows(self, df, dedup_columns):
+        """
+        Группирует строки, для которых достаточно одного запроса к LLM.
+
+        Первый столбец dedup_columns (целевой) при включенном объединении почти
+        одинаковых строк сравнивается по сходству текста (MinHash LSH), остальные -
+        на точное совпадение.
+
+        Args:
+            df: DataFrame со строками для обработки
+            dedup_columns: Столбцы, по которым сравниваются строки (целевой - первый)
+
+        Returns:
+            dict: Индекс строки, отправляемой в LLM -> индексы всех строк группы
+        """
+        threshold = self.get_near_duplicate_threshold()
+        if threshold is None:
+            return group_duplicate_rows(df, dedup_columns)
+
+        groups = group_near_duplicate_rows(
+            df,
+            dedup_columns[0],
+            dedup_columns[1:],
+            threshold=threshold,
+            num_perm=self.config_manager.get("near_duplicates.num_perm", DEFAULT_NUM_PERM),
+            shingle_size=self.config_manager.get("near_duplicates.shingle_size", DEFAULT_SHINGLE_SIZE)
+        )
+        self.logger.info(f"Почти одинаковые строки (сходство от {threshold:.2f}): {len(df)} строк -> {len(groups)} групп")
+        return groups
+
+    def open_row_checkpoint(self, df, prompt_template, params):
+        """
+        Открывает контрольную точку построчного анализа или возвращает None, если она отключена.
+
+        Args:
+            df: Исходный DataFrame
+            prompt_template: Шаблон промпта
+            params: Столбцы, контекст и параметры модели, влияющие на ответы
+
+        Returns:
+            CheckpointStore или None
+        """
+        if not self.config_manager.get("checkpoints.enabled", True):
+            return None
+
+        try:
+            run_id = make_run_id(df, prompt_template, params)
+            return CheckpointStore(run_id, self.config_manager.get("checkpoints.directory", "checkpoints"))
+        except Exception as e:
+            self.logger.warning(f"Контрольная точка недоступна, запуск без нее: {e}")
+            return None
+
+    def _dedup_summary(self, run_stats, **extra):
+        """Сводка запуска с долей дубликатов."""
+        return build_run_summary(
+            self.llm_provider,
+            rows=run_stats["rows"],
+            unique_rows=run_stats["unique_rows"],
+            dedup_ratio=dedup_ratio(run_stats["rows"], run_stats["unique_rows"]),
+            **extra
+        )
+
+    def process_row_by_row(self, df, target_column, additional_columns, prompt_template, context_files=None) -> AnalysisResult:
+        """
+        Построчный анализ.
+
+        Args:
+            df: Исходные данные
+            target_column: Целевой столбец
+            additional_columns: Дополнительные столбцы для контекста
+            prompt_template: Шаблон промпта
+            context_files: Дополнительные файлы контекста
+
+        Returns:
+            AnalysisResult: Таблица с результатами в столбце "<целевой столбец>_Обработано"
+        """
+        result_df = df.copy()
+        result_col = f"{target_column}_Обработано"
+        result_df[result_col] = ""
+
+        model_params = build_model_params(self.llm_settings)
+        _, context_text = self._prepare_context(context_files)
+        row_logs = []
+
+        # Контрольная точка: ответы, полученные ранее для тех же данных и промпта, не запрашиваются повторно
+        checkpoint = self.open_row_checkpoint(df, prompt_template, {
+            "target_column": target_column,
+            "additional_columns": additional_columns,
+            "context": context_text,
+            "model_params": model_params
+        })
+        remaining_df = df
+        resumed_rows = 0
+        if checkpoint is not None:
+            finished = checkpoint.load()
+            if finished:
+                finished_mask = df.index.map(str).isin(list(finished))
+                for i in df.index[finished_mask]:
+                    result_df.at[i, result_col] = finished[str(i)]
+                remaining_df = df[~finished_mask]
+                resumed_rows = int(finished_mask.sum())
+                self.on_message("info", f"Продолжение прерванного запуска: {resumed_rows} из {len(df)} строк уже обработаны")
+
+        progress = self.create_progress_reporter(len(df), initial=resumed_rows)
+        failed_rows = 0
+
+        def on_result(i, answer, success, row_log, done_count):
+            nonlocal failed_rows
+            # Записываем результат в DataFrame сразу по мере поступления
+            if success:
+                result_df.at[i, result_col] = answer
+                if checkpoint is not None:
+                    checkpoint.append(i, answer)
+            else:
+                failed_rows += 1
+                result_df.at[i, result_col] = f"Не удалось получить ответ: {row_log['attempts'][-1].get('error')}"
+            row_logs.append(row_log)
+            progress.update(resumed_rows + done_count, estimate_row_log_tokens(row_log))
+
+        # Пакетный режим: несколько строк в одном запросе
+        batch_options = None
+        if self.llm_settings.get("batch_rows"):
+            batch_options = make_batch_options(
+                self.llm_settings, model_params, prompt_template, target_column, additional_columns, context_text
+            )
+
+        try:
+            run_stats = self.run_rows_concurrently(
+                remaining_df,
+                lambda row: build_row_messages(row, target_column, additional_columns, prompt_template, context_text),
+                model_params,
+                on_result,
+                batch_options,
+                self.get_dedup_columns(target_column, additional_columns)
+            )
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        # Все строки обработаны - контрольная точка больше не нужна; при ошибках
+        # она остается, и повторный запуск отправит только строки без ответа
+        if checkpoint is not None and failed_rows == 0:
+            checkpoint.clear()
+        progress.finish()
+
+        return AnalysisResult(
+            result_df=result_df,
+            # Логи сохраняем в порядке строк, а не в порядке завершения запросов
+            logs=sorted(row_logs, key=lambda log: df.index.get_loc(log["row_index"])),
+            summary=self._dedup_summary(run_stats, resumed_rows=resumed_rows, throughput=progress.stats())
+        )
+
+    def process_full_table(self, df, focus_columns, prompt_template, context_files=None, group_column=None, group_period=None) -> AnalysisResult:
+        """
+        Анализ всей таблицы целиком.
+
+        Args:
+            df: Исходные данные
+            focus_columns: Столбцы, на которые следует обратить особое внимание
+            prompt_template: Шаблон промпта
+            context_files: Дополнительные файлы контекста
+            group_column: Столбец для анализа по группам (None - вся таблица одним анализом)
+            group_period: Период для группировки по датам (ключ GROUP_PERIODS) или None
+
+        Returns:
+            AnalysisResult: Результат анализа в table_analysis, исходные данные в result_df
+        """
+        # Увеличиваем max_tokens для анализа всей таблицы
+        table_model_params = build_model_params(self.llm_settings, min_max_tokens=1500)
+        full_prompt = customize_prompt(prompt_template, {"focus_columns": focus_columns})
+        context_files_processed, context_text = self._prepare_context(context_files)
+
+        if group_column:
+            return self._process_groups(df, group_column, group_period, full_prompt, table_model_params, context_files_processed, context_text)
+
+        self.on_progress(0, 1, "Выполняется анализ всей таблицы...")
+        result, error = self._analyze_table(df, full_prompt, table_model_params, context_files_processed)
+        self.on_progress(1, 1, "Анализ всей таблицы завершен")
+
+        return AnalysisResult(
+            result_df=df if result else None,
+            table_analysis=result,
+            errors=[f"Ошибка при анализе всей таблицы: {error}"] if error else [],
+            summary=build_run_summary(self.llm_provider)
+        )
+
+    def get_group_cache(self):
+        """Возвращает дисковый кэш отчетов по группам или None, если кэш отключен."""
+        if not (self.config_manager.get("cache.enabled", True) and self.llm_settings.get("use_cache", True)):
+            return None
+        try:
+            ttl_hours = self.config_manager.get("cache.ttl_hours")
+            return get_response_cache(
+                self.config_manager.get("cache.path", DEFAULT_CACHE_PATH),
+                ttl_seconds=ttl_hours * 3600 if ttl_hours else None,
+                max_size_mb=self.config_manager.get("cache.max_size_mb")
+            )
+        except Exception as e:
+            self.logger.warning(f"Кэш отчетов по группам недоступен: {e}")
+            return None
+
+    def _process_groups(self, df, group_column, group_period, full_prompt, model_params, context_files_processed, context_text):
+        """
+        Анализ всей таблицы по группам строк.
+
+        Таблица делится по значениям group_column (или периодам дат), каждая
+        группа анализируется как отдельная таблица, группы - параллельно.
+        Отчеты по группам кэшируются по содержимому строк группы, поэтому
+        после добавления нового периода анализируется только он. Итоговый
+        отчет объединяет отчеты групп (при большом числе групп - по уровням).
+
+        Returns:
+            AnalysisResult: Итоговый отчет в table_analysis, отчеты групп в group_reports
+        """
+        groups = split_table(df, group_column, group_period, self.config_manager.get("table_groups.max_groups", DEFAULT_MAX_GROUPS))
+        grouping = f"по столбцу '{group_column}'" + (f" ({GROUP_PERIODS[group_period]})" if group_period else "")
+        cache = self.get_group_cache()
+        cache_params = {
+            **model_params,
+            "map_reduce": self.use_table_map_reduce(),
+            "table_queries": self.get_table_query_settings(),
+            "digest_tokens": self.config_manager.get("table_digest.max_tokens", DEFAULT_DIGEST_TOKENS),
+            "findings_tokens": self.config_manager.get("table_findings.max_tokens", DEFAULT_FINDINGS_TOKENS),
+            "sample_rows": self.config_manager.get("table_sample.rows", DEFAULT_SAMPLE_ROWS)
+        }
+
+        result = AnalysisResult(result_df=df)
+        pending = []
+        for label, part in groups:
+            prompt = f"{full_prompt}\n\nАнализируется группа строк {grouping}: {label} (строк: {len(part)})."
+            key = group_report_key(label, part, f"{prompt}\n{context_text}", cache_params)
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                result.group_reports[label] = cached
+            else:
+                pending.append((label, part, prompt, key))
+
+        cached_groups = len(result.group_reports)
+        total = len(groups)
+        self.on_progress(cached_groups, total, f"Анализ групп: {cached_groups} из {total} (из кэша: {cached_groups})...")
+
+        def items():
+            # Статистика считается в вызывающем потоке (table_stats может обращаться к интерфейсу)
+            for label, part, prompt, key in pending:
+                yield label, (part, prompt, key, self.get_table_stats(part))
+
+        def worker(payload):
+            part, prompt, key, stats = payload
+            report, error = self._analyze_table(part, prompt, model_params, context_files_processed, stats, lambda done, count, text: None)
+            return report, error, key
+
+        done = cached_groups
+        executor = RowExecutor(max_workers=get_concurrency(self.llm_settings.get("provider_type", "cloud"), self.llm_settings, self.config_manager))
+        for label, outcome, exception in executor.run(items(), worker):
+            report, error, key = outcome if exception is None else (None, str(exception), None)
+            if error:
+                result.errors.append(f"Группа {label}: {error}")
+            if report:
+                result.group_reports[label] = report
+                # Частичные отчеты не кэшируются, чтобы повторный запуск их перестроил
+                if cache is not None and not error:
+                    cache.set(key, report)
+            done += 1
+            self.on_progress(done, total, f"Анализ групп: {done} из {total} (из кэша: {cached_groups})...")
+
+        summaries = [
+            f"Группа {label} (строк: {len(part)}):\n{result.group_reports[label]}"
+            for label, part in groups if label in result.group_reports
+        ]
+        merge_stats = {"levels": 0, "requests": 0}
+        if not summaries:
+            result.result_df = None
+            result.errors.append("Ошибка при анализе всей таблицы: не удалось проанализировать ни одной группы")
+        else:
+            self.on_progress(total, total, "Объединение отчетов по группам...")
+            instruction = (
+                f"{full_prompt}\n\nТаблица разбита на группы {grouping}, всего групп: {total}, строк: {len(df)}. "
+                "Отчеты по группам приведены ниже. Сравни группы между собой: выдели общие закономерности, "
+                "различия и изменения между группами."
+            )
+            merged, error, merge_stats = self.create_table_reducer(model_params).reduce_summaries(
+                instruction, summaries, [], merge_stats, lambda: None
+            )
+            result.table_analysis = merged
+            if error:
+                result.errors.append(f"Ошибка при объединении отчетов по группам: {error}")
+
+        self.logger.info(
+            f"Анализ по группам {grouping}: групп {total}, из кэша {cached_groups}, запросов объединения {merge_stats['requests']}"
+        )
+        result.summary = build_run_summary(self.llm_provider, groups=total, cached_groups=cached_groups)
+        return result
+
+    def process_combined(
+        self,
+        df,
+        target_column,
+        additional_columns,
+        focus_columns,
+        execution_order,
+        prompt_template,
+        context_files=None
+    ) -> AnalysisResult:
+        """
+        Комбинированный анализ: построчный анализ и анализ всей таблицы в заданном порядке.
+
+        "Сначала таблица": строки получают подробный отчет по таблице как контекст.
+        При combined.table_brief (use_table_brief) строки начинаются после краткого
+        описания таблицы (summarize_table_context, дополнительный запрос), подробный
+        отчет формируется параллельно с ними; строки тогда видят только краткое
+        описание, и их результаты могут отличаться. "Сначала строки": при
+        combined.pipeline и анализе всей таблицы map-reduce (use_table_map_reduce)
+        готовые строки сразу поступают в map-reduce (StreamingTableReducer), и время
+        запуска близко к более долгому этапу, а не к сумме этапов.
+
+        Args:
+            df: Исходные данные
+            target_column: Целевой столбец
+            additional_columns: Дополнительные столбцы для контекста
+            focus_columns: Столбцы для анализа всей таблицы
+            execution_order: Порядок выполнения ("Сначала анализ всей таблицы..." или построчный первым)
+            prompt_template: Шаблон промпта
+            context_files: Дополнительные файлы контекста
+
+        Returns:
+            AnalysisResult: Таблица с результатами и результат анализа всей таблицы
+        """
+        result = AnalysisResult()
+        result_df = df.copy()
+        result_col = f"{target_column}_Обработано"
+        result_df[result_col] = ""
+
+        # Параметры для анализа всей таблицы (увеличенное max_tokens)
+        table_model_params = build_model_params(self.llm_settings, min_max_tokens=1500)
+        context_files_processed, context_text = self._prepare_context(context_files)
+        dedup_columns = self.get_dedup_columns(target_column, additional_columns)
+        pipeline = self.config_manager.get("combined.pipeline", True)
+        table_prompt = customize_prompt(prompt_template, {"focus_columns": focus_columns})
+        progress = None
+        streaming = None
+
+        def on_result(i, answer, success, row_log, done_count):
+            # Записываем результат в DataFrame
+            if success:
+                result_df.at[i, result_col] = answer
+            else:
+                result_df.at[i, result_col] = f"Ошибка: {row_log['attempts'][-1].get('error')}"
+            result.logs.append(row_log)
+            if streaming is not None:
+                # Готовая строка поступает в анализ всей таблицы в порядке строк таблицы
+                streaming.add(serialize_row(i, tuple(df.loc[i]) + (result_df.at[i, result_col],)), df.index.get_loc(i))
+            progress.update(done_count, estimate_row_log_tokens(row_log))
+
+        def add_table_result(table_result, error):
+            if error:
+                result.errors.append(f"Ошибка при анализе всей таблицы: {error}")
+            if table_result:
+                result.table_analysis = table_result
+
+        if (execution_order or TABLE_FIRST_ORDER).startswith("Сначала анализ всей таблицы"):
+            # 1. Сначала анализ всей таблицы
+            self.on_progress(0, len(df), "Выполняется анализ всей таблицы...")
+            stats = self.get_table_stats(df)
+            table_context = None
+
+            with ThreadPoolExecutor(max_workers=1) as table_pool:
+                if self.use_table_brief():
+                    # Подробный отчет формируется в фоне, строки начинаются после краткого описания
+                    table_future = table_pool.submit(
+                        self._analyze_table, df, table_prompt, table_model_params, context_files_processed, stats,
+                        lambda done, total, text: None
+                    )
+                    table_context, error = summarize_table_context(
+                        df, self.llm_provider, table_prompt, table_model_params, stats, context_text,
+                        max_tokens=self.config_manager.get("combined.context_tokens", DEFAULT_CONTEXT_TOKENS),
+                        digest_tokens=self.config_manager.get("table_digest.max_tokens", DEFAULT_DIGEST_TOKENS)
+                    )
+                    if error or not table_context:
+                        self.logger.warning(f"Краткое описание таблицы не получено, ожидается полный отчет: {error}")
+                        table_context = None
+                else:
+                    table_future = None
+                    add_table_result(*self._analyze_table(df, table_prompt, table_model_params, context_files_processed, stats))
+
+                if table_context is None:
+                    if table_future is not None:
+                        add_table_result(*table_future.result())
+                        table_future = None
+                    # Обрезаем контекст, если он слишком длинный
+                    table_context = result.table_analysis
+                    if table_context and len(table_context) > MAX_TABLE_CONTEXT_CHARS:
+                        table_context = table_context[:MAX_TABLE_CONTEXT_CHARS] + "... [продолжение обрезано]"
+
+                # 2. Построчный анализ с результатом анализа всей таблицы в качестве контекста
+                progress = self.create_progress_reporter(len(df))
+                run_stats = self.run_rows_concurrently(
+                    df,
+                    lambda row: build_row_messages(
+                        row, target_column, additional_columns, prompt_template,
+                        f"Результат анализа всей таблицы (используй как контекст):\n{table_context}"
+                    ),
+                    table_model_params,
+                    on_result,
+                    dedup_columns=dedup_columns
+                )
+                progress.finish()
+
+                if table_future is not None:
+                    self.on_progress(len(df), len(df), "Завершается анализ всей таблицы...")
+                    add_table_result(*table_future.result())
+
+        else:
+            prompt = f"""
+                {table_prompt}
+
+                Обрати внимание, что каждая строка уже была проанализирована по отдельности,
+                и результаты находятся в столбце '{result_col}'.
+                Используй эти результаты для формирования общих выводов и закономерностей.
+
+                Проведи комплексный анализ данных и предоставь структурированный отчет
+                с ключевыми выводами, закономерностями и рекомендациями.
+                """
+
+            if pipeline and self.use_table_map_reduce():
+                # Анализ всей таблицы по всем строкам идет по мере их готовности (map-reduce по результатам);
+                # без map-reduce выполняется один настроенный запрос после построчного анализа
+                digest_tokens = self.config_manager.get("table_digest.max_tokens", DEFAULT_DIGEST_TOKENS)
+                findings_tokens = self.config_manager.get("table_findings.max_tokens", DEFAULT_FINDINGS_TOKENS)
+                streaming = StreamingTableReducer(
+                    self.create_table_reducer(table_model_params),
+                    describe_table(df, self.get_table_stats(df), prompt, context_text, digest_tokens, findings_tokens),
+                    table_header(result_df)
+                )
+
+            # 1. Построчный анализ
+            progress = self.create_progress_reporter(len(df))
+            try:
+                run_stats = self.run_rows_concurrently(
+                    df,
+                    lambda row: build_row_messages(row, target_column, additional_columns, prompt_template),
+                    table_model_params,
+                    on_result,
+                    dedup_columns=dedup_columns
+                )
+            except BaseException:
+                if streaming is not None:
+                    streaming.cancel()
+                raise
+            progress.finish()
+
+            # 2. Анализ всей таблицы с учетом результатов построчного анализа
+            self.on_progress(len(df), len(df), "Выполняется анализ всей таблицы...")
+            if streaming is not None:
+                table_result, error, reduce_stats = streaming.finish()
+                self.logger.info(
+                    f"Анализ всей таблицы по мере готовности строк: частей {reduce_stats['partitions']}, "
+                    f"запросов {reduce_stats['requests']}"
+                )
+            else:
+                # Передаем DataFrame с результатами построчного анализа
+                table_result, error = self._analyze_table(result_df, prompt, table_model_params, context_files_processed)
+            add_table_result(table_result, error)
+
+        result.result_df = result_df
+        result.logs.sort(key=lambda log: df.index.get_loc(log["row_index"]))
+        result.summary = self._dedup_summary(run_stats, throughput=progress.stats())
+        return result
+
+    def run(self, df, profile: Dict[str, Any], context_files=None) -> AnalysisResult:
+        """
+        Выполняет анализ в режиме, указанном в профиле.
+
+        Args:
+            df: Исходные данные
+            profile: Настройки запуска (mode, custom_prompt, target_column,
+                additional_columns, focus_columns, execution_order)
+            context_files: Дополнительные файлы контекста
+
+        Returns:
+            AnalysisResult: Результат анализа
+
+        Raises:
+            ValueError: Если режим неизвестен или не указан целевой столбец
+        """
+        mode = profile.get("mode", MODE_ROWS)
+        prompt_template = profile.get("custom_prompt", "")
+        target_column = profile.get("target_column")
+        additional_columns = list(profile.get("additional_columns") or [])
+        focus_columns = list(profile.get("focus_columns") or [])
+
+        if mode in (MODE_ROWS, MODE_COMBINED):
+            if not target_column:
+                raise ValueError(f"Для режима '{mode}' необходимо указать целевой столбец (target_column)")
+            missing = [col for col in [target_column] + additional_columns if col not in df.columns]
+            if missing:
+                raise ValueError(f"Столбцы отсутствуют в таблице: {', '.join(map(str, missing))}")
+
+        if mode == MODE_ROWS:
+            return self.process_row_by_row(df, target_column, additional_columns, prompt_template, context_files)
+        if mode == MODE_TABLE:
+            return self.process_full_table(
+                df, focus_columns, prompt_template, context_files,
+                group_column=profile.get("group_column"), group_period=profile.get("group_period")
+            )
+        if mode == MODE_COMBINED:
+            return self.process_combined(
+                df, target_column, additional_columns, focus_columns,
+                profile.get("execution_order", TABLE_FIRST_ORDER), prompt_template, context_files
+            )
+        raise ValueError(f"Неизвестный режим анализа: {mode}")
@@ -6,6 +6,9 @@ import re
 import io
 from datetime import datetime
 
+from src.core.excel_loader import read_excel_columns
+from src.core.table_findings import get_findings
+
 class DataProcessor:
     """
     Класс для предварительной обработки и анализа данных Excel и текстовых файлов.
@@ -28,7 +31,7 @@ class DataProcessor:
             pd.DataFrame: Данные из Excel
         """
         try:
-            return pd.read_excel(file)
+            return read_excel_columns(file)
         except Exception as e:
             raise ValueError(f"Ошибка при чтении Excel файла: {e}")
     
@@ -43,13 +46,18 @@ class DataProcessor:
         Returns:
             Dict[str, Any]: Статистика и метаданные
         """
+        # Пропуски и уникальные значения считаются сразу по всем столбцам
+        missing = df.isna().sum()
+        missing_percentage = (missing / len(df) * 100).round(2) if len(df) else missing.astype(float)
+        unique_values = df.nunique()
+        
         stats = {
             "shape": df.shape,
             "columns": list(df.columns),
             "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
-            "missing_values": {col: int(df[col].isna().sum()) for col in df.columns},
-            "missing_percentage": {col: round(df[col].isna().sum() / len(df) * 100, 2) for col in df.columns},
-            "unique_values": {col: int(df[col].nunique()) for col in df.columns},
+            "missing_values": {col: int(value) for col, value in missing.items()},
+            "missing_percentage": {col: float(value) for col, value in missing_percentage.items()},
+            "unique_values": {col: int(value) for col, value in unique_values.items()},
             "sample_values": {col: df[col].dropna().head(3).tolist() for col in df.columns},
             "numeric_columns": list(df.select_dtypes(include=['number']).columns),
             "text_columns": list(df.select_dtypes(include=['object']).columns),
@@ -64,11 +72,12 @@ class DataProcessor:
         # Анализ текстовых данных
         text_stats = {}
         for col in stats["text_columns"]:
-            if df[col].notna().any():
+            if missing[col] < len(df):
+                lengths = df[col].astype(str).str.len()
                 text_stats[col] = {
-                    "avg_length": df[col].astype(str).str.len().mean(),
-                    "max_length": df[col].astype(str).str.len().max(),
-                    "min_length": df[col].astype(str).str.len().min(),
+                    "avg_length": lengths.mean(),
+                    "max_length": lengths.max(),
+                    "min_length": lengths.min(),
                 }
         stats["text_stats"] = text_stats
         
@@ -192,6 +201,9 @@ class DataProcessor:
         }
         
         for col in df.columns:
+            # Текст хранится в object или, начиная с pandas 3, в строковом типе
+            is_text = pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])
+
             # Определение ID-столбцов
             if "id" in col.lower() or "код" in col.lower():
                 groups["ID_columns"].append(col)
@@ -201,7 +213,7 @@ class DataProcessor:
                 groups["Name_columns"].append(col)
             
             # Определение столбцов с датами
-            elif df[col].dtype == 'datetime64[ns]' or "date" in col.lower() or "дата" in col.lower():
+            elif pd.api.types.is_datetime64_any_dtype(df[col]) or "date" in col.lower() or "дата" in col.lower():
                 groups["Date_columns"].append(col)
             
             # Определение числовых столбцов
@@ -209,11 +221,11 @@ class DataProcessor:
                 groups["Numeric_columns"].append(col)
             
             # Определение категориальных столбцов (немного уникальных значений)
-            elif df[col].dtype == 'object' and df[col].nunique() < 10:
+            elif is_text and df[col].nunique() < 10:
                 groups["Category_columns"].append(col)
             
             # Остальные текстовые столбцы
-            elif df[col].dtype == 'object':
+            elif is_text:
                 groups["Text_columns"].append(col)
         
         # Удаляем пустые группы
@@ -362,21 +374,32 @@ class DataProcessor:
                     "prompt_category": "Работа с клиентами"
                 })
         
+        # Выбросы и динамика считаются локально по всем строкам, в промпт
+        # анализа всей таблицы они попадают готовыми выводами (findings_section)
+        findings = get_findings(df) if numeric_cols and (date_cols or row_count > 100) else None
+        
         # 3. Если есть даты - временной анализ
         if date_cols and numeric_cols:
+            description = "Анализ трендов и сезонности в данных, привязанных к датам"
+            if findings["trends"]:
+                description += f" (рассчитана динамика по столбцам дат: {', '.join(trend['column'] for trend in findings['trends'])})"
             suggestions.append({
                 "type": "Временной анализ",
-                "description": "Анализ трендов и сезонности в данных, привязанных к датам",
+                "description": description,
                 "columns": date_cols + numeric_cols,
                 "prompt_category": "Финансы и отчетность"
             })
         
         # 4. Если много строк - поиск аномалий
         if row_count > 100 and numeric_cols:
+            outlier_cols = [item["column"] for item in findings["outliers"]]
+            description = "Выявление выбросов и нетипичных паттернов в данных"
+            if outlier_cols:
+                description += f" (выбросы найдены в столбцах: {', '.join(outlier_cols)})"
             suggestions.append({
                 "type": "Поиск аномалий",
-                "description": "Выявление выбросов и нетипичных паттернов в данных",
-                "columns": numeric_cols,
+                "description": description,
+                "columns": outlier_cols or numeric_cols,
                 "prompt_category": "Операционная деятельность"
             })
         
@@ -0,0 +1,274 @@
+# src/core/dataset_digest.py
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.services.tokenizer import count_tokens
+
+# Ограничения размера сводки: не зависят от длины и ширины таблицы
+DEFAULT_DIGEST_TOKENS = 1500
+MAX_DIGEST_COLUMNS = 40
+TOP_K_CATEGORIES = 5
+MAX_CORRELATIONS = 5
+MAX_TREND_POINTS = 12
+MAX_VALUE_LENGTH = 40
+# Числовые столбцы, среди которых ищутся корреляции
+MAX_CORRELATION_COLUMNS = 200
+
+# Доля уникальных значений, начиная с которой столбец считается свободным текстом
+TEXT_UNIQUE_RATIO = 0.5
+
+QUANTILES = [0.0, 0.25, 0.5, 0.75, 1.0]
+
+# Периоды для динамики по датам: от мелкого к крупному
+TREND_PERIODS = [("D", "по дням"), ("W", "по неделям"), ("M", "по месяцам"), ("Q", "по кварталам"), ("Y", "по годам")]
+
+DIGEST_CACHE_SIZE = 16
+_digest_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_digest_cache_lock = threading.Lock()
+
+
+def dataframe_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Вычисляет хэш содержимого DataFrame (значения, индекс и названия столбцов).
+
+    Args:
+        df (pd.DataFrame): Таблица
+
+    Returns:
+        str: Хэш содержимого
+    """
+    digest = hashlib.sha1()
+    digest.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=True).values
+    except TypeError:
+        # Ячейки с непрехешируемыми значениями (списки, словари) сравниваем как текст
+        row_hashes = pd.util.hash_pandas_object(df.astype(str), index=True).values
+    digest.update(row_hashes.tobytes())
+    return digest.hexdigest()
+
+
+def _short(value: Any) -> str:
+    """Короткое текстовое представление значения."""
+    if isinstance(value, (float, np.floating)):
+        return f"{value:.4g}"
+    text = str(value).replace("\n", " ")
+    return text if len(text) <= MAX_VALUE_LENGTH else text[:MAX_VALUE_LENGTH - 1] + "…"
+
+
+def _date_trend(series: pd.Series) -> Optional[Dict[str, Any]]:
+    """Диапазон дат и количество записей по периодам (не больше MAX_TREND_POINTS точек)."""
+    values = series.dropna()
+    if values.empty:
+        return None
+    if getattr(values.dt, "tz", None) is not None:
+        values = values.dt.tz_localize(None)
+
+    start, end = values.min(), values.max()
+    for period, label in TREND_PERIODS:
+        periods = values.dt.to_period(period)
+        if periods.nunique() <= MAX_TREND_POINTS or period == TREND_PERIODS[-1][0]:
+            counts = periods.value_counts().sort_index()
+            return {
+                "start": str(start.date()),
+                "end": str(end.date()),
+                "label": label,
+                "counts": {str(key): int(count) for key, count in counts.tail(MAX_TREND_POINTS).items()}
+            }
+    return None
+
+
+def compute_digest(df: pd.DataFrame, stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Строит сводку по всей таблице.
+
+    Пропуски, число уникальных значений, квантили и корреляции считаются
+    векторизованно по всем столбцам сразу; частые значения и динамика дат -
+    только для столбцов, попавших в сводку (не больше MAX_DIGEST_COLUMNS).
+
+    Args:
+        df (pd.DataFrame): Таблица
+        stats (Optional[Dict[str, Any]]): Готовая статистика ExcelHandler.analyze_dataframe
+            или DataProcessor.analyze_dataframe (типы и доля пропусков берутся из нее)
+
+    Returns:
+        Dict[str, Any]: Сводка: rows, columns, omitted_columns, columns_info, correlations
+    """
+    rows = len(df)
+    columns = list(df.columns[:MAX_DIGEST_COLUMNS])
+    part = df[columns]
+
+    if stats and "missing_percentage" in stats:
+        null_rates = pd.Series({col: stats["missing_percentage"].get(col, 0.0) / 100 for col in columns}, dtype=float)
+    else:
+        null_rates = part.isna().mean() if rows else pd.Series(0.0, index=columns)
+    dtypes = stats["dtypes"] if stats and "dtypes" in stats else {col: str(dtype) for col, dtype in part.dtypes.items()}
+
+    try:
+        unique_counts = part.nunique()
+    except TypeError:
+        unique_counts = part.astype(str).nunique()
+    non_null = part.notna().sum()
+
+    numeric = part.select_dtypes(include="number")
+    dates = part.select_dtypes(include=["datetime", "datetimetz"])
+
+    # Квантили, среднее и разброс всех числовых столбцов - одним вызовом;
+    # столбцы без значений (лист без строк или только пропуски) пропускаются
+    filled = numeric.loc[:, non_null[numeric.columns] > 0]
+    quantiles = filled.quantile(QUANTILES).T if not filled.empty else pd.DataFrame()
+    moments = filled.agg(["mean", "std"]).T if not filled.empty else pd.DataFrame()
+
+    columns_info = []
+    for col in columns:
+        info = {
+            "name": str(col),
+            "dtype": dtypes.get(col, str(part[col].dtype)),
+            "null_rate": float(null_rates.get(col, 0.0)),
+            "unique": int(unique_counts.get(col, 0))
+        }
+        if col in numeric.columns:
+            info["kind"] = "numeric"
+            if col in filled.columns:
+                info["quantiles"] = [float(v) for v in quantiles.loc[col].values]
+                info["mean"] = float(moments.loc[col, "mean"])
+                info["std"] = float(moments.loc[col, "std"])
+        elif col in dates.columns:
+            info["kind"] = "date"
+            info["trend"] = _date_trend(part[col])
+        elif non_null[col] and info["unique"] / non_null[col] > TEXT_UNIQUE_RATIO and non_null[col] > TOP_K_CATEGORIES * 2:
+            info["kind"] = "text"
+            info["avg_length"] = float(part[col].dropna().astype(str).str.len().mean())
+        else:
+            info["kind"] = "category"
+            top = part[col].value_counts(dropna=True).head(TOP_K_CATEGORIES)
+            info["top"] = [(_short(value), int(count)) for value, count in top.items()]
+        columns_info.append(info)
+
+    # Самые сильные корреляции между числовыми столбцами (верхний треугольник матрицы)
+    correlations = []
+    all_numeric = df.select_dtypes(include="number").iloc[:, :MAX_CORRELATION_COLUMNS]
+    if all_numeric.shape[1] > 1:
+        matrix = all_numeric.corr().values
+        upper = np.triu_indices_from(matrix, k=1)
+        values = matrix[upper]
+        valid = ~np.isnan(values)
+        order = np.argsort(-np.abs(values[valid]))[:MAX_CORRELATIONS]
+        names = all_numeric.columns
+        pairs_i, pairs_j = upper[0][valid], upper[1][valid]
+        correlations = [
+            (str(names[pairs_i[k]]), str(names[pairs_j[k]]), float(values[valid][k]))
+            for k in order
+        ]
+
+    return {
+        "rows": rows,
+        "columns": len(df.columns),
+        "omitted_columns": len(df.columns) - len(columns),
+        "columns_info": columns_info,
+        "correlations": correlations
+    }
+
+
+def _format_column(info: Dict[str, Any]) -> str:
+    """Строка сводки по одному столбцу."""
+    line = f"- {info['name']} ({info['dtype']}): пропусков {info['null_rate']:.1%}, уникальных {info['unique']}"
+    if info["kind"] == "numeric" and "quantiles" in info:
+        q = info["quantiles"]
+        line += (
+            f"; min={_short(q[0])}, 25%={_short(q[1])}, медиана={_short(q[2])}, 75%={_short(q[3])}, max={_short(q[4])}"
+            f"; среднее={_short(info['mean'])}, ст. откл.={_short(info['std'])}"
+        )
+    elif info["kind"] == "date" and info.get("trend"):
+        trend = info["trend"]
+        counts = ", ".join(f"{period}: {count}" for period, count in trend["counts"].items())
+        line += f"; {trend['start']} — {trend['end']}; записей {trend['label']}: {counts}"
+    elif info["kind"] == "text":
+        line += f"; свободный текст, средняя длина {info['avg_length']:.0f} симв."
+    elif info["kind"] == "category" and info.get("top"):
+        line += "; частые: " + ", ".join(f"{value} ({count})" for value, count in info["top"])
+    return line
+
+
+def format_digest(digest: Dict[str, Any], max_tokens: int = DEFAULT_DIGEST_TOKENS) -> str:
+    """
+    Представляет сводку текстом для промпта, не длиннее max_tokens токенов.
+
+    Если сводка не помещается, последние столбцы опускаются с пометкой.
+
+    Args:
+        digest (Dict[str, Any]): Результат compute_digest
+        max_tokens (int): Максимальный размер текста в токенах
+
+    Returns:
+        str: Текст сводки
+    """
+    header = f"Строк: {digest['rows']}, столбцов: {digest['columns']}"
+    column_lines = [_format_column(info) for info in digest["columns_info"]]
+    correlation_line = ""
+    if digest["correlations"]:
+        correlation_line = "Сильнейшие корреляции: " + "; ".join(
+            f"{a} ~ {b}: {r:+.2f}" for a, b, r in digest["correlations"]
+        )
+
+    def render(lines: List[str], omitted: int) -> str:
+        parts = [header, "Столбцы:"] + lines
+        if omitted:
+            parts.append(f"... еще столбцов без сводки: {omitted}")
+        if correlation_line:
+            parts.append(correlation_line)
+        return "\n".join(parts)
+
+    kept = len(column_lines)
+    text = render(column_lines, digest["omitted_columns"])
+    while kept > 0 and count_tokens(text) > max_tokens:
+        kept -= 1
+        text = render(column_lines[:kept], digest["omitted_columns"] + len(column_lines) - kept)
+    return text
+
+
+def get_digest(df: pd.DataFrame, stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Возвращает сводку таблицы, используя кэш по хэшу содержимого.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        stats (Optional[Dict[str, Any]]): Готовая статистика analyze_dataframe
+
+    Returns:
+        Dict[str, Any]: Результат compute_digest
+    """
+    key = dataframe_fingerprint(df)
+    with _digest_cache_lock:
+        cached = _digest_cache.get(key)
+        if cached is not None:
+            _digest_cache.move_to_end(key)
+            return cached
+
+    digest = compute_digest(df, stats)
+
+    with _digest_cache_lock:
+        _digest_cache[key] = digest
+        if len(_digest_cache) > DIGEST_CACHE_SIZE:
+            _digest_cache.popitem(last=False)
+    return digest
+
+
+def describe_dataframe(df: pd.DataFrame, stats: Optional[Dict[str, Any]] = None, max_tokens: int = DEFAULT_DIGEST_TOKENS) -> str:
+    """
+    Текстовая сводка всей таблицы для промпта анализа всей таблицы.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        stats (Optional[Dict[str, Any]]): Готовая статистика analyze_dataframe
+        max_tokens (int): Максимальный размер сводки в токенах
+
+    Returns:
+        str: Текст сводки
+    """
+    return format_digest(get_digest(df, stats), max_tokens)
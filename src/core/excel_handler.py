@@ -4,7 +4,11 @@ import numpy as np
 from io import BytesIO
 import io  # Добавляем импорт io для работы с потоками ввода-вывода
 from typing import Dict, List, Tuple, Optional, Any, Union
-import streamlit as st
+
+from src.core.excel_loader import list_sheets, read_excel_columns
+from src.core.excel_shards import SHARDED_ENGINE, read_excel_sharded
+from src.core.excel_writer import write_excel
+from src.core.word_report import build_word_report
 
 # Пробуем различные способы импорта Document для работы с Word
 try:
@@ -28,12 +32,25 @@ class ExcelHandler:
     """
     
     @staticmethod
-    def load_excel(file) -> pd.DataFrame:
+    def load_excel(
+        file,
+        columns: Optional[List[str]] = None,
+        nrows: Optional[int] = None,
+        engine: Optional[str] = None,
+        workers: Optional[int] = None,
+        sheet: Union[int, str] = 0
+    ) -> pd.DataFrame:
         """
-        Загружает Excel файл и возвращает DataFrame.
+        Загружает лист Excel файла и возвращает DataFrame.
         
         Args:
             file: Файл Excel (BytesIO или путь)
+            columns (Optional[List[str]]): Загружаемые столбцы (None - все)
+            nrows (Optional[int]): Максимальное количество строк (None - все)
+            engine (Optional[str]): "sharded" - параллельный разбор листа xlsx в нескольких
+                процессах (для очень больших листов), None - быстрый движок по умолчанию
+            workers (Optional[int]): Число процессов для engine="sharded" (None - по числу ядер)
+            sheet (Union[int, str]): Номер или название листа (по умолчанию первый)
             
         Returns:
             pd.DataFrame: Загруженные данные
@@ -42,13 +59,36 @@ class ExcelHandler:
             ValueError: Если не удалось прочитать файл
         """
         try:
-            df = pd.read_excel(file)
-            # Присваиваем имя для дальнейшего использования
-            df.name = getattr(file, 'name', 'Unnamed Excel File')
+            # Начало листа читается быстрее без запуска процессов
+            if engine == SHARDED_ENGINE and nrows is None:
+                df = read_excel_sharded(file, sheet, columns=columns, workers=workers)
+            else:
+                df = read_excel_columns(file, sheet, columns=columns, nrows=nrows)
+            # Присваиваем имя для дальнейшего использования (df.name pandas не поддерживает)
+            df.attrs["name"] = getattr(file, 'name', 'Unnamed Excel File')
             return df
         except Exception as e:
             raise ValueError(f"Ошибка при чтении Excel файла: {e}")
     
+    @staticmethod
+    def list_sheets(file) -> List[str]:
+        """
+        Возвращает названия листов Excel файла.
+        
+        Args:
+            file: Файл Excel (BytesIO или путь)
+            
+        Returns:
+            List[str]: Названия листов в порядке книги
+            
+        Raises:
+            ValueError: Если не удалось прочитать файл
+        """
+        try:
+            return list_sheets(file)
+        except Exception as e:
+            raise ValueError(f"Ошибка при чтении Excel файла: {e}")
+    
     @staticmethod
     def analyze_dataframe(df: pd.DataFrame) -> Dict[str, Any]:
         """
@@ -60,27 +100,31 @@ class ExcelHandler:
         Returns:
             Dict[str, Any]: Статистика по DataFrame
         """
+        # Пропуски и уникальные значения считаются сразу по всем столбцам
+        missing = df.isna().sum()
+        missing_percentage = (missing / len(df) * 100).round(2) if len(df) else missing.astype(float)
+        
         stats = {
             "shape": df.shape,
             "rows": df.shape[0],
             "columns": df.shape[1],
             "column_names": list(df.columns),
             "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
-            "missing_values": {col: int(df[col].isna().sum()) for col in df.columns},
-            "missing_percentage": {col: round(df[col].isna().sum() / len(df) * 100, 2) for col in df.columns},
+            "missing_values": {col: int(value) for col, value in missing.items()},
+            "missing_percentage": {col: float(value) for col, value in missing_percentage.items()},
             "has_issues": False,
             "issues": []
         }
         
-        # Проверка на проблемы с данными
-        for col in df.columns:
-            # Проверка на большое количество пропусков
-            if df[col].isna().sum() > df.shape[0] * 0.5:  # Более 50% пропусков
-                stats["has_issues"] = True
-                stats["issues"].append(f"Столбец '{col}' содержит более 50% пропущенных значений")
-            
-            # Проверка на однородность данных для строковых столбцов
-            if df[col].dtype == 'object' and df[col].nunique() == 1 and df.shape[0] > 10:
+        # Проверка на большое количество пропусков (более 50%)
+        for col in missing.index[missing > df.shape[0] * 0.5]:
+            stats["has_issues"] = True
+            stats["issues"].append(f"Столбец '{col}' содержит более 50% пропущенных значений")
+        
+        # Проверка на однородность данных для строковых столбцов
+        if df.shape[0] > 10:
+            text_columns = df.select_dtypes(include=["object"])
+            for col in text_columns.columns[text_columns.nunique() == 1]:
                 stats["has_issues"] = True
                 stats["issues"].append(f"Столбец '{col}' содержит одинаковые значения во всех строках")
         
@@ -228,8 +272,7 @@ class ExcelHandler:
         output = BytesIO()
         
         try:
-            with pd.ExcelWriter(output, engine="openpyxl") as writer:
-                df.to_excel(writer, index=include_index, sheet_name="Results")
+            write_excel(df, output, sheet_name="Results", index=include_index)
             
             # Перемещаем указатель в начало файла
             output.seek(0)
@@ -241,24 +284,9 @@ class ExcelHandler:
     # Добавление методов из excel_utils.py
     @staticmethod
     def to_excel(df, filename="export.xlsx"):
-        """Экспорт в Excel с форматированием"""
+        """Экспорт в Excel с форматированием (потоковая запись, ширина столбцов по выборке строк)"""
         output = io.BytesIO()
-        
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Результаты')
-            
-            # Получаем созданный лист
-            workbook = writer.book
-            worksheet = writer.sheets['Результаты']
-            
-            # Форматирование: автоподбор ширины столбцов
-            for i, col in enumerate(df.columns):
-                max_length = max(
-                    df[col].astype(str).apply(len).max(),
-                    len(str(col))
-                ) + 2
-                worksheet.column_dimensions[chr(65 + i)].width = min(max_length, 50)
-        
+        write_excel(df, output, sheet_name='Результаты')
         return output.getvalue()
     
     @staticmethod
@@ -275,8 +303,8 @@ class ExcelHandler:
         return json_data.encode("utf-8")
     
     @staticmethod
-    def to_word(df, table_analysis=None, filename="export.docx"):
-        """Экспорт в документ Word"""
+    def to_word(df, table_analysis=None, filename="export.docx", group_reports=None):
+        """Экспорт в документ Word (таблица ограничена по строкам, полная таблица - в выгрузке Excel)"""
         # Проверяем, доступен ли Document
         if Document is None:
             # Если Document недоступен, возвращаем сообщение об ошибке
@@ -285,41 +313,16 @@ class ExcelHandler:
             # Возвращаем текстовый байт-объект с сообщением об ошибке
             return error_msg.encode("utf-8")
         
-        doc = Document()
-        
-        # Добавляем заголовок
-        doc.add_heading('Отчет по анализу данных', level=1)
-        
-        # Если есть анализ всей таблицы, добавляем его
-        if table_analysis:
-            doc.add_heading('Общий анализ', level=2)
-            doc.add_paragraph(table_analysis)
-        
-        # Добавляем таблицу с результатами
-        doc.add_heading('Результаты построчного анализа', level=2)
-        
-        # Создаем таблицу в Word
-        table = doc.add_table(rows=1, cols=len(df.columns))
-        table.style = 'Table Grid'
-        
-        # Заполняем заголовки
-        for i, column in enumerate(df.columns):
-            table.cell(0, i).text = str(column)
-        
-        # Заполняем данные
-        for _, row in df.iterrows():
-            cells = table.add_row().cells
-            for i, value in enumerate(row):
-                cells[i].text = str(value)
-        
-        # Сохраняем в BytesIO
-        output = io.BytesIO()
-        doc.save(output)
-        return output.getvalue()
+        return build_word_report(
+            df, table_analysis, group_reports, excel_name=filename.rsplit(".", 1)[0] + ".xlsx"
+        )
     
     @staticmethod
     def create_download_button(data, filename, label, mime_type):
         """Создает кнопку для скачивания в интерфейсе Streamlit"""
+        # Streamlit импортируется здесь, чтобы модуль работал и без интерфейса (src/cli.py)
+        import streamlit as st
+        
         return st.download_button(
             label=label,
             data=data,
@@ -0,0 +1,395 @@
+# src/core/excel_loader.py
+import os
+import posixpath
+import re
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Union
+from xml.etree import ElementTree
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# calamine (python-calamine) читает xlsx в несколько раз быстрее openpyxl
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+DEFAULT_CHUNK_ROWS = 50000
+DEFAULT_PREVIEW_ROWS = 1000
+# Файлы больше этого размера загружаются в два этапа: просмотр, затем нужные столбцы
+DEFAULT_LAZY_THRESHOLD_MB = 20
+
+# Форматы, которые openpyxl читает потоково
+STREAMING_EXTENSIONS = (".xlsx", ".xlsm", ".xltx", ".xltm")
+
+# Начало строки листа в XML (с префиксом пространства имен или без)
+ROW_TAG = re.compile(rb"<(?:\w+:)?row[\s>/]")
+XML_CHUNK_BYTES = 1 << 20
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+SHARED_STRINGS = "xl/sharedStrings.xml"
+
+Sheet = Union[int, str]
+
+
+def _rewind(file) -> None:
+    """Возвращает файловый объект в начало (файл читается несколько раз)."""
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+
+def _file_name(file) -> str:
+    """Имя файла для определения формата."""
+    return str(getattr(file, "name", file if isinstance(file, (str, os.PathLike)) else ""))
+
+
+def file_size_mb(file) -> float:
+    """
+    Размер файла в МБ.
+
+    Args:
+        file: Путь или файловый объект (UploadedFile, BytesIO)
+
+    Returns:
+        float: Размер файла
+    """
+    size = getattr(file, "size", None)
+    if size is None and isinstance(file, (str, os.PathLike)):
+        size = os.path.getsize(file)
+    if size is None and hasattr(file, "getbuffer"):
+        size = file.getbuffer().nbytes
+    return (size or 0) / (1024 * 1024)
+
+
+def get_engine() -> Optional[str]:
+    """
+    Выбирает движок pandas.read_excel: calamine, если установлен, иначе выбор pandas.
+
+    Returns:
+        Optional[str]: Название движка или None (по умолчанию pandas)
+    """
+    return "calamine" if CALAMINE_AVAILABLE else None
+
+
+def _is_streamable(file) -> bool:
+    """True, если файл можно читать потоково через openpyxl в режиме read_only."""
+    name = _file_name(file).lower()
+    return not name or name.endswith(STREAMING_EXTENSIONS)
+
+
+def _column_names(header: List[Any]) -> List[Any]:
+    """Названия столбцов как у pandas.read_excel: пустые - "Unnamed: N", повторы - "имя.1"."""
+    names = []
+    seen: Dict[Any, int] = {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _open_sheet(file, sheet: Sheet):
+    """Открывает лист книги в режиме read_only."""
+    _rewind(file)
+    workbook = load_workbook(file, read_only=True, data_only=True, keep_links=False)
+    worksheet = workbook.worksheets[sheet] if isinstance(sheet, int) else workbook[sheet]
+    return workbook, worksheet
+
+
+def _read_header(worksheet) -> List[Any]:
+    """Первая строка листа без пустых ячеек в конце."""
+    header = list(next(worksheet.iter_rows(min_row=1, max_row=1, values_only=True), ()))
+    while header and header[-1] is None:
+        header.pop()
+    return header
+
+
+def _sheet_paths(archive: zipfile.ZipFile) -> List[tuple]:
+    """Пары (название листа, путь XML листа в архиве xlsx) в порядке книги."""
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    relations = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in relations.iter(f"{PACKAGE_REL_NS}Relationship")}
+    paths = []
+    for element in workbook.iter(f"{MAIN_NS}sheet"):
+        target = targets[element.get(f"{REL_NS}id")]
+        path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+        paths.append((element.get("name"), path))
+    return paths
+
+
+def _shared_strings(archive: zipfile.ZipFile, needed: set) -> Dict[int, str]:
+    """Читает из общих строк книги только строки с нужными номерами."""
+    if not needed or SHARED_STRINGS not in archive.namelist():
+        return {}
+    strings = {}
+    last = max(needed)
+    index = 0
+    with archive.open(SHARED_STRINGS) as stream:
+        for _, element in ElementTree.iterparse(stream):
+            if element.tag != f"{MAIN_NS}si":
+                continue
+            if index in needed:
+                # Текст строки - все фрагменты t, кроме фонетических подсказок (rPh)
+                phonetic = {id(text) for rph in element.iter(f"{MAIN_NS}rPh") for text in rph.iter(f"{MAIN_NS}t")}
+                strings[index] = "".join(
+                    text.text or "" for text in element.iter(f"{MAIN_NS}t") if id(text) not in phonetic
+                )
+            element.clear()
+            if index >= last:
+                break
+            index += 1
+    return strings
+
+
+def _cell_value(cell, shared: Dict[int, str]) -> Any:
+    """Значение ячейки заголовка по ее XML (тип из атрибута t)."""
+    kind = cell.get("t", "n")
+    if kind == "inlineStr":
+        parts = [text.text or "" for text in cell.iter(f"{MAIN_NS}t")]
+        return "".join(parts) if parts else None
+    value = cell.findtext(f"{MAIN_NS}v")
+    if value is None:
+        return None
+    if kind == "s":
+        return shared.get(int(value))
+    if kind == "b":
+        return value == "1"
+    if kind == "n":
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    return value
+
+
+def _column_index(reference: str) -> int:
+    """Номер столбца (с 0) по адресу ячейки вида "AB12"."""
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord("A") + 1
+    return index - 1
+
+
+def count_sheet_rows(stream) -> int:
+    """
+    Считает строки листа xlsx по тегам строк в XML, не разбирая ячейки.
+
+    Используется, если размеры листа не записаны в файле: это в десятки раз
+    быстрее чтения строк через openpyxl.
+
+    Args:
+        stream: XML листа (файловый объект из архива xlsx)
+
+    Returns:
+        int: Количество строк листа вместе с заголовком
+    """
+    count = 0
+    tail = b""
+    while True:
+        chunk = stream.read(XML_CHUNK_BYTES)
+        if not chunk:
+            return count
+        data = tail + chunk
+        # Теги, целиком попавшие в хвост прошлой части, уже посчитаны
+        count += sum(1 for match in ROW_TAG.finditer(data) if match.end() > len(tail))
+        tail = data[-16:]
+
+
+def _scan_xlsx(file, sheet: Sheet) -> Dict[str, Any]:
+    """Заголовок и количество строк листа xlsx по XML, без разбора данных."""
+    _rewind(file)
+    with zipfile.ZipFile(file) as archive:
+        paths = _sheet_paths(archive)
+        names = [name for name, _ in paths]
+        if isinstance(sheet, int):
+            title, path = paths[sheet]
+        elif sheet in names:
+            title, path = sheet, paths[names.index(sheet)][1]
+        else:
+            raise ValueError(f"Лист не найден: {sheet}")
+
+        dimension_rows = None
+        cells = []
+        with archive.open(path) as stream:
+            for _, element in ElementTree.iterparse(stream):
+                if element.tag == f"{MAIN_NS}dimension":
+                    # Диапазон вида "A1:R1001"; "A1" пишется и для непустых листов
+                    match = re.search(r"(\d+)$", element.get("ref", ""))
+                    if match and ":" in element.get("ref", ""):
+                        dimension_rows = int(match.group(1))
+                elif element.tag == f"{MAIN_NS}row":
+                    cells = list(element.iter(f"{MAIN_NS}c"))
+                    break
+
+        needed = {int(cell.findtext(f"{MAIN_NS}v")) for cell in cells if cell.get("t") == "s" and cell.findtext(f"{MAIN_NS}v")}
+        shared = _shared_strings(archive, needed)
+        header: List[Any] = []
+        for position, cell in enumerate(cells):
+            index = _column_index(cell.get("r")) if cell.get("r") else position
+            header.extend([None] * (index + 1 - len(header)))
+            header[index] = _cell_value(cell, shared)
+        while header and header[-1] is None:
+            header.pop()
+
+        if dimension_rows is None:
+            with archive.open(path) as stream:
+                dimension_rows = count_sheet_rows(stream)
+
+    return {"sheet_names": names, "sheet": title, "columns": _column_names(header), "rows": max(dimension_rows - 1, 0)}
+
+
+def list_sheets(file) -> List[str]:
+    """
+    Возвращает названия листов книги в порядке книги.
+
+    Для xlsx читается только описание книги, данные листов не разбираются.
+
+    Args:
+        file: Путь или файловый объект
+
+    Returns:
+        List[str]: Названия листов
+    """
+    _rewind(file)
+    if _is_streamable(file):
+        with zipfile.ZipFile(file) as archive:
+            return [name for name, _ in _sheet_paths(archive)]
+    return list(pd.ExcelFile(file, engine=get_engine()).sheet_names)
+
+
+def scan_sheet(file, sheet: Sheet = 0) -> Dict[str, Any]:
+    """
+    Читает только заголовок и количество строк листа.
+
+    Для xlsx читается начало XML листа: первая строка и размеры листа,
+    записанные в файле (если их нет - строки считаются по тегам в XML,
+    count_sheet_rows). Для остальных форматов читается только заголовок,
+    а количество строк неизвестно.
+
+    Args:
+        file: Путь или файловый объект
+        sheet (Sheet): Номер или название листа
+
+    Returns:
+        Dict[str, Any]: sheet_names, sheet (название), columns, rows (None, если неизвестно)
+    """
+    if _is_streamable(file):
+        return _scan_xlsx(file, sheet)
+
+    _rewind(file)
+    excel = pd.ExcelFile(file, engine=get_engine())
+    header = excel.parse(sheet, nrows=0)
+    name = excel.sheet_names[sheet] if isinstance(sheet, int) else sheet
+    return {"sheet_names": excel.sheet_names, "sheet": name, "columns": list(header.columns), "rows": None}
+
+
+def _to_frame(rows: List[tuple], columns: List[Any], start: int) -> pd.DataFrame:
+    """DataFrame из значений ячеек с индексом, продолжающим предыдущие части."""
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    frame.index = pd.RangeIndex(start, start + len(frame))
+    frame = frame.infer_objects()
+    # Пустые столбцы - float с NaN, как в pandas.read_excel
+    for column in frame.columns[frame.isna().all().to_numpy()]:
+        frame[column] = frame[column].astype(float)
+    return frame
+
+
+def iter_excel_chunks(
+    file,
+    sheet: Sheet = 0,
+    columns: Optional[List[Any]] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS
+) -> Iterator[pd.DataFrame]:
+    """
+    Читает лист частями по chunk_rows строк.
+
+    Лист читается потоково (openpyxl, read_only), в памяти одновременно
+    находится только одна часть. Строки, пустые во всех столбцах листа,
+    пропускаются, как в pandas.read_excel.
+
+    Args:
+        file: Путь или файловый объект (xlsx)
+        sheet (Sheet): Номер или название листа
+        columns (Optional[List[Any]]): Нужные столбцы (None - все)
+        chunk_rows (int): Строк в одной части
+
+    Yields:
+        pd.DataFrame: Части листа со сквозным индексом строк
+
+    Raises:
+        ValueError: Если нужных столбцов нет на листе
+    """
+    workbook, worksheet = _open_sheet(file, sheet)
+    try:
+        names = _column_names(_read_header(worksheet))
+        if columns is None:
+            positions = list(range(len(names)))
+        else:
+            missing = [col for col in columns if col not in names]
+            if missing:
+                raise ValueError(f"Столбцы отсутствуют на листе: {', '.join(map(str, missing))}")
+            # Порядок столбцов - как на листе (как usecols в pandas.read_excel)
+            positions = sorted(names.index(col) for col in columns)
+        selected = [names[position] for position in positions]
+        if not positions:
+            return
+
+        buffer: List[tuple] = []
+        start = 0
+        for row in worksheet.iter_rows(min_row=2, values_only=True):
+            if all(value is None for value in row):
+                continue
+            buffer.append(tuple(row[position] if position < len(row) else None for position in positions))
+            if len(buffer) >= chunk_rows:
+                yield _to_frame(buffer, selected, start)
+                start += len(buffer)
+                buffer = []
+        if buffer or start == 0:
+            yield _to_frame(buffer, selected, start)
+    finally:
+        workbook.close()
+
+
+def read_excel_columns(
+    file,
+    sheet: Sheet = 0,
+    columns: Optional[List[Any]] = None,
+    nrows: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Читает лист Excel (только указанные столбцы) быстрым движком.
+
+    При установленном calamine используется pandas.read_excel с ним, иначе
+    xlsx читается потоково по частям (iter_excel_chunks), а остальные
+    форматы - pandas.read_excel.
+
+    Args:
+        file: Путь или файловый объект
+        sheet (Sheet): Номер или название листа
+        columns (Optional[List[Any]]): Нужные столбцы (None - все)
+        nrows (Optional[int]): Максимальное количество строк (None - все)
+
+    Returns:
+        pd.DataFrame: Данные листа
+    """
+    engine = get_engine()
+    if engine or not _is_streamable(file):
+        _rewind(file)
+        return pd.read_excel(file, sheet_name=sheet, usecols=columns, nrows=nrows, engine=engine)
+
+    chunks = []
+    rows = 0
+    for chunk in iter_excel_chunks(file, sheet, columns, min(nrows or DEFAULT_CHUNK_ROWS, DEFAULT_CHUNK_ROWS)):
+        chunks.append(chunk)
+        rows += len(chunk)
+        if nrows is not None and rows >= nrows:
+            break
+    frame = pd.concat(chunks) if len(chunks) > 1 else chunks[0]
+    return frame.head(nrows) if nrows is not None else frame
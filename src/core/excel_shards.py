@@ -0,0 +1,394 @@
+# src/core/excel_shards.py
+import math
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+
+from src.core.excel_loader import (
+    MAIN_NS, ROW_TAG, XML_CHUNK_BYTES, Sheet, _cell_value, _column_index, _column_names, _rewind,
+    _shared_strings, _sheet_paths
+)
+
+# Название движка для ExcelHandler.load_excel
+SHARDED_ENGINE = "sharded"
+
+# Размер части XML листа, которую разбирает один процесс
+DEFAULT_SHARD_MB = 8
+# Листы меньше этого размера разбираются в текущем процессе
+MIN_PARALLEL_MB = 16
+
+ROOT_TAG = re.compile(rb"<((?:\w+:)?)worksheet\b[^>]*>")
+SHEET_DATA_END = re.compile(rb"</(?:\w+:)?sheetData>")
+SHEET_DATA = f"{MAIN_NS}sheetData"
+ROW = f"{MAIN_NS}row"
+CELL = f"{MAIN_NS}c"
+VALUE = f"{MAIN_NS}v"
+TEXT = f"{MAIN_NS}t"
+TEXT_PATH = f".//{TEXT}"
+
+# Типы ячеек в результатах разбора части листа
+EMPTY, NUMBER, SHARED, STRING, BOOLEAN, DATE = range(6)
+
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+EXCEL_EPOCH_1904 = pd.Timestamp("1904-01-01")
+
+
+def _date_styles(archive: zipfile.ZipFile) -> frozenset:
+    """Номера стилей ячеек с форматом даты (числа в таких ячейках - даты)."""
+    if "xl/styles.xml" not in archive.namelist():
+        return frozenset()
+    styles = ElementTree.fromstring(archive.read("xl/styles.xml"))
+    custom = {int(fmt.get("numFmtId")): fmt.get("formatCode") for fmt in styles.iter(f"{MAIN_NS}numFmt")}
+    cell_xfs = styles.find(f"{MAIN_NS}cellXfs")
+    if cell_xfs is None:
+        return frozenset()
+    dates = set()
+    for i, xf in enumerate(cell_xfs.findall(f"{MAIN_NS}xf")):
+        fmt_id = int(xf.get("numFmtId", 0))
+        code = custom.get(fmt_id, BUILTIN_FORMATS.get(fmt_id))
+        if code and is_date_format(code):
+            dates.add(i)
+    return frozenset(dates)
+
+
+def _epoch(archive: zipfile.ZipFile) -> pd.Timestamp:
+    """Начало отсчета дат книги (система 1900 или 1904)."""
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    properties = workbook.find(f"{MAIN_NS}workbookPr")
+    date1904 = properties is not None and properties.get("date1904", "0").lower() in ("1", "true")
+    return EXCEL_EPOCH_1904 if date1904 else EXCEL_EPOCH
+
+
+def parse_rows(
+    data: bytes,
+    wrapper: Tuple[bytes, bytes],
+    positions: Dict[int, int],
+    date_styles: frozenset
+) -> Dict[str, Any]:
+    """
+    Разбирает часть XML листа (целые строки) в столбцовые массивы.
+
+    Выполняется в процессе пула, поэтому возвращает только массивы numpy и
+    словарь текстов: общие строки остаются номерами и подставляются в
+    основном процессе.
+
+    Args:
+        data (bytes): Строки листа (теги row целиком)
+        wrapper (Tuple[bytes, bytes]): Открывающие и закрывающие теги worksheet и sheetData
+        positions (Dict[int, int]): Номер столбца листа -> номер столбца результата
+        date_styles (frozenset): Номера стилей с форматом даты
+
+    Returns:
+        Dict[str, Any]: kinds (тип ячейки, int8), numbers (число или номер общей строки),
+            texts ((строка, столбец) -> текст); пустые строки пропущены
+    """
+    width = len(positions)
+    kinds = []
+    numbers = []
+    texts = {}
+    # Номера столбцов по буквам адреса: буквы повторяются в каждой строке
+    letters_index: Dict[str, int] = {}
+    # Часть целиком строится как дерево (быстрее iterparse), ее размер ограничен
+    sheet_data = ElementTree.fromstring(wrapper[0] + data + wrapper[1]).find(SHEET_DATA)
+    for element in sheet_data.iterfind(ROW):
+        row_kinds = [EMPTY] * width
+        row_numbers = [math.nan] * width
+        row_texts = {}
+        # Строка пропускается, только если пуста во всех столбцах листа, а не только в нужных
+        filled = False
+        column = -1
+        for cell in element.iterfind(CELL):
+            reference = cell.get("r")
+            if reference:
+                letters = reference.rstrip("0123456789")
+                column = letters_index.get(letters)
+                if column is None:
+                    column = letters_index[letters] = _column_index(letters)
+            else:
+                column += 1
+            slot = positions.get(column)
+            if slot is None:
+                filled = filled or cell.find(VALUE) is not None or cell.find(TEXT_PATH) is not None
+                continue
+            kind = cell.get("t", "n")
+            if kind == "inlineStr":
+                # Пустые ячейки могут быть записаны как inlineStr без текста
+                parts = [text.text or "" for text in cell.iter(TEXT)]
+                if parts:
+                    row_kinds[slot] = STRING
+                    row_texts[slot] = "".join(parts)
+                continue
+            value = cell.findtext(VALUE)
+            if value is None:
+                continue
+            if kind == "n":
+                row_kinds[slot] = DATE if cell.get("s") is not None and int(cell.get("s")) in date_styles else NUMBER
+                row_numbers[slot] = float(value)
+            elif kind == "s":
+                row_kinds[slot] = SHARED
+                row_numbers[slot] = int(value)
+            elif kind == "b":
+                row_kinds[slot] = BOOLEAN
+                row_numbers[slot] = float(value == "1")
+            else:
+                row_kinds[slot] = STRING
+                row_texts[slot] = value
+        # Пустые строки пропускаются, как в pandas.read_excel
+        if filled or any(row_kinds):
+            for slot, text in row_texts.items():
+                texts[(len(kinds), slot)] = text
+            kinds.append(row_kinds)
+            numbers.append(row_numbers)
+    return {
+        "kinds": np.array(kinds, dtype=np.int8).reshape(-1, width),
+        "numbers": np.array(numbers, dtype=np.float64).reshape(-1, width),
+        "texts": texts
+    }
+
+
+def _iter_shards(stream, shard_bytes: int) -> Iterator[Tuple[str, Any]]:
+    """
+    Читает XML листа потоком и делит его на части по границам строк.
+
+    Yields:
+        Tuple[str, Any]: ("wrapper", (открывающие, закрывающие теги)), ("header", XML первой строки),
+            затем ("rows", XML строк) для каждой части
+    """
+    buffer = b""
+    eof = False
+    # Конец sheetData ищется только в новых данных (с запасом на тег, разрезанный при чтении)
+    searched = 0
+
+    def fill(size: int) -> None:
+        nonlocal buffer, eof
+        chunk = stream.read(size)
+        eof = not chunk
+        buffer += chunk
+
+    def data_end():
+        nonlocal searched
+        match = SHEET_DATA_END.search(buffer, max(searched - 32, 0))
+        searched = len(buffer)
+        return match
+
+    # Начало листа: теги worksheet и первая строка (заголовок)
+    while True:
+        first = ROW_TAG.search(buffer)
+        end = SHEET_DATA_END.search(buffer)
+        searched = len(buffer)
+        if end and (not first or first.start() > end.start()):
+            return
+        if first:
+            second = ROW_TAG.search(buffer, first.end())
+            if second and (not end or second.start() < end.start()):
+                header_end = second.start()
+                break
+            if end:
+                header_end = end.start()
+                break
+        if eof:
+            return
+        fill(XML_CHUNK_BYTES)
+
+    root = ROOT_TAG.search(buffer)
+    prefix = root.group(1) if root else b""
+    yield "wrapper", (
+        (root.group(0) if root else b"<worksheet>") + b"<" + prefix + b"sheetData>",
+        b"</" + prefix + b"sheetData></" + prefix + b"worksheet>"
+    )
+    yield "header", buffer[first.start():header_end]
+    buffer = buffer[header_end:]
+    searched = 0
+
+    row_open = b"<" + prefix + b"row"
+    while True:
+        end = data_end()
+        if end:
+            if ROW_TAG.search(buffer, 0, end.start()):
+                yield "rows", buffer[:end.start()]
+            return
+        if eof:
+            return
+        if len(buffer) >= shard_bytes:
+            # Граница части - начало последней полной строки в буфере
+            cut = buffer.rfind(row_open)
+            while cut > 0 and buffer[cut + len(row_open):cut + len(row_open) + 1] not in (b" ", b">", b"/"):
+                cut = buffer.rfind(row_open, 0, cut)
+            if cut > 0:
+                yield "rows", buffer[:cut]
+                buffer = buffer[cut:]
+                searched = 0
+        fill(XML_CHUNK_BYTES)
+
+
+def _excel_dates(numbers: np.ndarray, epoch: pd.Timestamp) -> pd.DatetimeIndex:
+    """Даты по числам Excel с округлением до миллисекунд, как в openpyxl."""
+    days = np.floor(numbers)
+    millis = np.round((numbers - days) * 86_400_000)
+    if epoch == EXCEL_EPOCH:
+        # Система 1900 считает несуществующее 29.02.1900: ранние даты сдвинуты на день
+        days = np.where((numbers > 0) & (numbers < 60), days + 1, days)
+    return (epoch + pd.to_timedelta((days * 86_400_000 + millis).astype(np.int64), unit="ms")).astype("datetime64[us]")
+
+
+def _to_column(kinds: np.ndarray, numbers: np.ndarray, texts: Dict[int, str], shared: np.ndarray, epoch: pd.Timestamp):
+    """Собирает столбец из типов и значений ячеек с теми же типами данных, что pandas.read_excel."""
+    filled = kinds != EMPTY
+    present = set(np.unique(kinds[filled]).tolist())
+    if not present:
+        return np.full(len(kinds), np.nan)
+    if present == {NUMBER}:
+        if filled.all() and np.all(numbers == np.round(numbers)) and np.all(np.abs(numbers) < 2 ** 63):
+            return numbers.astype(np.int64)
+        return numbers
+    if present == {DATE}:
+        return pd.Series(_excel_dates(np.where(filled, numbers, 0), epoch)).where(filled).to_numpy()
+    if present == {BOOLEAN} and filled.all():
+        return numbers.astype(bool)
+
+    values = np.full(len(kinds), np.nan, dtype=object)
+    number_rows = np.flatnonzero(kinds == NUMBER)
+    for i, number in zip(number_rows, numbers[number_rows]):
+        values[i] = int(number) if number == int(number) else number
+    shared_rows = np.flatnonzero(kinds == SHARED)
+    values[shared_rows] = shared[numbers[shared_rows].astype(np.int64)]
+    for i in np.flatnonzero(kinds == BOOLEAN):
+        values[i] = bool(numbers[i])
+    date_rows = np.flatnonzero(kinds == DATE)
+    for i, date in zip(date_rows, _excel_dates(numbers[date_rows], epoch)):
+        values[i] = date.to_pydatetime()
+    for i, text in texts.items():
+        values[i] = text
+    return values
+
+
+def read_excel_sharded(
+    file,
+    sheet: Sheet = 0,
+    columns: Optional[List[Any]] = None,
+    workers: Optional[int] = None,
+    shard_mb: float = DEFAULT_SHARD_MB
+) -> pd.DataFrame:
+    """
+    Читает большой лист xlsx, разбирая части XML параллельно в нескольких процессах.
+
+    XML листа читается из архива потоком и делится на части по границам
+    строк; части разбираются в пуле процессов в столбцовые массивы, которые
+    затем объединяются в один DataFrame. Типы данных - как у pandas.read_excel.
+
+    Args:
+        file: Путь или файловый объект xlsx
+        sheet (Sheet): Номер или название листа
+        columns (Optional[List[Any]]): Нужные столбцы (None - все)
+        workers (Optional[int]): Число процессов (None - по числу ядер)
+        shard_mb (float): Размер части XML в МБ
+
+    Returns:
+        pd.DataFrame: Данные листа
+
+    Raises:
+        ValueError: Если лист или столбцы не найдены
+    """
+    workers = workers or os.cpu_count() or 1
+    _rewind(file)
+    with zipfile.ZipFile(file) as archive:
+        paths = dict(_sheet_paths(archive))
+        names = list(paths)
+        if isinstance(sheet, int):
+            path = paths[names[sheet]]
+        elif sheet in paths:
+            path = paths[sheet]
+        else:
+            raise ValueError(f"Лист не найден: {sheet}")
+        date_styles = _date_styles(archive)
+        epoch = _epoch(archive)
+        # Маленькие листы не стоят запуска процессов
+        parallel = workers > 1 and archive.getinfo(path).file_size >= MIN_PARALLEL_MB * 1024 * 1024
+
+        with archive.open(path) as stream, ProcessPoolExecutor(workers) if parallel else _InProcess() as pool:
+            shards = _iter_shards(stream, int(shard_mb * 1024 * 1024))
+            wrapper = next(shards, (None, None))[1]
+            if wrapper is None:
+                return pd.DataFrame(columns=columns or [])
+
+            header_xml = next(shards)[1]
+            header_row = ElementTree.fromstring(wrapper[0] + header_xml + wrapper[1]).find(f"{MAIN_NS}sheetData/{ROW}")
+            header_cells = list(header_row.iter(CELL)) if header_row is not None else []
+            header_shared = {int(cell.findtext(VALUE)) for cell in header_cells if cell.get("t") == "s" and cell.findtext(VALUE)}
+
+            header_strings = _shared_strings(archive, header_shared)
+            header = []
+            for order, cell in enumerate(header_cells):
+                index = _column_index(cell.get("r")) if cell.get("r") else order
+                header.extend([None] * (index + 1 - len(header)))
+                header[index] = _cell_value(cell, header_strings)
+            while header and header[-1] is None:
+                header.pop()
+            all_names = _column_names(header)
+            if columns is None:
+                selected = list(range(len(all_names)))
+            else:
+                missing = [col for col in columns if col not in all_names]
+                if missing:
+                    raise ValueError(f"Столбцы отсутствуют на листе: {', '.join(map(str, missing))}")
+                selected = sorted(all_names.index(col) for col in columns)
+            positions = {column: slot for slot, column in enumerate(selected)}
+
+            # В работе не больше двух частей на процесс: XML листа не накапливается в памяти
+            parts = []
+            pending = deque()
+            for _, data in shards:
+                pending.append(pool.submit(parse_rows, data, wrapper, positions, date_styles))
+                if len(pending) >= 2 * workers:
+                    parts.append(pending.popleft().result())
+            parts.extend(future.result() for future in pending)
+
+        kinds = np.concatenate([part["kinds"] for part in parts]) if parts else np.zeros((0, len(selected)), np.int8)
+        numbers = np.concatenate([part["numbers"] for part in parts]) if parts else np.zeros((0, len(selected)))
+        texts: Dict[int, Dict[int, str]] = {slot: {} for slot in range(len(selected))}
+        offset = 0
+        for part in parts:
+            for (row, slot), text in part["texts"].items():
+                texts[slot][offset + row] = text
+            offset += len(part["kinds"])
+
+        shared_used = kinds == SHARED
+        needed = set(np.unique(numbers[shared_used]).astype(np.int64).tolist())
+        strings = _shared_strings(archive, needed)
+    shared = np.empty(max(needed) + 1 if needed else 0, dtype=object)
+    for index, text in strings.items():
+        shared[index] = text
+
+    frame = pd.DataFrame({
+        all_names[column]: _to_column(kinds[:, slot], numbers[:, slot], texts[slot], shared, epoch)
+        for slot, column in enumerate(selected)
+    })
+    return frame.infer_objects()
+
+
+class _InProcess:
+    """Исполнитель с интерфейсом ProcessPoolExecutor, выполняющий задачи в текущем процессе."""
+
+    class _Done:
+        def __init__(self, value):
+            self.value = value
+
+        def result(self):
+            return self.value
+
+    def submit(self, function, *args):
+        return self._Done(function(*args))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
@@ -0,0 +1,208 @@
+# src/core/excel_writer.py
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+# xlsxwriter в режиме constant_memory пишет xlsx в несколько раз быстрее openpyxl
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+OPENPYXL_ENGINE = "openpyxl"
+XLSXWRITER_ENGINE = "xlsxwriter"
+# Строк, которые преобразуются в значения ячеек за один раз
+DEFAULT_CHUNK_ROWS = 10000
+# Строк, по которым подбирается ширина столбцов
+DEFAULT_WIDTH_SAMPLE_ROWS = 1000
+MAX_COLUMN_WIDTH = 50
+WIDTH_PADDING = 2
+DATE_FORMAT = "yyyy-mm-dd hh:mm:ss"
+
+
+def get_writer_engine(engine: Optional[str] = None) -> str:
+    """
+    Выбирает движок записи: указанный, иначе xlsxwriter, если установлен, иначе openpyxl.
+
+    Args:
+        engine (Optional[str]): Название движка или None
+
+    Returns:
+        str: Название движка
+
+    Raises:
+        ValueError: Если движок неизвестен или не установлен
+    """
+    if engine is None:
+        return XLSXWRITER_ENGINE if XLSXWRITER_AVAILABLE else OPENPYXL_ENGINE
+    if engine not in (OPENPYXL_ENGINE, XLSXWRITER_ENGINE):
+        raise ValueError(f"Неизвестный движок записи Excel: {engine}")
+    if engine == XLSXWRITER_ENGINE and not XLSXWRITER_AVAILABLE:
+        raise ValueError("Движок xlsxwriter не установлен")
+    return engine
+
+
+def _prepare_frame(df: pd.DataFrame, index: bool) -> pd.DataFrame:
+    """Таблица для записи: индекс как обычные столбцы, заголовки - строки."""
+    if index:
+        df = df.reset_index()
+    if any(not isinstance(col, str) for col in df.columns):
+        df = df.set_axis([str(col) for col in df.columns], axis=1)
+    return df
+
+
+def _cell_values(series: pd.Series) -> List[Any]:
+    """Значения столбца для ячеек: пропуски - None, даты без часового пояса."""
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        # Excel не хранит часовой пояс
+        series = series.dt.tz_localize(None)
+    values = series.to_numpy(dtype=object, na_value=None) if series.hasnans else series.to_numpy(dtype=object)
+    return values.tolist()
+
+
+def iter_rows(df: pd.DataFrame, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[Tuple[Any, ...]]:
+    """
+    Возвращает строки таблицы как кортежи значений ячеек.
+
+    Значения преобразуются по столбцам частями по chunk_rows строк, поэтому
+    в памяти одновременно находится только одна часть в виде объектов Python.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        chunk_rows (int): Строк в одной части
+
+    Yields:
+        Tuple[Any, ...]: Значения ячеек строки
+    """
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        yield from zip(*(_cell_values(chunk.iloc[:, i]) for i in range(chunk.shape[1])))
+
+
+def column_widths(df: pd.DataFrame, sample_rows: int = DEFAULT_WIDTH_SAMPLE_ROWS) -> List[float]:
+    """
+    Подбирает ширину столбцов по равномерной выборке строк.
+
+    Длины значений считаются векторно (str.len) по выборке из sample_rows
+    строк, а не по всем строкам столбца. Ширина не меньше длины заголовка
+    и не больше MAX_COLUMN_WIDTH.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        sample_rows (int): Строк в выборке
+
+    Returns:
+        List[float]: Ширина каждого столбца
+    """
+    if len(df) > sample_rows:
+        sample = df.iloc[np.linspace(0, len(df) - 1, sample_rows).astype(int)]
+    else:
+        sample = df
+    widths = []
+    for i, col in enumerate(df.columns):
+        values = sample.iloc[:, i]
+        lengths = values.astype(str).str.len().where(values.notna(), 0)
+        longest = int(lengths.max()) if len(lengths) else 0
+        widths.append(min(max(longest, len(str(col))) + WIDTH_PADDING, MAX_COLUMN_WIDTH))
+    return widths
+
+
+def _write_openpyxl(sheets: Dict[str, pd.DataFrame], output, autofit: bool, chunk_rows: int, sample_rows: int) -> None:
+    """Потоковая запись через openpyxl в режиме write_only."""
+    workbook = Workbook(write_only=True)
+    bold = Font(bold=True)
+    for name, df in sheets.items():
+        worksheet = workbook.create_sheet(name)
+        # В режиме write_only ширина задается до записи строк
+        if autofit:
+            for i, width in enumerate(column_widths(df, sample_rows), start=1):
+                worksheet.column_dimensions[get_column_letter(i)].width = width
+        header = []
+        for col in df.columns:
+            cell = WriteOnlyCell(worksheet, value=col)
+            cell.font = bold
+            header.append(cell)
+        worksheet.append(header)
+        for row in iter_rows(df, chunk_rows):
+            worksheet.append(row)
+    workbook.save(output)
+
+
+def _write_xlsxwriter(sheets: Dict[str, pd.DataFrame], output, autofit: bool, chunk_rows: int, sample_rows: int) -> None:
+    """Потоковая запись через xlsxwriter в режиме constant_memory."""
+    workbook = xlsxwriter.Workbook(output, {
+        "constant_memory": True,
+        "default_date_format": DATE_FORMAT,
+        "nan_inf_to_errors": True,
+        "strings_to_numbers": False,
+        "strings_to_formulas": False,
+        "strings_to_urls": False
+    })
+    bold = workbook.add_format({"bold": True})
+    try:
+        for name, df in sheets.items():
+            worksheet = workbook.add_worksheet(name)
+            if autofit:
+                for i, width in enumerate(column_widths(df, sample_rows)):
+                    worksheet.set_column(i, i, width)
+            worksheet.write_row(0, 0, list(df.columns), bold)
+            # Пустые ячейки (None) без формата xlsxwriter не записывает
+            for row_index, row in enumerate(iter_rows(df, chunk_rows), start=1):
+                worksheet.write_row(row_index, 0, row)
+    finally:
+        workbook.close()
+
+
+def write_sheets(
+    sheets: Dict[str, pd.DataFrame],
+    output,
+    index: bool = False,
+    autofit: bool = True,
+    engine: Optional[str] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    sample_rows: int = DEFAULT_WIDTH_SAMPLE_ROWS
+) -> None:
+    """
+    Записывает таблицы в xlsx построчно, не собирая книгу в памяти.
+
+    Строки пишутся сразу на диск (xlsxwriter constant_memory или openpyxl
+    write_only), поэтому память не растет с числом строк результата.
+    Ширина столбцов подбирается по выборке строк (column_widths).
+
+    Args:
+        sheets (Dict[str, pd.DataFrame]): Название листа -> таблица
+        output: Путь или файловый объект (BytesIO) для записи
+        index (bool): Записывать индекс таблицы
+        autofit (bool): Подбирать ширину столбцов
+        engine (Optional[str]): "xlsxwriter", "openpyxl" или None (по get_writer_engine)
+        chunk_rows (int): Строк, преобразуемых за один раз
+        sample_rows (int): Строк в выборке для ширины столбцов
+
+    Raises:
+        ValueError: Если движок неизвестен или не установлен
+    """
+    engine = get_writer_engine(engine)
+    sheets = {name: _prepare_frame(df, index) for name, df in sheets.items()}
+    if engine == XLSXWRITER_ENGINE:
+        _write_xlsxwriter(sheets, output, autofit, chunk_rows, sample_rows)
+    else:
+        _write_openpyxl(sheets, output, autofit, chunk_rows, sample_rows)
+
+
+def write_excel(df: pd.DataFrame, output, sheet_name: str = "Результаты", **kwargs) -> None:
+    """
+    Записывает одну таблицу в xlsx построчно (см. write_sheets).
+
+    Args:
+        df (pd.DataFrame): Таблица
+        output: Путь или файловый объект (BytesIO) для записи
+        sheet_name (str): Название листа
+        **kwargs: Параметры write_sheets (index, autofit, engine, ...)
+    """
+    write_sheets({sheet_name: df}, output, **kwargs)
@@ -5,6 +5,8 @@ import logging
 import pandas as pd
 import re
 
+from src.core.excel_loader import read_excel_columns
+
 class FileProcessor:
     """
     Класс для обработки различных типов файлов, используемых как дополнительный контекст.
@@ -199,7 +201,7 @@ class FileProcessor:
             pd.DataFrame: Данные из Excel
         """
         try:
-            return pd.read_excel(file)
+            return read_excel_columns(file)
         except Exception as e:
             raise ValueError(f"Ошибка при чтении Excel файла: {e}")
     
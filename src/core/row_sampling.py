@@ -0,0 +1,297 @@
+# src/core/row_sampling.py
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.core.data_processor import DataProcessor
+from src.services.row_dedup import char_ngram_hashes
+from src.services.table_mapreduce import serialize_rows, table_header
+from src.services.tokenizer import count_tokens
+
+# Количество представительных строк по умолчанию
+DEFAULT_SAMPLE_ROWS = 20
+DEFAULT_SAMPLE_TOKENS = 1500
+
+# Размерность хэшированного пространства символьных n-грамм
+HASH_FEATURES = 256
+NGRAM_SIZES = (2, 3, 4)
+# Из каждой строки векторизуются только первые символы текста
+MAX_TEXT_CHARS = 256
+# Строк, векторизуемых за один проход (ограничивает память промежуточных массивов)
+HASH_CHUNK_ROWS = 2048
+
+KMEANS_BATCH_SIZE = 1024
+KMEANS_MAX_ITER = 100
+KMEANS_TOLERANCE = 1e-4
+# Строк, на которых выбираются начальные центры k-means++
+KMEANS_INIT_ROWS = 4096
+
+
+def hash_char_ngrams(texts: Sequence[str], n_features: int = HASH_FEATURES, ngram_sizes: Tuple[int, ...] = NGRAM_SIZES) -> np.ndarray:
+    """
+    Векторизует тексты хэшированными символьными n-граммами.
+
+    Хэши n-грамм считаются без цикла по символам (char_ngram_hashes). Частоты
+    сглаживаются квадратным корнем, векторы нормируются по длине.
+
+    Args:
+        texts (Sequence[str]): Тексты
+        n_features (int): Размерность вектора
+        ngram_sizes (Tuple[int, ...]): Длины n-грамм
+
+    Returns:
+        np.ndarray: Матрица (количество текстов, n_features)
+    """
+    result = np.zeros((len(texts), n_features), dtype=np.float32)
+
+    for start in range(0, len(texts), HASH_CHUNK_ROWS):
+        chunk = [str(text).lower()[:MAX_TEXT_CHARS] for text in texts[start:start + HASH_CHUNK_ROWS]]
+        # Пробелы по краям дают n-граммы начала и конца текста
+        chunk = [f" {text} " if text else "" for text in chunk]
+        rows = np.arange(len(chunk))[:, None]
+        counts = np.zeros(len(chunk) * n_features, dtype=np.float32)
+
+        for size in ngram_sizes:
+            hashes, valid = char_ngram_hashes(chunk, size)
+            buckets = ((hashes >> np.uint64(32)) % np.uint64(n_features)).astype(np.int64)
+            flat = (np.broadcast_to(rows, buckets.shape) * n_features + buckets)[valid]
+            counts += np.bincount(flat, minlength=counts.size).astype(np.float32)
+
+        result[start:start + len(chunk)] = np.sqrt(counts.reshape(len(chunk), n_features))
+
+    norms = np.linalg.norm(result, axis=1, keepdims=True)
+    np.divide(result, norms, out=result, where=norms > 0)
+    return result
+
+
+def _squared_distances(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Квадраты евклидовых расстояний от каждой точки до каждого центра."""
+    distances = (
+        np.einsum("ij,ij->i", points, points)[:, None]
+        - 2 * points @ centers.T
+        + np.einsum("ij,ij->i", centers, centers)[None, :]
+    )
+    return np.maximum(distances, 0)
+
+
+def _init_centers(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """Выбирает начальные центры методом k-means++ на подвыборке."""
+    if len(points) > KMEANS_INIT_ROWS:
+        points = points[rng.choice(len(points), KMEANS_INIT_ROWS, replace=False)]
+
+    centers = [points[rng.integers(len(points))]]
+    closest = _squared_distances(points, centers[0][None, :])[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        index = rng.choice(len(points), p=closest / total) if total > 0 else rng.integers(len(points))
+        centers.append(points[index])
+        closest = np.minimum(closest, _squared_distances(points, points[index][None, :])[:, 0])
+    return np.array(centers, dtype=points.dtype)
+
+
+def minibatch_kmeans(
+    points: np.ndarray,
+    k: int,
+    batch_size: int = KMEANS_BATCH_SIZE,
+    max_iter: int = KMEANS_MAX_ITER,
+    seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Кластеризует точки мини-пакетным k-means.
+
+    На каждой итерации центры сдвигаются к средним случайного пакета точек
+    с шагом 1 / (число точек, уже отнесенных к центру), поэтому стоимость
+    итерации не зависит от количества строк таблицы.
+
+    Args:
+        points (np.ndarray): Матрица точек
+        k (int): Количество кластеров
+        batch_size (int): Размер пакета
+        max_iter (int): Максимальное количество итераций
+        seed (int): Начальное значение генератора случайных чисел
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Центры (k, d) и номер кластера каждой точки
+    """
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, len(points)))
+    centers = _init_centers(points, k, rng)
+    counts = np.zeros(k)
+
+    for _ in range(max_iter):
+        batch = points[rng.choice(len(points), min(batch_size, len(points)), replace=False)]
+        labels = _squared_distances(batch, centers).argmin(axis=1)
+        batch_counts = np.bincount(labels, minlength=k)
+        membership = np.zeros((k, len(batch)), dtype=points.dtype)
+        membership[labels, np.arange(len(batch))] = 1
+        batch_sums = membership @ batch
+
+        counts += batch_counts
+        updated = batch_counts > 0
+        previous = centers.copy()
+        centers[updated] += (batch_sums[updated] - batch_counts[updated, None] * centers[updated]) / counts[updated, None]
+        if np.abs(centers - previous).max() < KMEANS_TOLERANCE:
+            break
+
+    labels = _squared_distances(points, centers).argmin(axis=1)
+    return centers, labels
+
+
+def row_features(df: pd.DataFrame, text_columns: List[str], numeric_columns: List[str]) -> np.ndarray:
+    """
+    Строит векторы строк: n-граммы текстовых столбцов и нормированные числа.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        text_columns (List[str]): Текстовые столбцы (объединяются в один текст строки)
+        numeric_columns (List[str]): Числовые столбцы
+
+    Returns:
+        np.ndarray: Матрица признаков (строки, признаки)
+    """
+    parts = []
+    if text_columns:
+        values = [df[col].fillna("").astype(str) for col in text_columns]
+        texts = values[0].str.cat(values[1:], sep=" | ").tolist() if len(values) > 1 else values[0].tolist()
+        parts.append(hash_char_ngrams(texts))
+    if numeric_columns:
+        values = df[numeric_columns].astype(float)
+        std = values.std().replace(0, 1).fillna(1)
+        scaled = ((values - values.mean()) / std).fillna(0).to_numpy(dtype=np.float32)
+        # Числовые признаки в сумме весят как один нормированный текстовый вектор
+        parts.append(scaled / np.sqrt(len(numeric_columns)))
+    if not parts:
+        return np.zeros((len(df), 1), dtype=np.float32)
+    return np.hstack(parts)
+
+
+def _allocate(sizes: List[int], n_samples: int) -> List[int]:
+    """Делит количество строк выборки между группами пропорционально размеру (не меньше одной)."""
+    total = sum(sizes)
+    shares = [size * n_samples / total for size in sizes]
+    allocation = [min(size, max(1, int(share))) for size, share in zip(sizes, shares)]
+    # Оставшиеся места - группам с наибольшим дробным остатком
+    for i in sorted(range(len(sizes)), key=lambda i: shares[i] - int(shares[i]), reverse=True):
+        if sum(allocation) >= n_samples:
+            break
+        if allocation[i] < sizes[i]:
+            allocation[i] += 1
+    return allocation
+
+
+def sample_representative_rows(
+    df: pd.DataFrame,
+    n_samples: int = DEFAULT_SAMPLE_ROWS,
+    strata_columns: Optional[List[str]] = None,
+    text_columns: Optional[List[str]] = None,
+    seed: int = 0
+) -> List[Tuple[int, int]]:
+    """
+    Выбирает строки, представляющие всю таблицу.
+
+    Строки делятся на группы по категориальным столбцам, места в выборке
+    распределяются между группами пропорционально их размеру. Внутри группы
+    строки кластеризуются, и от каждого кластера берется строка, ближайшая
+    к центру. Вес строки - размер ее кластера, сумма весов равна числу строк.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        n_samples (int): Количество строк выборки
+        strata_columns (Optional[List[str]]): Столбцы групп (по умолчанию Category_columns
+            из DataProcessor.suggest_column_groups)
+        text_columns (Optional[List[str]]): Текстовые столбцы (по умолчанию Text_columns и
+            Name_columns, а если их нет - все нечисловые столбцы)
+        seed (int): Начальное значение генератора случайных чисел
+
+    Returns:
+        List[Tuple[int, int]]: Позиции строк и их веса, по убыванию веса
+    """
+    if df.empty or n_samples <= 0:
+        return []
+
+    groups = DataProcessor.suggest_column_groups(df)
+    if strata_columns is None:
+        strata_columns = groups.get("Category_columns", [])
+    if text_columns is None:
+        text_columns = groups.get("Text_columns", []) + groups.get("Name_columns", [])
+        if not text_columns:
+            text_columns = [col for col in df.columns if not pd.api.types.is_numeric_dtype(df[col]) and col not in strata_columns]
+    numeric_columns = [
+        col for col in groups.get("Numeric_columns", [])
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+    ]
+
+    features = row_features(df, text_columns, numeric_columns)
+
+    if strata_columns:
+        strata = list(df.groupby(strata_columns, dropna=False, sort=False).indices.values())
+    else:
+        strata = [np.arange(len(df))]
+    strata.sort(key=len, reverse=True)
+    # Мелкие группы сверх размера выборки объединяются в одну
+    if len(strata) > n_samples:
+        strata = strata[:n_samples - 1] + [np.concatenate(strata[n_samples - 1:])]
+
+    sample = []
+    for positions, k in zip(strata, _allocate([len(p) for p in strata], n_samples)):
+        if len(positions) <= k:
+            sample.extend((int(position), 1) for position in positions)
+            continue
+
+        points = features[positions]
+        centers, labels = minibatch_kmeans(points, k, seed=seed)
+        distances = _squared_distances(points, centers)[np.arange(len(points)), labels]
+        for cluster in np.unique(labels):
+            members = np.flatnonzero(labels == cluster)
+            nearest = members[distances[members].argmin()]
+            sample.append((int(positions[nearest]), len(members)))
+
+    sample.sort(key=lambda item: (-item[1], item[0]))
+    return sample
+
+
+def format_weighted_sample(df: pd.DataFrame, sample: List[Tuple[int, int]], max_tokens: int = DEFAULT_SAMPLE_TOKENS) -> str:
+    """
+    Представляет выборку текстом для промпта, не длиннее max_tokens токенов.
+
+    Каждая строка выводится с весом - сколько строк таблицы она представляет.
+    Если выборка не помещается, отбрасываются строки с наименьшим весом.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        sample (List[Tuple[int, int]]): Результат sample_representative_rows
+        max_tokens (int): Максимальный размер текста в токенах
+
+    Returns:
+        str: Текст выборки
+    """
+    if not sample:
+        return ""
+
+    total = len(df)
+    lines = serialize_rows(df.iloc[[position for position, _ in sample]])
+    weighted = [f"{weight} ({weight / total:.1%}) | {line}" for (_, weight), line in zip(sample, lines)]
+    header = "Вес (строк таблицы) | " + table_header(df)
+
+    text = "\n".join([header] + weighted)
+    kept = len(weighted)
+    while kept > 1 and count_tokens(text) > max_tokens:
+        kept -= 1
+        text = "\n".join([header] + weighted[:kept])
+    return text
+
+
+def describe_sample(df: pd.DataFrame, n_samples: int = DEFAULT_SAMPLE_ROWS, max_tokens: int = DEFAULT_SAMPLE_TOKENS) -> str:
+    """
+    Текст представительной выборки строк для промпта анализа всей таблицы.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        n_samples (int): Количество строк выборки (0 - без выборки)
+        max_tokens (int): Максимальный размер текста в токенах
+
+    Returns:
+        str: Текст выборки или пустая строка
+    """
+    return format_weighted_sample(df, sample_representative_rows(df, n_samples), max_tokens)
@@ -0,0 +1,526 @@
+# src/core/table_findings.py
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.core.dataset_digest import dataframe_fingerprint
+from src.services.tokenizer import count_tokens
+
+# Размер текста выводов в промпте по умолчанию
+DEFAULT_FINDINGS_TOKENS = 800
+
+# Выбросы: множитель межквартильного размаха и порог робастного z
+IQR_FACTOR = 1.5
+ROBUST_Z_THRESHOLD = 3.5
+# Коэффициент перевода MAD в стандартное отклонение нормального распределения
+MAD_SCALE = 0.6745
+MAX_OUTLIER_EXAMPLES = 3
+
+# Динамика: столбцы дат и числовые столбцы, для которых строятся ряды
+MAX_DATE_COLUMNS = 2
+MAX_SERIES_COLUMNS = 8
+MIN_SERIES_POINTS = 8
+MAX_SERIES_POINTS = 400
+# Доля периодов с записями, при которой период считается подходящим
+MIN_FILLED_SHARE = 0.8
+# Крайний период с долей записей меньше этой (от медианы) считается неполным и отбрасывается
+PARTIAL_PERIOD_SHARE = 0.5
+# Периоды от мелкого к крупному и длина сезона для каждого
+SERIES_PERIODS = [("D", "по дням", 7), ("W", "по неделям", 52), ("M", "по месяцам", 12), ("Q", "по кварталам", 4), ("Y", "по годам", 0)]
+# Доля дисперсии, объясняемая сезонностью, начиная с которой она упоминается
+MIN_SEASONAL_STRENGTH = 0.3
+# Доля дисперсии, объясняемая линейным трендом, начиная с которой ряд упоминается
+MIN_TREND_R2 = 0.3
+
+# Сдвиги уровня: порог статистики и ограничения бинарной сегментации
+CHANGE_POINT_THRESHOLD = 4.0
+MAX_CHANGE_POINTS = 3
+MIN_SEGMENT_POINTS = 3
+
+COUNT_SERIES = "Количество записей"
+
+FINDINGS_CACHE_SIZE = 16
+_findings_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_findings_cache_lock = threading.Lock()
+
+
+def _number(value: float) -> str:
+    """Короткая запись числа."""
+    return f"{value:.4g}"
+
+
+def outlier_masks(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Находит выбросы во всех столбцах матрицы сразу.
+
+    Выброс по IQR - значение вне [Q1 - 1.5 IQR; Q3 + 1.5 IQR]. Робастный
+    z-score считается по медиане и MAD и устойчив к самим выбросам.
+
+    Args:
+        values (np.ndarray): Матрица (строки, столбцы), пропуски - NaN
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Маски выбросов по IQR и по
+            робастному z, нижние и верхние границы IQR по столбцам
+    """
+    with np.errstate(all="ignore"):
+        q1, median, q3 = np.nanpercentile(values, [25, 50, 75], axis=0)
+        iqr = q3 - q1
+        lower, upper = q1 - IQR_FACTOR * iqr, q3 + IQR_FACTOR * iqr
+        iqr_mask = (values < lower) | (values > upper)
+
+        mad = np.nanmedian(np.abs(values - median), axis=0)
+        robust_z = np.where(mad > 0, MAD_SCALE * (values - median) / np.where(mad > 0, mad, 1), 0.0)
+        z_mask = np.abs(np.nan_to_num(robust_z)) > ROBUST_Z_THRESHOLD
+    return iqr_mask, z_mask, lower, upper
+
+
+def detect_outliers(df: pd.DataFrame, columns: List[str]) -> List[Dict[str, Any]]:
+    """
+    Выбросы по числовым столбцам таблицы.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        columns (List[str]): Числовые столбцы
+
+    Returns:
+        List[Dict[str, Any]]: Столбцы с выбросами по убыванию их доли: column, count,
+            robust_count, share, lower, upper, examples (значение, индекс строки)
+    """
+    if not columns or df.empty:
+        return []
+
+    values = df[columns].to_numpy(dtype=float, na_value=np.nan)
+    iqr_mask, z_mask, lower, upper = outlier_masks(values)
+    counts = iqr_mask.sum(axis=0)
+    valid = (~np.isnan(values)).sum(axis=0)
+    median = np.nanmedian(values, axis=0) if len(values) else np.zeros(len(columns))
+
+    findings = []
+    for j in np.flatnonzero((counts > 0) | (z_mask.sum(axis=0) > 0)):
+        rows = np.flatnonzero(iqr_mask[:, j] | z_mask[:, j])
+        # Самые далекие от медианы значения
+        extreme = rows[np.argsort(-np.abs(values[rows, j] - median[j]))[:MAX_OUTLIER_EXAMPLES]]
+        findings.append({
+            "column": str(columns[j]),
+            "count": int(counts[j]),
+            "robust_count": int(z_mask[:, j].sum()),
+            "share": float(counts[j] / valid[j]) if valid[j] else 0.0,
+            "lower": float(lower[j]),
+            "upper": float(upper[j]),
+            "examples": [(float(values[i, j]), str(df.index[i])) for i in extreme]
+        })
+    findings.sort(key=lambda item: (-item["share"], item["column"]))
+    return findings
+
+
+def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Центрированное скользящее среднее по каждому столбцу (NaN по краям).
+
+    Для четного окна используется скользящее среднее 2 x window, как в
+    классическом сезонном разложении.
+
+    Args:
+        values (np.ndarray): Матрица (точки, ряды) без пропусков
+        window (int): Ширина окна
+
+    Returns:
+        np.ndarray: Матрица той же формы
+    """
+    n = len(values)
+    result = np.full(values.shape, np.nan)
+    span = window + 1 if window % 2 == 0 else window
+    if n < span:
+        return result
+
+    cumsum = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    means = (cumsum[window:] - cumsum[:-window]) / window
+    if window % 2 == 0:
+        means = (means[1:] + means[:-1]) / 2
+    half = span // 2
+    result[half:n - half] = means
+    return result
+
+
+def seasonal_decompose(values: np.ndarray, season: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Классическое аддитивное разложение рядов: тренд + сезонность + остаток.
+
+    Args:
+        values (np.ndarray): Матрица (точки, ряды) без пропусков
+        season (int): Длина сезона в точках
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Сезонные отклонения по фазам (season, ряды) и
+            сила сезонности каждого ряда (доля дисперсии без тренда, объясняемая сезонностью)
+    """
+    trend = moving_average(values, season)
+    detrended = values - trend
+    phases = np.arange(len(values)) % season
+
+    # Среднее отклонение по каждой фазе сезона
+    known = ~np.isnan(detrended)
+    membership = (phases[None, :] == np.arange(season)[:, None]).astype(float)
+    sums = membership @ np.where(known, detrended, 0.0)
+    counts = membership @ known.astype(float)
+    with np.errstate(all="ignore"):
+        pattern = np.where(counts > 0, sums / np.where(counts > 0, counts, 1), 0.0)
+    pattern -= pattern.mean(axis=0)
+
+    residual = detrended - pattern[phases]
+    with np.errstate(all="ignore"):
+        detrended_var = np.nanvar(detrended, axis=0)
+        strength = np.where(detrended_var > 0, 1 - np.nanvar(residual, axis=0) / np.where(detrended_var > 0, detrended_var, 1), 0.0)
+        # Средние по фазам объясняют около 1/m дисперсии даже у шума (m - точек на фазу)
+        noise_share = 1 / np.maximum(counts.mean(axis=0), 1)
+        strength = np.where(noise_share < 1, (strength - noise_share) / (1 - noise_share), 0.0)
+    return pattern, np.clip(np.nan_to_num(strength), 0, 1)
+
+
+def linear_trends(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Наклон линейного тренда и R² для каждого ряда (метод наименьших квадратов).
+
+    Args:
+        values (np.ndarray): Матрица (точки, ряды) без пропусков
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Наклон (изменение за период) и R² по рядам
+    """
+    t = np.arange(len(values), dtype=float)
+    t -= t.mean()
+    centered = values - values.mean(axis=0)
+    slope = (t @ centered) / (t @ t)
+    with np.errstate(all="ignore"):
+        total = (centered ** 2).sum(axis=0)
+        r2 = np.where(total > 0, (slope ** 2) * (t @ t) / np.where(total > 0, total, 1), 0.0)
+    return slope, r2
+
+
+def change_points(series: np.ndarray, threshold: float = CHANGE_POINT_THRESHOLD, max_points: int = MAX_CHANGE_POINTS) -> List[int]:
+    """
+    Находит сдвиги уровня ряда бинарной сегментацией.
+
+    Для каждого отрезка статистика разности средних слева и справа от всех
+    возможных точек разбиения считается сразу через накопленные суммы;
+    отрезок делится в точке максимума, если она превышает порог.
+
+    Args:
+        series (np.ndarray): Ряд без пропусков
+        threshold (float): Порог статистики (разность средних в единицах шума)
+        max_points (int): Максимальное количество сдвигов
+
+    Returns:
+        List[int]: Позиции начала новых уровней в порядке возрастания
+    """
+    n = len(series)
+    if n < 2 * MIN_SEGMENT_POINTS:
+        return []
+    # Шум - по MAD первых разностей (на нее почти не влияют сами сдвиги), но не меньше
+    # половины разброса ряда: иначе плавные колебания выдаются за серию скачков
+    differences = np.diff(series)
+    noise = max(
+        np.median(np.abs(differences - np.median(differences))) / MAD_SCALE / np.sqrt(2),
+        0.5 * np.median(np.abs(series - np.median(series))) / MAD_SCALE
+    )
+    if noise <= 0:
+        noise = np.std(differences) / np.sqrt(2)
+    if noise <= 0:
+        return []
+
+    points = []
+    segments = [(0, n)]
+    while segments and len(points) < max_points:
+        best = None
+        for start, end in segments:
+            length = end - start
+            if length < 2 * MIN_SEGMENT_POINTS:
+                continue
+            cumsum = np.cumsum(series[start:end])
+            k = np.arange(MIN_SEGMENT_POINTS, length - MIN_SEGMENT_POINTS + 1)
+            left = cumsum[k - 1] / k
+            right = (cumsum[-1] - cumsum[k - 1]) / (length - k)
+            statistic = np.sqrt(k * (length - k) / length) * np.abs(left - right) / noise
+            i = int(statistic.argmax())
+            if statistic[i] > threshold and (best is None or statistic[i] > best[0]):
+                best = (statistic[i], start, end, start + int(k[i]))
+        if best is None:
+            break
+        _, start, end, split = best
+        points.append(split)
+        segments.remove((start, end))
+        segments.extend([(start, split), (split, end)])
+    return sorted(points)
+
+
+def build_series(df: pd.DataFrame, date_column: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Агрегирует таблицу по периодам дат.
+
+    Выбирается самый мелкий период, при котором точек не больше
+    MAX_SERIES_POINTS и записи есть почти в каждом периоде. Пропущенные
+    периоды дают 0 записей, средние по ним восстанавливаются линейной
+    интерполяцией; неполные крайние периоды отбрасываются.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        date_column (str): Столбец дат
+        columns (List[str]): Числовые столбцы (агрегируются средним)
+
+    Returns:
+        Optional[Dict[str, Any]]: period, label, season, index (периоды) и values
+            (DataFrame рядов) или None, если точек меньше MIN_SERIES_POINTS
+    """
+    dates = df[date_column]
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    known = dates.notna()
+    if known.sum() == 0:
+        return None
+    dates = dates[known]
+
+    for period, label, season in SERIES_PERIODS:
+        periods = dates.dt.to_period(period)
+        full_range = pd.period_range(periods.min(), periods.max(), freq=periods.dt.freq)
+        # Период не мельче шага данных: почти в каждом периоде есть записи
+        if len(full_range) <= MAX_SERIES_POINTS and periods.nunique() >= MIN_FILLED_SHARE * len(full_range):
+            break
+    if len(full_range) < MIN_SERIES_POINTS:
+        return None
+
+    grouped = df.loc[known, columns].groupby(periods.to_numpy())
+    values = grouped.mean().reindex(full_range)
+    values = values.interpolate(limit_direction="both") if columns else values
+    values.insert(0, COUNT_SERIES, grouped.size().reindex(full_range, fill_value=0).astype(float))
+    values = values.dropna(axis=1, how="any")
+
+    # Крайние периоды обычно неполные (данные начинаются и заканчиваются внутри периода)
+    counts = values[COUNT_SERIES].to_numpy()
+    keep = np.ones(len(values), dtype=bool)
+    keep[[0, -1]] = counts[[0, -1]] >= PARTIAL_PERIOD_SHARE * np.median(counts)
+    if keep.sum() < MIN_SERIES_POINTS:
+        return None
+    values, full_range = values[keep], full_range[keep]
+    return {"period": period, "label": label, "season": season, "index": full_range, "values": values}
+
+
+def analyze_series(series: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Тренд, сезонность и сдвиги уровня для рядов одного столбца дат.
+
+    Args:
+        series (Dict[str, Any]): Результат build_series
+
+    Returns:
+        List[Dict[str, Any]]: Выводы по каждому ряду
+    """
+    frame = series["values"]
+    values = frame.to_numpy(dtype=float)
+    n = len(values)
+    labels = [str(period) for period in series["index"]]
+
+    slope, r2 = linear_trends(values)
+    window = max(2, min(series["season"] or 3, n // 4))
+    first, last = values[:window].mean(axis=0), values[-window:].mean(axis=0)
+
+    season = series["season"]
+    if season and n >= 2 * season:
+        pattern, strength = seasonal_decompose(values, season)
+        seasonal = np.where(strength >= MIN_SEASONAL_STRENGTH, 1.0, 0.0) * pattern[np.arange(n) % season]
+    else:
+        pattern, strength, seasonal = None, np.zeros(values.shape[1]), 0.0
+    deseasonalized = values - seasonal
+    # Остаток линейного тренда: сдвиги уровня сравниваются с ним
+    t = np.arange(n) - (n - 1) / 2
+    trend_sse = ((deseasonalized - deseasonalized.mean(axis=0) - t[:, None] * slope) ** 2).sum(axis=0)
+
+    results = []
+    for j, column in enumerate(frame.columns):
+        mean = values[:, j].mean()
+        result = {
+            "column": str(column),
+            "slope": float(slope[j]),
+            "relative_slope": float(slope[j] / abs(mean)) if mean else 0.0,
+            "r2": float(r2[j]),
+            "window": window,
+            "first": float(first[j]),
+            "last": float(last[j]),
+            "seasonal_strength": float(strength[j]),
+            "change_points": []
+        }
+        if pattern is not None and strength[j] >= MIN_SEASONAL_STRENGTH:
+            phase_values = pattern[:, j]
+            result["season"] = season
+            result["peak"] = int(phase_values.argmax())
+            result["trough"] = int(phase_values.argmin())
+            # Метка периода, с которого начинается фаза (первое вхождение)
+            result["peak_label"] = labels[result["peak"]]
+            result["trough_label"] = labels[result["trough"]]
+        bounds = [0] + change_points(deseasonalized[:, j]) + [n]
+        segments = [deseasonalized[start:end, j] for start, end in zip(bounds, bounds[1:])]
+        # Плавный тренд тоже дает "сдвиги": они сообщаются, только если ступеньки
+        # описывают ряд лучше прямой
+        if sum(((segment - segment.mean()) ** 2).sum() for segment in segments) < trend_sse[j]:
+            for before, point, after in zip(bounds, bounds[1:-1], bounds[2:]):
+                result["change_points"].append(
+                    (labels[point], float(values[before:point, j].mean()), float(values[point:after, j].mean()))
+                )
+        results.append(result)
+    return results
+
+
+def compute_findings(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Локальные расчеты по всем строкам таблицы для промпта анализа.
+
+    Args:
+        df (pd.DataFrame): Таблица
+
+    Returns:
+        Dict[str, Any]: outliers (detect_outliers) и trends - по столбцам дат:
+            column, label, points, series (analyze_series)
+    """
+    numeric = [
+        col for col in df.select_dtypes(include="number").columns
+        if not pd.api.types.is_bool_dtype(df[col])
+    ]
+    date_columns = list(df.select_dtypes(include=["datetime", "datetimetz"]).columns[:MAX_DATE_COLUMNS])
+
+    trends = []
+    if date_columns and len(df):
+        # Для динамики берутся числовые столбцы с наибольшим разбросом относительно среднего
+        with np.errstate(all="ignore"):
+            variation = (df[numeric].std() / df[numeric].mean().abs()).replace([np.inf, -np.inf], np.nan).fillna(0)
+        series_columns = list(variation.sort_values(ascending=False).index[:MAX_SERIES_COLUMNS])
+        for date_column in date_columns:
+            series = build_series(df, date_column, series_columns)
+            if series is not None:
+                trends.append({
+                    "column": str(date_column),
+                    "label": series["label"],
+                    "points": len(series["index"]),
+                    "series": analyze_series(series)
+                })
+
+    return {"rows": len(df), "outliers": detect_outliers(df, numeric), "trends": trends}
+
+
+def _format_trend(item: Dict[str, Any]) -> str:
+    """Строка выводов по одному ряду."""
+    line = f"- {item['column']}: тренд {item['relative_slope']:+.1%} за период (R²={item['r2']:.2f})"
+    if item["first"]:
+        change = (item["last"] - item["first"]) / abs(item["first"])
+        line += f", среднее последних {item['window']} периодов к первым: {change:+.0%}"
+    else:
+        line += f", среднее первых {item['window']} периодов {_number(item['first'])}, последних - {_number(item['last'])}"
+    if "season" in item:
+        line += (
+            f"; сезонность (цикл {item['season']} периодов, сила {item['seasonal_strength']:.2f}): "
+            f"пик в фазе {item['peak'] + 1} ({item['peak_label']}), спад в фазе {item['trough'] + 1} ({item['trough_label']})"
+        )
+    if item["change_points"]:
+        line += "; сдвиги уровня: " + ", ".join(
+            f"с {label} ({_number(before)} → {_number(after)})" for label, before, after in item["change_points"]
+        )
+    return line
+
+
+def format_findings(findings: Dict[str, Any], max_tokens: int = DEFAULT_FINDINGS_TOKENS) -> str:
+    """
+    Представляет выводы текстом для промпта, не длиннее max_tokens токенов.
+
+    Если текст не помещается, опускаются последние строки (наименее заметные
+    выбросы и ряды).
+
+    Args:
+        findings (Dict[str, Any]): Результат compute_findings
+        max_tokens (int): Максимальный размер текста в токенах
+
+    Returns:
+        str: Текст выводов или пустая строка, если выводов нет
+    """
+    sections = []
+    if findings["outliers"]:
+        lines = [
+            f"- {item['column']}: {item['count']} ({item['share']:.1%}) вне [{_number(item['lower'])}; {_number(item['upper'])}], "
+            f"робастный z > {ROBUST_Z_THRESHOLD}: {item['robust_count']}; крайние: "
+            + ", ".join(f"{_number(value)} (строка {index})" for value, index in item["examples"])
+            for item in findings["outliers"]
+        ]
+        sections.append((f"Выбросы (IQR x{IQR_FACTOR} и робастный z-score):", lines))
+    for trend in findings["trends"]:
+        # Ряды без тренда, сезонности и сдвигов не упоминаются
+        notable = [
+            item for item in trend["series"]
+            if item["r2"] >= MIN_TREND_R2 or "season" in item or item["change_points"]
+        ]
+        if notable:
+            sections.append((
+                f"Динамика по столбцу '{trend['column']}' ({trend['label']}, периодов: {trend['points']}; числа - средние за период):",
+                [_format_trend(item) for item in notable]
+            ))
+    if not sections:
+        return ""
+
+    def render(limit: int) -> str:
+        parts, used = [], 0
+        for header, lines in sections:
+            kept = lines[:max(0, limit - used)]
+            used += len(kept)
+            if kept:
+                parts.append(header)
+                parts.extend(kept)
+        return "\n".join(parts)
+
+    kept = sum(len(lines) for _, lines in sections)
+    text = render(kept)
+    while kept > 1 and count_tokens(text) > max_tokens:
+        kept -= 1
+        text = render(kept)
+    return text
+
+
+def get_findings(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Возвращает выводы по таблице, используя кэш по хэшу содержимого.
+
+    Args:
+        df (pd.DataFrame): Таблица
+
+    Returns:
+        Dict[str, Any]: Результат compute_findings
+    """
+    key = dataframe_fingerprint(df)
+    with _findings_cache_lock:
+        cached = _findings_cache.get(key)
+        if cached is not None:
+            _findings_cache.move_to_end(key)
+            return cached
+
+    findings = compute_findings(df)
+
+    with _findings_cache_lock:
+        _findings_cache[key] = findings
+        if len(_findings_cache) > FINDINGS_CACHE_SIZE:
+            _findings_cache.popitem(last=False)
+    return findings
+
+
+def describe_findings(df: pd.DataFrame, max_tokens: int = DEFAULT_FINDINGS_TOKENS) -> str:
+    """
+    Текст локальных расчетов (выбросы, тренды, сезонность, сдвиги) для промпта.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        max_tokens (int): Максимальный размер текста в токенах (0 - без расчетов)
+
+    Returns:
+        str: Текст выводов или пустая строка
+    """
+    if max_tokens <= 0:
+        return ""
+    return format_findings(get_findings(df), max_tokens)
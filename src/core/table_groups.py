@@ -0,0 +1,111 @@
+# src/core/table_groups.py
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.core.dataset_digest import dataframe_fingerprint
+
+# Периоды группировки по датам (коды pandas) и их названия
+GROUP_PERIODS = {"D": "по дням", "W": "по неделям", "M": "по месяцам", "Q": "по кварталам", "Y": "по годам"}
+
+# Больше групп не анализируется отдельно: самые мелкие объединяются в "Прочие"
+DEFAULT_MAX_GROUPS = 50
+OTHER_GROUP = "Прочие"
+MISSING_GROUP = "(пусто)"
+
+
+def group_keys(df: pd.DataFrame, column: str, period: Optional[str] = None) -> pd.Series:
+    """
+    Вычисляет ключ группы для каждой строки.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        column (str): Столбец группировки
+        period (Optional[str]): Период для дат (ключ GROUP_PERIODS) или None - группировка по значениям
+
+    Returns:
+        pd.Series: Текстовые ключи групп с индексом df
+
+    Raises:
+        ValueError: Если период неизвестен или столбец не содержит дат
+    """
+    if column not in df.columns:
+        raise ValueError(f"Столбец группировки отсутствует в таблице: {column}")
+
+    if period is None:
+        return df[column].astype(str).where(df[column].notna(), MISSING_GROUP)
+
+    if period not in GROUP_PERIODS:
+        raise ValueError(f"Неизвестный период группировки: {period}. Допустимые: {', '.join(GROUP_PERIODS)}")
+    dates = pd.to_datetime(df[column], errors="coerce")
+    if dates.notna().sum() == 0:
+        raise ValueError(f"Столбец '{column}' не содержит дат")
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    return dates.dt.to_period(period).astype(str).where(dates.notna(), MISSING_GROUP)
+
+
+def split_table(
+    df: pd.DataFrame,
+    column: str,
+    period: Optional[str] = None,
+    max_groups: int = DEFAULT_MAX_GROUPS
+) -> List[Tuple[str, pd.DataFrame]]:
+    """
+    Делит таблицу на группы по значениям столбца или периодам дат.
+
+    Группы упорядочены по ключу (периоды - по времени), строки внутри
+    группы - в исходном порядке. Поэтому добавление строк за новый период
+    не меняет состав и содержимое прежних групп.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        column (str): Столбец группировки
+        period (Optional[str]): Период для дат (ключ GROUP_PERIODS) или None
+        max_groups (int): Максимальное количество групп
+
+    Returns:
+        List[Tuple[str, pd.DataFrame]]: Пары (ключ группы, строки группы)
+    """
+    keys = group_keys(df, column, period)
+    positions = pd.Series(range(len(df))).groupby(keys.to_numpy(), sort=True).indices
+    labels = [label for label in positions if label != MISSING_GROUP]
+    if MISSING_GROUP in positions:
+        labels.append(MISSING_GROUP)
+
+    if len(labels) > max_groups:
+        # Самые крупные группы анализируются отдельно, остальные - вместе
+        largest = set(sorted(labels, key=lambda label: len(positions[label]), reverse=True)[:max(1, max_groups - 1)])
+        rest = sorted(p for label in labels if label not in largest for p in positions[label])
+        labels = [label for label in labels if label in largest]
+        positions[OTHER_GROUP] = rest
+        labels.append(OTHER_GROUP)
+
+    return [(label, df.iloc[positions[label]]) for label in labels]
+
+
+def group_report_key(label: str, group_df: pd.DataFrame, prompt: str, params: Dict[str, Any]) -> str:
+    """
+    Вычисляет ключ кэша отчета по группе.
+
+    Ключ зависит от содержимого строк группы, промпта и параметров анализа,
+    поэтому отчет по группе, строки которой не изменились, берется из кэша.
+
+    Args:
+        label (str): Ключ группы
+        group_df (pd.DataFrame): Строки группы
+        prompt (str): Промпт анализа группы (с контекстом)
+        params (Dict[str, Any]): Параметры модели и анализа
+
+    Returns:
+        str: Ключ кэша
+    """
+    payload = json.dumps(
+        {"group": label, "data": dataframe_fingerprint(group_df), "prompt": prompt, "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str
+    )
+    return "group-report:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
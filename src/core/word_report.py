@@ -0,0 +1,314 @@
+# src/core/word_report.py
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import reduce
+from io import BytesIO
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+try:
+    from docx import Document
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+    from docx.shared import Inches
+    DOCX_AVAILABLE = True
+except ImportError:
+    DOCX_AVAILABLE = False
+
+# Диаграммы строятся через объектный API matplotlib (без pyplot), поэтому работают в фоновом потоке
+try:
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    MATPLOTLIB_AVAILABLE = True
+except ImportError:
+    MATPLOTLIB_AVAILABLE = False
+
+# Строк таблицы результатов, встраиваемых в документ; остальные - в выгрузке Excel
+DEFAULT_MAX_TABLE_ROWS = 500
+# Символов в ячейке таблицы документа
+DEFAULT_MAX_CELL_CHARS = 1000
+DEFAULT_MAX_CHARTS = 4
+# Таблицы больше этого числа строк формируются в фоновом потоке
+DEFAULT_BACKGROUND_ROWS = 5000
+# Значений на диаграмме распределения
+CHART_TOP_VALUES = 10
+# Столбцы с большим числом уникальных значений не подходят для диаграммы распределения
+MAX_CHART_CATEGORIES = 50
+# Символы, недопустимые в XML документа
+ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+MARKDOWN_BULLET = re.compile(r"^[-*+]\s+(.*)$")
+MARKDOWN_NUMBERED = re.compile(r"^\d+[.)]\s+(.*)$")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _cell_text(series: pd.Series, max_chars: int) -> pd.Series:
+    """Текст ячеек столбца, готовый для XML документа (векторно по всему столбцу)."""
+    text = series.astype(str).where(series.notna(), "")
+    long_text = text.str.len() > max_chars
+    if long_text.any():
+        text = text.where(~long_text, text.str.slice(0, max_chars) + "…")
+    text = (
+        text.str.replace(ILLEGAL_XML_CHARS, "", regex=True)
+        .str.replace("&", "&amp;", regex=False)
+        .str.replace("<", "&lt;", regex=False)
+        .str.replace(">", "&gt;", regex=False)
+        .str.replace("\r\n", "\n", regex=False)
+        .str.replace("\n", '</w:t><w:br/><w:t xml:space="preserve">', regex=False)
+    )
+    return '<w:tc><w:p><w:r><w:t xml:space="preserve">' + text + "</w:t></w:r></w:p></w:tc>"
+
+
+def table_xml(df: pd.DataFrame, max_cell_chars: int = DEFAULT_MAX_CELL_CHARS) -> str:
+    """
+    Строит XML таблицы Word (w:tbl) для всей таблицы сразу.
+
+    Текст ячеек экранируется и оборачивается в разметку векторно по
+    столбцам; документ получает готовый элемент одной операцией разбора,
+    без создания объектов python-docx для каждой ячейки.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        max_cell_chars (int): Символов в ячейке (длинный текст обрезается)
+
+    Returns:
+        str: XML элемента w:tbl
+    """
+    header = pd.Series([str(col) for col in df.columns])
+    header_cells = _cell_text(header, max_cell_chars).str.replace("<w:r>", "<w:r><w:rPr><w:b/></w:rPr>", regex=False)
+    parts = [
+        f"<w:tbl {nsdecls('w')}>"
+        '<w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="0" w:type="auto"/></w:tblPr>'
+        "<w:tblGrid>" + "<w:gridCol/>" * len(df.columns) + "</w:tblGrid>",
+        # Строка заголовка повторяется на каждой странице
+        "<w:tr><w:trPr><w:tblHeader/></w:trPr>" + "".join(header_cells) + "</w:tr>"
+    ]
+    if len(df) and len(df.columns):
+        columns = [_cell_text(df.iloc[:, i], max_cell_chars) for i in range(df.shape[1])]
+        rows = reduce(lambda left, right: left + right, columns)
+        parts.append("<w:tr>" + "</w:tr><w:tr>".join(rows.tolist()) + "</w:tr>")
+    parts.append("</w:tbl>")
+    return "".join(parts)
+
+
+def add_table(doc, df: pd.DataFrame, max_cell_chars: int = DEFAULT_MAX_CELL_CHARS) -> None:
+    """
+    Добавляет таблицу в конец документа (см. table_xml).
+
+    Args:
+        doc: Документ python-docx
+        df (pd.DataFrame): Таблица
+        max_cell_chars (int): Символов в ячейке
+    """
+    # Пустой абзац после таблицы отделяет ее от следующей
+    anchor = doc.add_paragraph()
+    anchor._p.addprevious(parse_xml(table_xml(df, max_cell_chars)))
+
+
+def column_summary(df: pd.DataFrame, top_values: int = 3) -> pd.DataFrame:
+    """
+    Краткая сводка по столбцам для отчета.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        top_values (int): Частых значений для текстовых столбцов
+
+    Returns:
+        pd.DataFrame: Столбец, заполнено, уникальных, значения
+    """
+    rows = []
+    for col in df.columns:
+        values = df[col].dropna()
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values) and len(values):
+            description = f"от {values.min():g} до {values.max():g}, среднее {values.mean():g}"
+        elif pd.api.types.is_datetime64_any_dtype(values) and len(values):
+            description = f"с {values.min():%Y-%m-%d} по {values.max():%Y-%m-%d}"
+        else:
+            counts = values.astype(str).value_counts().head(top_values)
+            description = "; ".join(
+                f"{value if len(value) <= 60 else value[:60] + '…'} ({count})" for value, count in counts.items()
+            )
+        rows.append({
+            "Столбец": str(col),
+            "Заполнено": f"{len(values)} из {len(df)}",
+            "Уникальных": values.nunique(),
+            "Значения": description
+        })
+    return pd.DataFrame(rows, columns=["Столбец", "Заполнено", "Уникальных", "Значения"])
+
+
+def chart_columns(df: pd.DataFrame, max_charts: int = DEFAULT_MAX_CHARTS) -> List[str]:
+    """
+    Выбирает столбцы для диаграмм распределения значений.
+
+    Сначала столбцы результатов (_Обработано), затем остальные категориальные
+    столбцы - с 2..MAX_CHART_CATEGORIES уникальными значениями.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        max_charts (int): Максимальное число диаграмм
+
+    Returns:
+        List[str]: Столбцы для диаграмм
+    """
+    candidates = sorted(df.columns, key=lambda col: not str(col).endswith("_Обработано"))
+    selected = []
+    for col in candidates:
+        if len(selected) >= max_charts:
+            break
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            continue
+        if 2 <= df[col].nunique() <= MAX_CHART_CATEGORIES:
+            selected.append(col)
+    return selected
+
+
+def distribution_chart(df: pd.DataFrame, column: str) -> bytes:
+    """
+    Горизонтальная диаграмма частых значений столбца (PNG).
+
+    Строится по агрегированным частотам (value_counts), а не по строкам.
+
+    Args:
+        df (pd.DataFrame): Таблица
+        column (str): Столбец
+
+    Returns:
+        bytes: Изображение PNG
+    """
+    counts = df[column].dropna().astype(str).value_counts().head(CHART_TOP_VALUES)[::-1]
+    labels = [label if len(label) <= 40 else label[:40] + "…" for label in counts.index]
+
+    figure = Figure(figsize=(6.5, 1 + 0.35 * len(counts)))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.barh(labels, counts.to_numpy())
+    axes.set_title(f"{column}: частые значения")
+    axes.set_xlabel("Количество строк")
+    figure.tight_layout()
+
+    output = BytesIO()
+    figure.savefig(output, format="png", dpi=120)
+    return output.getvalue()
+
+
+def add_markdown(doc, text: str) -> None:
+    """
+    Добавляет текст ответа модели в документ: заголовки и списки Markdown
+    становятся заголовками и списками Word, выделение ** убирается.
+
+    Args:
+        doc: Документ python-docx
+        text (str): Текст в формате Markdown
+    """
+    for line in ILLEGAL_XML_CHARS.sub("", text).splitlines():
+        line = line.strip().replace("**", "").replace("`", "")
+        if not line:
+            continue
+        heading = MARKDOWN_HEADING.match(line)
+        bullet = MARKDOWN_BULLET.match(line)
+        numbered = MARKDOWN_NUMBERED.match(line)
+        if heading:
+            doc.add_heading(heading.group(2), level=min(len(heading.group(1)) + 2, 9))
+        elif bullet:
+            doc.add_paragraph(bullet.group(1), style="List Bullet")
+        elif numbered:
+            doc.add_paragraph(numbered.group(1), style="List Number")
+        else:
+            doc.add_paragraph(line)
+
+
+def build_word_report(
+    df: Optional[pd.DataFrame],
+    table_analysis: Optional[str] = None,
+    group_reports: Optional[Dict[str, str]] = None,
+    max_table_rows: int = DEFAULT_MAX_TABLE_ROWS,
+    max_cell_chars: int = DEFAULT_MAX_CELL_CHARS,
+    max_charts: int = DEFAULT_MAX_CHARTS,
+    excel_name: Optional[str] = None
+) -> bytes:
+    """
+    Формирует отчет Word по результатам анализа.
+
+    В отчет входят анализ всей таблицы и отчеты по группам, сводка по
+    столбцам, диаграммы распределения значений и таблица результатов.
+    Таблица строится одним XML-элементом (table_xml); в документ
+    встраиваются не больше max_table_rows строк, полная таблица - в
+    выгрузке Excel.
+
+    Args:
+        df (Optional[pd.DataFrame]): Таблица результатов
+        table_analysis (Optional[str]): Результат анализа всей таблицы
+        group_reports (Optional[Dict[str, str]]): Отчеты по группам
+        max_table_rows (int): Строк таблицы в документе
+        max_cell_chars (int): Символов в ячейке таблицы
+        max_charts (int): Диаграмм в отчете (0 - без диаграмм)
+        excel_name (Optional[str]): Имя файла выгрузки Excel для ссылки в отчете
+
+    Returns:
+        bytes: Документ Word
+
+    Raises:
+        ImportError: Если python-docx не установлен
+    """
+    if not DOCX_AVAILABLE:
+        raise ImportError("Для отчета Word установите python-docx: pip install python-docx")
+
+    doc = Document()
+    doc.add_heading("Отчет по анализу данных", level=1)
+
+    if table_analysis:
+        doc.add_heading("Общий анализ", level=2)
+        add_markdown(doc, table_analysis)
+
+    if group_reports:
+        doc.add_heading("Отчеты по группам", level=2)
+        for label, report in group_reports.items():
+            doc.add_heading(str(label), level=3)
+            add_markdown(doc, report)
+
+    if df is not None and len(df.columns):
+        doc.add_heading("Сводка по столбцам", level=2)
+        doc.add_paragraph(f"Строк: {len(df)}, столбцов: {len(df.columns)}")
+        add_table(doc, column_summary(df), max_cell_chars)
+
+        if MATPLOTLIB_AVAILABLE and max_charts:
+            columns = chart_columns(df, max_charts)
+            if columns:
+                doc.add_heading("Распределение значений", level=2)
+                for column in columns:
+                    doc.add_picture(BytesIO(distribution_chart(df, column)), width=Inches(6))
+
+        doc.add_heading("Результаты построчного анализа", level=2)
+        if len(df) > max_table_rows:
+            export = f" ({excel_name})" if excel_name else ""
+            doc.add_paragraph(
+                f"Показаны первые {max_table_rows} строк из {len(df)}. "
+                f"Полная таблица - в выгрузке Excel{export}."
+            )
+        add_table(doc, df.head(max_table_rows), max_cell_chars)
+
+    output = BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+
+def submit_word_report(*args, **kwargs) -> Future:
+    """
+    Формирует отчет в фоновом потоке (аргументы как у build_word_report).
+
+    Отчеты формируются по одному в общем потоке, чтобы несколько больших
+    отчетов не конкурировали за процессор с интерфейсом.
+
+    Returns:
+        Future: Результат - документ Word (bytes)
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="word-report")
+    return _executor.submit(build_word_report, *args, **kwargs)
@@ -0,0 +1,298 @@
+# src/core/workbook_runner.py
+import asyncio
+import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from src.config.manager import ConfigManager
+from src.core.analysis_engine import AnalysisEngine, AnalysisResult, build_run_summary
+from src.core.excel_loader import read_excel_columns
+from src.core.excel_writer import write_sheets
+from src.services.row_executor import get_concurrency
+
+# Сколько листов анализируется одновременно по умолчанию
+DEFAULT_PARALLEL_SHEETS = 3
+# Максимальная длина названия листа Excel
+MAX_SHEET_NAME = 31
+# Интервал, с которым вызывающий поток передает прогресс листов (сек.)
+POLL_INTERVAL = 0.2
+
+
+@dataclass
+class WorkbookResult:
+    """
+    Результат анализа нескольких листов книги.
+
+    Attributes:
+        results: Результаты по листам в порядке листов книги (название листа -> результат)
+        errors: Ошибки листов, анализ которых не удался (название листа -> текст ошибки)
+        summary: Сводка запуска (листы, кэш ответов, скорость запросов)
+    """
+    results: Dict[str, AnalysisResult] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    summary: Dict[str, Any] = field(default_factory=dict)
+
+
+class SharedRequestSlots:
+    """
+    Провайдер LLM с общим ограничением одновременных запросов.
+
+    Все листы используют один экземпляр: у каждого листа свой пул строк, но
+    запросов к модели одновременно выполняется не больше slots на все листы,
+    а кэш ответов и регулятор частоты провайдера общие.
+    """
+
+    def __init__(self, llm_provider, slots: int):
+        """
+        Args:
+            llm_provider: Провайдер LLM
+            slots (int): Максимальное число одновременных запросов
+        """
+        self.llm_provider = llm_provider
+        self.slots = threading.BoundedSemaphore(max(1, int(slots)))
+        # Асинхронный режим движка включается, только если его поддерживает провайдер
+        if hasattr(llm_provider, "achat_completion"):
+            self.achat_completion = self._achat_completion
+
+    def chat_completion(self, *args, **kwargs):
+        """chat_completion провайдера в пределах общего числа запросов."""
+        with self.slots:
+            return self.llm_provider.chat_completion(*args, **kwargs)
+
+    async def _achat_completion(self, *args, **kwargs):
+        """achat_completion провайдера в пределах общего числа запросов."""
+        await asyncio.to_thread(self.slots.acquire)
+        try:
+            return await self.llm_provider.achat_completion(*args, **kwargs)
+        finally:
+            self.slots.release()
+
+    def __getattr__(self, name):
+        # Остальные методы и атрибуты (статистика кэша, настройки) - от провайдера
+        return getattr(self.llm_provider, name)
+
+
+def _context_copies(context_files) -> Optional[List[BytesIO]]:
+    """Копии файлов контекста в памяти: листы читают их одновременно из разных потоков."""
+    if not context_files:
+        return None
+    copies = []
+    for file in context_files:
+        if hasattr(file, "seek"):
+            file.seek(0)
+        data = file.read()
+        if hasattr(file, "seek"):
+            file.seek(0)
+        copy = BytesIO(data)
+        copy.name = getattr(file, "name", "context")
+        copies.append(copy)
+    return copies
+
+
+class WorkbookRunner:
+    """
+    Анализ выбранных листов книги с общим пулом запросов к LLM.
+
+    Листы читаются по одному в фоновом потоке, на один лист вперед, пока
+    уже загруженные листы анализируются: чтение следующего листа идет
+    одновременно с запросами к модели по предыдущим. Одновременно
+    анализируется до max_parallel_sheets листов. Прогресс и сообщения
+    передаются в вызывающем потоке.
+    """
+
+    def __init__(
+        self,
+        llm_provider,
+        llm_settings: Optional[Dict[str, Any]] = None,
+        config_manager: Optional[ConfigManager] = None,
+        on_progress: Optional[Callable[[int, int, str], None]] = None,
+        on_message: Optional[Callable[[str, str], None]] = None,
+        max_parallel_sheets: Optional[int] = None,
+        load_sheet: Optional[Callable[[Any, str], pd.DataFrame]] = None
+    ):
+        """
+        Args:
+            llm_provider: Провайдер LLM
+            llm_settings: Настройки LLM и обработки (как у AnalysisEngine)
+            config_manager: Менеджер конфигурации
+            on_progress: Функция (обработано, всего, текст) - общий прогресс по листам
+            on_message: Функция (уровень, текст)
+            max_parallel_sheets: Сколько листов анализируется одновременно
+                (по умолчанию workbook.parallel_sheets из конфигурации)
+            load_sheet: Функция (файл, лист) -> DataFrame (по умолчанию read_excel_columns)
+        """
+        self.llm_settings = llm_settings if isinstance(llm_settings, dict) else {}
+        self.config_manager = config_manager or ConfigManager()
+        self.llm_provider = SharedRequestSlots(
+            llm_provider,
+            get_concurrency(self.llm_settings.get("provider_type", "cloud"), self.llm_settings, self.config_manager)
+        )
+        self.on_progress = on_progress or (lambda done, total, text: None)
+        self.on_message = on_message or (lambda level, text: getattr(self.logger, level, self.logger.info)(text))
+        self.max_parallel_sheets = max(1, int(
+            max_parallel_sheets or self.config_manager.get("workbook.parallel_sheets", DEFAULT_PARALLEL_SHEETS)
+        ))
+        self.load_sheet = load_sheet or (lambda file, sheet: read_excel_columns(file, sheet))
+        self.logger = logging.getLogger("WorkbookRunner")
+
+    def _analyze_sheet(self, name, df, profile, context_files, events) -> AnalysisResult:
+        """Анализирует один лист; прогресс и сообщения передаются через очередь events."""
+        engine = AnalysisEngine(
+            self.llm_provider,
+            self.llm_settings,
+            self.config_manager,
+            on_progress=lambda done, total, text: events.put(("progress", name, (done, total, text))),
+            on_message=lambda level, text: events.put(("message", name, (level, text)))
+        )
+        return engine.run(df, profile, _context_copies(context_files))
+
+    def run(self, file, sheets: List[str], profile: Dict[str, Any], context_files=None) -> WorkbookResult:
+        """
+        Анализирует листы книги с одним профилем запуска.
+
+        Ошибка чтения или анализа листа не прерывает обработку остальных
+        листов и записывается в WorkbookResult.errors.
+
+        Args:
+            file: Путь или файловый объект книги
+            sheets (List[str]): Названия листов
+            profile (Dict[str, Any]): Профиль запуска (как у AnalysisEngine.run)
+            context_files: Дополнительные файлы контекста
+
+        Returns:
+            WorkbookResult: Результаты по листам
+        """
+        context_files = _context_copies(context_files)
+        results: Dict[str, AnalysisResult] = {}
+        errors: Dict[str, str] = {}
+        progress: Dict[str, tuple] = {}
+        events: queue.Queue = queue.Queue()
+
+        def drain_events():
+            while True:
+                try:
+                    kind, name, payload = events.get_nowait()
+                except queue.Empty:
+                    return
+                if kind == "message":
+                    level, text = payload
+                    self.on_message(level, f"Лист '{name}': {text}")
+                else:
+                    done, total, text = payload
+                    progress[name] = (done, total)
+                    self.on_progress(
+                        sum(value[0] for value in progress.values()),
+                        sum(value[1] for value in progress.values()),
+                        f"Лист '{name}': {text}"
+                    )
+
+        waiting = deque(sheets)
+        ready = deque()
+        loading = None
+        running = {}
+        # Файл книги читает только поток загрузки
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheet-loader") as loader, \
+                ThreadPoolExecutor(max_workers=self.max_parallel_sheets, thread_name_prefix="sheet-worker") as analyzers:
+            while waiting or loading or ready or running:
+                # Следующий лист читается, пока предыдущие анализируются
+                if loading is None and waiting and not ready:
+                    name = waiting.popleft()
+                    loading = (name, loader.submit(self.load_sheet, file, name))
+
+                while ready and len(running) < self.max_parallel_sheets:
+                    name, df = ready.popleft()
+                    running[analyzers.submit(self._analyze_sheet, name, df, profile, context_files, events)] = name
+
+                futures = list(running) + ([loading[1]] if loading else [])
+                done, _ = wait(futures, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                drain_events()
+
+                if loading is not None and loading[1] in done:
+                    name, future = loading
+                    loading = None
+                    try:
+                        ready.append((name, future.result()))
+                        self.logger.info(f"Лист '{name}' загружен")
+                    except Exception as e:
+                        errors[name] = f"Не удалось прочитать лист: {e}"
+                        self.on_message("error", f"Лист '{name}': {errors[name]}")
+
+                for future in done:
+                    name = running.pop(future, None)
+                    if name is None:
+                        continue
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        # Несоответствие листа профилю (ValueError) - без трассировки
+                        self.logger.error(f"Ошибка анализа листа '{name}': {e}", exc_info=not isinstance(e, ValueError))
+                        errors[name] = str(e)
+                        self.on_message("error", f"Лист '{name}': {e}")
+        drain_events()
+
+        return WorkbookResult(
+            results={name: results[name] for name in sheets if name in results},
+            errors={name: errors[name] for name in sheets if name in errors},
+            summary=build_run_summary(
+                self.llm_provider.llm_provider,
+                sheets=len(sheets),
+                failed_sheets=len(errors),
+                rows=sum(len(result.result_df) for result in results.values() if result.result_df is not None)
+            )
+        )
+
+
+def result_sheet_names(sheets: List[str]) -> Dict[str, str]:
+    """
+    Названия листов результата: как у исходных листов, в пределах 31 символа и без повторов.
+
+    Args:
+        sheets (List[str]): Названия исходных листов
+
+    Returns:
+        Dict[str, str]: Исходный лист -> лист результата
+    """
+    names = {}
+    used = set()
+    for sheet in sheets:
+        name = sheet[:MAX_SHEET_NAME]
+        suffix = 1
+        while name.lower() in used:
+            suffix += 1
+            tail = f" ({suffix})"
+            name = sheet[:MAX_SHEET_NAME - len(tail)] + tail
+        used.add(name.lower())
+        names[sheet] = name
+    return names
+
+
+def write_workbook_result(result: WorkbookResult, output) -> None:
+    """
+    Записывает результаты в книгу: по листу результата на каждый исходный лист.
+
+    Результаты анализа всей таблицы собираются на лист "Анализ таблиц",
+    ошибки листов - на лист "Ошибки".
+
+    Args:
+        result (WorkbookResult): Результаты по листам
+        output: Путь или файловый объект (BytesIO) для записи
+    """
+    names = result_sheet_names(list(result.results) + ["Анализ таблиц", "Ошибки"])
+    table_analyses = {sheet: item.table_analysis for sheet, item in result.results.items() if item.table_analysis}
+
+    sheets = {}
+    for sheet, item in result.results.items():
+        if item.result_df is not None:
+            sheets[names[sheet]] = item.result_df
+    if table_analyses:
+        sheets[names["Анализ таблиц"]] = pd.DataFrame({"Лист": list(table_analyses), "Анализ таблицы": list(table_analyses.values())})
+    if result.errors or not result.results:
+        sheets[names["Ошибки"]] = pd.DataFrame({"Лист": list(result.errors), "Ошибка": list(result.errors.values())})
+    write_sheets(sheets, output)
@@ -1,8 +1,13 @@
 # llm_integration.py
+import asyncio
 import logging
+import time
 from typing import Dict, List, Tuple, Optional, Any
-from openai import OpenAI
-from src.services.api_utils import APIUtils
+from openai import OpenAI, AsyncOpenAI
+from src.services.rate_governor import estimate_request_tokens
+from src.services.row_batching import get_context_limit
+from src.services.tokenizer import count_message_tokens, count_tokens
+from src.services.retry_policy import RetryPolicy
 from abc import ABC, abstractmethod
 
 
@@ -56,7 +61,17 @@ class LLMServiceProvider:
         """
         self.api_key = api_key
         self.base_url = base_url
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        # Повторы выполняются через retry_policy, встроенные повторы клиента отключены,
+        # чтобы ответы 429 доходили до регулятора частоты запросов
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        # Асинхронный клиент создается при первом вызове achat_completion
+        self._async_client = None
+        self._async_client_loop = None
+        # Регулятор частоты запросов (RateGovernor), политика повторов и предохранитель
+        # API назначаются UnifiedLLM; без них используется политика по умолчанию
+        self.rate_governor = None
+        self.retry_policy = RetryPolicy()
+        self.circuit_breaker = None
         # Инициализация логгера
         self.logger = logging.getLogger(__name__)
         if not self.logger.handlers:
@@ -100,8 +115,8 @@ class LLMServiceProvider:
         top_p: float = 1.0,
         frequency_penalty: float = 0.0,
         presence_penalty: float = 0.0,
-        max_retries: int = 5,
-        retry_delay: int = 1
+        max_retries: Optional[int] = None,
+        retry_delay: Optional[float] = None
     ) -> Tuple[Optional[str], Optional[str]]:
         """
         Выполняет запрос к API модели с механизмом повторных попыток.
@@ -114,13 +129,19 @@ class LLMServiceProvider:
             top_p (float): Параметр top_p
             frequency_penalty (float): Штраф за повторение
             presence_penalty (float): Штраф за наличие
-            max_retries (int): Максимальное количество повторных попыток
-            retry_delay (int): Начальная задержка между попытками в секундах
+            max_retries (Optional[int]): Максимальное количество попыток (по умолчанию из retry_policy)
+            retry_delay (Optional[float]): Начальная задержка между попытками (по умолчанию из retry_policy)
             
         Returns:
             Tuple[Optional[str], Optional[str]]: (ответ, ошибка)
         """
-        def _make_request() -> Tuple[Optional[str], Optional[str]]:
+        governor = self.rate_governor
+        request_tokens = estimate_request_tokens(messages, max_tokens)
+        
+        def _make_request() -> str:
+            if governor is not None:
+                governor.acquire(request_tokens)
+            started = time.monotonic()
             try:
                 response = self.client.chat.completions.create(
                     model=model,
@@ -132,34 +153,108 @@ class LLMServiceProvider:
                     presence_penalty=presence_penalty,
                     stream=False
                 )
-                
-                # Правильно извлекаем ответ
-                return response.choices[0].message.content.strip(), None
-                    
             except Exception as e:
-                return None, f"Ошибка API: {str(e)}"
-        
-        # Использование APIUtils для повторных попыток
-        return APIUtils.retry_with_backoff(
-            _make_request,
-            max_retries=max_retries,
-            initial_delay=retry_delay,
-            max_delay=60.0,
-            backoff_factor=2.0
-        )
+                if governor is not None:
+                    governor.record_exception(e)
+                raise
+            
+            if governor is not None:
+                governor.on_success(time.monotonic() - started, request_tokens, self._used_tokens(response))
+            
+            # Правильно извлекаем ответ
+            return response.choices[0].message.content.strip()
+        
+        policy = self.retry_policy.with_overrides(max_attempts=max_retries, initial_delay=retry_delay)
+        response, error = policy.call(_make_request, self.circuit_breaker)
+        return response, (f"Ошибка API: {error}" if error else None)
+    
+    def _get_async_client(self) -> AsyncOpenAI:
+        """
+        Возвращает асинхронный клиент для текущего цикла событий.
+        
+        HTTP-соединения асинхронного клиента привязаны к циклу событий,
+        поэтому при смене цикла клиент создается заново.
+        
+        Returns:
+            AsyncOpenAI: Асинхронный клиент API
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+            self._async_client_loop = loop
+        return self._async_client
+    
+    async def achat_completion(
+        self, 
+        messages: List[Dict[str, str]], 
+        model: str = "deepseek-chat",
+        temperature: float = 0.7,
+        max_tokens: int = 300,
+        top_p: float = 1.0,
+        frequency_penalty: float = 0.0,
+        presence_penalty: float = 0.0,
+        max_retries: Optional[int] = None,
+        retry_delay: Optional[float] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Асинхронный вариант chat_completion.
+        
+        Параметры и возвращаемое значение совпадают с chat_completion.
+        
+        Returns:
+            Tuple[Optional[str], Optional[str]]: (ответ, ошибка)
+        """
+        client = self._get_async_client()
+        governor = self.rate_governor
+        request_tokens = estimate_request_tokens(messages, max_tokens)
+        
+        async def _make_request() -> str:
+            if governor is not None:
+                await governor.aacquire(request_tokens)
+            started = time.monotonic()
+            try:
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    top_p=top_p,
+                    frequency_penalty=frequency_penalty,
+                    presence_penalty=presence_penalty,
+                    stream=False
+                )
+            except Exception as e:
+                if governor is not None:
+                    governor.record_exception(e)
+                raise
+            
+            if governor is not None:
+                governor.on_success(time.monotonic() - started, request_tokens, self._used_tokens(response))
+            
+            return response.choices[0].message.content.strip()
+        
+        policy = self.retry_policy.with_overrides(max_attempts=max_retries, initial_delay=retry_delay)
+        response, error = await policy.acall(_make_request, self.circuit_breaker)
+        return response, (f"Ошибка API: {error}" if error else None)
+    
+    @staticmethod
+    def _used_tokens(response: Any) -> Optional[int]:
+        """Возвращает фактический расход токенов из ответа API, если он указан."""
+        usage = getattr(response, "usage", None)
+        total = getattr(usage, "total_tokens", None)
+        return total if isinstance(total, int) else None
     
     def estimate_tokens(self, text: str) -> int:
         """
-        Оценивает количество токенов в тексте (грубая аппроксимация).
+        Считает количество токенов в тексте.
         
         Args:
             text (str): Текст для оценки
             
         Returns:
-            int: Приблизительное количество токенов
+            int: Количество токенов
         """
-        # Простое приближение: ~4 символа на токен для большинства языков
-        return len(text) // 4
+        return count_tokens(text)
     
     def can_process_in_one_request(self, messages: List[Dict[str, str]], model: str, max_output_tokens: int = 300) -> bool:
         """
@@ -173,27 +268,11 @@ class LLMServiceProvider:
         Returns:
             bool: True, если запрос вписывается в лимиты, иначе False
         """
-        # Оценка входящих токенов
-        estimated_tokens = sum(self.estimate_tokens(msg["content"]) for msg in messages)
-        
-        # Получение лимита контекста для модели
-        context_limit = 4096  # значение по умолчанию
-        
-        # Для DeepSeek
-        if model == "deepseek-chat":
-            context_limit = 4096
-        elif model == "deepseek-coder":
-            context_limit = 8192
-        # Для OpenAI GPT
-        elif "gpt-3.5" in model:
-            context_limit = 4096
-        elif "gpt-4" in model:
-            context_limit = 8192
-        elif "gpt-4-turbo" in model:
-            context_limit = 128000
+        # Токены входящих сообщений (с учетом служебной разметки каждого сообщения)
+        input_tokens = count_message_tokens(messages)
         
         # Проверка с учетом ожидаемых выходных токенов
-        return (estimated_tokens + max_output_tokens) < context_limit
+        return (input_tokens + max_output_tokens) <= get_context_limit(model)
     
     def batch_process_long_context(
         self,
@@ -202,22 +281,49 @@ class LLMServiceProvider:
         model: str = "deepseek-chat",
         max_chunk_size: int = 3000,
         overlap: int = 500,
+        strategy: str = "tree",
+        max_workers: int = 4,
+        fan_in: int = 4,
+        max_chunk_tokens: Optional[int] = None,
         **kwargs
     ) -> Tuple[Optional[str], Optional[str]]:
         """
         Обрабатывает длинный контекст, разбивая его на части и объединяя результаты.
         
+        Стратегии:
+            - "tree": части обрабатываются независимо и параллельно, затем ответы
+              объединяются деревом, каждый узел которого объединяет не больше fan_in
+              ответов. Размер промпта не растет с длиной документа.
+            - "sequential": части обрабатываются по очереди, в каждый запрос
+              добавляются ответы всех предыдущих частей.
+        
         Args:
             system_prompt (str): Системный промпт
             user_content (str): Длинный пользовательский контент
             model (str): ID модели
             max_chunk_size (int): Максимальный размер чанка в символах
             overlap (int): Размер перекрытия между чанками в символах
+            strategy (str): Стратегия обработки ("tree" или "sequential")
+            max_workers (int): Количество одновременных запросов (для "tree")
+            fan_in (int): Максимальное число ответов, объединяемых одним запросом (для "tree")
+            max_chunk_tokens (Optional[int]): Размер чанка в токенах; если указан, max_chunk_size
+                пересчитывается по плотности токенов в тексте, overlap - пропорционально
             **kwargs: Дополнительные параметры для chat_completion
             
         Returns:
             Tuple[Optional[str], Optional[str]]: (объединенный ответ, ошибка)
         """
+        if strategy not in ("tree", "sequential"):
+            raise ValueError(f"Неизвестная стратегия обработки длинного контекста: {strategy}")
+        
+        if max_chunk_tokens:
+            # Переводим бюджет токенов в символы по фактической плотности текста
+            # (для кириллицы символов на токен почти вдвое меньше, чем для латиницы)
+            chars_per_token = len(user_content) / max(1, self.estimate_tokens(user_content))
+            overlap_ratio = overlap / max_chunk_size if max_chunk_size else 0
+            max_chunk_size = max(1, int(max_chunk_tokens * chars_per_token))
+            overlap = int(max_chunk_size * overlap_ratio)
+        
         # Если текст достаточно короткий, обрабатываем его целиком
         if len(user_content) <= max_chunk_size:
             messages = [
@@ -226,7 +332,15 @@ class LLMServiceProvider:
             ]
             return self.chat_completion(messages, model=model, **kwargs)
         
-        # Разбиваем контент на перекрывающиеся чанки
+        chunks = self._split_long_context(user_content, max_chunk_size, overlap)
+        
+        if strategy == "sequential":
+            return self._process_chunks_sequential(system_prompt, chunks, model, **kwargs)
+        return self._process_chunks_tree(system_prompt, chunks, model, max_chunk_size, max_workers, fan_in, **kwargs)
+    
+    @staticmethod
+    def _split_long_context(user_content: str, max_chunk_size: int, overlap: int) -> List[str]:
+        """Разбивает контент на перекрывающиеся чанки по границам предложений или абзацев."""
         chunks = []
         start = 0
         
@@ -245,13 +359,37 @@ class LLMServiceProvider:
             
             chunks.append(user_content[start:end])
             
-            # Начинаем следующий чанк с перекрытием
+            # Начинаем следующий чанк с перекрытием (но всегда продвигаемся вперед)
             if end < len(user_content):
-                start = max(0, end - overlap)
+                start = max(start + 1, end - overlap)
             else:
                 break
         
-        # Обрабатываем каждый чанк
+        return chunks
+    
+    @staticmethod
+    def _combine_responses(responses: List[str], errors: List[str]) -> Tuple[Optional[str], Optional[str]]:
+        """Возвращает (ответ, ошибка) с учетом частичного успеха."""
+        # Если есть хотя бы один успешный ответ
+        if responses:
+            # Если были ошибки, добавляем информацию о них
+            if errors:
+                error_summary = "\n".join(errors)
+                return "\n\n".join(responses), f"Частичный успех с ошибками: {error_summary}"
+            else:
+                return "\n\n".join(responses), None
+        else:
+            # Если все запросы завершились с ошибкой
+            return None, "\n".join(errors)
+    
+    def _process_chunks_sequential(
+        self,
+        system_prompt: str,
+        chunks: List[str],
+        model: str,
+        **kwargs
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Последовательная обработка: каждый чанк получает ответы всех предыдущих."""
         responses = []
         errors = []
         
@@ -284,17 +422,104 @@ class LLMServiceProvider:
             if error:
                 errors.append(f"Ошибка в части {i+1}: {error}")
         
-        # Если есть хотя бы один успешный ответ
-        if responses:
-            # Если были ошибки, добавляем информацию о них
-            if errors:
-                error_summary = "\n".join(errors)
-                return "\n\n".join(responses), f"Частичный успех с ошибками: {error_summary}"
-            else:
-                return "\n\n".join(responses), None
-        else:
-            # Если все запросы завершились с ошибкой
-            return None, "\n".join(errors)
+        return self._combine_responses(responses, errors)
+    
+    def _run_parallel(self, requests: List[List[Dict[str, str]]], model: str, max_workers: int, **kwargs) -> List[Tuple[Optional[str], Optional[str]]]:
+        """Параллельно выполняет запросы и возвращает ответы в исходном порядке."""
+        from src.services.row_executor import RowExecutor
+        
+        results: List[Tuple[Optional[str], Optional[str]]] = [(None, None)] * len(requests)
+        executor = RowExecutor(max_workers=max_workers)
+        
+        for i, result, error in executor.run(
+            enumerate(requests),
+            lambda messages: self.chat_completion(messages, model=model, **kwargs)
+        ):
+            results[i] = (None, str(error)) if error is not None else result
+        
+        return results
+    
+    def _process_chunks_tree(
+        self,
+        system_prompt: str,
+        chunks: List[str],
+        model: str,
+        max_chunk_size: int,
+        max_workers: int,
+        fan_in: int,
+        **kwargs
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Параллельная обработка: чанки независимо, затем объединение ответов деревом.
+        
+        Узел объединяет не больше fan_in ответов и не больше max_chunk_size
+        символов (но всегда хотя бы два ответа, чтобы дерево сокращалось).
+        """
+        fan_in = max(2, fan_in)
+        errors = []
+        
+        # Уровень 0: каждый чанк обрабатывается независимо
+        requests = [
+            [
+                {"role": "system", "content": f"{system_prompt}\nЭто часть {i+1} из {len(chunks)} большого текста. "
+                                              "Обработай ее самостоятельно, результаты частей будут объединены позже."},
+                {"role": "user", "content": chunk}
+            ]
+            for i, chunk in enumerate(chunks)
+        ]
+        responses = []
+        for i, (response, error) in enumerate(self._run_parallel(requests, model, max_workers, **kwargs)):
+            if response:
+                responses.append(response)
+            if error:
+                errors.append(f"Ошибка в части {i+1}: {error}")
+        
+        # Объединяем ответы уровнями, пока не останется один
+        level = 1
+        while len(responses) > 1:
+            groups = []
+            current = []
+            current_size = 0
+            for response in responses:
+                if len(current) >= 2 and (len(current) >= fan_in or current_size + len(response) > max_chunk_size):
+                    groups.append(current)
+                    current, current_size = [], 0
+                current.append(response)
+                current_size += len(response)
+            groups.append(current)
+            
+            final = len(groups) == 1
+            instruction = (
+                "Ниже приведены результаты обработки последовательных частей одного текста. "
+                + ("Объедини их в единый итоговый ответ на задание." if final
+                   else "Объедини их в один промежуточный результат, сохранив существенные детали.")
+            )
+            requests = [
+                [
+                    {"role": "system", "content": f"{system_prompt}\n{instruction}"},
+                    {"role": "user", "content": "\n\n".join(
+                        f"Результаты части {j+1}:\n{response}" for j, response in enumerate(group)
+                    )}
+                ]
+                for group in groups
+            ]
+            
+            next_responses = []
+            for group, (response, error) in zip(groups, self._run_parallel(requests, model, max_workers, **kwargs)):
+                if response:
+                    next_responses.append(response)
+                else:
+                    # Группа не объединена - ее ответы передаются дальше как есть
+                    errors.append(f"Ошибка объединения (уровень {level}): {error}")
+                    next_responses.extend(group)
+            
+            if len(next_responses) >= len(responses):
+                # Уровень не сократил число ответов - возвращаем то, что есть
+                break
+            responses = next_responses
+            level += 1
+        
+        return self._combine_responses(responses, errors)
     
     def change_provider(self, api_key: str, base_url: str):
         """
@@ -306,7 +531,9 @@ class LLMServiceProvider:
         """
         self.api_key = api_key
         self.base_url = base_url
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self._async_client = None
+        self._async_client_loop = None
 
 
 # Пример использования:
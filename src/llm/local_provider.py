@@ -2,9 +2,19 @@
 import requests
 import json
 import time
+import asyncio
 from typing import Dict, List, Tuple, Optional, Any, Union
 import logging
 
+from src.services.rate_governor import estimate_request_tokens, parse_retry_after
+from src.services.retry_policy import RetryPolicy, LLMRequestError
+
+# Асинхронный HTTP-клиент нужен только для achat_completion
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
 class LocalLLMProvider:
     """
     Класс для работы с локально развернутыми LLM моделями.
@@ -30,6 +40,16 @@ class LocalLLMProvider:
         self.timeout = timeout
         self.logger = logging.getLogger("LocalLLM")
         
+        # Асинхронный клиент создается при первом вызове achat_completion
+        self._async_client = None
+        self._async_client_loop = None
+        
+        # Регулятор частоты запросов (RateGovernor), политика повторов и предохранитель
+        # API назначаются UnifiedLLM; без них используется политика по умолчанию
+        self.rate_governor = None
+        self.retry_policy = RetryPolicy()
+        self.circuit_breaker = None
+        
         # Проверяем доступность сервиса
         self.is_available = self._check_availability()
     
@@ -99,8 +119,8 @@ class LocalLLMProvider:
         top_p: float = 1.0,
         frequency_penalty: float = 0.0,
         presence_penalty: float = 0.0,
-        max_retries: int = 3,
-        retry_delay: int = 2
+        max_retries: Optional[int] = None,
+        retry_delay: Optional[float] = None
     ) -> Tuple[Optional[str], Optional[str]]:
         """
         Выполняет запрос к локальной LLM с механизмом повторных попыток.
@@ -113,8 +133,8 @@ class LocalLLMProvider:
             top_p (float): Параметр top_p
             frequency_penalty (float): Штраф за повторение
             presence_penalty (float): Штраф за наличие
-            max_retries (int): Максимальное количество повторных попыток
-            retry_delay (int): Задержка между попытками в секундах
+            max_retries (Optional[int]): Максимальное количество попыток (по умолчанию из retry_policy)
+            retry_delay (Optional[float]): Начальная задержка между попытками (по умолчанию из retry_policy)
             
         Returns:
             Tuple[Optional[str], Optional[str]]: (ответ, ошибка)
@@ -122,31 +142,23 @@ class LocalLLMProvider:
         if not self.is_available:
             return None, "Локальная модель недоступна. Проверьте, запущен ли сервис."
         
-        attempt = 0
-        last_error = None
+        # Формирование запроса в зависимости от провайдера
+        if self.provider == "ollama":
+            send = lambda: self._ollama_completion(messages, model, temperature, max_tokens, top_p)
+        elif self.provider in ["lmstudio", "textgen_webui"]:
+            send = lambda: self._openai_compatible_completion(messages, model, temperature, max_tokens, top_p, frequency_penalty, presence_penalty)
+        else:
+            return None, f"Неподдерживаемый тип локального провайдера: {self.provider}"
         
-        while attempt < max_retries:
-            attempt += 1
-            try:
-                # Формирование запроса в зависимости от провайдера
-                if self.provider == "ollama":
-                    return self._ollama_completion(messages, model, temperature, max_tokens, top_p)
-                elif self.provider in ["lmstudio", "textgen_webui"]:
-                    return self._openai_compatible_completion(messages, model, temperature, max_tokens, top_p, frequency_penalty, presence_penalty)
-                else:
-                    return None, f"Неподдерживаемый тип локального провайдера: {self.provider}"
-                
-            except Exception as e:
-                last_error = f"Ошибка в попытке {attempt}: {str(e)}"
-                
-                # Если это последняя попытка, возвращаем ошибку
-                if attempt >= max_retries:
-                    return None, last_error
-                
-                # Иначе делаем паузу перед следующей попыткой
-                time.sleep(retry_delay)
+        request_tokens = estimate_request_tokens(messages, max_tokens)
+        
+        def _make_request() -> str:
+            if self.rate_governor is not None:
+                self.rate_governor.acquire(request_tokens)
+            return send()
         
-        return None, f"Не удалось получить ответ после {max_retries} попыток"
+        policy = self.retry_policy.with_overrides(max_attempts=max_retries, initial_delay=retry_delay)
+        return policy.call(_make_request, self.circuit_breaker)
     
     def _ollama_completion(
         self,
@@ -155,7 +167,7 @@ class LocalLLMProvider:
         temperature: float,
         max_tokens: int,
         top_p: float
-    ) -> Tuple[Optional[str], Optional[str]]:
+    ) -> str:
         """
         Выполняет запрос к Ollama API.
         
@@ -167,7 +179,10 @@ class LocalLLMProvider:
             top_p: Top-p параметр
             
         Returns:
-            Tuple[Optional[str], Optional[str]]: (ответ, ошибка)
+            str: Ответ модели
+            
+        Raises:
+            LLMRequestError: При ответе API с ошибкой
         """
         # Формирование данных запроса для Ollama
         payload = {
@@ -181,20 +196,15 @@ class LocalLLMProvider:
             "stream": False
         }
         
+        started = time.monotonic()
         response = requests.post(
             f"{self.base_url}/api/chat",
             json=payload,
             timeout=self.timeout
         )
+        self._record_response(response, time.monotonic() - started, messages, max_tokens)
         
-        if response.status_code == 200:
-            try:
-                result = response.json()
-                return result.get("message", {}).get("content", ""), None
-            except Exception as e:
-                return None, f"Ошибка при обработке ответа: {e}"
-        else:
-            return None, f"Ошибка API: {response.status_code} - {response.text}"
+        return self._parse_chat_response(response.status_code, response.text, response.json, response.headers)
     
     def _openai_compatible_completion(
         self,
@@ -205,7 +215,7 @@ class LocalLLMProvider:
         top_p: float,
         frequency_penalty: float,
         presence_penalty: float
-    ) -> Tuple[Optional[str], Optional[str]]:
+    ) -> str:
         """
         Выполняет запрос к API, совместимому с OpenAI (LM Studio, Text Generation WebUI).
         
@@ -219,7 +229,10 @@ class LocalLLMProvider:
             presence_penalty: Штраф за присутствие
             
         Returns:
-            Tuple[Optional[str], Optional[str]]: (ответ, ошибка)
+            str: Ответ модели
+            
+        Raises:
+            LLMRequestError: При ответе API с ошибкой
         """
         # Формирование данных запроса для OpenAI-совместимого API
         payload = {
@@ -234,20 +247,138 @@ class LocalLLMProvider:
         }
         
         # URL уже содержит /v1 для lmstudio и textgen_webui
+        started = time.monotonic()
         response = requests.post(
             f"{self.base_url}/chat/completions",
             json=payload,
             timeout=self.timeout
         )
+        self._record_response(response, time.monotonic() - started, messages, max_tokens)
         
-        if response.status_code == 200:
-            try:
-                result = response.json()
-                return result.get("choices", [{}])[0].get("message", {}).get("content", ""), None
-            except Exception as e:
-                return None, f"Ошибка при обработке ответа: {e}"
+        return self._parse_chat_response(response.status_code, response.text, response.json, response.headers)
+    
+    def _get_async_client(self) -> "httpx.AsyncClient":
+        """
+        Возвращает асинхронный HTTP-клиент для текущего цикла событий.
+        
+        Returns:
+            httpx.AsyncClient: Клиент с пулом соединений к локальному сервису
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = httpx.AsyncClient(timeout=self.timeout)
+            self._async_client_loop = loop
+        return self._async_client
+    
+    async def achat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "llama2",
+        temperature: float = 0.7,
+        max_tokens: int = 300,
+        top_p: float = 1.0,
+        frequency_penalty: float = 0.0,
+        presence_penalty: float = 0.0,
+        max_retries: Optional[int] = None,
+        retry_delay: Optional[float] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Асинхронный вариант chat_completion.
+        
+        Использует httpx.AsyncClient; если httpx не установлен, синхронный
+        запрос выполняется в отдельном потоке.
+        
+        Returns:
+            Tuple[Optional[str], Optional[str]]: (ответ, ошибка)
+        """
+        if not self.is_available:
+            return None, "Локальная модель недоступна. Проверьте, запущен ли сервис."
+        
+        if httpx is None:
+            return await asyncio.to_thread(
+                self.chat_completion, messages, model, temperature, max_tokens,
+                top_p, frequency_penalty, presence_penalty, max_retries, retry_delay
+            )
+        
+        if self.provider == "ollama":
+            url = f"{self.base_url}/api/chat"
+            payload = {
+                "model": model,
+                "messages": messages,
+                "options": {
+                    "temperature": temperature,
+                    "num_predict": max_tokens,
+                    "top_p": top_p
+                },
+                "stream": False
+            }
+        elif self.provider in ["lmstudio", "textgen_webui"]:
+            url = f"{self.base_url}/chat/completions"
+            payload = {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "top_p": top_p,
+                "frequency_penalty": frequency_penalty,
+                "presence_penalty": presence_penalty,
+                "stream": False
+            }
         else:
-            return None, f"Ошибка API: {response.status_code} - {response.text}"
+            return None, f"Неподдерживаемый тип локального провайдера: {self.provider}"
+        
+        client = self._get_async_client()
+        request_tokens = estimate_request_tokens(messages, max_tokens)
+        
+        async def _make_request() -> str:
+            if self.rate_governor is not None:
+                await self.rate_governor.aacquire(request_tokens)
+            started = time.monotonic()
+            response = await client.post(url, json=payload)
+            self._record_response(response, time.monotonic() - started, messages, max_tokens)
+            return self._parse_chat_response(response.status_code, response.text, response.json, response.headers)
+        
+        policy = self.retry_policy.with_overrides(max_attempts=max_retries, initial_delay=retry_delay)
+        return await policy.acall(_make_request, self.circuit_breaker)
+    
+    def _record_response(self, response: Any, latency: float, messages: List[Dict[str, str]], max_tokens: int):
+        """Передает код ответа и задержку регулятору частоты запросов."""
+        if self.rate_governor is not None:
+            self.rate_governor.record_response(
+                response.status_code, response.headers, latency, estimate_request_tokens(messages, max_tokens)
+            )
+    
+    def _parse_chat_response(self, status_code: int, text: str, get_json, headers: Any = None) -> str:
+        """
+        Извлекает текст ответа из тела ответа Ollama или OpenAI-совместимого API.
+        
+        Args:
+            status_code: HTTP-код ответа
+            text: Тело ответа в виде текста
+            get_json: Функция, возвращающая разобранное тело ответа
+            headers: Заголовки ответа
+            
+        Returns:
+            str: Ответ модели
+            
+        Raises:
+            LLMRequestError: При HTTP-коде, отличном от 200
+            ValueError: Если тело ответа не удалось разобрать
+        """
+        if status_code != 200:
+            raise LLMRequestError(
+                f"Ошибка API: {status_code} - {text}",
+                status_code=status_code,
+                retry_after=parse_retry_after((headers or {}).get("retry-after"))
+            )
+        
+        try:
+            result = get_json()
+            if self.provider == "ollama":
+                return result.get("message", {}).get("content", "")
+            return result.get("choices", [{}])[0].get("message", {}).get("content", "")
+        except Exception as e:
+            raise ValueError(f"Ошибка при обработке ответа: {e}") from e
     
     def get_model_info(self, model_name: str) -> Dict[str, Any]:
         """
@@ -400,8 +531,8 @@ class UnifiedLLMProvider:
         top_p: float = 1.0,
         frequency_penalty: float = 0.0,
         presence_penalty: float = 0.0,
-        max_retries: int = 3,
-        retry_delay: int = 2
+        max_retries: Optional[int] = None,
+        retry_delay: Optional[float] = None
     ) -> Tuple[Optional[str], Optional[str]]:
         """
         Выполняет запрос к текущему провайдеру LLM.
@@ -414,8 +545,8 @@ class UnifiedLLMProvider:
             top_p (float): Параметр top_p
             frequency_penalty (float): Штраф за повторение
             presence_penalty (float): Штраф за наличие
-            max_retries (int): Максимальное количество повторных попыток
-            retry_delay (int): Задержка между попытками в секундах
+            max_retries (Optional[int]): Максимальное количество попыток (по умолчанию из политики провайдера)
+            retry_delay (Optional[float]): Начальная задержка между попытками (по умолчанию из политики провайдера)
             
         Returns:
             Tuple[Optional[str], Optional[str]]: (ответ, ошибка)
@@ -1,7 +1,13 @@
 # modules/unified_llm.py
+import asyncio
 import logging
+import threading
 from typing import Dict, List, Tuple, Optional, Any, Union
 
+from src.services.response_cache import get_response_cache, DEFAULT_CACHE_PATH
+from src.services.rate_governor import get_rate_governor, DEFAULT_RATE_LIMITS
+from src.services.retry_policy import RetryPolicy, get_circuit_breaker
+
 # Добавляем необходимые модули и обработку ошибок
 try:
     from .local_provider import LocalLLMProvider
@@ -23,6 +29,9 @@ except ImportError as e:
         def __init__(self, **kwargs):
             raise ImportError("Модуль xinference_integration недоступен")
 
+# Заглушка вместо названия модели: локальный сервер отвечает загруженной моделью
+LOCAL_MODEL_PLACEHOLDER = "local_model"
+
 class UnifiedLLM:
     """
     Универсальный провайдер LLM, объединяющий локальные и облачные модели
@@ -40,6 +49,14 @@ class UnifiedLLM:
                 - cloud_base_url: URL облачного провайдера
                 - local_provider: Тип локального провайдера
                 - local_base_url: URL локального провайдера
+                - use_cache: Использовать дисковый кэш ответов
+                - cache_path: Путь к файлу кэша
+                - cache_ttl_hours: Время жизни записей кэша в часах
+                - cache_max_size_mb: Максимальный размер кэша в МБ
+                - rate_limits: Ограничения частоты запросов (requests_per_second,
+                  max_requests_per_second, tokens_per_minute); по умолчанию DEFAULT_RATE_LIMITS
+                - retry: Политика повторов (max_attempts, initial_delay, max_delay, jitter,
+                  deadline, circuit_failure_threshold, circuit_recovery_timeout)
         """
         self.logger = logging.getLogger("UnifiedLLM")
         
@@ -49,15 +66,44 @@ class UnifiedLLM:
             "cloud_api_key": "",
             "cloud_base_url": "https://api.deepseek.com",
             "local_provider": "ollama",
-            "local_base_url": "http://localhost:11434"
+            "local_base_url": "http://localhost:11434",
+            "use_cache": True,
+            "cache_path": DEFAULT_CACHE_PATH,
+            "cache_ttl_hours": 168,
+            "cache_max_size_mb": 200,
+            "rate_limits": None,
+            "retry": None
         }
         
         # Объединяем с переданной конфигурацией
         self.config = {**default_config, **(config or {})}
         
+        # Счетчики кэша для текущего запуска
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._init_cache()
+        
         # Инициализируем нужный провайдер
         self._init_provider()
     
+    def _init_cache(self):
+        """Подключает общий дисковый кэш ответов, если он включен"""
+        self.cache = None
+        if not self.config.get("use_cache"):
+            return
+        
+        try:
+            ttl_hours = self.config.get("cache_ttl_hours")
+            self.cache = get_response_cache(
+                self.config.get("cache_path") or DEFAULT_CACHE_PATH,
+                ttl_seconds=ttl_hours * 3600 if ttl_hours else None,
+                max_size_mb=self.config.get("cache_max_size_mb")
+            )
+        except Exception as e:
+            self.logger.warning(f"Кэш ответов недоступен, запросы будут выполняться без него: {e}")
+            self.cache = None
+    
     def _init_provider(self):
         """Инициализирует провайдер на основе конфигурации"""
         if self.config["provider_type"] == "cloud":
@@ -83,6 +129,56 @@ class UnifiedLLM:
             except Exception as e:
                 self.logger.error(f"Не удалось инициализировать LocalLLMProvider: {e}")
                 self.provider = None
+        
+        # Все запросы к одному API проходят через общий для процесса регулятор частоты
+        # и предохранитель; повторы выполняются только на уровне провайдера
+        self.rate_governor = self._get_rate_governor()
+        self.retry_policy, self.circuit_breaker = self._get_retry_policy()
+        if self.provider is not None:
+            self.provider.rate_governor = self.rate_governor
+            self.provider.retry_policy = self.retry_policy
+            self.provider.circuit_breaker = self.circuit_breaker
+    
+    def _get_rate_governor(self):
+        """Возвращает регулятор частоты запросов для текущего API"""
+        provider_type = "cloud" if self.config["provider_type"] == "cloud" else "local"
+        limits = {**DEFAULT_RATE_LIMITS[provider_type], **(self.config.get("rate_limits") or {})}
+        return get_rate_governor(
+            self._endpoint(),
+            requests_per_second=limits["requests_per_second"],
+            max_requests_per_second=limits.get("max_requests_per_second"),
+            tokens_per_minute=limits.get("tokens_per_minute")
+        )
+    
+    def _endpoint(self) -> str:
+        """Возвращает базовый URL текущего API"""
+        if self.config["provider_type"] == "cloud":
+            return self.config["cloud_base_url"]
+        return self.config["local_base_url"]
+    
+    def _get_retry_policy(self):
+        """Возвращает политику повторов и предохранитель для текущего API"""
+        settings = dict(self.config.get("retry") or {})
+        failure_threshold = settings.pop("circuit_failure_threshold", 5)
+        recovery_timeout = settings.pop("circuit_recovery_timeout", 30.0)
+        policy = RetryPolicy().with_overrides(
+            **{key: value for key, value in settings.items() if key in RetryPolicy.__dataclass_fields__}
+        )
+        breaker = get_circuit_breaker(
+            self._endpoint(),
+            failure_threshold=failure_threshold,
+            recovery_timeout=recovery_timeout
+        )
+        return policy, breaker
+    
+    def get_rate_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает состояние регулятора частоты запросов текущего API.
+        
+        Returns:
+            Dict[str, Any]: Скорость, количество ответов 429 и суммарное ожидание
+        """
+        return self.rate_governor.stats()
     
     def switch_provider(self, provider_type: str, **kwargs):
         """
@@ -130,8 +226,9 @@ class UnifiedLLM:
         top_p: float = 1.0,
         frequency_penalty: float = 0.0,
         presence_penalty: float = 0.0,
-        max_retries: int = 3,
-        retry_delay: int = 2
+        max_retries: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+        use_cache: bool = True
     ) -> Tuple[Optional[str], Optional[str]]:
         """
         Выполняет запрос к текущему провайдеру LLM.
@@ -144,8 +241,9 @@ class UnifiedLLM:
             top_p (float): Параметр top_p
             frequency_penalty (float): Штраф за повторение
             presence_penalty (float): Штраф за наличие
-            max_retries (int): Максимальное количество повторных попыток
-            retry_delay (int): Задержка между попытками в секундах
+            max_retries (Optional[int]): Максимальное количество попыток (по умолчанию из политики повторов)
+            retry_delay (Optional[float]): Начальная задержка между попытками (по умолчанию из политики повторов)
+            use_cache (bool): Использовать кэш ответов для этого запроса
             
         Returns:
             Tuple[Optional[str], Optional[str]]: (ответ, ошибка)
@@ -153,20 +251,17 @@ class UnifiedLLM:
         if self.provider is None:
             return None, "Провайдер не инициализирован"
             
-        # Если модель не указана, используем дефолтную для текущего провайдера
-        if model is None:
-            if self.config["provider_type"] == "cloud":
-                model = "deepseek-chat"
-            else:
-                # Используем дефолтную модель для локального провайдера
-                # Для lmstudio и других провайдеров используем их указанную модель
-                if self.config["local_provider"] == "ollama":
-                    model = "llama2"
-                # Не используем "local_model" для других провайдеров, 
-                # вместо этого должен использоваться фактический выбранный пользователем model
+        model = self._resolve_model(model)
+        
+        cache_key = None
+        if use_cache and self.cache is not None and self._model_identified(model):
+            cache_key = self._cache_key(messages, model, temperature, max_tokens, top_p, frequency_penalty, presence_penalty)
+            cached = self._cache_lookup(cache_key)
+            if cached is not None:
+                return cached, None
         
         try:
-            return self.provider.chat_completion(
+            response, error = self.provider.chat_completion(
                 messages=messages,
                 model=model,
                 temperature=temperature,
@@ -180,6 +275,166 @@ class UnifiedLLM:
         except Exception as e:
             self.logger.error(f"Ошибка при выполнении запроса: {e}")
             return None, f"Ошибка провайдера: {str(e)}"
+        
+        self._cache_store(cache_key, response, error)
+        return response, error
+    
+    async def achat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        temperature: float = 0.7,
+        max_tokens: int = 300,
+        top_p: float = 1.0,
+        frequency_penalty: float = 0.0,
+        presence_penalty: float = 0.0,
+        max_retries: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+        use_cache: bool = True
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Асинхронно выполняет запрос к текущему провайдеру LLM.
+        
+        Параметры и возвращаемое значение совпадают с chat_completion. Если
+        провайдер не поддерживает асинхронные запросы, синхронный вызов
+        выполняется в отдельном потоке.
+        
+        Returns:
+            Tuple[Optional[str], Optional[str]]: (ответ, ошибка)
+        """
+        if self.provider is None:
+            return None, "Провайдер не инициализирован"
+        
+        model = self._resolve_model(model)
+        params = {
+            "messages": messages,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "top_p": top_p,
+            "frequency_penalty": frequency_penalty,
+            "presence_penalty": presence_penalty,
+            "max_retries": max_retries,
+            "retry_delay": retry_delay
+        }
+        
+        cache_key = None
+        if use_cache and self.cache is not None and self._model_identified(model):
+            cache_key = self._cache_key(messages, model, temperature, max_tokens, top_p, frequency_penalty, presence_penalty)
+            cached = self._cache_lookup(cache_key)
+            if cached is not None:
+                return cached, None
+        
+        try:
+            if asyncio.iscoroutinefunction(getattr(self.provider, "achat_completion", None)):
+                response, error = await self.provider.achat_completion(**params)
+            else:
+                response, error = await asyncio.to_thread(lambda: self.provider.chat_completion(**params))
+        except Exception as e:
+            self.logger.error(f"Ошибка при выполнении запроса: {e}")
+            return None, f"Ошибка провайдера: {str(e)}"
+        
+        self._cache_store(cache_key, response, error)
+        return response, error
+    
+    def _provider_id(self) -> str:
+        """Возвращает идентификатор провайдера для ключа кэша"""
+        if self.config["provider_type"] == "cloud":
+            return f"cloud:{self.config['cloud_base_url']}"
+        return f"local:{self.config['local_provider']}:{self.config['local_base_url']}"
+    
+    def _model_identified(self, model: Optional[str]) -> bool:
+        """
+        Проверяет, что модель запроса известна и может входить в ключ кэша.
+        
+        Без названия модели (или с заглушкой "local_model") OpenAI-совместимые локальные
+        серверы отвечают загруженной в данный момент моделью, и ответы разных моделей
+        попали бы в одну запись кэша, поэтому такие запросы не кэшируются.
+        
+        Args:
+            model (Optional[str]): Модель после _resolve_model
+            
+        Returns:
+            bool: True, если ответ можно кэшировать
+        """
+        return bool(model) and model != LOCAL_MODEL_PLACEHOLDER
+    
+    def _cache_key(self, messages, model, temperature, max_tokens, top_p, frequency_penalty, presence_penalty) -> str:
+        """Вычисляет ключ кэша для параметров запроса"""
+        return self.cache.make_key(
+            self._provider_id(), model, messages, temperature, top_p,
+            frequency_penalty, presence_penalty, max_tokens
+        )
+    
+    def _cache_lookup(self, cache_key: str) -> Optional[str]:
+        """Ищет ответ в кэше и обновляет счетчики текущего запуска"""
+        try:
+            cached = self.cache.get(cache_key)
+        except Exception as e:
+            self.logger.warning(f"Ошибка чтения кэша: {e}")
+            cached = None
+        
+        with self._cache_lock:
+            if cached is not None:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+        return cached
+    
+    def _cache_store(self, cache_key: Optional[str], response: Optional[str], error: Optional[str]):
+        """Сохраняет успешный ответ в кэш"""
+        if cache_key is None or error is not None or response is None:
+            return
+        try:
+            self.cache.set(cache_key, response)
+        except Exception as e:
+            self.logger.warning(f"Ошибка записи в кэш: {e}")
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает статистику кэша для текущего запуска.
+        
+        Returns:
+            Dict[str, Any]: Попадания, промахи и доля попаданий
+        """
+        with self._cache_lock:
+            total = self.cache_hits + self.cache_misses
+            return {
+                "enabled": self.cache is not None,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_rate": round(self.cache_hits / total, 4) if total else 0.0
+            }
+    
+    def reset_cache_stats(self):
+        """Сбрасывает счетчики кэша перед новым запуском"""
+        with self._cache_lock:
+            self.cache_hits = 0
+            self.cache_misses = 0
+    
+    def _resolve_model(self, model: Optional[str]) -> Optional[str]:
+        """
+        Возвращает модель по умолчанию для текущего провайдера, если модель не указана.
+        
+        Args:
+            model (Optional[str]): Указанная модель
+            
+        Returns:
+            Optional[str]: Название модели
+        """
+        if model is not None:
+            return model
+        
+        if self.config["provider_type"] == "cloud":
+            return "deepseek-chat"
+        
+        # Используем дефолтную модель для локального провайдера
+        # Для lmstudio и других провайдеров используем их указанную модель
+        if self.config["local_provider"] == "ollama":
+            return "llama2"
+        # Не используем "local_model" для других провайдеров, 
+        # вместо этого должен использоваться фактический выбранный пользователем model
+        return None
     
     def is_available(self) -> bool:
         """
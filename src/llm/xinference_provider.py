@@ -1,7 +1,18 @@
 import requests
 import json
+import time
+import asyncio
+from typing import Dict, List, Tuple, Optional
 from .cloud_provider import LLMIntegrationInterface
 from src.config.manager import ConfigManager
+from src.services.rate_governor import estimate_request_tokens, parse_retry_after
+from src.services.retry_policy import RetryPolicy, LLMRequestError
+
+# Асинхронный HTTP-клиент нужен только для achat_completion
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
 class XInferenceIntegration(LLMIntegrationInterface):
     """
@@ -12,6 +23,15 @@ class XInferenceIntegration(LLMIntegrationInterface):
         self.xinference_config = self.config.get('xinference', {})
         self.api_endpoint = self.xinference_config.get('api_endpoint', 'http://localhost:9997/v1/chat/completions') # Пример эндпоинта
         self.model_name = self.xinference_config.get('model_name', 'default-model') # Пример модели
+        self.timeout = self.xinference_config.get('timeout', 60)
+        self._async_client = None
+        self._async_client_loop = None
+        # Регулятор частоты запросов (RateGovernor), политика повторов и предохранитель
+        # API можно назначить снаружи; UnifiedLLM этот провайдер не создает, поэтому
+        # по умолчанию действует RetryPolicy() без предохранителя и регулятора
+        self.rate_governor = None
+        self.retry_policy = RetryPolicy()
+        self.circuit_breaker = None
         # Добавьте сюда логику для API ключа, если он нужен
         # self.api_key = self.xinference_config.get('api_key')
 
@@ -71,6 +91,80 @@ class XInferenceIntegration(LLMIntegrationInterface):
             print(f"Непредвиденная ошибка при работе с XInference: {e}")
             raise
 
+    def _get_async_client(self):
+        """Возвращает асинхронный HTTP-клиент для текущего цикла событий."""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = httpx.AsyncClient(timeout=self.timeout)
+            self._async_client_loop = loop
+        return self._async_client
+
+    async def achat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 300,
+        top_p: float = 1.0,
+        frequency_penalty: float = 0.0,
+        presence_penalty: float = 0.0,
+        max_retries: Optional[int] = None,
+        retry_delay: Optional[float] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Асинхронно выполняет запрос к OpenAI-совместимому API XInference.
+
+        Повторы выполняются через retry_policy, как у облачного и локального
+        провайдеров; предохранитель и регулятор частоты запросов применяются,
+        если назначены (circuit_breaker, rate_governor).
+
+        Args:
+            max_retries (Optional[int]): Число попыток вместо заданного в retry_policy
+            retry_delay (Optional[float]): Начальная задержка вместо заданной в retry_policy
+
+        Returns:
+            Tuple[Optional[str], Optional[str]]: (ответ, ошибка)
+        """
+        if not self.api_endpoint:
+            return None, "API endpoint for XInference is not configured."
+        if httpx is None:
+            return None, "Для асинхронных запросов к XInference требуется пакет httpx"
+
+        payload = {
+            "model": model if model else self.model_name,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "top_p": top_p,
+            "frequency_penalty": frequency_penalty,
+            "presence_penalty": presence_penalty
+        }
+        client = self._get_async_client()
+        request_tokens = estimate_request_tokens(messages, max_tokens)
+
+        async def _make_request() -> str:
+            if self.rate_governor is not None:
+                await self.rate_governor.aacquire(request_tokens)
+            started = time.monotonic()
+            response = await client.post(self.api_endpoint, json=payload)
+            if self.rate_governor is not None:
+                self.rate_governor.record_response(
+                    response.status_code, response.headers, time.monotonic() - started, request_tokens
+                )
+            if response.status_code != 200:
+                raise LLMRequestError(
+                    f"Ошибка API: {response.status_code} - {response.text}",
+                    status_code=response.status_code,
+                    retry_after=parse_retry_after(response.headers.get("retry-after"))
+                )
+            result = response.json()
+            if 'choices' in result and len(result['choices']) > 0:
+                return result['choices'][0]['message']['content'].strip()
+            raise ValueError(f"Не удалось извлечь ответ из XInference: {result}")
+
+        policy = self.retry_policy.with_overrides(max_attempts=max_retries, initial_delay=retry_delay)
+        return await policy.acall(_make_request, self.circuit_breaker)
+
     def update_config(self, new_config):
         """Обновляет конфигурацию для XInference."""
         self.xinference_config = new_config.get('xinference', {})
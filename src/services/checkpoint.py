@@ -0,0 +1,156 @@
+# src/services/checkpoint.py
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Hashable, Optional
+
+import pandas as pd
+
+DEFAULT_CHECKPOINT_DIR = "checkpoints"
+
+
+def fingerprint_dataframe(df: pd.DataFrame) -> str:
+    """
+    Вычисляет отпечаток содержимого таблицы (столбцы, индекс и значения).
+
+    Args:
+        df (pd.DataFrame): Данные книги
+
+    Returns:
+        str: SHA-256 в шестнадцатеричном виде
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(column) for column in df.columns], ensure_ascii=False).encode("utf-8"))
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=True)
+    except TypeError:
+        # Ячейки с нехешируемыми значениями (списки, словари) сравниваем по строковому виду
+        row_hashes = pd.util.hash_pandas_object(df.astype(str), index=True)
+    digest.update(row_hashes.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def hash_prompt(prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Вычисляет хэш промпта вместе с параметрами, влияющими на ответ.
+
+    Args:
+        prompt (str): Шаблон промпта
+        params (Optional[Dict[str, Any]]): Столбцы, контекст и параметры модели
+
+    Returns:
+        str: SHA-256 в шестнадцатеричном виде
+    """
+    payload = json.dumps({"prompt": prompt, "params": params or {}}, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_run_id(df: pd.DataFrame, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Формирует идентификатор запуска из отпечатка книги и хэша промпта.
+
+    Один и тот же набор данных с тем же промптом и параметрами всегда получает
+    один и тот же идентификатор, поэтому повторный запуск находит свою контрольную точку.
+
+    Args:
+        df (pd.DataFrame): Данные книги
+        prompt (str): Шаблон промпта
+        params (Optional[Dict[str, Any]]): Столбцы, контекст и параметры модели
+
+    Returns:
+        str: Идентификатор запуска
+    """
+    return f"{fingerprint_dataframe(df)[:16]}_{hash_prompt(prompt, params)[:16]}"
+
+
+class CheckpointStore:
+    """
+    Контрольная точка построчного анализа в формате JSON Lines.
+
+    Каждый завершенный ответ дописывается в конец файла отдельной строкой,
+    поэтому при аварийном завершении теряется не больше одной незаписанной строки.
+    """
+
+    def __init__(self, run_id: str, directory: str = DEFAULT_CHECKPOINT_DIR):
+        """
+        Инициализирует хранилище контрольной точки.
+
+        Args:
+            run_id (str): Идентификатор запуска
+            directory (str): Каталог с файлами контрольных точек
+        """
+        self.run_id = run_id
+        self.path = os.path.join(directory, f"{run_id}.jsonl")
+        self.logger = logging.getLogger("CheckpointStore")
+        self._lock = threading.Lock()
+        self._file = None
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def load(self) -> Dict[str, str]:
+        """
+        Загружает ответы, сохраненные предыдущими запусками.
+
+        Returns:
+            Dict[str, str]: Строковый индекс строки -> ответ
+        """
+        answers = {}
+        if not os.path.exists(self.path):
+            return answers
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    answers[str(record["row"])] = record["answer"]
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    # Последняя строка может быть оборвана при аварийном завершении
+                    self.logger.warning(f"Пропущена поврежденная строка {line_number} в {self.path}")
+
+        return answers
+
+    def append(self, row: Hashable, answer: str) -> None:
+        """
+        Дописывает ответ для строки в контрольную точку.
+
+        Args:
+            row (Hashable): Индекс строки DataFrame
+            answer (str): Ответ модели
+        """
+        line = json.dumps({"row": str(row), "answer": answer}, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                # Оборванная при аварийном завершении последняя строка не должна слиться с новой записью
+                truncated = self._ends_without_newline()
+                self._file = open(self.path, "a", encoding="utf-8")
+                if truncated:
+                    self._file.write("\n")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def _ends_without_newline(self) -> bool:
+        """True, если файл не пуст и последняя строка не завершена переводом строки."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return False
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def close(self) -> None:
+        """Закрывает файл контрольной точки."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def clear(self) -> None:
+        """Удаляет контрольную точку."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,200 @@
+# src/services/progress.py
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+# Обновлений индикатора прогресса в секунду по умолчанию
+DEFAULT_UPDATES_PER_SECOND = 4.0
+
+# Окно (сек.), по которому считается текущая скорость обработки
+THROUGHPUT_WINDOW = 30.0
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """
+    Форматирует длительность для отображения.
+
+    Args:
+        seconds (Optional[float]): Длительность в секундах
+
+    Returns:
+        str: Например "45 с", "12 мин 5 с" или "1 ч 20 мин"
+    """
+    if seconds is None:
+        return "—"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours} ч {minutes} мин"
+    if minutes:
+        return f"{minutes} мин {secs} с"
+    return f"{secs} с"
+
+
+def format_progress(snapshot: Dict[str, Any]) -> str:
+    """
+    Формирует текст индикатора прогресса.
+
+    Args:
+        snapshot (Dict[str, Any]): Состояние ProgressReporter.snapshot()
+
+    Returns:
+        str: Количество строк, скорость и оставшееся время
+    """
+    text = f"Обработано строк: {snapshot['done']} из {snapshot['total']}"
+    if snapshot["rows_per_second"]:
+        text += f" · {snapshot['rows_per_second']:.1f} строк/с"
+        if snapshot["tokens_per_second"]:
+            text += f" · {snapshot['tokens_per_second']:.0f} токенов/с"
+    if snapshot["done"] < snapshot["total"] and snapshot["eta_seconds"] is not None:
+        text += f" · осталось ~{format_duration(snapshot['eta_seconds'])}"
+    return text
+
+
+def estimate_duration(rows: int, rows_per_second: Optional[float]) -> Optional[float]:
+    """
+    Оценивает время обработки строк по измеренной скорости.
+
+    Args:
+        rows (int): Количество строк
+        rows_per_second (Optional[float]): Скорость, измеренная в предыдущем запуске
+
+    Returns:
+        Optional[float]: Оценка в секундах или None, если скорость неизвестна
+    """
+    if not rows_per_second:
+        return None
+    return rows / rows_per_second
+
+
+class ProgressReporter:
+    """
+    Прореживает обновления прогресса построчной обработки.
+
+    Каждая строка вызывает update(), но обратный вызов выполняется не чаще
+    max_updates_per_second раз в секунду и не раньше, чем обработано
+    min_rows_step новых строк. В интерфейсе каждое обновление - отдельное
+    сообщение в браузер, поэтому на 50 тысячах строк обновление на каждую
+    строку заметно замедляет запуск. Последнее обновление выполняется всегда.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        callback: Callable[[Dict[str, Any]], None],
+        max_updates_per_second: float = DEFAULT_UPDATES_PER_SECOND,
+        min_rows_step: Optional[int] = None,
+        initial: int = 0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Инициализирует отчет о прогрессе.
+
+        Args:
+            total (int): Общее количество строк
+            callback (Callable): Функция, получающая snapshot() при каждом обновлении
+            max_updates_per_second (float): Максимальная частота обновлений (0 - без ограничения)
+            min_rows_step (Optional[int]): Минимум новых строк между обновлениями
+                (по умолчанию 0.1% от total)
+            initial (int): Строки, обработанные до запуска (например, из контрольной точки)
+            clock (Callable): Источник времени
+        """
+        self.total = total
+        self.callback = callback
+        self.min_interval = 1.0 / max_updates_per_second if max_updates_per_second and max_updates_per_second > 0 else 0.0
+        self.min_rows_step = max(1, min_rows_step if min_rows_step is not None else total // 1000)
+        self.initial = initial
+        self.clock = clock
+
+        self.done = initial
+        self.tokens = 0
+        self.updates = 0
+        self.start_time = clock()
+        self._last_update_time = self.start_time
+        self._last_update_done = initial
+        # Точки (время, строки, токены) для расчета скорости по скользящему окну
+        self._samples = deque([(self.start_time, initial, 0)])
+
+    def update(self, done: int, tokens: int = 0) -> bool:
+        """
+        Учитывает обработанные строки и при необходимости вызывает callback.
+
+        Args:
+            done (int): Общее количество обработанных строк
+            tokens (int): Токены, потраченные на строки с прошлого вызова
+
+        Returns:
+            bool: True, если callback был вызван
+        """
+        self.done = done
+        self.tokens += tokens
+        now = self.clock()
+
+        if done < self.total and (
+            now - self._last_update_time < self.min_interval
+            or done - self._last_update_done < self.min_rows_step
+        ):
+            return False
+
+        self._emit(now)
+        return True
+
+    def finish(self) -> None:
+        """Выполняет последнее обновление, если оно еще не отправлено."""
+        if self._last_update_done != self.done or not self.updates:
+            self._emit(self.clock())
+
+    def _emit(self, now: float) -> None:
+        self._last_update_time = now
+        self._last_update_done = self.done
+        self.updates += 1
+        self._samples.append((now, self.done, self.tokens))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= THROUGHPUT_WINDOW:
+            self._samples.popleft()
+        self.callback(self.snapshot(now))
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Возвращает текущее состояние обработки.
+
+        Скорость считается по последним THROUGHPUT_WINDOW секундам, поэтому
+        оценка оставшегося времени следует за фактической задержкой ответов.
+
+        Returns:
+            Dict[str, Any]: done, total, elapsed, rows_per_second, tokens_per_second, eta_seconds
+        """
+        now = self.clock() if now is None else now
+        first_time, first_done, first_tokens = self._samples[0]
+        span = now - first_time
+
+        rows_per_second = (self.done - first_done) / span if span > 0 else 0.0
+        tokens_per_second = (self.tokens - first_tokens) / span if span > 0 else 0.0
+        remaining = max(0, self.total - self.done)
+
+        return {
+            "done": self.done,
+            "total": self.total,
+            "elapsed": now - self.start_time,
+            "rows_per_second": rows_per_second,
+            "tokens_per_second": tokens_per_second,
+            "eta_seconds": remaining / rows_per_second if rows_per_second > 0 else None
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает итоговую скорость запуска для сводки.
+
+        Returns:
+            Dict[str, Any]: Длительность, средняя скорость, токены и количество обновлений
+        """
+        elapsed = self.clock() - self.start_time
+        processed = self.done - self.initial
+        return {
+            "elapsed": round(elapsed, 3),
+            "rows": processed,
+            "rows_per_second": round(processed / elapsed, 3) if elapsed > 0 else None,
+            "tokens": self.tokens,
+            "tokens_per_second": round(self.tokens / elapsed, 3) if elapsed > 0 else None,
+            "updates": self.updates
+        }
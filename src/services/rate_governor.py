@@ -0,0 +1,352 @@
+# src/services/rate_governor.py
+import asyncio
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+from src.services.tokenizer import count_message_tokens, count_tokens
+
+# Ограничения по умолчанию для каждого типа провайдера. requests_per_second -
+# начальная скорость, max_requests_per_second - потолок, до которого скорость
+# растет при отсутствии ошибок; tokens_per_minute=None - без ограничения по токенам.
+DEFAULT_RATE_LIMITS = {
+    "cloud": {"requests_per_second": 5.0, "max_requests_per_second": 20.0, "tokens_per_minute": None},
+    "local": {"requests_per_second": 2.0, "max_requests_per_second": 8.0, "tokens_per_minute": None}
+}
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """
+    Разбирает значение заголовка Retry-After.
+
+    Args:
+        value: Количество секунд или дата в формате HTTP
+
+    Returns:
+        Optional[float]: Пауза в секундах или None
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_request_tokens(messages: List[Dict[str, str]], max_tokens: int = 0) -> int:
+    """
+    Оценивает расход токенов запроса: сообщения плюс лимит ответа.
+
+    Args:
+        messages (List[Dict[str, str]]): Сообщения запроса
+        max_tokens (int): Максимальная длина ответа
+
+    Returns:
+        int: Приблизительное количество токенов
+    """
+    if isinstance(messages, str):
+        return count_tokens(messages) + (max_tokens or 0)
+    return count_message_tokens(messages) + (max_tokens or 0)
+
+
+class RateGovernor:
+    """
+    Регулятор частоты запросов к одному API.
+
+    Два ведра токенов ограничивают количество запросов в секунду и количество
+    токенов в минуту. Скорость подстраивается по принципу AIMD: после каждого
+    успешного ответа она немного растет, а при ответе 429 или росте задержки
+    уменьшается в несколько раз. Пауза из заголовка Retry-After
+    приостанавливает все запросы к этому API.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_second: float = 5.0,
+        max_requests_per_second: Optional[float] = None,
+        min_requests_per_second: float = 0.1,
+        tokens_per_minute: Optional[float] = None,
+        increase_step: float = 0.1,
+        decrease_factor: float = 0.5,
+        latency_threshold: Optional[float] = 30.0,
+        cooldown: float = 2.0
+    ):
+        """
+        Инициализирует регулятор.
+
+        Args:
+            name (str): Идентификатор API (обычно базовый URL)
+            requests_per_second (float): Начальная скорость запросов в секунду
+            max_requests_per_second (Optional[float]): Верхняя граница скорости
+            min_requests_per_second (float): Нижняя граница скорости
+            tokens_per_minute (Optional[float]): Лимит токенов в минуту (None - без лимита)
+            increase_step (float): Прирост скорости после успешного ответа
+            decrease_factor (float): Множитель скорости при перегрузке
+            latency_threshold (Optional[float]): Задержка ответа в секундах, выше которой скорость снижается
+            cooldown (float): Минимальный интервал между снижениями скорости в секундах
+        """
+        self.name = name
+        self.logger = logging.getLogger("RateGovernor")
+        self._lock = threading.Lock()
+
+        self.min_rate = min_requests_per_second
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_threshold = latency_threshold
+        self.cooldown = cooldown
+        self.configure(requests_per_second, max_requests_per_second, tokens_per_minute)
+
+        now = time.monotonic()
+        self._request_tokens = 1.0
+        self._budget_tokens = self.tokens_per_minute or 0.0
+        self._last_refill = now
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+
+        self.rate_limited_count = 0
+        self.total_wait = 0.0
+
+    def configure(
+        self,
+        requests_per_second: float,
+        max_requests_per_second: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None
+    ) -> None:
+        """
+        Задает ограничения регулятора.
+
+        Args:
+            requests_per_second (float): Начальная скорость запросов в секунду
+            max_requests_per_second (Optional[float]): Верхняя граница скорости
+            tokens_per_minute (Optional[float]): Лимит токенов в минуту
+        """
+        with self._lock:
+            self.max_rate = max(max_requests_per_second or requests_per_second, requests_per_second)
+            self.rate = min(max(requests_per_second, self.min_rate), self.max_rate)
+            self.tokens_per_minute = tokens_per_minute or None
+
+    def _refill(self, now: float) -> None:
+        """Пополняет ведра; вызывается под блокировкой."""
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        # Емкость ведра запросов - одна секунда работы на текущей скорости
+        self._request_tokens = min(max(1.0, self.rate), self._request_tokens + elapsed * self.rate)
+        if self.tokens_per_minute:
+            self._budget_tokens = min(self.tokens_per_minute, self._budget_tokens + elapsed * self.tokens_per_minute / 60.0)
+
+    def _reserve(self, tokens: int) -> float:
+        """
+        Пытается занять место для запроса.
+
+        Returns:
+            float: 0, если запрос можно выполнять, иначе время ожидания в секундах
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            if self._paused_until > now:
+                return self._paused_until - now
+
+            wait = 0.0
+            if self._request_tokens < 1.0:
+                wait = (1.0 - self._request_tokens) / self.rate
+
+            if self.tokens_per_minute:
+                # Запрос больше всего ведра пропускаем при полном ведре, иначе он не пройдет никогда
+                needed = min(tokens, self.tokens_per_minute)
+                if self._budget_tokens < needed:
+                    wait = max(wait, (needed - self._budget_tokens) * 60.0 / self.tokens_per_minute)
+
+            if wait > 0:
+                return wait
+
+            self._request_tokens -= 1.0
+            if self.tokens_per_minute:
+                self._budget_tokens -= tokens
+            return 0.0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Блокирует поток, пока запрос не уложится в ограничения.
+
+        Args:
+            tokens (int): Оценка расхода токенов запроса
+
+        Returns:
+            float: Суммарное время ожидания в секундах
+        """
+        waited = 0.0
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                break
+            time.sleep(wait)
+            waited += wait
+        if waited:
+            with self._lock:
+                self.total_wait += waited
+        return waited
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        """
+        Асинхронный вариант acquire: ожидание не блокирует цикл событий.
+
+        Args:
+            tokens (int): Оценка расхода токенов запроса
+
+        Returns:
+            float: Суммарное время ожидания в секундах
+        """
+        waited = 0.0
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+        if waited:
+            with self._lock:
+                self.total_wait += waited
+        return waited
+
+    def on_success(self, latency: float, estimated_tokens: int = 0, used_tokens: Optional[int] = None) -> None:
+        """
+        Учитывает успешный ответ.
+
+        Args:
+            latency (float): Время выполнения запроса в секундах
+            estimated_tokens (int): Оценка токенов, занятая при acquire
+            used_tokens (Optional[int]): Фактический расход токенов по ответу API
+        """
+        with self._lock:
+            if self.tokens_per_minute and used_tokens is not None:
+                # Возвращаем или доплачиваем разницу между оценкой и фактом
+                self._budget_tokens += estimated_tokens - used_tokens
+
+            if self.latency_threshold is not None and latency > self.latency_threshold:
+                self._decrease(time.monotonic(), f"задержка ответа {latency:.1f} сек.")
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """
+        Учитывает ответ 429 (превышение лимита запросов).
+
+        Args:
+            retry_after (Optional[float]): Пауза из заголовка Retry-After в секундах
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.rate_limited_count += 1
+            self._decrease(now, "ответ 429")
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self._paused_until = max(self._paused_until, now + pause)
+            self._request_tokens = min(self._request_tokens, 0.0)
+
+    def record_exception(self, error: BaseException) -> None:
+        """
+        Учитывает исключение клиента API, если оно означает превышение лимита.
+
+        Поддерживаются исключения с атрибутами status_code и response.headers
+        (openai.APIStatusError, httpx.HTTPStatusError).
+
+        Args:
+            error (BaseException): Исключение, возникшее при запросе
+        """
+        status_code = getattr(error, "status_code", None)
+        response = getattr(error, "response", None)
+        if status_code is None and response is not None:
+            status_code = getattr(response, "status_code", None)
+        if status_code == 429:
+            headers = getattr(response, "headers", None) or {}
+            self.on_rate_limited(parse_retry_after(headers.get("retry-after")))
+
+    def record_response(self, status_code: int, headers: Any, latency: float, estimated_tokens: int = 0) -> None:
+        """
+        Учитывает HTTP-ответ API.
+
+        Args:
+            status_code (int): HTTP-код ответа
+            headers: Заголовки ответа
+            latency (float): Время выполнения запроса в секундах
+            estimated_tokens (int): Оценка токенов, занятая при acquire
+        """
+        if status_code == 429:
+            self.on_rate_limited(parse_retry_after((headers or {}).get("retry-after")))
+        elif status_code < 400:
+            self.on_success(latency, estimated_tokens)
+
+    def _decrease(self, now: float, reason: str) -> None:
+        """Снижает скорость не чаще одного раза за cooldown; вызывается под блокировкой."""
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self.logger.info(f"{self.name}: скорость снижена до {self.rate:.2f} запр./сек. ({reason})")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает текущее состояние регулятора.
+
+        Returns:
+            Dict[str, Any]: Скорость, количество ответов 429 и суммарное ожидание
+        """
+        with self._lock:
+            return {
+                "endpoint": self.name,
+                "requests_per_second": round(self.rate, 3),
+                "rate_limited": self.rate_limited_count,
+                "total_wait": round(self.total_wait, 3)
+            }
+
+
+_governors: Dict[str, RateGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_rate_governor(
+    endpoint: str,
+    requests_per_second: float = 5.0,
+    max_requests_per_second: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None
+) -> RateGovernor:
+    """
+    Возвращает общий для процесса регулятор для указанного API.
+
+    Запуски из интерфейса и задачи TaskScheduler в одном процессе обращаются
+    к одному API через один регулятор и делят между собой его лимиты.
+
+    Args:
+        endpoint (str): Базовый URL API
+        requests_per_second (float): Начальная скорость запросов в секунду
+        max_requests_per_second (Optional[float]): Верхняя граница скорости
+        tokens_per_minute (Optional[float]): Лимит токенов в минуту
+
+    Returns:
+        RateGovernor: Регулятор частоты запросов
+    """
+    key = (endpoint or "").rstrip("/")
+    with _governors_lock:
+        governor = _governors.get(key)
+        if governor is None:
+            governor = RateGovernor(
+                key,
+                requests_per_second=requests_per_second,
+                max_requests_per_second=max_requests_per_second,
+                tokens_per_minute=tokens_per_minute
+            )
+            _governors[key] = governor
+        elif (governor.max_rate, governor.tokens_per_minute) != (
+            max(max_requests_per_second or requests_per_second, requests_per_second), tokens_per_minute or None
+        ):
+            # Ограничения изменились в настройках - применяем их, сохраняя регулятор
+            governor.configure(requests_per_second, max_requests_per_second, tokens_per_minute)
+        return governor
@@ -0,0 +1,242 @@
+# src/services/response_cache.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_CACHE_PATH = "cache/llm_responses.sqlite"
+
+
+class ResponseCache:
+    """
+    Дисковый кэш ответов LLM на SQLite.
+
+    Ключ - хэш от провайдера, модели, сообщений и параметров генерации.
+    Записи удаляются по истечении TTL и при превышении общего размера
+    (в первую очередь - давно не использованные).
+    """
+
+    # Очистка выполняется не на каждую запись, а раз в EVICT_EVERY записей
+    EVICT_EVERY = 100
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        max_size_mb: Optional[float] = 200
+    ):
+        """
+        Инициализирует кэш.
+
+        Args:
+            path (str): Путь к файлу базы SQLite
+            ttl_seconds (Optional[float]): Время жизни записи в секундах (None - без ограничения)
+            max_size_mb (Optional[float]): Максимальный суммарный размер ответов в МБ (None - без ограничения)
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.logger = logging.getLogger("ResponseCache")
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: Optional[str],
+        messages: List[Dict[str, str]],
+        temperature: float,
+        top_p: float,
+        frequency_penalty: float,
+        presence_penalty: float,
+        max_tokens: int
+    ) -> str:
+        """
+        Вычисляет ключ кэша для запроса.
+
+        Args:
+            provider (str): Идентификатор провайдера (тип и URL)
+            model (Optional[str]): Название модели
+            messages (List[Dict[str, str]]): Сообщения запроса
+            temperature, top_p, frequency_penalty, presence_penalty, max_tokens: Параметры генерации
+
+        Returns:
+            str: SHA-256 в шестнадцатеричном виде
+        """
+        payload = json.dumps(
+            {
+                "provider": provider,
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "top_p": top_p,
+                "frequency_penalty": frequency_penalty,
+                "presence_penalty": presence_penalty,
+                "max_tokens": max_tokens
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Возвращает ответ из кэша или None.
+
+        Args:
+            key (str): Ключ запроса
+
+        Returns:
+            Optional[str]: Сохраненный ответ
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        """
+        Сохраняет ответ в кэш.
+
+        Args:
+            key (str): Ключ запроса
+            response (str): Ответ модели
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode("utf-8")), now, now)
+            )
+            self._conn.commit()
+
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= self.EVICT_EVERY:
+                self._writes_since_evict = 0
+                self._evict(now)
+
+    def evict(self) -> None:
+        """Удаляет устаревшие записи и записи сверх лимита размера."""
+        with self._lock:
+            self._evict(time.time())
+
+    def _evict(self, now: float) -> None:
+        """Выполняет очистку; вызывается под блокировкой."""
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+
+        if self.max_size_bytes is not None:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_size_bytes:
+                # Удаляем давно не использованные записи, пока не уложимся в лимит
+                excess = total - self.max_size_bytes
+                removed = 0
+                keys = []
+                for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                    keys.append((key,))
+                    removed += size
+                    if removed >= excess:
+                        break
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+                self.logger.info(f"Из кэша удалено записей: {len(keys)}")
+
+        self._conn.commit()
+
+    def clear(self) -> None:
+        """Удаляет все записи кэша."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает статистику кэша.
+
+        Returns:
+            Dict[str, Any]: Попадания, промахи, число записей и размер
+        """
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "size_bytes": size
+        }
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
+
+
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(
+    path: str = DEFAULT_CACHE_PATH,
+    ttl_seconds: Optional[float] = 7 * 24 * 3600,
+    max_size_mb: Optional[float] = 200
+) -> ResponseCache:
+    """
+    Возвращает общий для процесса экземпляр кэша для указанного файла.
+
+    Интерфейс Streamlit и задачи TaskScheduler в одном процессе используют
+    один и тот же кэш и одно соединение с базой.
+
+    Args:
+        path (str): Путь к файлу базы SQLite
+        ttl_seconds (Optional[float]): Время жизни записи в секундах
+        max_size_mb (Optional[float]): Максимальный размер кэша в МБ
+
+    Returns:
+        ResponseCache: Экземпляр кэша
+    """
+    key = os.path.abspath(path)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = ResponseCache(path, ttl_seconds=ttl_seconds, max_size_mb=max_size_mb)
+        return _caches[key]
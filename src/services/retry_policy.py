@@ -0,0 +1,318 @@
+# src/services/retry_policy.py
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from src.services.rate_governor import parse_retry_after
+
+T = TypeVar('T')
+
+# HTTP-коды, при которых запрос имеет смысл повторить
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class LLMRequestError(Exception):
+    """Ошибка запроса к API LLM с HTTP-кодом ответа."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def get_status_code(error: BaseException) -> Optional[int]:
+    """
+    Извлекает HTTP-код из исключения клиента API.
+
+    Args:
+        error (BaseException): Исключение
+
+    Returns:
+        Optional[int]: HTTP-код или None
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Определяет, имеет ли смысл повторять запрос после ошибки.
+
+    Повторяются сетевые ошибки, таймауты, ответы 429 и 5xx. Ошибки
+    авторизации, некорректного запроса (400, 401, 403, 404, 422) и ошибки
+    разбора ответа не повторяются: следующая попытка закончится тем же.
+
+    Args:
+        error (BaseException): Исключение
+
+    Returns:
+        bool: True, если запрос можно повторить
+    """
+    status_code = get_status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    return not isinstance(error, (ValueError, TypeError, KeyError, IndexError, AttributeError))
+
+
+def get_retry_after(error: BaseException) -> Optional[float]:
+    """Возвращает паузу из Retry-After для исключения, если она указана."""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        return retry_after
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    return parse_retry_after(headers.get("retry-after"))
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для одного API.
+
+    После failure_threshold ошибок подряд предохранитель размыкается, и запросы
+    к API сразу завершаются ошибкой. Через recovery_timeout секунд пропускается
+    один пробный запрос: при успехе предохранитель замыкается, при ошибке
+    снова размыкается.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        """
+        Инициализирует предохранитель.
+
+        Args:
+            name (str): Идентификатор API
+            failure_threshold (int): Количество ошибок подряд до размыкания
+            recovery_timeout (float): Время до пробного запроса в секундах
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.logger = logging.getLogger("CircuitBreaker")
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """
+        Проверяет, можно ли выполнить запрос.
+
+        Returns:
+            bool: False, если предохранитель разомкнут
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                # Пропускаем единственный пробный запрос
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Учитывает успешный запрос."""
+        with self._lock:
+            if self.state != self.CLOSED:
+                self.logger.info(f"{self.name}: сервис снова доступен")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Учитывает неудачный запрос."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.logger.warning(
+                        f"{self.name}: {self.failures} ошибок подряд, запросы приостановлены на {self.recovery_timeout:.0f} сек."
+                    )
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Политика повторных попыток запросов к API LLM.
+
+    Attributes:
+        max_attempts: Максимальное количество попыток
+        initial_delay: Задержка перед второй попыткой в секундах
+        max_delay: Максимальная задержка между попытками в секундах
+        backoff_factor: Множитель экспоненциальной задержки
+        jitter: Доля случайного уменьшения задержки (0 - без разброса, 1 - от 0 до полной задержки)
+        deadline: Общий лимит времени на все попытки в секундах (None - без лимита)
+    """
+    max_attempts: int = 4
+    initial_delay: float = 1.0
+    max_delay: float = 30.0
+    backoff_factor: float = 2.0
+    jitter: float = 0.5
+    deadline: Optional[float] = 120.0
+
+    def with_overrides(self, **overrides: Any) -> "RetryPolicy":
+        """
+        Возвращает копию политики с измененными параметрами (значения None игнорируются).
+
+        Returns:
+            RetryPolicy: Новая политика
+        """
+        return replace(self, **{key: value for key, value in overrides.items() if value is not None})
+
+    def compute_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Вычисляет задержку перед следующей попыткой.
+
+        Args:
+            attempt (int): Номер неудавшейся попытки (с 1)
+            retry_after (Optional[float]): Пауза, запрошенная сервером
+
+        Returns:
+            float: Задержка в секундах
+        """
+        delay = min(self.max_delay, self.initial_delay * self.backoff_factor ** (attempt - 1))
+        # Разброс не дает параллельным запросам повторяться одновременно
+        delay *= 1 - self.jitter * random.random()
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _next_delay(self, attempt: int, error: BaseException, started: float) -> Optional[float]:
+        """Возвращает задержку перед повтором или None, если повторять не нужно."""
+        if attempt >= self.max_attempts or not is_retryable(error):
+            return None
+        delay = self.compute_delay(attempt, get_retry_after(error))
+        if self.deadline is not None and time.monotonic() - started + delay > self.deadline:
+            return None
+        return delay
+
+    def call(
+        self,
+        func: Callable[[], T],
+        breaker: Optional[CircuitBreaker] = None
+    ) -> Tuple[Optional[T], Optional[str]]:
+        """
+        Выполняет func с повторными попытками.
+
+        Args:
+            func: Функция без аргументов; при ошибке выбрасывает исключение
+            breaker (Optional[CircuitBreaker]): Предохранитель API
+
+        Returns:
+            Tuple[Optional[T], Optional[str]]: (результат, ошибка)
+        """
+        logger = logging.getLogger("RetryPolicy")
+        started = time.monotonic()
+        attempt = 0
+
+        while True:
+            attempt += 1
+            if breaker is not None and not breaker.allow_request():
+                return None, f"Сервис {breaker.name} временно недоступен: запросы приостановлены после серии ошибок"
+
+            try:
+                result = func()
+            except Exception as e:
+                error_message = self._record_failure(e, attempt, breaker)
+                delay = self._next_delay(attempt, e, started)
+                if delay is None:
+                    return None, error_message
+                logger.info(f"Попытка {attempt} не удалась. Повторная попытка через {delay:.1f} сек.")
+                time.sleep(delay)
+                continue
+
+            if breaker is not None:
+                breaker.record_success()
+            return result, None
+
+    async def acall(
+        self,
+        func: Callable[[], Awaitable[T]],
+        breaker: Optional[CircuitBreaker] = None
+    ) -> Tuple[Optional[T], Optional[str]]:
+        """
+        Асинхронный вариант call: паузы между попытками не блокируют цикл событий.
+
+        Args:
+            func: Корутина-функция без аргументов; при ошибке выбрасывает исключение
+            breaker (Optional[CircuitBreaker]): Предохранитель API
+
+        Returns:
+            Tuple[Optional[T], Optional[str]]: (результат, ошибка)
+        """
+        logger = logging.getLogger("RetryPolicy")
+        started = time.monotonic()
+        attempt = 0
+
+        while True:
+            attempt += 1
+            if breaker is not None and not breaker.allow_request():
+                return None, f"Сервис {breaker.name} временно недоступен: запросы приостановлены после серии ошибок"
+
+            try:
+                result = await func()
+            except Exception as e:
+                error_message = self._record_failure(e, attempt, breaker)
+                delay = self._next_delay(attempt, e, started)
+                if delay is None:
+                    return None, error_message
+                logger.info(f"Попытка {attempt} не удалась. Повторная попытка через {delay:.1f} сек.")
+                await asyncio.sleep(delay)
+                continue
+
+            if breaker is not None:
+                breaker.record_success()
+            return result, None
+
+    @staticmethod
+    def _record_failure(error: BaseException, attempt: int, breaker: Optional[CircuitBreaker]) -> str:
+        """Учитывает ошибку в предохранителе и возвращает ее описание."""
+        if breaker is not None:
+            if is_retryable(error):
+                breaker.record_failure()
+            else:
+                # Ошибка запроса (400, авторизация) - API ответил, значит он доступен
+                breaker.record_success()
+        return f"Ошибка в попытке {attempt}: {error}"
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint: str, failure_threshold: int = 5, recovery_timeout: float = 30.0) -> CircuitBreaker:
+    """
+    Возвращает общий для процесса предохранитель для указанного API.
+
+    Args:
+        endpoint (str): Базовый URL API
+        failure_threshold (int): Количество ошибок подряд до размыкания
+        recovery_timeout (float): Время до пробного запроса в секундах
+
+    Returns:
+        CircuitBreaker: Предохранитель
+    """
+    key = (endpoint or "").rstrip("/")
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(key, failure_threshold=failure_threshold, recovery_timeout=recovery_timeout)
+            _breakers[key] = breaker
+        else:
+            breaker.failure_threshold = max(1, failure_threshold)
+            breaker.recovery_timeout = recovery_timeout
+        return breaker
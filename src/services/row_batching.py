@@ -0,0 +1,246 @@
+# src/services/row_batching.py
+import json
+import logging
+import re
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from src.services.tokenizer import count_tokens
+
+# Размер контекстного окна моделей (в токенах)
+MODEL_CONTEXT_LIMITS = {
+    "deepseek-chat": 65536,
+    "deepseek-coder": 65536,
+    "deepseek-reasoner": 65536,
+    "gpt-3.5": 4096,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+}
+DEFAULT_CONTEXT_LIMIT = 4096
+
+BATCH_SYSTEM_PROMPT = "Вы – полезный аналитический ассистент. Вы обрабатываете несколько записей за один запрос и отвечаете строго в формате JSON."
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Считает количество токенов в тексте.
+
+    Используется общий счетчик src.services.tokenizer: словарь модели, если
+    файл токенизатора доступен, иначе приблизительный подсчет с учетом алфавита.
+
+    Args:
+        text (str): Текст для оценки
+
+    Returns:
+        int: Количество токенов
+    """
+    return count_tokens(text)
+
+
+def get_context_limit(model: Optional[str]) -> int:
+    """
+    Возвращает размер контекстного окна модели.
+
+    Args:
+        model (Optional[str]): ID модели
+
+    Returns:
+        int: Размер контекста в токенах
+    """
+    if not model:
+        return DEFAULT_CONTEXT_LIMIT
+    if model in MODEL_CONTEXT_LIMITS:
+        return MODEL_CONTEXT_LIMITS[model]
+    # Более длинные префиксы проверяем первыми (gpt-4-turbo раньше gpt-4)
+    for prefix in sorted(MODEL_CONTEXT_LIMITS, key=len, reverse=True):
+        if prefix in model:
+            return MODEL_CONTEXT_LIMITS[prefix]
+    return DEFAULT_CONTEXT_LIMIT
+
+
+class RowBatcher:
+    """
+    Упаковывает несколько строк таблицы в один запрос к LLM и разбирает ответ.
+
+    Общая часть промпта (инструкция, контекстные файлы) отправляется один раз
+    на пакет. Модель возвращает JSON-массив вида [{"id": 1, "answer": "..."}],
+    ответы сопоставляются со строками по id.
+    """
+
+    def __init__(
+        self,
+        context_limit: int = DEFAULT_CONTEXT_LIMIT,
+        row_output_tokens: int = 300,
+        max_batch_size: int = 20,
+        max_completion_tokens: int = 8000,
+        token_counter: Callable[[str], int] = estimate_tokens
+    ):
+        """
+        Инициализирует упаковщик строк.
+
+        Args:
+            context_limit (int): Размер контекстного окна модели в токенах
+            row_output_tokens (int): Бюджет ответа на одну строку (max_tokens)
+            max_batch_size (int): Максимальное количество строк в пакете
+            max_completion_tokens (int): Максимальная длина ответа модели
+            token_counter (Callable[[str], int]): Функция подсчета токенов
+        """
+        self.context_limit = context_limit
+        self.row_output_tokens = row_output_tokens
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_completion_tokens = max_completion_tokens
+        self.count_tokens = token_counter
+        self.logger = logging.getLogger("RowBatcher")
+
+    def build_header(self, instruction: str, context_text: str = "") -> str:
+        """
+        Формирует общую часть промпта для пакета.
+
+        Args:
+            instruction (str): Инструкция пользователя (без данных строки)
+            context_text (str): Дополнительный контекст
+
+        Returns:
+            str: Текст общей части промпта
+        """
+        header = (
+            f"{instruction}\n\n"
+            "Ниже приведены записи в формате JSON. Выполни задание для каждой записи "
+            "независимо от остальных.\n"
+            "Верни ответ строго в виде JSON-массива без пояснений: "
+            '[{"id": <id записи>, "answer": "<ответ для записи>"}]. '
+            "Для каждой записи должен быть ровно один элемент с ее id."
+        )
+        if context_text:
+            header += f"\n\n{context_text}"
+        return header
+
+    def plan_batches(
+        self,
+        records: List[Tuple[Hashable, Dict[str, Any]]],
+        header: str
+    ) -> List[List[Tuple[Hashable, Dict[str, Any]]]]:
+        """
+        Разбивает записи на пакеты с учетом бюджета токенов.
+
+        Пакет заполняется, пока промпт и ожидаемые ответы помещаются в контекст
+        модели, а суммарный ответ не превышает max_completion_tokens.
+
+        Args:
+            records: Список пар (ключ строки, данные строки)
+            header (str): Общая часть промпта
+
+        Returns:
+            List[List[Tuple[Hashable, Dict[str, Any]]]]: Пакеты записей
+        """
+        fixed_tokens = self.count_tokens(BATCH_SYSTEM_PROMPT) + self.count_tokens(header)
+        max_rows_by_output = max(1, self.max_completion_tokens // max(1, self.row_output_tokens))
+
+        batches = []
+        current = []
+        current_tokens = fixed_tokens
+
+        for key, record in records:
+            row_tokens = self.count_tokens(self._serialize_record(len(current) + 1, record))
+            cost = row_tokens + self.row_output_tokens
+
+            fits = current_tokens + cost <= self.context_limit
+            if current and (not fits or len(current) >= min(self.max_batch_size, max_rows_by_output)):
+                batches.append(current)
+                current = []
+                current_tokens = fixed_tokens
+
+            current.append((key, record))
+            current_tokens += cost
+
+        if current:
+            batches.append(current)
+
+        return batches
+
+    def build_messages(self, batch: List[Tuple[Hashable, Dict[str, Any]]], header: str) -> List[Dict[str, str]]:
+        """
+        Формирует сообщения для пакетного запроса.
+
+        Args:
+            batch: Пакет записей
+            header (str): Общая часть промпта
+
+        Returns:
+            List[Dict[str, str]]: Сообщения для chat_completion
+        """
+        records_text = "\n".join(
+            self._serialize_record(position, record)
+            for position, (_, record) in enumerate(batch, start=1)
+        )
+        return [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": f"{header}\n\nЗаписи:\n{records_text}"}
+        ]
+
+    def completion_tokens(self, batch_size: int) -> int:
+        """
+        Возвращает max_tokens для пакетного запроса.
+
+        Args:
+            batch_size (int): Количество строк в пакете
+
+        Returns:
+            int: Лимит токенов ответа
+        """
+        return min(self.max_completion_tokens, self.row_output_tokens * batch_size + 50)
+
+    def parse_response(self, response: str, batch: List[Tuple[Hashable, Dict[str, Any]]]) -> Dict[Hashable, str]:
+        """
+        Сопоставляет ответы модели со строками пакета.
+
+        Строки, для которых ответ не найден или пуст, в результат не попадают
+        и должны быть отправлены повторно по одной.
+
+        Args:
+            response (str): Ответ модели
+            batch: Пакет записей
+
+        Returns:
+            Dict[Hashable, str]: Ответы по ключам строк
+        """
+        items = self._extract_json_array(response or "")
+        answers = {}
+
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                position = int(item.get("id"))
+            except (TypeError, ValueError, OverflowError):
+                # Нечисловой id или бесконечное число (1e999 в JSON)
+                continue
+            answer = item.get("answer")
+            if 1 <= position <= len(batch) and answer not in (None, ""):
+                key = batch[position - 1][0]
+                answers[key] = answer if isinstance(answer, str) else json.dumps(answer, ensure_ascii=False)
+
+        return answers
+
+    @staticmethod
+    def _serialize_record(position: int, record: Dict[str, Any]) -> str:
+        """Сериализует запись в одну строку JSON с идентификатором позиции."""
+        return json.dumps({"id": position, **{str(k): str(v) for k, v in record.items()}}, ensure_ascii=False)
+
+    def _extract_json_array(self, text: str) -> List[Any]:
+        """
+        Извлекает JSON-массив из ответа модели.
+
+        Модели часто оборачивают JSON в блок ```json ... ``` или добавляют
+        пояснения, поэтому берется фрагмент от первой [ до последней ].
+        """
+        text = re.sub(r"```(?:json)?", "", text).strip()
+        start = text.find("[")
+        end = text.rfind("]")
+        if start == -1 or end <= start:
+            return []
+        try:
+            data = json.loads(text[start:end + 1])
+        except json.JSONDecodeError as e:
+            self.logger.warning(f"Не удалось разобрать JSON ответа пакета: {e}")
+            return []
+        return data if isinstance(data, list) else []
@@ -0,0 +1,318 @@
+# src/services/row_dedup.py
+import re
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_column(series: pd.Series) -> pd.Series:
+    """
+    Нормализует значения столбца для сравнения строк.
+
+    Пропуски приводятся к пустой строке, пробелы по краям удаляются,
+    повторяющиеся пробельные символы схлопываются, регистр не учитывается.
+
+    Args:
+        series (pd.Series): Столбец DataFrame
+
+    Returns:
+        pd.Series: Нормализованные строковые значения
+    """
+    return (
+        series.fillna("")
+        .astype(str)
+        .str.strip()
+        .str.replace(r"\s+", " ", regex=True)
+        .str.casefold()
+    )
+
+
+def group_duplicate_rows(df: pd.DataFrame, columns: Sequence[str]) -> Dict[Hashable, List[Hashable]]:
+    """
+    Группирует строки с одинаковыми нормализованными значениями в указанных столбцах.
+
+    Args:
+        df (pd.DataFrame): Исходные данные
+        columns (Sequence[str]): Столбцы, по которым сравниваются строки
+
+    Returns:
+        Dict[Hashable, List[Hashable]]: Индекс первой строки группы -> индексы всех строк группы
+            (в порядке исходного DataFrame)
+    """
+    if df.empty:
+        return {}
+
+    # Столбцы нумеруются по позиции, чтобы повтор столбца в списке не ломал группировку
+    normalized = pd.DataFrame(
+        {position: normalize_column(df[column]) for position, column in enumerate(dict.fromkeys(columns))},
+        index=df.index
+    )
+    codes = normalized.groupby(list(normalized.columns), sort=False).ngroup().to_numpy()
+
+    groups: Dict[int, List[Hashable]] = {}
+    for code, index in zip(codes, df.index):
+        groups.setdefault(code, []).append(index)
+
+    return {members[0]: members for members in groups.values()}
+
+
+def dedup_ratio(total_rows: int, unique_rows: int) -> float:
+    """
+    Возвращает долю строк, для которых запрос к LLM не понадобился.
+
+    Args:
+        total_rows (int): Всего строк
+        unique_rows (int): Уникальных групп строк
+
+    Returns:
+        float: Доля дубликатов от 0 до 1
+    """
+    if not total_rows:
+        return 0.0
+    return round(1 - unique_rows / total_rows, 4)
+
+
+# Параметры поиска почти одинаковых строк (MinHash LSH)
+DEFAULT_NEAR_DUPLICATE_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 64
+DEFAULT_SHINGLE_SIZE = 5
+# Из каждого значения сравниваются только первые символы
+MAX_SHINGLE_CHARS = 2000
+# Строк, обрабатываемых за один проход (ограничивает память промежуточных массивов)
+SIGNATURE_CHUNK_ROWS = 1024
+
+_HASH_PRIME = np.uint64(1099511628211)
+_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+_EMPTY_BIN = np.iinfo(np.uint64).max
+
+# Знаки препинания и символы (любого алфавита) не влияют на сходство текстов
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]+")
+
+
+def char_ngram_hashes(texts: Sequence[str], size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Хэширует все символьные n-граммы текстов без цикла по символам.
+
+    Тексты переводятся в матрицу кодов символов (дополненную нулями справа),
+    хэши n-грамм считаются сдвигами этой матрицы.
+
+    Args:
+        texts (Sequence[str]): Тексты
+        size (int): Длина n-граммы
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Хэши (тексты, позиции) uint64 и маска n-грамм,
+            целиком лежащих внутри текста
+    """
+    width = max(max(map(len, texts), default=0), size)
+    codes = np.array(texts, dtype=f"<U{width}").view(np.uint32).reshape(len(texts), width).astype(np.uint64)
+    span = width - size + 1
+
+    hashes = np.full((len(texts), span), size, dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * _HASH_PRIME + codes[:, offset:offset + span]
+    hashes ^= hashes >> np.uint64(29)
+    hashes *= _HASH_MIX
+    # Последний символ n-граммы не нулевой - n-грамма целиком внутри текста
+    return hashes, codes[:, size - 1:] != 0
+
+
+def normalize_text(series: pd.Series) -> pd.Series:
+    """
+    Нормализует текст для поиска почти одинаковых значений.
+
+    Помимо normalize_column удаляет знаки препинания. Замена выполняется
+    модулем re: в строковом типе pandas на pyarrow класс \\w не включает кириллицу.
+
+    Args:
+        series (pd.Series): Столбец DataFrame
+
+    Returns:
+        pd.Series: Нормализованные строковые значения
+    """
+    return normalize_column(series.fillna("").astype(str).map(lambda text: PUNCTUATION_PATTERN.sub(" ", text)))
+
+
+def minhash_signatures(texts: Sequence[str], num_perm: int = DEFAULT_NUM_PERM, shingle_size: int = DEFAULT_SHINGLE_SIZE) -> np.ndarray:
+    """
+    Вычисляет MinHash-подписи множеств символьных шинглов.
+
+    Используется хэширование одной перестановкой: каждый шингл хэшируется
+    один раз и попадает в одну из num_perm корзин, в корзине сохраняется
+    минимальный хэш. Пустые корзины заполняются из ближайшей непустой справа
+    (с поправкой на расстояние), поэтому доля совпадающих позиций подписей
+    оценивает коэффициент Жаккара. Память - O(строк * num_perm).
+
+    Args:
+        texts (Sequence[str]): Нормализованные тексты
+        num_perm (int): Длина подписи
+        shingle_size (int): Длина шингла в символах
+
+    Returns:
+        np.ndarray: Подписи (тексты, num_perm) uint64; у текстов без шинглов все
+            позиции равны максимальному значению uint64
+    """
+    signatures = np.full((len(texts), num_perm), _EMPTY_BIN, dtype=np.uint64)
+    positions = np.arange(num_perm)
+
+    for start in range(0, len(texts), SIGNATURE_CHUNK_ROWS):
+        chunk = [f" {text[:MAX_SHINGLE_CHARS]} " if text else "" for text in texts[start:start + SIGNATURE_CHUNK_ROWS]]
+        hashes, valid = char_ngram_hashes(chunk, shingle_size)
+
+        rows = np.broadcast_to(np.arange(len(chunk))[:, None], hashes.shape)[valid]
+        values = hashes[valid]
+        bins = (values % np.uint64(num_perm)).astype(np.int64)
+        flat = np.full(len(chunk) * num_perm, _EMPTY_BIN, dtype=np.uint64)
+        np.minimum.at(flat, rows * num_perm + bins, values // np.uint64(num_perm))
+        block = flat.reshape(len(chunk), num_perm)
+
+        # Уплотнение: пустая корзина берет значение ближайшей непустой справа (по кругу)
+        filled = block != _EMPTY_BIN
+        has_any = filled.any(axis=1)
+        if not filled[has_any].all():
+            doubled = np.where(np.hstack([filled, filled]), np.arange(2 * num_perm), 2 * num_perm)
+            nearest = np.minimum.accumulate(doubled[:, ::-1], axis=1)[:, ::-1][:, :num_perm]
+            nearest = np.where(has_any[:, None], nearest, positions)
+            source = np.take_along_axis(block, nearest % num_perm, axis=1)
+            shifted = source + (nearest - positions).astype(np.uint64) * _HASH_MIX
+            block = np.where(filled | ~has_any[:, None], block, shifted)
+
+        signatures[start:start + len(chunk)] = block
+
+    return signatures
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Подбирает число полос LSH и строк в полосе для порога сходства.
+
+    Пара с коэффициентом Жаккара s становится кандидатом с вероятностью
+    1 - (1 - s^r)^b; порог этой кривой примерно (1 / b)^(1 / r).
+
+    Args:
+        num_perm (int): Длина подписи
+        threshold (float): Порог коэффициента Жаккара
+
+    Returns:
+        Tuple[int, int]: (полос, строк в полосе)
+    """
+    options = [(num_perm // r, r) for r in range(1, num_perm + 1) if num_perm % r == 0]
+    # При равной близости к порогу предпочитаем меньший порог кривой (меньше пропусков)
+    return min(options, key=lambda option: (abs((1 / option[0]) ** (1 / option[1]) - threshold), option[1]))
+
+
+def _find(parents: List[int], item: int) -> int:
+    """Корень множества в системе непересекающихся множеств."""
+    root = item
+    while parents[root] != root:
+        root = parents[root]
+    while parents[item] != root:
+        parents[item], item = root, parents[item]
+    return root
+
+
+def cluster_near_duplicates(
+    texts: Sequence[str],
+    threshold: float = DEFAULT_NEAR_DUPLICATE_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM,
+    shingle_size: int = DEFAULT_SHINGLE_SIZE
+) -> np.ndarray:
+    """
+    Объединяет почти одинаковые тексты в кластеры с помощью MinHash LSH.
+
+    Подписи делятся на полосы; тексты с совпадающей полосой - кандидаты.
+    Каждый кандидат сравнивается с первым текстом своей корзины, и при оценке
+    сходства не ниже threshold их кластеры объединяются. Время и память
+    линейны по числу текстов.
+
+    Args:
+        texts (Sequence[str]): Нормализованные тексты (см. normalize_text)
+        threshold (float): Порог коэффициента Жаккара
+        num_perm (int): Длина подписи
+        shingle_size (int): Длина шингла в символах
+
+    Returns:
+        np.ndarray: Номер кластера каждого текста (номер первого текста кластера)
+    """
+    signatures = minhash_signatures(texts, num_perm, shingle_size)
+    parents = list(range(len(texts)))
+    has_shingles = signatures[:, 0] != _EMPTY_BIN
+    candidates = np.flatnonzero(has_shingles)
+
+    bands, rows = lsh_bands(num_perm, threshold)
+    for band in range(bands):
+        part = signatures[candidates, band * rows:(band + 1) * rows]
+        keys = np.zeros(len(candidates), dtype=np.uint64)
+        for column in range(rows):
+            keys = (keys ^ part[:, column]) * _HASH_PRIME
+
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        leaders = candidates[order[np.repeat(starts, np.diff(np.r_[starts, len(order)]))]]
+        members = candidates[order]
+        pairs = leaders != members
+        if not pairs.any():
+            continue
+
+        leaders, members = leaders[pairs], members[pairs]
+        similarity = (signatures[leaders] == signatures[members]).mean(axis=1)
+        for leader, member in zip(leaders[similarity >= threshold].tolist(), members[similarity >= threshold].tolist()):
+            root_leader, root_member = _find(parents, leader), _find(parents, member)
+            if root_leader != root_member:
+                parents[max(root_leader, root_member)] = min(root_leader, root_member)
+
+    labels = np.array([_find(parents, item) for item in range(len(texts))], dtype=np.int64)
+
+    # Тексты короче шингла объединяются только при полном совпадении
+    short = np.flatnonzero(~has_shingles)
+    if len(short):
+        first = {}
+        for item in short.tolist():
+            labels[item] = first.setdefault(texts[item], item)
+    return labels
+
+
+def group_near_duplicate_rows(
+    df: pd.DataFrame,
+    text_column: str,
+    columns: Sequence[str] = (),
+    threshold: float = DEFAULT_NEAR_DUPLICATE_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM,
+    shingle_size: int = DEFAULT_SHINGLE_SIZE
+) -> Dict[Hashable, List[Hashable]]:
+    """
+    Группирует строки с почти одинаковым текстом в text_column.
+
+    Значения остальных столбцов columns должны совпадать так же, как в
+    group_duplicate_rows. Одинаковые строки всегда попадают в одну группу.
+
+    Args:
+        df (pd.DataFrame): Исходные данные
+        text_column (str): Текстовый столбец, сравниваемый по сходству
+        columns (Sequence[str]): Столбцы, сравниваемые на точное совпадение
+        threshold (float): Порог коэффициента Жаккара
+        num_perm (int): Длина MinHash-подписи
+        shingle_size (int): Длина шингла в символах
+
+    Returns:
+        Dict[Hashable, List[Hashable]]: Индекс первой строки группы -> индексы всех строк группы
+            (в порядке исходного DataFrame)
+    """
+    if df.empty:
+        return {}
+
+    # Одинаковые тексты подписываются и сравниваются один раз
+    codes, texts = pd.factorize(normalize_text(df[text_column]))
+    labels = cluster_near_duplicates(list(texts), threshold, num_perm, shingle_size)[codes]
+    keys = pd.DataFrame({"cluster": labels}, index=df.index)
+    for position, column in enumerate(dict.fromkeys(col for col in columns if col != text_column)):
+        keys[position] = normalize_column(df[column])
+    codes = keys.groupby(list(keys.columns), sort=False).ngroup().to_numpy()
+
+    groups: Dict[int, List[Hashable]] = {}
+    for code, index in zip(codes, df.index):
+        groups.setdefault(code, []).append(index)
+
+    return {members[0]: members for members in groups.values()}
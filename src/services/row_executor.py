@@ -0,0 +1,206 @@
+# src/services/row_executor.py
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Iterator, Optional, Tuple
+
+# Количество одновременных запросов по умолчанию для каждого типа провайдера.
+# Облачные API хорошо переносят параллельные запросы, локальные модели обычно
+# обслуживают один-два запроса одновременно.
+DEFAULT_CONCURRENCY = {
+    "cloud": 8,
+    "local": 2
+}
+
+
+def get_concurrency(provider_type: str, settings: Optional[Dict[str, Any]] = None, config_manager=None) -> int:
+    """
+    Определяет количество одновременных запросов для типа провайдера.
+
+    Приоритет: явное значение в settings["concurrency"], затем
+    processing.concurrency.<provider_type> из конфигурации, затем DEFAULT_CONCURRENCY.
+
+    Args:
+        provider_type (str): Тип провайдера ("cloud" или "local")
+        settings (Optional[Dict[str, Any]]): Настройки LLM
+        config_manager: Менеджер конфигурации (ConfigManager)
+
+    Returns:
+        int: Количество одновременных запросов (не меньше 1)
+    """
+    value = None
+
+    if isinstance(settings, dict) and settings.get("concurrency"):
+        value = settings["concurrency"]
+    elif config_manager is not None:
+        value = config_manager.get(f"processing.concurrency.{provider_type}")
+
+    if value is None:
+        value = DEFAULT_CONCURRENCY.get(provider_type, 1)
+
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return DEFAULT_CONCURRENCY.get(provider_type, 1)
+
+
+class RowExecutor:
+    """
+    Ограниченный пул потоков для параллельной обработки строк.
+
+    Одновременно выполняется не более max_workers задач. Задачи берутся из
+    входного итератора по мере освобождения слотов, поэтому подготовка
+    промптов для 50 тысяч строк не выполняется заранее целиком.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        """
+        Инициализирует исполнитель.
+
+        Args:
+            max_workers (int): Максимальное количество одновременных задач
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.logger = logging.getLogger("RowExecutor")
+
+    def run(
+        self,
+        items: Iterable[Tuple[Hashable, Any]],
+        worker: Callable[[Any], Any]
+    ) -> Iterator[Tuple[Hashable, Any, Optional[Exception]]]:
+        """
+        Выполняет worker для каждого элемента и отдает результаты по мере готовности.
+
+        Итерация по items и обработка результатов происходят в вызывающем потоке,
+        поэтому в цикле по результатам можно безопасно обновлять DataFrame и UI.
+
+        Args:
+            items: Итератор пар (ключ, данные для обработки)
+            worker: Функция, обрабатывающая данные одного элемента
+
+        Yields:
+            Tuple[Hashable, Any, Optional[Exception]]: (ключ, результат, исключение)
+        """
+        iterator = iter(items)
+        pending = {}
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="row-worker")
+
+        def _submit_next() -> bool:
+            try:
+                key, payload = next(iterator)
+            except StopIteration:
+                return False
+            pending[executor.submit(worker, payload)] = key
+            return True
+
+        try:
+            # Заполняем все слоты пула
+            while len(pending) < self.max_workers and _submit_next():
+                pass
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    key = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.logger.error(f"Ошибка при обработке элемента {key}: {e}")
+                        result = None
+                        error = e
+                    else:
+                        error = None
+
+                    yield key, result, error
+
+                    # Освободившийся слот сразу занимаем следующей задачей
+                    _submit_next()
+        finally:
+            # При досрочной остановке отменяем задачи, которые еще не начались
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def run_async(
+        self,
+        items: Iterable[Tuple[Hashable, Any]],
+        worker: Callable[[Any], Awaitable[Any]]
+    ) -> Iterator[Tuple[Hashable, Any, Optional[Exception]]]:
+        """
+        Выполняет корутину worker для каждого элемента в одном цикле событий.
+
+        Цикл событий работает в фоновом потоке, а результаты передаются в
+        вызывающий поток через очередь. Так сотни запросов могут находиться
+        в работе одновременно без отдельного потока на каждый запрос.
+
+        Args:
+            items: Итератор пар (ключ, данные для обработки)
+            worker: Корутина-функция, обрабатывающая данные одного элемента
+
+        Yields:
+            Tuple[Hashable, Any, Optional[Exception]]: (ключ, результат, исключение)
+        """
+        results = queue.Queue()
+        stop = threading.Event()
+        finished = object()
+
+        async def _run_one(key, payload):
+            try:
+                results.put((key, await worker(payload), None))
+            except Exception as e:
+                self.logger.error(f"Ошибка при обработке элемента {key}: {e}")
+                results.put((key, None, e))
+
+        async def _main():
+            in_flight = set()
+            try:
+                for key, payload in items:
+                    if stop.is_set():
+                        break
+                    if len(in_flight) >= self.max_workers:
+                        _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    in_flight.add(asyncio.ensure_future(_run_one(key, payload)))
+
+                if stop.is_set():
+                    for task in in_flight:
+                        task.cancel()
+                if in_flight:
+                    await asyncio.gather(*in_flight, return_exceptions=True)
+                results.put((finished, None, None))
+            except Exception as e:
+                results.put((finished, None, e))
+
+        thread = threading.Thread(target=lambda: asyncio.run(_main()), name="row-event-loop", daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                key, result, error = results.get()
+                if key is finished:
+                    if error is not None:
+                        raise error
+                    break
+                yield key, result, error
+        finally:
+            stop.set()
+            thread.join()
+
+    def map(self, items: Iterable[Tuple[Hashable, Any]], worker: Callable[[Any], Any]) -> Dict[Hashable, Any]:
+        """
+        Выполняет worker для всех элементов и возвращает результаты в исходном порядке.
+
+        Args:
+            items: Итератор пар (ключ, данные для обработки)
+            worker: Функция, обрабатывающая данные одного элемента
+
+        Returns:
+            Dict[Hashable, Any]: Результаты по ключам в порядке входных элементов
+        """
+        items = list(items)
+        results = {key: None for key, _ in items}
+
+        for key, result, error in self.run(items, worker):
+            results[key] = result if error is None else None
+
+        return results
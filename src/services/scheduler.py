@@ -4,11 +4,13 @@ import schedule
 import time
 import threading
 import os
-import pandas as pd
 from datetime import datetime
 import json
 import logging
 
+from src.core.excel_loader import read_excel_columns
+from src.core.excel_writer import write_excel
+
 class TaskScheduler:
     def __init__(self, tasks_file="scheduled_tasks.json"):
         """
@@ -113,37 +115,42 @@ class TaskScheduler:
             self.logger.info(f"Выполнение задачи {task['name']}")
             
             # Загрузка Excel
-            df = pd.read_excel(task["excel_path"])
+            df = read_excel_columns(task["excel_path"])
             
             # Импортируем нужные модули внутри функции для избежания циклических импортов
-            from src.llm.unified_provider import UnifiedLLM as UnifiedLLMProvider
+            from src.config.manager import ConfigManager
+            from src.core.analysis_engine import AnalysisEngine, create_llm_provider
             
             # Инициализация LLM провайдера
-            llm_provider = UnifiedLLMProvider(task["config"]["llm_settings"])
-            
-            result_df = None # Инициализация result_df
+            config_manager = ConfigManager()
+            llm_provider = create_llm_provider(task["config"]["llm_settings"], config_manager)
             
-            # Выполнение анализа в зависимости от режима
-            if task["config"]["mode"] == "Построчный анализ":
-                from app import process_row_by_row
-                result_df = process_row_by_row(
-                    df, 
-                    llm_provider, 
-                    task["config"]["llm_settings"],
-                    task["config"]["target_column"],
-                    task["config"].get("additional_columns", []),
-                    None  # Контекстные файлы пока не поддерживаются
-                )
-            # ... другие режимы ...
+            # Выполнение анализа в режиме задачи (контекстные файлы пока не поддерживаются)
+            engine = AnalysisEngine(llm_provider, task["config"]["llm_settings"], config_manager)
+            result = engine.run(df, task["config"])
+            for error in result.errors:
+                self.logger.error(f"Задача {task['name']}: {error}")
+            result_df = result.result_df
             
             # Сохранение результатов
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_path = f"scheduled_results/{task['name']}_{timestamp}.xlsx"
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             if result_df is not None:
-                result_df.to_excel(output_path, index=False)
+                write_excel(result_df, output_path)
+                if result.table_analysis:
+                    # Результат анализа всей таблицы сохраняем рядом с таблицей
+                    with open(os.path.splitext(output_path)[0] + ".txt", "w", encoding="utf-8") as f:
+                        f.write(result.table_analysis)
             else:
-                self.logger.warning(f"Нет данных для сохранения для задачи {task['name']}. Возможно, режим анализа не реализован.")
+                self.logger.warning(f"Нет данных для сохранения для задачи {task['name']}.")
+            
+            # Статистика кэша ответов за этот запуск
+            cache_stats = llm_provider.get_cache_stats()
+            if cache_stats["enabled"]:
+                self.logger.info(
+                    f"Кэш ответов для задачи {task['name']}: попаданий {cache_stats['hits']}, промахов {cache_stats['misses']}"
+                )
             
             # Обновление информации о задаче
             task["last_run"] = datetime.now().isoformat()
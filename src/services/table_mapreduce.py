@@ -0,0 +1,533 @@
+# src/services/table_mapreduce.py
+import hashlib
+import logging
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from src.services.row_batching import estimate_tokens
+from src.services.row_executor import RowExecutor
+
+MAP_SYSTEM_PROMPT = "Вы – эксперт по анализу данных. Вы анализируете часть большой таблицы и кратко излагаете существенное для общего отчета."
+REDUCE_SYSTEM_PROMPT = "Вы – эксперт по анализу данных и бизнес-аналитике. Вы объединяете частичные отчеты по таблице в один."
+
+LINE_BREAKS = re.compile(r"[\r\n]+")
+
+# Доля бюджета части, после которой разрешена граница по содержимому строки
+MIN_PARTITION_FILL = 0.5
+
+
+def serialize_rows(df: pd.DataFrame) -> List[str]:
+    """
+    Представляет строки таблицы в виде текстовых строк "индекс | значение | ...".
+
+    Переводы строк внутри ячеек заменяются пробелами, чтобы одна строка
+    таблицы занимала одну строку текста; пропущенные значения - пустые.
+
+    Args:
+        df (pd.DataFrame): Таблица
+
+    Returns:
+        List[str]: Текст каждой строки в порядке строк DataFrame
+    """
+    # В pandas 3 astype(str) оставляет пропуски как NaN, поэтому они заменяются заранее
+    values = df.astype(object).where(df.notna(), "").astype(str).replace(r"[\r\n]+", " ", regex=True)
+    return [
+        " | ".join((str(index),) + row)
+        for index, row in zip(df.index, values.itertuples(index=False, name=None))
+    ]
+
+
+def serialize_row(index: Any, values: Iterable[Any]) -> str:
+    """
+    Представляет одну строку таблицы так же, как serialize_rows.
+
+    Args:
+        index (Any): Индекс строки
+        values (Iterable[Any]): Значения столбцов
+
+    Returns:
+        str: Текст строки
+    """
+    return " | ".join([str(index)] + [
+        "" if pd.api.types.is_scalar(value) and pd.isna(value) else LINE_BREAKS.sub(" ", str(value))
+        for value in values
+    ])
+
+
+def table_header(df: pd.DataFrame) -> str:
+    """Возвращает строку заголовка таблицы в формате serialize_rows."""
+    return " | ".join(["№"] + [str(col) for col in df.columns])
+
+
+def _boundary_hash(line: str) -> int:
+    """Стабильный хэш текста строки для выбора границ частей."""
+    return int.from_bytes(hashlib.md5(line.encode("utf-8")).digest()[:8], "big")
+
+
+def partition_lines(
+    lines: List[str],
+    budget_tokens: int,
+    token_counter: Callable[[str], int] = estimate_tokens
+) -> List[Tuple[int, int]]:
+    """
+    Разбивает строки на части, каждая из которых помещается в бюджет токенов.
+
+    Границы частей выбираются по содержимому строк: после заполнения
+    половины бюджета часть заканчивается на строке, хэш которой делится на
+    ожидаемое число строк в части. Поэтому изменение одной строки сдвигает
+    границы только соседних частей, а остальные части дают тот же промпт и
+    берутся из кэша ответов.
+
+    Args:
+        lines (List[str]): Текст строк таблицы
+        budget_tokens (int): Бюджет токенов на данные одной части
+        token_counter (Callable[[str], int]): Функция подсчета токенов
+
+    Returns:
+        List[Tuple[int, int]]: Границы частей [начало, конец)
+    """
+    if not lines:
+        return []
+
+    costs = [token_counter(line) for line in lines]
+    average_cost = max(1.0, sum(costs) / len(costs))
+    # Ожидаемое число строк между минимальным заполнением и полным бюджетом
+    divisor = max(1, int(budget_tokens * (1 - MIN_PARTITION_FILL) / average_cost))
+
+    partitions = []
+    start = 0
+    current_tokens = 0
+
+    for i, cost in enumerate(costs):
+        if i > start and current_tokens + cost > budget_tokens:
+            partitions.append((start, i))
+            start, current_tokens = i, 0
+
+        current_tokens += cost
+
+        if current_tokens >= budget_tokens * MIN_PARTITION_FILL and _boundary_hash(lines[i]) % divisor == 0:
+            partitions.append((start, i + 1))
+            start, current_tokens = i + 1, 0
+
+    if start < len(lines):
+        partitions.append((start, len(lines)))
+
+    return partitions
+
+
+class TableMapReducer:
+    """
+    Анализ всех строк таблицы по схеме map-reduce.
+
+    Таблица делится на части в пределах контекстного окна модели, каждая
+    часть кратко анализируется (map), затем частичные отчеты объединяются
+    группами в дерево, пока не останется один итоговый отчет (reduce).
+    Запросы каждого уровня выполняются параллельно. Промпты частей и узлов
+    не зависят от их номеров, поэтому при повторном запуске после небольшой
+    правки кэш ответов провайдера отдает неизмененные ветви без запросов.
+    """
+
+    def __init__(
+        self,
+        llm_provider,
+        model_params: Dict[str, Any],
+        context_limit: int,
+        partition_output_tokens: int = 600,
+        fan_in: int = 4,
+        max_workers: int = 4,
+        max_partition_tokens: Optional[int] = None,
+        token_counter: Callable[[str], int] = estimate_tokens
+    ):
+        """
+        Инициализирует анализ map-reduce.
+
+        Args:
+            llm_provider: Провайдер LLM
+            model_params (Dict[str, Any]): Параметры модели для итогового отчета
+            context_limit (int): Размер контекстного окна модели в токенах
+            partition_output_tokens (int): max_tokens для отчета по части и промежуточного узла
+            fan_in (int): Максимальное число отчетов, объединяемых одним запросом
+            max_workers (int): Количество одновременных запросов
+            max_partition_tokens (Optional[int]): Ограничение размера части в токенах
+                (меньшие части - больше параллелизма и точнее повторное использование кэша)
+            token_counter (Callable[[str], int]): Функция подсчета токенов
+        """
+        self.llm_provider = llm_provider
+        self.model_params = dict(model_params)
+        self.context_limit = context_limit
+        self.partition_output_tokens = partition_output_tokens
+        self.fan_in = max(2, fan_in)
+        self.max_workers = max(1, max_workers)
+        self.max_partition_tokens = max_partition_tokens
+        self.count_tokens = token_counter
+        self.logger = logging.getLogger("TableMapReducer")
+
+    def _data_budget(self, fixed_text: str, output_tokens: int) -> int:
+        """Токены, доступные для данных после промпта и ответа."""
+        budget = self.context_limit - self.count_tokens(fixed_text) - output_tokens
+        if self.max_partition_tokens:
+            budget = min(budget, self.max_partition_tokens)
+        return max(1, budget)
+
+    def build_map_messages(self, instruction: str, header: str, lines: List[str], final: bool) -> List[Dict[str, str]]:
+        """
+        Формирует сообщения для анализа части таблицы.
+
+        Args:
+            instruction (str): Задание пользователя и описание таблицы
+            header (str): Строка заголовка таблицы
+            lines (List[str]): Строки части
+            final (bool): Таблица поместилась в одну часть - нужен итоговый отчет
+
+        Returns:
+            List[Dict[str, str]]: Сообщения для chat_completion
+        """
+        if final:
+            task = "Проведи тщательный анализ и предоставь детальные, структурированные результаты с выводами и рекомендациями."
+            system_prompt = REDUCE_SYSTEM_PROMPT
+        else:
+            task = (
+                "Это часть большой таблицы. Кратко изложи наблюдения по этой части, важные для задания: "
+                "закономерности, количественные итоги, аномалии и примеры. Общий отчет будет составлен позже."
+            )
+            system_prompt = MAP_SYSTEM_PROMPT
+        rows_text = "\n".join([header] + lines)
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"{instruction}\n\n{task}\n\nСтроки таблицы:\n{rows_text}"}
+        ]
+
+    def build_reduce_messages(self, instruction: str, summaries: List[str], final: bool) -> List[Dict[str, str]]:
+        """
+        Формирует сообщения для объединения частичных отчетов.
+
+        Args:
+            instruction (str): Задание пользователя и описание таблицы
+            summaries (List[str]): Объединяемые отчеты в порядке строк таблицы
+            final (bool): Узел является корнем дерева
+
+        Returns:
+            List[Dict[str, str]]: Сообщения для chat_completion
+        """
+        if final:
+            task = (
+                "Ниже приведены отчеты по последовательным частям таблицы, вместе они охватывают все строки. "
+                "Объедини их и предоставь детальный, структурированный отчет по всей таблице с выводами и рекомендациями."
+            )
+        else:
+            task = (
+                "Ниже приведены отчеты по последовательным частям таблицы. Объедини их в один краткий отчет, "
+                "сохранив количественные итоги, закономерности и аномалии. Общий отчет будет составлен позже."
+            )
+        reports = "\n\n".join(f"Отчет {i}:\n{summary}" for i, summary in enumerate(summaries, start=1))
+        return [
+            {"role": "system", "content": REDUCE_SYSTEM_PROMPT},
+            {"role": "user", "content": f"{instruction}\n\n{task}\n\n{reports}"}
+        ]
+
+    def group_summaries(self, instruction: str, summaries: List[str]) -> List[Tuple[int, int]]:
+        """
+        Делит отчеты уровня на группы для объединения.
+
+        Группа содержит не более fan_in отчетов и помещается в контекст модели.
+
+        Returns:
+            List[Tuple[int, int]]: Границы групп [начало, конец)
+        """
+        budget = self._data_budget(self.build_reduce_messages(instruction, [], True)[1]["content"], self.model_params.get("max_tokens", 0))
+        groups = []
+        start = 0
+        current_tokens = 0
+        for i, summary in enumerate(summaries):
+            cost = self.count_tokens(summary)
+            if i > start and (i - start >= self.fan_in or current_tokens + cost > budget):
+                groups.append((start, i))
+                start, current_tokens = i, 0
+            current_tokens += cost
+        groups.append((start, len(summaries)))
+        return groups
+
+    def _run_level(self, requests: List[List[Dict[str, str]]], max_tokens: int, on_done: Callable[[], None]) -> List[Tuple[Optional[str], Optional[str]]]:
+        """Параллельно выполняет запросы одного уровня и возвращает ответы в исходном порядке."""
+        params = {**self.model_params, "max_tokens": max_tokens}
+        results: List[Tuple[Optional[str], Optional[str]]] = [(None, None)] * len(requests)
+
+        def worker(messages):
+            return self.llm_provider.chat_completion(messages=messages, **params)
+
+        executor = RowExecutor(max_workers=self.max_workers)
+        for i, result, error in executor.run(enumerate(requests), worker):
+            results[i] = (None, f"Ошибка при вызове LLM: {error}") if error is not None else result
+            on_done()
+        return results
+
+    def run(
+        self,
+        df: pd.DataFrame,
+        instruction: str,
+        on_progress: Optional[Callable[[int, int, str], None]] = None
+    ) -> Tuple[Optional[str], Optional[str], Dict[str, Any]]:
+        """
+        Анализирует все строки таблицы.
+
+        Args:
+            df (pd.DataFrame): Таблица
+            instruction (str): Задание пользователя и описание таблицы
+            on_progress (Optional[Callable]): Функция (выполнено, всего, текст)
+
+        Returns:
+            Tuple[Optional[str], Optional[str], Dict[str, Any]]: (отчет, ошибка, статистика).
+            Если часть запросов не удалась, отчет строится по остальным, а в ошибке
+            перечисляются неудачные части.
+        """
+        on_progress = on_progress or (lambda done, total, text: None)
+        header = table_header(df)
+        lines = serialize_rows(df)
+
+        map_fixed = self.build_map_messages(instruction, header, [], False)
+        budget = self._data_budget(map_fixed[0]["content"] + map_fixed[1]["content"], self.model_params.get("max_tokens", 0))
+        partitions = partition_lines(lines, budget, self.count_tokens)
+        stats = {"partitions": len(partitions), "levels": 1, "requests": len(partitions)}
+
+        if not partitions:
+            return None, "Таблица не содержит строк", stats
+
+        # Таблица поместилась в один запрос - сразу итоговый отчет
+        if len(partitions) == 1:
+            on_progress(0, 1, "Выполняется анализ всей таблицы...")
+            messages = self.build_map_messages(instruction, header, lines, True)
+            result, error = self._run_level([messages], self.model_params.get("max_tokens", 300), lambda: on_progress(1, 1, "Анализ всей таблицы завершен"))[0]
+            return result, error, stats
+
+        done = 0
+
+        def on_done():
+            nonlocal done
+            done += 1
+            # Запросы следующего уровня добавляются в stats["requests"] до его выполнения
+            on_progress(done, stats["requests"], f"Анализ частей таблицы: {done} из {stats['requests']}...")
+
+        errors = []
+        level_results = self._run_level(
+            [self.build_map_messages(instruction, header, lines[start:end], False) for start, end in partitions],
+            self.partition_output_tokens,
+            on_done
+        )
+        summaries = []
+        for (start, end), (summary, error) in zip(partitions, level_results):
+            if error or not summary:
+                errors.append(f"Строки {df.index[start]}–{df.index[end - 1]}: {error or 'пустой ответ'}")
+            else:
+                summaries.append(summary)
+
+        return self.reduce_summaries(instruction, summaries, errors, stats, on_done)
+
+    def reduce_summaries(
+        self,
+        instruction: str,
+        summaries: List[str],
+        errors: List[str],
+        stats: Dict[str, Any],
+        on_done: Callable[[], None]
+    ) -> Tuple[Optional[str], Optional[str], Dict[str, Any]]:
+        """
+        Объединяет отчеты уровнями до одного итогового.
+
+        Args:
+            instruction (str): Задание пользователя и описание таблицы
+            summaries (List[str]): Отчеты по частям в порядке строк таблицы
+            errors (List[str]): Ошибки предыдущих уровней (дополняется)
+            stats (Dict[str, Any]): Статистика запуска (levels и requests дополняются)
+            on_done (Callable[[], None]): Вызывается после каждого запроса
+
+        Returns:
+            Tuple[Optional[str], Optional[str], Dict[str, Any]]: (отчет, ошибка, статистика)
+        """
+        while summaries:
+            groups = self.group_summaries(instruction, summaries)
+            final = len(groups) == 1
+            stats["levels"] += 1
+            stats["requests"] += len(groups)
+
+            level_results = self._run_level(
+                [self.build_reduce_messages(instruction, summaries[start:end], final) for start, end in groups],
+                self.model_params.get("max_tokens", 300) if final else self.partition_output_tokens,
+                on_done
+            )
+
+            next_summaries = []
+            for (start, end), (summary, error) in zip(groups, level_results):
+                if error or not summary:
+                    errors.append(f"Объединение отчетов (уровень {stats['levels'] - 1}): {error or 'пустой ответ'}")
+                    # Отчеты группы передаются на следующий уровень без объединения
+                    next_summaries.extend(summaries[start:end] if not final else [])
+                else:
+                    next_summaries.append(summary)
+
+            if final:
+                if next_summaries:
+                    error_text = f"Частичный успех с ошибками: {'; '.join(errors)}" if errors else None
+                    return next_summaries[0], error_text, stats
+                break
+            if len(next_summaries) >= len(summaries):
+                # Уровень не сократил число отчетов - прекращаем, чтобы не зациклиться
+                break
+            summaries = next_summaries
+
+        return None, "; ".join(errors) or "Не удалось объединить отчеты", stats
+
+
+class StreamingTableReducer:
+    """
+    Map-reduce по строкам, поступающим по мере готовности.
+
+    Строки добавляются по одной (например, по мере получения ответов
+    построчного анализа). Строки с номером позиции ждут, пока не поступят все
+    предыдущие, поэтому части состоят из последовательных строк в порядке
+    таблицы и совпадают между запусками (запросы частей попадают в кэш ответов).
+    Как только накопленные строки заполняют бюджет части, ее анализ (map)
+    запускается в фоне; готовые отчеты частей сразу объединяются группами по
+    fan_in. К вызову finish() остается выполнить только последние части и
+    несколько объединений, а не весь анализ таблицы.
+    """
+
+    def __init__(self, reducer: TableMapReducer, instruction: str, header: str):
+        """
+        Инициализирует потоковый анализ.
+
+        Args:
+            reducer (TableMapReducer): Параметры модели, бюджет и промпты map-reduce
+            instruction (str): Задание пользователя и описание таблицы
+            header (str): Строка заголовка таблицы (см. table_header)
+        """
+        self.reducer = reducer
+        self.instruction = instruction
+        self.header = header
+
+        map_fixed = reducer.build_map_messages(instruction, header, [], False)
+        self.budget = reducer._data_budget(map_fixed[0]["content"] + map_fixed[1]["content"], reducer.model_params.get("max_tokens", 0))
+        self.pool = ThreadPoolExecutor(max_workers=reducer.max_workers)
+
+        self.lines: List[str] = []
+        self.line_tokens = 0
+        # Строки, поступившие раньше предыдущих: позиция -> текст
+        self.waiting: Dict[int, str] = {}
+        self.next_position = 0
+        # Отчеты частей, еще не объединенные, и узлы первого уровня объединения - в порядке поступления строк
+        self.pending: List[Future] = []
+        self.nodes: List[Tuple[Future, List[str]]] = []
+        self.errors: List[str] = []
+        self.stats = {"partitions": 0, "levels": 1, "requests": 0, "rows": 0}
+
+    def _request(self, messages: List[Dict[str, str]], max_tokens: int) -> Tuple[Optional[str], Optional[str]]:
+        """Выполняет один запрос к LLM, возвращая ошибку вместо исключения."""
+        try:
+            return self.reducer.llm_provider.chat_completion(messages=messages, **{**self.reducer.model_params, "max_tokens": max_tokens})
+        except Exception as e:
+            return None, f"Ошибка при вызове LLM: {e}"
+
+    def _submit_partition(self) -> None:
+        """Запускает анализ накопленных строк."""
+        messages = self.reducer.build_map_messages(self.instruction, self.header, self.lines, False)
+        self.pending.append(self.pool.submit(self._request, messages, self.reducer.partition_output_tokens))
+        self.stats["partitions"] += 1
+        self.stats["requests"] += 1
+        self.lines, self.line_tokens = [], 0
+
+    def _reduce_ready(self) -> None:
+        """Объединяет первые fan_in готовых отчетов частей."""
+        fan_in = self.reducer.fan_in
+        while len(self.pending) >= fan_in and all(future.done() for future in self.pending[:fan_in]):
+            group, self.pending = self.pending[:fan_in], self.pending[fan_in:]
+            summaries = self._collect(group, "Часть таблицы")
+            if not summaries:
+                continue
+            for start, end in self.reducer.group_summaries(self.instruction, summaries):
+                messages = self.reducer.build_reduce_messages(self.instruction, summaries[start:end], False)
+                future = self.pool.submit(self._request, messages, self.reducer.partition_output_tokens)
+                self.nodes.append((future, summaries[start:end]))
+                self.stats["requests"] += 1
+            self.stats["levels"] = 2
+
+    def _collect(self, futures: List[Future], label: str) -> List[str]:
+        """Дожидается ответов и возвращает успешные отчеты, запоминая ошибки."""
+        summaries = []
+        for future in futures:
+            summary, error = future.result()
+            if error or not summary:
+                self.errors.append(f"{label}: {error or 'пустой ответ'}")
+            else:
+                summaries.append(summary)
+        return summaries
+
+    def add(self, line: str, position: Optional[int] = None) -> None:
+        """
+        Добавляет строку таблицы (в формате serialize_rows).
+
+        Args:
+            line (str): Текст строки
+            position (Optional[int]): Номер строки в таблице (с 0); строка ждет, пока
+                не поступят все предыдущие. None - строка добавляется сразу
+        """
+        if position is None:
+            self._append(line)
+            return
+        self.waiting[position] = line
+        while self.next_position in self.waiting:
+            self._append(self.waiting.pop(self.next_position))
+            self.next_position += 1
+
+    def _append(self, line: str) -> None:
+        """Добавляет строку в текущую часть, запуская анализ заполненной части."""
+        cost = self.reducer.count_tokens(line)
+        if self.lines and self.line_tokens + cost > self.budget:
+            self._submit_partition()
+        self.lines.append(line)
+        self.line_tokens += cost
+        self.stats["rows"] += 1
+        self._reduce_ready()
+
+    def cancel(self) -> None:
+        """Отменяет еще не начатые запросы (например, при ошибке построчного анализа)."""
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def finish(self) -> Tuple[Optional[str], Optional[str], Dict[str, Any]]:
+        """
+        Завершает анализ после поступления всех строк.
+
+        Returns:
+            Tuple[Optional[str], Optional[str], Dict[str, Any]]: (отчет, ошибка, статистика),
+            как у TableMapReducer.run
+        """
+        try:
+            # Строки после пропущенных позиций добавляются в порядке таблицы
+            for position in sorted(self.waiting):
+                self._append(self.waiting.pop(position))
+            # Все строки поместились в одну часть - сразу итоговый отчет
+            if not self.pending and not self.nodes:
+                if not self.lines:
+                    return None, "Таблица не содержит строк", self.stats
+                self.stats["partitions"] += 1
+                self.stats["requests"] += 1
+                messages = self.reducer.build_map_messages(self.instruction, self.header, self.lines, True)
+                result, error = self._request(messages, self.reducer.model_params.get("max_tokens", 300))
+                return result, error, self.stats
+
+            if self.lines:
+                self._submit_partition()
+            summaries = []
+            for future, group in self.nodes:
+                summary, error = future.result()
+                if error or not summary:
+                    self.errors.append(f"Объединение отчетов (уровень 1): {error or 'пустой ответ'}")
+                    # Отчеты группы передаются дальше без объединения
+                    summaries.extend(group)
+                else:
+                    summaries.append(summary)
+            summaries += self._collect(self.pending, "Часть таблицы")
+            return self.reducer.reduce_summaries(self.instruction, summaries, self.errors, self.stats, lambda: None)
+        finally:
+            self.pool.shutdown(wait=True)
@@ -0,0 +1,305 @@
+# src/services/table_query.py
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.services.tokenizer import count_tokens
+
+# DuckDB нужен только для анализа всей таблицы с запросами модели
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+TABLE_NAME = "data"
+
+DEFAULT_MAX_ROUNDS = 4
+DEFAULT_MAX_QUERIES = 3
+DEFAULT_MAX_RESULT_ROWS = 50
+DEFAULT_MAX_RESULT_TOKENS = 1500
+DEFAULT_QUERY_TIMEOUT = 10.0
+
+SQL_BLOCK = re.compile(r"```sql\s*(.*?)```", re.IGNORECASE | re.DOTALL)
+# Строковые литералы и идентификаторы в кавычках не проверяются на ключевые слова
+QUOTED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+READ_ONLY_START = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+FORBIDDEN_KEYWORDS = re.compile(
+    r"\b(attach|detach|copy|export|import|install|load|pragma|create|insert|update|delete|drop|alter|"
+    r"set|reset|call|checkpoint|vacuum|use|read_\w+|glob)\b",
+    re.IGNORECASE
+)
+
+QUERY_INSTRUCTIONS = f"""Таблица целиком загружена в DuckDB как таблица {TABLE_NAME}. Чтобы получить точные числа по всем строкам,
+напиши запросы SQL (диалект DuckDB, только SELECT) в блоках ```sql ... ```, не больше {{max_queries}} за ответ.
+Названия столбцов заключай в двойные кавычки. Результат запроса ограничен {{max_rows}} строками - используй агрегаты,
+GROUP BY, ORDER BY и LIMIT. Когда данных достаточно, дай итоговый отчет без блоков sql.
+Столбцы таблицы {TABLE_NAME}:
+{{schema}}"""
+
+
+def table_query_available() -> bool:
+    """Возвращает True, если установлен DuckDB."""
+    return duckdb is not None
+
+
+def describe_schema(df: pd.DataFrame) -> str:
+    """
+    Описывает столбцы таблицы для модели: имя в кавычках SQL и тип.
+
+    Args:
+        df (pd.DataFrame): Таблица
+
+    Returns:
+        str: Строки вида "- "Столбец" (тип)"
+    """
+    return "\n".join(
+        f"- \"{str(col).replace(chr(34), chr(34) * 2)}\" ({dtype})"
+        for col, dtype in df.dtypes.items()
+    )
+
+
+def extract_queries(text: str) -> List[str]:
+    """
+    Извлекает запросы из блоков ```sql ответа модели.
+
+    Args:
+        text (str): Ответ модели
+
+    Returns:
+        List[str]: Непустые запросы в порядке появления
+    """
+    return [query.strip().rstrip(";").strip() for query in SQL_BLOCK.findall(text or "") if query.strip().rstrip(";").strip()]
+
+
+def validate_query(query: str) -> Optional[str]:
+    """
+    Проверяет, что запрос только читает данные.
+
+    Это дополнительная проверка для понятной ошибки модели: соединение
+    DuckDB в любом случае открыто без доступа к файлам и сети.
+
+    Args:
+        query (str): Запрос SQL
+
+    Returns:
+        Optional[str]: Текст ошибки или None, если запрос допустим
+    """
+    bare = QUOTED.sub("''", query)
+    if not READ_ONLY_START.match(bare):
+        return "разрешены только запросы SELECT (или WITH ... SELECT)"
+    if ";" in bare:
+        return "разрешен только один запрос в блоке"
+    forbidden = FORBIDDEN_KEYWORDS.search(bare)
+    if forbidden:
+        return f"недопустимое ключевое слово: {forbidden.group(1).upper()}"
+    return None
+
+
+def format_result(frame: pd.DataFrame, truncated: bool, max_tokens: int = DEFAULT_MAX_RESULT_TOKENS) -> str:
+    """
+    Представляет результат запроса текстом "значение | значение | ...".
+
+    Args:
+        frame (pd.DataFrame): Результат запроса
+        truncated (bool): Результат обрезан по числу строк
+        max_tokens (int): Максимальный размер текста в токенах
+
+    Returns:
+        str: Текст результата
+    """
+    if frame.empty:
+        return "(пустой результат)"
+
+    def cell(value: Any) -> str:
+        if isinstance(value, float):
+            return f"{value:.6g}"
+        return re.sub(r"[\r\n]+", " ", str(value))
+
+    header = " | ".join(str(col) for col in frame.columns)
+    lines = [" | ".join(cell(value) for value in row) for row in frame.itertuples(index=False, name=None)]
+    text = "\n".join([header] + lines)
+    kept = len(lines)
+    while kept > 1 and count_tokens(text) > max_tokens:
+        kept = kept // 2
+        text = "\n".join([header] + lines[:kept])
+        truncated = True
+    if truncated:
+        text += f"\n... показаны первые {kept} строк, уточни запрос агрегатами или LIMIT"
+    return text
+
+
+class TableQueryEngine:
+    """
+    Выполняет запросы модели к таблице во встроенной базе DuckDB.
+
+    База находится в памяти, доступ к файлам и сети отключен, настройки
+    заблокированы. Каждый запрос ограничен по времени и числу строк.
+    """
+
+    def __init__(self, df: pd.DataFrame, max_rows: int = DEFAULT_MAX_RESULT_ROWS, timeout: float = DEFAULT_QUERY_TIMEOUT):
+        """
+        Args:
+            df (pd.DataFrame): Таблица (регистрируется без копирования как TABLE_NAME)
+            max_rows (int): Максимальное число строк результата
+            timeout (float): Максимальное время запроса в секундах
+
+        Raises:
+            ImportError: Если DuckDB не установлен
+        """
+        if duckdb is None:
+            raise ImportError("Для запросов к таблице необходимо установить пакет duckdb")
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.connection = duckdb.connect(config={"enable_external_access": False})
+        self.connection.register(TABLE_NAME, df)
+        self.connection.execute("SET lock_configuration = true")
+
+    def execute(self, query: str) -> Tuple[Optional[pd.DataFrame], bool, Optional[str]]:
+        """
+        Выполняет запрос только на чтение.
+
+        Args:
+            query (str): Запрос SQL
+
+        Returns:
+            Tuple[Optional[pd.DataFrame], bool, Optional[str]]: (результат, обрезан ли он, ошибка)
+        """
+        error = validate_query(query)
+        if error:
+            return None, False, error
+
+        # Запрос прерывается, если не успел за timeout секунд
+        timer = threading.Timer(self.timeout, self.connection.interrupt)
+        timer.start()
+        try:
+            frame = self.connection.execute(f"SELECT * FROM ({query}) AS q LIMIT {self.max_rows + 1}").fetchdf()
+        except Exception as e:
+            if isinstance(e, duckdb.InterruptException):
+                return None, False, f"запрос выполнялся дольше {self.timeout:g} сек. и был прерван"
+            return None, False, str(e).strip()
+        finally:
+            timer.cancel()
+        return frame.head(self.max_rows), len(frame) > self.max_rows, None
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class TableQueryLoop:
+    """
+    Анализ всей таблицы с запросами модели к данным.
+
+    Модель получает описание таблицы и в нескольких раундах запрашивает
+    агрегаты на SQL; запросы выполняются локально по всем строкам, в
+    модель возвращаются только небольшие результаты. Поэтому размер
+    промптов зависит от числа вопросов, а не от числа строк, а числа в
+    отчете точные.
+    """
+
+    def __init__(
+        self,
+        llm_provider,
+        model_params: Dict[str, Any],
+        max_rounds: int = DEFAULT_MAX_ROUNDS,
+        max_queries: int = DEFAULT_MAX_QUERIES,
+        max_result_rows: int = DEFAULT_MAX_RESULT_ROWS,
+        max_result_tokens: int = DEFAULT_MAX_RESULT_TOKENS,
+        timeout: float = DEFAULT_QUERY_TIMEOUT
+    ):
+        """
+        Args:
+            llm_provider: Провайдер LLM с методом chat_completion
+            model_params (Dict[str, Any]): Параметры модели
+            max_rounds (int): Максимальное число раундов запросов
+            max_queries (int): Максимальное число запросов в одном ответе модели
+            max_result_rows (int): Максимальное число строк результата запроса
+            max_result_tokens (int): Максимальный размер результата запроса в токенах
+            timeout (float): Максимальное время запроса в секундах
+        """
+        self.llm_provider = llm_provider
+        self.model_params = model_params
+        self.max_rounds = max_rounds
+        self.max_queries = max_queries
+        self.max_result_rows = max_result_rows
+        self.max_result_tokens = max_result_tokens
+        self.timeout = timeout
+        self.logger = logging.getLogger("TableQueryLoop")
+
+    def instructions(self, df: pd.DataFrame) -> str:
+        """Возвращает описание возможности запросов для промпта (схема таблицы и правила)."""
+        return QUERY_INSTRUCTIONS.format(
+            max_queries=self.max_queries, max_rows=self.max_result_rows, schema=describe_schema(df)
+        )
+
+    def run_queries(self, engine: TableQueryEngine, queries: List[str]) -> Tuple[str, int]:
+        """Выполняет запросы раунда и возвращает их результаты одним сообщением и число ошибок."""
+        parts = []
+        failed = 0
+        for i, query in enumerate(queries, start=1):
+            if i > self.max_queries:
+                parts.append(f"Запрос {i}: не выполнен - не больше {self.max_queries} запросов за ответ")
+                continue
+            frame, truncated, error = engine.execute(query)
+            if error:
+                failed += 1
+                parts.append(f"Запрос {i}: ошибка - {error}\n{query}")
+            else:
+                parts.append(f"Запрос {i}:\n{query}\nРезультат:\n{format_result(frame, truncated, self.max_result_tokens)}")
+        return "\n\n".join(parts), failed
+
+    def run(self, df: pd.DataFrame, messages: List[Dict[str, str]]) -> Tuple[Optional[str], Optional[str], Dict[str, Any]]:
+        """
+        Выполняет диалог с запросами до итогового отчета.
+
+        Args:
+            df (pd.DataFrame): Таблица
+            messages (List[Dict[str, str]]): Начальные сообщения; последнее сообщение
+                пользователя должно содержать instructions(df)
+
+        Returns:
+            Tuple[Optional[str], Optional[str], Dict[str, Any]]: (отчет, ошибка, статистика:
+                rounds, queries, failed_queries)
+        """
+        stats = {"rounds": 0, "queries": 0, "failed_queries": 0}
+        messages = list(messages)
+
+        with TableQueryEngine(df, self.max_result_rows, self.timeout) as engine:
+            while True:
+                response, error = self.llm_provider.chat_completion(messages=messages, **self.model_params)
+                if error:
+                    return None, error, stats
+
+                queries = extract_queries(response)
+                if not queries:
+                    return response, None, stats
+                if stats["rounds"] >= self.max_rounds:
+                    # Лимит раундов исчерпан: оставляем текст ответа без запросов
+                    report = SQL_BLOCK.sub("", response).strip()
+                    return (report or None), (None if report else "Модель не дала итоговый отчет"), stats
+
+                stats["rounds"] += 1
+                results, failed = self.run_queries(engine, queries)
+                stats["queries"] += min(len(queries), self.max_queries)
+                stats["failed_queries"] += failed
+                self.logger.info(f"Раунд запросов {stats['rounds']}: запросов {len(queries)}")
+
+                if stats["rounds"] >= self.max_rounds:
+                    follow_up = "Лимит запросов исчерпан. Дай итоговый отчет по полученным данным, без блоков sql."
+                else:
+                    follow_up = (
+                        f"Можно задать еще запросы (осталось раундов: {self.max_rounds - stats['rounds']}) "
+                        "или дать итоговый отчет без блоков sql."
+                    )
+                messages.append({"role": "assistant", "content": response})
+                messages.append({"role": "user", "content": f"Результаты запросов:\n\n{results}\n\n{follow_up}"})
@@ -0,0 +1,278 @@
+# src/services/tokenizer.py
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Файл токенизатора по умолчанию (tokenizer.json в формате Hugging Face, например от DeepSeek)
+DEFAULT_TOKENIZER_PATH = "models/tokenizer.json"
+
+# Количество текстов, для которых хранится посчитанное число токенов
+DEFAULT_CACHE_SIZE = 50000
+
+# Тексты длиннее этого размера не кэшируются (промпты целиком считаются один раз)
+MAX_CACHED_TEXT_LENGTH = 4000
+
+# Служебные токены чата на одно сообщение (роль и разделители)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Предварительное разбиение на слова, как в байтовых BPE-токенизаторах (GPT-2, DeepSeek)
+PRETOKENIZE_PATTERN = re.compile(
+    r"'(?:s|t|re|ve|m|ll|d)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+(?!\S)|\s+"
+)
+
+
+@lru_cache(maxsize=1)
+def _bytes_to_unicode() -> Dict[int, str]:
+    """Обратимое отображение байтов в печатные символы Unicode (байтовый BPE)."""
+    printable = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    chars = printable[:]
+    extra = 0
+    for byte in range(256):
+        if byte not in printable:
+            printable.append(byte)
+            chars.append(256 + extra)
+            extra += 1
+    return dict(zip(printable, map(chr, chars)))
+
+
+class BPETokenizer:
+    """
+    Байтовый BPE-токенизатор, загружаемый из tokenizer.json.
+
+    Используются только словарь и правила слияния модели, поэтому для подсчета
+    токенов не нужны сетевые запросы и дополнительные библиотеки. Результат
+    для каждого слова кэшируется.
+    """
+
+    def __init__(self, merges: List[Tuple[str, str]], word_cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Инициализирует токенизатор.
+
+        Args:
+            merges (List[Tuple[str, str]]): Правила слияния в порядке приоритета
+            word_cache_size (int): Размер кэша разбиения слов
+        """
+        self.ranks = {pair: rank for rank, pair in enumerate(merges)}
+        self.byte_encoder = _bytes_to_unicode()
+        self._count_word = lru_cache(maxsize=word_cache_size)(self._count_word_uncached)
+
+    @classmethod
+    def from_file(cls, path: str, word_cache_size: int = DEFAULT_CACHE_SIZE) -> "BPETokenizer":
+        """
+        Загружает токенизатор из tokenizer.json (формат Hugging Face).
+
+        Args:
+            path (str): Путь к файлу
+            word_cache_size (int): Размер кэша разбиения слов
+
+        Returns:
+            BPETokenizer: Токенизатор
+
+        Raises:
+            ValueError: Если файл не содержит BPE-модель
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        model = data.get("model") or {}
+        if model.get("type") != "BPE" or "merges" not in model:
+            raise ValueError(f"{path}: ожидается BPE-модель с правилами слияния")
+
+        merges = [tuple(merge.split(" ", 1)) if isinstance(merge, str) else tuple(merge) for merge in model["merges"]]
+        return cls(merges, word_cache_size)
+
+    def _count_word_uncached(self, word: str) -> int:
+        """Количество токенов одного слова после применения правил слияния."""
+        symbols = [self.byte_encoder[byte] for byte in word.encode("utf-8")]
+
+        while len(symbols) > 1:
+            best_rank, best_index = None, -1
+            for i in range(len(symbols) - 1):
+                rank = self.ranks.get((symbols[i], symbols[i + 1]))
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank, best_index = rank, i
+            if best_rank is None:
+                break
+            symbols[best_index:best_index + 2] = [symbols[best_index] + symbols[best_index + 1]]
+
+        return len(symbols)
+
+    def count(self, text: str) -> int:
+        """
+        Считает токены в тексте.
+
+        Args:
+            text (str): Текст
+
+        Returns:
+            int: Количество токенов
+        """
+        return sum(self._count_word(word) for word in PRETOKENIZE_PATTERN.findall(text))
+
+
+def heuristic_token_count(text: str) -> int:
+    """
+    Приблизительно считает токены без словаря модели.
+
+    Латиница, цифры и знаки ASCII - около 4 символов на токен, кириллица и
+    другие алфавиты - около 2 символов на токен, иероглифы - токен на символ.
+
+    Args:
+        text (str): Текст
+
+    Returns:
+        int: Приблизительное количество токенов
+    """
+    ascii_chars = 0
+    cjk_chars = 0
+    for char in text:
+        code = ord(char)
+        if code < 128:
+            ascii_chars += 1
+        elif 0x3000 <= code <= 0x9FFF or 0xAC00 <= code <= 0xD7AF:
+            cjk_chars += 1
+    other_chars = len(text) - ascii_chars - cjk_chars
+    return ascii_chars // 4 + (other_chars + 1) // 2 + cjk_chars + 1
+
+
+class TokenCounter:
+    """
+    Подсчет токенов с LRU-кэшем.
+
+    Если файл токенизатора найден, используется BPETokenizer, иначе -
+    heuristic_token_count. Короткие тексты (строки таблицы, ответы) часто
+    повторяются между пакетированием, регулятором частоты и отчетами о
+    прогрессе, поэтому их количество токенов кэшируется.
+    """
+
+    def __init__(self, tokenizer: Optional[BPETokenizer] = None, cache_size: int = DEFAULT_CACHE_SIZE, path: Optional[str] = None):
+        """
+        Инициализирует счетчик.
+
+        Args:
+            tokenizer (Optional[BPETokenizer]): Токенизатор модели (None - приблизительный подсчет)
+            cache_size (int): Количество кэшируемых текстов
+            path (Optional[str]): Путь к файлу токенизатора, с которым настроен счетчик
+        """
+        self.tokenizer = tokenizer
+        self.path = path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def exact(self) -> bool:
+        """True, если используется словарь модели."""
+        return self.tokenizer is not None
+
+    def count(self, text: str) -> int:
+        """
+        Возвращает количество токенов в тексте.
+
+        Args:
+            text (str): Текст
+
+        Returns:
+            int: Количество токенов
+        """
+        if not text:
+            return 0
+
+        cacheable = len(text) <= MAX_CACHED_TEXT_LENGTH
+        if cacheable:
+            with self._lock:
+                cached = self._cache.get(text)
+                if cached is not None:
+                    self._cache.move_to_end(text)
+                    self.hits += 1
+                    return cached
+
+        tokens = self.tokenizer.count(text) if self.tokenizer is not None else heuristic_token_count(text)
+
+        if cacheable:
+            with self._lock:
+                self.misses += 1
+                self._cache[text] = tokens
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return tokens
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает статистику кэша."""
+        with self._lock:
+            return {"exact": self.exact, "hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+
+_counter: Optional[TokenCounter] = None
+_counter_lock = threading.Lock()
+
+
+def configure_tokenizer(path: Optional[str] = None, cache_size: int = DEFAULT_CACHE_SIZE) -> TokenCounter:
+    """
+    Настраивает общий для процесса счетчик токенов.
+
+    Args:
+        path (Optional[str]): Путь к tokenizer.json (по умолчанию DEFAULT_TOKENIZER_PATH)
+        cache_size (int): Количество кэшируемых текстов
+
+    Returns:
+        TokenCounter: Счетчик токенов
+    """
+    global _counter
+    path = path or DEFAULT_TOKENIZER_PATH
+    logger = logging.getLogger("Tokenizer")
+
+    with _counter_lock:
+        if _counter is not None and _counter.path == path:
+            return _counter
+
+        tokenizer = None
+        if os.path.exists(path):
+            try:
+                tokenizer = BPETokenizer.from_file(path, cache_size)
+                logger.info(f"Загружен токенизатор {path}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Не удалось загрузить токенизатор {path}, используется приблизительный подсчет: {e}")
+        else:
+            logger.info(f"Файл токенизатора {path} не найден, используется приблизительный подсчет токенов")
+
+        _counter = TokenCounter(tokenizer, cache_size, path)
+        return _counter
+
+
+def get_token_counter() -> TokenCounter:
+    """Возвращает общий счетчик токенов, настраивая его при первом обращении."""
+    return _counter if _counter is not None else configure_tokenizer()
+
+
+def count_tokens(text: str) -> int:
+    """
+    Считает токены в тексте общим счетчиком.
+
+    Args:
+        text (str): Текст
+
+    Returns:
+        int: Количество токенов
+    """
+    return get_token_counter().count(text)
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    Считает токены сообщений чата, включая служебную разметку каждого сообщения.
+
+    Args:
+        messages (List[Dict[str, str]]): Сообщения для chat_completion
+
+    Returns:
+        int: Количество токенов промпта
+    """
+    return sum(count_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS for message in messages)
@@ -1,8 +1,60 @@
 # ui/export_view.py
 import streamlit as st
 from src.core.excel_handler import ExcelHandler  # Изменено с export_utils.py
+from src.core.word_report import (
+    DEFAULT_BACKGROUND_ROWS, DEFAULT_MAX_CHARTS, DEFAULT_MAX_TABLE_ROWS, build_word_report, submit_word_report
+)
 from datetime import datetime
 
+WORD_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+def render_word_report(df, table_analysis=None, group_reports=None, base_filename="results"):
+    """
+    Отображает кнопку скачивания отчета Word.
+    
+    Небольшие отчеты формируются сразу, отчеты по большим таблицам - в фоновом
+    потоке (export.word.background_rows), пока интерфейс остается доступным.
+    """
+    config_manager = st.session_state.get("config_manager")
+    get = config_manager.get if config_manager else (lambda key, default=None: default)
+    options = {
+        "max_table_rows": get("export.word.max_table_rows", DEFAULT_MAX_TABLE_ROWS),
+        "max_charts": get("export.word.max_charts", DEFAULT_MAX_CHARTS),
+        "excel_name": f"{base_filename}.xlsx"
+    }
+    rows = len(df) if df is not None else 0
+    
+    if rows <= get("export.word.background_rows", DEFAULT_BACKGROUND_ROWS):
+        try:
+            word_data = build_word_report(df, table_analysis, group_reports, **options)
+        except ImportError as e:
+            st.error(str(e))
+            return
+        ExcelHandler.create_download_button(word_data, f"{base_filename}.docx", "📥 Скачать отчет Word", WORD_MIME)
+        return
+    
+    # Отчет по большой таблице: одно фоновое задание на таблицу результатов
+    job = st.session_state.get("word_report_job")
+    if job is None or job["source"] is not df:
+        if st.button(f"📄 Сформировать отчет Word ({rows} строк)"):
+            job = {
+                "source": df,
+                "filename": f"{base_filename}.docx",
+                "future": submit_word_report(df, table_analysis, group_reports, **options)
+            }
+            st.session_state["word_report_job"] = job
+        else:
+            return
+    
+    future = job["future"]
+    if not future.done():
+        st.info("Отчет Word формируется в фоне...")
+        st.button("🔄 Проверить готовность отчета")
+    elif future.exception() is not None:
+        st.error(f"Не удалось сформировать отчет Word: {future.exception()}")
+    else:
+        ExcelHandler.create_download_button(future.result(), job["filename"], "📥 Скачать отчет Word", WORD_MIME)
+
 def render_export_ui(df, table_analysis=None):
     """Отображает UI для экспорта результатов"""
     st.subheader("Экспорт результатов")
@@ -44,10 +96,4 @@ def render_export_ui(df, table_analysis=None):
         
         # Word (если есть анализ всей таблицы)
         if table_analysis:
-            word_data = ExcelHandler.to_word(df, table_analysis)
-            ExcelHandler.create_download_button(
-                word_data, 
-                f"{base_filename}.docx", 
-                "📥 Скачать отчет Word",
-                "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            )
\ No newline at end of file
+            render_word_report(df, table_analysis, base_filename=base_filename)
\ No newline at end of file
@@ -5,6 +5,7 @@ from typing import Dict, Any
 import traceback
 import logging
 import os # Добавлен импорт os
+from src.services.row_executor import get_concurrency
 
 # Определяем путь к основному лог-файлу приложения
 # Путь относительно текущего файла (ui/llm_settings_view.py) -> .. -> app.log
@@ -284,6 +285,23 @@ def llm_settings_ui() -> Dict[str, Any]:
             value=st.session_state.get("presence_penalty", 0.0)
         )
 
+        st.checkbox(
+            "Кэшировать ответы модели", key="use_cache",
+            value=st.session_state.get("use_cache", True),
+            help="Повторные запросы с теми же данными и параметрами берутся из дискового кэша без обращения к модели"
+        )
+
+        # Количество одновременных запросов задается отдельно для облачных и локальных моделей
+        concurrency_key = f"concurrency_{st.session_state.get('provider_type', 'cloud')}"
+        st.number_input(
+            "Параллельных запросов", min_value=1, max_value=64, step=1, key=concurrency_key,
+            help="Сколько запросов к модели выполняется одновременно при построчном анализе",
+            value=st.session_state.get(
+                concurrency_key,
+                get_concurrency(st.session_state.get("provider_type", "cloud"), None, st.session_state.get("config_manager"))
+            )
+        )
+
 
         # --- Управление логами ---
         st.divider()
@@ -333,6 +351,8 @@ def llm_settings_ui() -> Dict[str, Any]:
     settings['top_p'] = st.session_state.get("top_p", 1.0)
     settings['frequency_penalty'] = st.session_state.get("frequency_penalty", 0.0)
     settings['presence_penalty'] = st.session_state.get("presence_penalty", 0.0)
+    settings['concurrency'] = st.session_state.get(f"concurrency_{settings['provider_type']}")
+    settings['use_cache'] = st.session_state.get("use_cache", True)
 
 
     return settings
\ No newline at end of file
@@ -76,6 +76,8 @@ def render_scheduler_ui():
             # Для простоты здесь не реализуем полный интерфейс выбора столбцов,
             # так как это требует загрузки Excel-файла
             config["target_column"] = st.text_input("Целевой столбец")
+        
+        config["custom_prompt"] = st.text_area("Промпт", height=150)
             
         submitted = st.form_submit_button("Добавить задачу")
         
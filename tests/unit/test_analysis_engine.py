@@ -0,0 +1,338 @@
+# tests/unit/test_analysis_engine.py
+
+import unittest
+import tempfile
+import threading
+import sys
+import os
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core.analysis_engine import (
+    AnalysisEngine, MODE_COMBINED, MODE_ROWS, MODE_TABLE, ROW_SYSTEM_PROMPT,
+    estimate_row_log_tokens, make_batch_options, request_batch_completion
+)
+from src.services.tokenizer import count_message_tokens
+from src.services.table_query import table_query_available
+
+class FakeConfig:
+    """Конфигурация без контрольных точек и с последовательной обработкой"""
+    def __init__(self, values=None):
+        self.values = {"checkpoints.enabled": False, "processing.concurrency.cloud": 1}
+        self.values.update(values or {})
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+class FakeProvider:
+    """Провайдер, отвечающий текстом последнего сообщения"""
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    def chat_completion(self, messages, **kwargs):
+        self.calls.append(messages)
+        if self.error:
+            return None, self.error
+        return f"ответ: {messages[-1]['content'][-20:]}", None
+
+class GatedProvider(FakeProvider):
+    """Провайдер, задерживающий выбранный запрос до наступления события"""
+    def __init__(self, gate, event, on_call):
+        super().__init__()
+        self.gate = gate
+        self.event = event
+        self.on_call = on_call
+        self.lock = threading.Lock()
+        self.messages = []
+        self.systems = []
+        self.waited_ok = None
+
+    def chat_completion(self, messages, **kwargs):
+        with self.lock:
+            self.messages.append(messages)
+            self.systems.append(messages[0]["content"])
+            self.on_call(messages, self.systems)
+        if self.gate(messages):
+            self.waited_ok = self.event.wait(5)
+        return f"ответ: {messages[-1]['content'][-20:]}", None
+
+class TestAnalysisEngine(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            "Отзыв": ["Хорошо", "Плохо", "Хорошо"],
+            "Магазин": ["А", "Б", "А"]
+        })
+        self.provider = FakeProvider()
+        self.progress = []
+        self.engine = AnalysisEngine(
+            self.provider,
+            {"provider_type": "cloud", "model": "deepseek-chat"},
+            FakeConfig(),
+            on_progress=lambda done, total, text: self.progress.append((done, total)),
+            table_stats=lambda df: {"dtypes": {}, "missing_percentage": {}}
+        )
+
+    def test_row_by_row(self):
+        """Проверяет построчный анализ и объединение одинаковых строк"""
+        result = self.engine.run(self.df, {
+            "mode": MODE_ROWS,
+            "custom_prompt": "Оцени отзыв",
+            "target_column": "Отзыв",
+            "additional_columns": ["Магазин"]
+        })
+
+        self.assertEqual(len(self.provider.calls), 2)
+        self.assertTrue(all(result.result_df["Отзыв_Обработано"].str.startswith("ответ")))
+        self.assertEqual([log["row_index"] for log in result.logs], [0, 1, 2])
+        self.assertEqual(result.summary["unique_rows"], 2)
+        self.assertEqual(self.progress[-1], (3, 3))
+
+    def test_checkpoint_cleared_after_successful_run(self):
+        """Проверяет, что контрольная точка удаляется после успешного запуска и остается при ошибках"""
+        profile = {"mode": MODE_ROWS, "custom_prompt": "Оцени отзыв", "target_column": "Отзыв"}
+        with tempfile.TemporaryDirectory() as directory:
+            self.engine.config_manager = FakeConfig({"checkpoints.enabled": True, "checkpoints.directory": directory})
+
+            # Строка "Плохо" не обработана - ответы остальных строк сохраняются
+            failing = FakeProvider()
+            failing.chat_completion = lambda messages, **kwargs: (
+                (None, "API недоступен") if "Плохо" in messages[-1]["content"] else ("ответ", None)
+            )
+            self.engine.llm_provider = failing
+            self.engine.run(self.df, profile)
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+            self.engine.llm_provider = self.provider
+            self.engine.run(self.df, profile)
+            self.assertEqual(os.listdir(directory), [])
+
+            # Повторный запуск того же задания выполняется заново, а не продолжается
+            messages = []
+            self.engine.on_message = lambda level, text: messages.append(text)
+            self.provider.calls.clear()
+            self.engine.run(self.df, profile)
+            self.assertEqual(len(self.provider.calls), 2)
+            self.assertFalse(any("Продолжение" in text for text in messages))
+
+    def test_failed_batch_reports_every_row(self):
+        """Проверяет, что исключение при обработке пакета дает ошибку для каждой строки пакета"""
+        self.engine.llm_settings["batch_rows"] = True
+        with mock.patch("src.core.analysis_engine.request_batch_completion", side_effect=RuntimeError("сбой пакета")):
+            result = self.engine.run(self.df, {
+                "mode": MODE_ROWS, "custom_prompt": "Оцени отзыв", "target_column": "Отзыв", "additional_columns": ["Магазин"]
+            })
+
+        self.assertEqual(sorted(log["row_index"] for log in result.logs), [0, 1, 2])
+        self.assertTrue(all("сбой пакета" in log["attempts"][0]["error"] for log in result.logs))
+        self.assertEqual(self.progress[-1], (3, 3))
+
+    def test_batch_tokens_include_shared_prompt(self):
+        """Проверяет, что токены промпта пакетного запроса делятся между строками пакета"""
+        model_params = {"model": "deepseek-chat", "max_tokens": 50}
+        options = make_batch_options({}, model_params, "Оцени отзыв", "Отзыв", ["Магазин"])
+        batch = [(i, {"Отзыв": text, "Магазин": shop}) for i, (text, shop) in enumerate(self.df.itertuples(index=False))]
+        provider = mock.Mock()
+        provider.chat_completion.return_value = ('[{"id": 1, "answer": "да"}, {"id": 2, "answer": "нет"}]', None)
+
+        results = request_batch_completion(provider, batch, options, lambda record: [{"role": "user", "content": "x"}], model_params)
+
+        prompt_tokens = count_message_tokens(provider.chat_completion.call_args_list[0].kwargs["messages"])
+        self.assertEqual(sum(log["batch_prompt_tokens"] for _, _, _, log in results), prompt_tokens)
+        self.assertGreater(estimate_row_log_tokens(results[0][3]), prompt_tokens // 3)
+
+    def test_row_by_row_near_duplicates(self):
+        """Проверяет объединение почти одинаковых текстов перед запросами"""
+        df = pd.DataFrame({"Отзыв": ["Курьер опоздал на час, заказ холодный", "курьер опоздал на час... заказ холодный!", "Всё понравилось"]})
+        self.engine.llm_settings["near_duplicates"] = True
+        result = self.engine.run(df, {"mode": MODE_ROWS, "custom_prompt": "Оцени отзыв", "target_column": "Отзыв"})
+
+        self.assertEqual(len(self.provider.calls), 2)
+        self.assertEqual(result.logs[1]["duplicate_of"], 0)
+        self.assertEqual(result.result_df.at[1, "Отзыв_Обработано"], result.result_df.at[0, "Отзыв_Обработано"])
+
+    def test_full_table(self):
+        """Проверяет анализ всей таблицы"""
+        result = self.engine.run(self.df, {"mode": MODE_TABLE, "custom_prompt": "Опиши таблицу"})
+
+        self.assertEqual(len(self.provider.calls), 1)
+        self.assertTrue(result.table_analysis.startswith("ответ"))
+        self.assertIs(result.result_df, self.df)
+
+    def test_table_name_from_attrs(self):
+        """Проверяет, что название таблицы из df.attrs попадает в промпт и сохраняется при копировании"""
+        df = self.df.copy()
+        df.attrs["name"] = "отзывы.xlsx"
+        self.engine.run(df[["Отзыв"]], {"mode": MODE_TABLE, "custom_prompt": "Опиши таблицу"})
+
+        self.assertIn("Таблица: отзывы.xlsx", self.provider.calls[0][-1]["content"])
+
+    def test_full_table_missing_values(self):
+        """Проверяет анализ всей таблицы и групп с пропущенными значениями в выборке строк"""
+        df = pd.DataFrame({
+            "Отзыв": [f"Отзыв {i % 13}" for i in range(200)],
+            "n": np.arange(200, dtype=float),
+            "Магазин": ["А", "Б"] * 100
+        })
+        df.loc[::7, "n"] = np.nan
+        df.loc[::11, "Отзыв"] = None
+
+        result = self.engine.run(df, {"mode": MODE_TABLE, "custom_prompt": "Опиши таблицу"})
+        self.assertEqual(result.errors, [])
+        self.assertIsNotNone(result.table_analysis)
+
+        result = self.engine.run(df, {"mode": MODE_TABLE, "custom_prompt": "Опиши таблицу", "group_column": "Магазин"})
+        self.assertEqual(list(result.group_reports), ["А", "Б"])
+        self.assertIsNotNone(result.table_analysis)
+
+    def test_full_table_map_reduce(self):
+        """Проверяет, что в режиме map-reduce в модель передаются все строки"""
+        self.engine.llm_settings["table_map_reduce"] = True
+        result = self.engine.run(self.df, {"mode": MODE_TABLE, "custom_prompt": "Опиши таблицу"})
+
+        self.assertIsNotNone(result.table_analysis)
+        self.assertIn("2 | Хорошо | А", self.provider.calls[0][-1]["content"])
+
+    def test_full_table_error(self):
+        """Проверяет, что ошибка анализа таблицы возвращается в errors"""
+        self.engine.llm_provider = FakeProvider(error="API недоступен")
+        result = self.engine.run(self.df, {"mode": MODE_TABLE, "custom_prompt": "Опиши таблицу"})
+
+        self.assertIsNone(result.table_analysis)
+        self.assertIn("API недоступен", result.errors[0])
+
+    def test_combined(self):
+        """Проверяет комбинированный анализ"""
+        result = self.engine.run(self.df, {
+            "mode": MODE_COMBINED,
+            "custom_prompt": "Оцени отзыв",
+            "target_column": "Отзыв"
+        })
+
+        self.assertIsNotNone(result.table_analysis)
+        self.assertIn("Отзыв_Обработано", result.result_df.columns)
+        row_calls = [messages for messages in self.provider.calls if messages[0]["content"] == ROW_SYSTEM_PROMPT]
+        self.assertEqual(len(row_calls), 2)
+        self.assertIn("Результат анализа всей таблицы", row_calls[-1][-1]["content"])
+
+    def test_combined_table_first_overlaps_phases(self):
+        """Проверяет, что строки обрабатываются, пока формируется подробный отчет по таблице"""
+        rows_done = threading.Event()
+        provider = GatedProvider(
+            gate=lambda messages: "Проведи тщательный анализ" in messages[-1]["content"],
+            event=rows_done,
+            on_call=lambda messages, calls: calls.count(ROW_SYSTEM_PROMPT) == 2 and rows_done.set()
+        )
+        self.engine.llm_provider = provider
+        self.engine.config_manager = FakeConfig({"combined.table_brief": True})
+        with mock.patch.object(self.engine, "_prepare_context", return_value=(None, "Справочник магазинов")):
+            result = self.engine.run(self.df, {"mode": MODE_COMBINED, "custom_prompt": "Оцени отзыв", "target_column": "Отзыв"})
+
+        self.assertTrue(provider.waited_ok)
+        brief_prompt = next(m for m in provider.messages if "Кратко, в нескольких пунктах" in m[-1]["content"])[-1]["content"]
+        self.assertIn("Справочник магазинов", brief_prompt)
+        self.assertIsNotNone(result.table_analysis)
+        self.assertFalse(result.errors)
+        row_prompt = next(m for m in provider.messages if m[0]["content"] == ROW_SYSTEM_PROMPT)[-1]["content"]
+        self.assertIn("ответ:", row_prompt)
+
+    def test_combined_table_first_uses_full_report(self):
+        """Проверяет, что по умолчанию строки получают подробный отчет по таблице без краткого описания"""
+        result = self.engine.run(self.df, {"mode": MODE_COMBINED, "custom_prompt": "Оцени отзыв", "target_column": "Отзыв"})
+
+        self.assertFalse(any("Кратко, в нескольких пунктах" in m[-1]["content"] for m in self.provider.calls))
+        row_prompt = next(m for m in self.provider.calls if m[0]["content"] == ROW_SYSTEM_PROMPT)[-1]["content"]
+        self.assertIn(result.table_analysis, row_prompt)
+
+    def test_combined_rows_first_streams_rows_to_table(self):
+        """Проверяет, что анализ всей таблицы начинается до завершения построчного анализа"""
+        df = pd.DataFrame({"Отзыв": [f"Отзыв покупателя номер {i} о доставке" for i in range(40)]})
+        map_started = threading.Event()
+        provider = GatedProvider(
+            gate=lambda messages: messages[0]["content"] == ROW_SYSTEM_PROMPT and "номер 39 " in messages[-1]["content"],
+            event=map_started,
+            on_call=lambda messages, calls: "Это часть большой таблицы" in messages[-1]["content"] and map_started.set()
+        )
+        self.engine.llm_provider = provider
+        self.engine.config_manager = FakeConfig({"table_map_reduce.enabled": True, "table_map_reduce.max_partition_tokens": 60})
+        result = self.engine.run(df, {
+            "mode": MODE_COMBINED,
+            "custom_prompt": "Оцени отзыв",
+            "target_column": "Отзыв",
+            "execution_order": "Сначала построчный анализ, затем анализ всей таблицы"
+        })
+
+        self.assertTrue(provider.waited_ok)
+        self.assertIsNotNone(result.table_analysis)
+        self.assertFalse(result.errors)
+        self.assertTrue(all(result.result_df["Отзыв_Обработано"].str.startswith("ответ")))
+
+    def test_combined_rows_first_single_table_request(self):
+        """Проверяет, что без map-reduce анализ всей таблицы после строк - один запрос"""
+        df = pd.DataFrame({"Отзыв": [f"Отзыв покупателя номер {i} о доставке" for i in range(40)]})
+        self.engine.config_manager = FakeConfig({"table_map_reduce.max_partition_tokens": 60})
+        result = self.engine.run(df, {
+            "mode": MODE_COMBINED,
+            "custom_prompt": "Оцени отзыв",
+            "target_column": "Отзыв",
+            "execution_order": "Сначала построчный анализ, затем анализ всей таблицы"
+        })
+
+        table_calls = [m for m in self.provider.calls if m[0]["content"] != ROW_SYSTEM_PROMPT]
+        self.assertEqual(len(table_calls), 1)
+        self.assertIn("Сводка по всем строкам таблицы", table_calls[0][-1]["content"])
+        self.assertIsNotNone(result.table_analysis)
+
+    def test_grouped_table_reuses_cached_groups(self):
+        """Проверяет, что после добавления нового месяца анализируется только новая группа"""
+        df = pd.DataFrame({
+            "Дата": pd.to_datetime(["2024-01-05", "2024-01-20", "2024-02-03", "2024-02-25"]),
+            "Отзыв": ["Хорошо", "Плохо", "Отлично", "Нормально"]
+        })
+        with tempfile.TemporaryDirectory() as directory:
+            self.engine.config_manager = FakeConfig({"cache.path": os.path.join(directory, "cache.sqlite")})
+            profile = {"mode": MODE_TABLE, "custom_prompt": "Опиши отзывы", "group_column": "Дата", "group_period": "M"}
+
+            result = self.engine.run(df, profile)
+            self.assertEqual(list(result.group_reports), ["2024-01", "2024-02"])
+            self.assertIsNotNone(result.table_analysis)
+            self.assertEqual(result.summary["cached_groups"], 0)
+            # Два отчета по группам и объединяющий запрос
+            self.assertEqual(len(self.provider.calls), 3)
+            self.assertIn("Группа 2024-02", self.provider.calls[-1][-1]["content"])
+
+            self.provider.calls.clear()
+            extended = pd.concat([df, pd.DataFrame({"Дата": pd.to_datetime(["2024-03-10"]), "Отзыв": ["Плохо"]})], ignore_index=True)
+            result = self.engine.run(extended, profile)
+            self.assertEqual(result.summary["groups"], 3)
+            self.assertEqual(result.summary["cached_groups"], 2)
+            self.assertEqual(len(self.provider.calls), 2)
+            self.assertIn("2024-03", self.provider.calls[0][-1]["content"])
+
+    @unittest.skipUnless(table_query_available(), "не установлен duckdb")
+    def test_full_table_with_queries(self):
+        """Проверяет, что при включенных запросах модели передается схема таблицы"""
+        self.engine.llm_settings["table_queries"] = True
+        result = self.engine.run(self.df, {"mode": MODE_TABLE, "custom_prompt": "Опиши отзывы"})
+
+        self.assertIsNotNone(result.table_analysis)
+        prompt = self.provider.calls[0][-1]["content"]
+        self.assertIn("DuckDB", prompt)
+        self.assertIn('"Магазин"', prompt)
+
+    def test_validation(self):
+        """Проверяет проверку профиля"""
+        with self.assertRaises(ValueError):
+            self.engine.run(self.df, {"mode": MODE_ROWS, "custom_prompt": ""})
+        with self.assertRaises(ValueError):
+            self.engine.run(self.df, {"mode": MODE_ROWS, "target_column": "Нет такого"})
+        with self.assertRaises(ValueError):
+            self.engine.run(self.df, {"mode": "Неизвестный"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# tests/unit/test_checkpoint.py
+
+import unittest
+import tempfile
+import sys
+import os
+
+import pandas as pd
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.checkpoint import CheckpointStore, make_run_id, fingerprint_dataframe
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.df = pd.DataFrame({"Отзыв": ["Хорошо", "Плохо", "Нормально"], "Оценка": [5, 1, 3]})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_run_id_depends_on_data_and_prompt(self):
+        """Проверяет, что идентификатор запуска зависит от данных и промпта"""
+        run_id = make_run_id(self.df, "Промпт", {"model": "deepseek-chat"})
+
+        self.assertEqual(run_id, make_run_id(self.df.copy(), "Промпт", {"model": "deepseek-chat"}))
+        self.assertNotEqual(run_id, make_run_id(self.df, "Другой промпт", {"model": "deepseek-chat"}))
+        self.assertNotEqual(run_id, make_run_id(self.df, "Промпт", {"model": "deepseek-coder"}))
+
+        changed = self.df.copy()
+        changed.loc[1, "Отзыв"] = "Отлично"
+        self.assertNotEqual(fingerprint_dataframe(self.df), fingerprint_dataframe(changed))
+
+    def test_append_and_load(self):
+        """Проверяет, что ответы сохраняются между экземплярами хранилища"""
+        store = CheckpointStore("run", self.temp_dir.name)
+        store.append(0, "Позитивный")
+        store.append(2, "Нейтральный")
+        store.close()
+
+        reopened = CheckpointStore("run", self.temp_dir.name)
+        self.assertEqual(reopened.load(), {"0": "Позитивный", "2": "Нейтральный"})
+
+    def test_load_skips_truncated_line(self):
+        """Проверяет, что оборванная последняя строка не мешает загрузке"""
+        store = CheckpointStore("run", self.temp_dir.name)
+        store.append(0, "Позитивный")
+        store.close()
+        with open(store.path, "a", encoding="utf-8") as f:
+            f.write('{"row": "1", "ans')
+
+        self.assertEqual(store.load(), {"0": "Позитивный"})
+
+    def test_append_after_truncated_line(self):
+        """Проверяет, что новая запись после оборванной строки не повреждается"""
+        store = CheckpointStore("run", self.temp_dir.name)
+        store.append(0, "Позитивный")
+        store.close()
+        with open(store.path, "a", encoding="utf-8") as f:
+            f.write('{"row": "1", "ans')
+
+        reopened = CheckpointStore("run", self.temp_dir.name)
+        reopened.append(2, "Нейтральный")
+        reopened.close()
+        self.assertEqual(reopened.load(), {"0": "Позитивный", "2": "Нейтральный"})
+
+    def test_clear(self):
+        """Проверяет удаление контрольной точки"""
+        store = CheckpointStore("run", self.temp_dir.name)
+        store.append(0, "Позитивный")
+        store.clear()
+
+        self.assertEqual(store.load(), {})
+
+if __name__ == '__main__':
+    unittest.main()
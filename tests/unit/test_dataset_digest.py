@@ -0,0 +1,89 @@
+# tests/unit/test_dataset_digest.py
+
+import unittest
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core.dataset_digest import compute_digest, dataframe_fingerprint, describe_dataframe, get_digest
+from src.services.tokenizer import count_tokens
+
+class TestDatasetDigest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 1000
+        price = rng.random(n) * 100
+        self.df = pd.DataFrame({
+            "Дата": pd.date_range("2024-01-01", periods=n, freq="D"),
+            "Цена": price,
+            "Выручка": price * 3 + rng.random(n),
+            "Категория": rng.choice(["А", "Б", "В"], n),
+            "Отзыв": [f"Отзыв номер {i}" for i in range(n)]
+        })
+        self.df.loc[:99, "Категория"] = None
+
+    def test_column_summaries(self):
+        """Проверяет квантили, частые значения, пропуски и свободный текст"""
+        digest = compute_digest(self.df)
+        columns = {info["name"]: info for info in digest["columns_info"]}
+
+        self.assertEqual(columns["Цена"]["kind"], "numeric")
+        self.assertAlmostEqual(columns["Цена"]["quantiles"][2], self.df["Цена"].median())
+        self.assertEqual(columns["Категория"]["kind"], "category")
+        self.assertAlmostEqual(columns["Категория"]["null_rate"], 0.1)
+        self.assertEqual(sum(count for _, count in columns["Категория"]["top"]), 900)
+        self.assertEqual(columns["Отзыв"]["kind"], "text")
+
+    def test_numeric_columns_without_values(self):
+        """Проверяет сводку по листу без строк данных и по числовому столбцу из одних пропусков"""
+        header_only = self.df.iloc[:0]
+        text = describe_dataframe(header_only)
+        self.assertIn("Цена", text)
+        self.assertNotIn("медиана", text)
+
+        empty_price = self.df.assign(Цена=np.nan)
+        columns = {info["name"]: info for info in compute_digest(empty_price)["columns_info"]}
+        self.assertEqual(columns["Цена"]["kind"], "numeric")
+        self.assertNotIn("quantiles", columns["Цена"])
+        self.assertAlmostEqual(columns["Выручка"]["quantiles"][2], self.df["Выручка"].median())
+
+    def test_date_trend_is_bounded(self):
+        """Проверяет диапазон дат и ограничение числа точек динамики"""
+        trend = compute_digest(self.df)["columns_info"][0]["trend"]
+
+        self.assertEqual(trend["start"], "2024-01-01")
+        self.assertLessEqual(len(trend["counts"]), 12)
+        self.assertEqual(trend["label"], "по кварталам")
+
+    def test_strongest_correlation(self):
+        """Проверяет поиск сильнейших корреляций"""
+        a, b, r = compute_digest(self.df)["correlations"][0]
+
+        self.assertEqual({a, b}, {"Цена", "Выручка"})
+        self.assertGreater(r, 0.99)
+
+    def test_size_is_bounded(self):
+        """Проверяет, что размер сводки не зависит от ширины таблицы"""
+        wide = pd.DataFrame(np.random.default_rng(1).random((50, 300)), columns=[f"Столбец {i}" for i in range(300)])
+        text = describe_dataframe(wide, max_tokens=500)
+
+        self.assertLessEqual(count_tokens(text), 500)
+        self.assertIn("еще столбцов без сводки", text)
+
+    def test_cache_by_content(self):
+        """Проверяет кэширование по хэшу содержимого"""
+        first = get_digest(self.df)
+        self.assertIs(get_digest(self.df.copy()), first)
+
+        changed = self.df.copy()
+        changed.loc[0, "Цена"] = -1
+        self.assertNotEqual(dataframe_fingerprint(changed), dataframe_fingerprint(self.df))
+        self.assertIsNot(get_digest(changed), first)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# tests/unit/test_excel_loader.py
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import pandas as pd
+from openpyxl import Workbook
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core import excel_loader
+from src.core.excel_loader import iter_excel_chunks, read_excel_columns, scan_sheet
+
+class TestExcelLoader(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.df = pd.DataFrame({
+            "Отзыв": ["хорошо", "плохо", None, "отлично", "нормально"],
+            "Оценка": [5, 1, 3, 5, 4],
+            "Цена": [10.5, None, 7.0, 3.25, 1.0],
+            "Пусто": [None] * 5
+        })
+        self.path = os.path.join(self.temp_dir, "data.xlsx")
+        self.df.to_excel(self.path, index=False, sheet_name="Данные")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_scan_sheet(self):
+        """Проверяет чтение заголовка и количества строк"""
+        scan = scan_sheet(self.path)
+
+        self.assertEqual(scan["sheet_names"], ["Данные"])
+        self.assertEqual(scan["sheet"], "Данные")
+        self.assertEqual(scan["columns"], list(self.df.columns))
+        self.assertEqual(scan["rows"], 5)
+
+    def test_scan_sheet_without_dimension(self):
+        """Проверяет подсчет строк листа без записанных размеров (write_only)"""
+        path = os.path.join(self.temp_dir, "stream.xlsx")
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Лист")
+        sheet.append(["А", None, "А"])
+        for i in range(120):
+            sheet.append([i, "x", i * 2])
+        workbook.save(path)
+
+        with open(path, "rb") as f, mock.patch.object(excel_loader, "XML_CHUNK_BYTES", 64):
+            scan = scan_sheet(f, "Лист")
+
+        self.assertEqual(scan["columns"], ["А", "Unnamed: 1", "А.1"])
+        self.assertEqual(scan["rows"], 120)
+
+    def test_chunks_keep_index_and_sheet_order(self):
+        """Проверяет чтение частями: сквозной индекс и порядок столбцов как на листе"""
+        chunks = list(iter_excel_chunks(self.path, columns=["Цена", "Отзыв"], chunk_rows=2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        frame = pd.concat(chunks)
+        self.assertEqual(list(frame.columns), ["Отзыв", "Цена"])
+        self.assertEqual(frame.index.tolist(), [0, 1, 2, 3, 4])
+        pd.testing.assert_frame_equal(frame, pd.read_excel(self.path, usecols=["Отзыв", "Цена"]), check_dtype=False)
+
+    def test_missing_column(self):
+        """Проверяет ошибку при отсутствии столбца на листе"""
+        with self.assertRaises(ValueError):
+            list(iter_excel_chunks(self.path, columns=["Нет такого"]))
+
+    def test_streaming_matches_pandas(self):
+        """Проверяет, что потоковое чтение без calamine совпадает с pandas.read_excel"""
+        with mock.patch.object(excel_loader, "CALAMINE_AVAILABLE", False):
+            frame = read_excel_columns(self.path)
+            head = read_excel_columns(self.path, columns=["Оценка"], nrows=2)
+
+        expected = pd.read_excel(self.path)
+        pd.testing.assert_frame_equal(frame, expected, check_dtype=False)
+        self.assertEqual(frame["Пусто"].dtype, expected["Пусто"].dtype)
+        self.assertEqual(head["Оценка"].tolist(), [5, 1])
+
+if __name__ == '__main__':
+    unittest.main()
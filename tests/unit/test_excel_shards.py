@@ -0,0 +1,79 @@
+# tests/unit/test_excel_shards.py
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import pandas as pd
+from openpyxl import Workbook
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core import excel_shards
+from src.core.excel_shards import read_excel_sharded
+
+class TestReadExcelSharded(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "data.xlsx")
+        rows = 60
+        self.df = pd.DataFrame({
+            "Отзыв": [f"отзыв {i % 7}" if i % 5 else None for i in range(rows)],
+            "Оценка": [i % 5 + 1 for i in range(rows)],
+            "Цена": [i * 1.25 if i % 4 else None for i in range(rows)],
+            "Дата": pd.date_range("2024-01-01 08:15", periods=rows, freq="37min"),
+            "Смешанный": [i if i % 2 else f"т{i}" for i in range(rows)],
+            "Флаг": [i % 3 == 0 for i in range(rows)]
+        })
+        self.df.to_excel(self.path, index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_matches_pandas(self):
+        """Проверяет совпадение с pandas.read_excel, в том числе при делении на много частей"""
+        expected = pd.read_excel(self.path)
+
+        for shard_mb in (8, 0.001):
+            pd.testing.assert_frame_equal(read_excel_sharded(self.path, shard_mb=shard_mb), expected)
+
+    def test_process_pool(self):
+        """Проверяет разбор частей в пуле процессов"""
+        with mock.patch.object(excel_shards, "MIN_PARALLEL_MB", 0):
+            frame = read_excel_sharded(self.path, workers=2, shard_mb=0.001)
+
+        pd.testing.assert_frame_equal(frame, pd.read_excel(self.path))
+
+    def test_selected_columns(self):
+        """Проверяет чтение только нужных столбцов в порядке листа"""
+        frame = read_excel_sharded(self.path, columns=["Цена", "Отзыв"], shard_mb=0.001)
+
+        pd.testing.assert_frame_equal(frame, pd.read_excel(self.path, usecols=["Отзыв", "Цена"]))
+        with self.assertRaises(ValueError):
+            read_excel_sharded(self.path, columns=["Нет такого"])
+
+    def test_blank_rows_and_header_only(self):
+        """Проверяет пропуск пустых строк и лист только с заголовком"""
+        path = os.path.join(self.temp_dir, "blank.xlsx")
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Лист")
+        sheet.append(["А", "Б"])
+        sheet.append([1, "x"])
+        sheet.append([None, None])
+        sheet.append([3, "z"])
+        header_only = workbook.create_sheet("Пусто")
+        header_only.append(["А", "Б"])
+        workbook.save(path)
+
+        frame = read_excel_sharded(path, "Лист")
+        self.assertEqual(frame["А"].tolist(), [1, 3])
+        self.assertEqual(frame.index.tolist(), [0, 1])
+        self.assertEqual(list(read_excel_sharded(path, "Пусто").columns), ["А", "Б"])
+        self.assertEqual(len(read_excel_sharded(path, "Пусто")), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# tests/unit/test_excel_writer.py
+
+import unittest
+import sys
+import os
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core.excel_writer import (
+    MAX_COLUMN_WIDTH, XLSXWRITER_AVAILABLE, column_widths, get_writer_engine, write_excel, write_sheets
+)
+
+ENGINES = ["openpyxl"] + (["xlsxwriter"] if XLSXWRITER_AVAILABLE else [])
+
+class TestExcelWriter(unittest.TestCase):
+    def setUp(self):
+        rows = 50
+        self.df = pd.DataFrame({
+            "Отзыв": [f"отзыв {i}" if i % 5 else None for i in range(rows)],
+            "Оценка": [i % 5 + 1 for i in range(rows)],
+            "Цена": [i * 1.25 if i % 4 else np.nan for i in range(rows)],
+            "Дата": pd.date_range("2024-01-01 08:15", periods=rows, freq="37min"),
+            "Флаг": [i % 3 == 0 for i in range(rows)]
+        })
+
+    def test_roundtrip(self):
+        """Проверяет, что записанная таблица читается без изменений всеми движками"""
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                output = BytesIO()
+                write_excel(self.df, output, engine=engine, chunk_rows=7)
+
+                pd.testing.assert_frame_equal(pd.read_excel(output, sheet_name="Результаты"), self.df)
+
+    def test_many_columns_and_widths(self):
+        """Проверяет ширину столбцов после Z и ограничение ширины длинного текста"""
+        df = pd.DataFrame({f"Столбец {i}": [i] * 3 for i in range(30)})
+        df["Текст"] = ["короткий", "очень длинный ответ модели " * 10, None]
+
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                output = BytesIO()
+                write_excel(df, output, engine=engine)
+                worksheet = load_workbook(output).active
+
+                self.assertEqual(worksheet["AE1"].value, "Текст")
+                # xlsxwriter хранит ширину с поправкой на поля ячейки
+                self.assertAlmostEqual(worksheet.column_dimensions["AE"].width, MAX_COLUMN_WIDTH, delta=1)
+                self.assertAlmostEqual(worksheet.column_dimensions["AD"].width, len("Столбец 29") + 2, delta=1)
+                self.assertTrue(worksheet["A1"].font.bold)
+
+    def test_column_widths_sample(self):
+        """Проверяет подбор ширины по выборке строк, включая первую и последнюю"""
+        df = pd.DataFrame({"А": ["x"] * 10000})
+        df.loc[9999, "А"] = "y" * 20
+
+        self.assertEqual(column_widths(df, sample_rows=100), [22])
+        self.assertEqual(column_widths(df.iloc[:0]), [3])
+
+    def test_several_sheets_and_index(self):
+        """Проверяет запись нескольких листов и индекса"""
+        output = BytesIO()
+        indexed = self.df.set_index("Оценка")
+        write_sheets({"Данные": indexed, "Итог": pd.DataFrame({"Текст": ["итог"]})}, output, index=True)
+
+        sheets = pd.read_excel(output, sheet_name=None)
+        self.assertEqual(list(sheets), ["Данные", "Итог"])
+        self.assertEqual(list(sheets["Данные"].columns), list(indexed.reset_index().columns))
+
+    def test_unknown_engine(self):
+        """Проверяет ошибку для неизвестного движка"""
+        with self.assertRaises(ValueError):
+            get_writer_engine("csv")
+
+if __name__ == '__main__':
+    unittest.main()
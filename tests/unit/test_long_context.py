@@ -0,0 +1,67 @@
+# tests/unit/test_long_context.py
+
+import unittest
+import threading
+import sys
+import os
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.llm.cloud_provider import LLMServiceProvider
+
+class FakeLLMServiceProvider(LLMServiceProvider):
+    """Провайдер без обращения к API: отвечает длиной пользовательского сообщения"""
+    def __init__(self):
+        super().__init__(api_key="test_key")
+        self.lock = threading.Lock()
+        self.requests = []
+
+    def chat_completion(self, messages, model=None, **kwargs):
+        with self.lock:
+            self.requests.append(messages)
+        return f"ответ ({len(messages[-1]['content'])} симв.)", None
+
+class TestLongContext(unittest.TestCase):
+    def setUp(self):
+        self.provider = FakeLLMServiceProvider()
+        self.text = " ".join(f"Предложение номер {i}." for i in range(400))
+
+    def test_tree_prompts_do_not_grow(self):
+        """Проверяет, что в стратегии tree размер запросов ограничен"""
+        result, error = self.provider.batch_process_long_context(
+            "Кратко перескажи", self.text, max_chunk_size=500, overlap=50, fan_in=3
+        )
+
+        self.assertIsNone(error)
+        self.assertTrue(result.startswith("ответ"))
+        for messages in self.provider.requests:
+            self.assertLessEqual(messages[-1]["content"].count("Результаты части"), 3)
+            self.assertLessEqual(len(messages[-1]["content"]), 600)
+
+    def test_tree_ends_with_single_answer(self):
+        """Проверяет, что дерево объединения сводится к одному ответу"""
+        result, error = self.provider.batch_process_long_context(
+            "Кратко перескажи", self.text, max_chunk_size=500, overlap=50
+        )
+
+        self.assertNotIn("\n\n", result)
+        self.assertIn("итоговый", self.provider.requests[-1][0]["content"])
+
+    def test_sequential_strategy_is_kept(self):
+        """Проверяет, что последовательный режим передает ответы предыдущих частей"""
+        chunks = LLMServiceProvider._split_long_context(self.text, 500, 50)
+        self.provider.batch_process_long_context(
+            "Кратко перескажи", self.text, max_chunk_size=500, overlap=50, strategy="sequential"
+        )
+
+        self.assertEqual(len(self.provider.requests), len(chunks))
+        self.assertIn("Результаты части 1", self.provider.requests[-1][-1]["content"])
+
+    def test_unknown_strategy(self):
+        """Проверяет ошибку для неизвестной стратегии"""
+        with self.assertRaises(ValueError):
+            self.provider.batch_process_long_context("Промпт", self.text, max_chunk_size=500, strategy="unknown")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# tests/unit/test_progress.py
+
+import unittest
+import sys
+import os
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.progress import ProgressReporter, estimate_duration, format_duration, format_progress
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestProgressReporter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.updates = []
+
+    def make_reporter(self, total, **kwargs):
+        return ProgressReporter(total, self.updates.append, clock=self.clock, **kwargs)
+
+    def test_updates_are_throttled_by_time(self):
+        """Проверяет, что обновлений не больше max_updates_per_second в секунду"""
+        reporter = self.make_reporter(1000, max_updates_per_second=4, min_rows_step=1)
+
+        for done in range(1, 1001):
+            self.clock.now = done * 0.01
+            reporter.update(done)
+
+        # 10 секунд по 4 обновления, последнее обновление - на завершении
+        self.assertLessEqual(len(self.updates), 41)
+        self.assertEqual(self.updates[-1]["done"], 1000)
+
+    def test_updates_are_throttled_by_rows(self):
+        """Проверяет минимальный шаг в строках между обновлениями"""
+        reporter = self.make_reporter(100, max_updates_per_second=0, min_rows_step=10)
+
+        for done in range(1, 101):
+            self.clock.now = done
+            reporter.update(done)
+
+        self.assertEqual([update["done"] for update in self.updates], list(range(10, 101, 10)))
+
+    def test_throughput_and_eta(self):
+        """Проверяет скорость и оставшееся время по измеренной задержке"""
+        reporter = self.make_reporter(100, max_updates_per_second=0, min_rows_step=1)
+
+        self.clock.now = 10.0
+        reporter.update(20, tokens=2000)
+
+        snapshot = self.updates[-1]
+        self.assertAlmostEqual(snapshot["rows_per_second"], 2.0)
+        self.assertAlmostEqual(snapshot["tokens_per_second"], 200.0)
+        self.assertAlmostEqual(snapshot["eta_seconds"], 40.0)
+
+    def test_resumed_rows_are_not_counted_in_speed(self):
+        """Проверяет, что строки из контрольной точки не завышают скорость"""
+        reporter = self.make_reporter(100, max_updates_per_second=0, min_rows_step=1, initial=50)
+
+        self.clock.now = 5.0
+        reporter.update(60)
+
+        self.assertAlmostEqual(self.updates[-1]["rows_per_second"], 2.0)
+        self.assertEqual(reporter.stats()["rows"], 10)
+
+    def test_finish_sends_last_update(self):
+        """Проверяет, что finish отправляет последнее состояние"""
+        reporter = self.make_reporter(100, max_updates_per_second=1, min_rows_step=1)
+
+        self.clock.now = 0.5
+        reporter.update(5)
+        self.assertEqual(self.updates, [])
+
+        reporter.finish()
+        self.assertEqual(self.updates[-1]["done"], 5)
+
+    def test_formatting(self):
+        """Проверяет форматирование длительности и текста прогресса"""
+        self.assertEqual(format_duration(45), "45 с")
+        self.assertEqual(format_duration(725), "12 мин 5 с")
+        self.assertEqual(format_duration(4800), "1 ч 20 мин")
+        self.assertEqual(estimate_duration(100, 4.0), 25.0)
+        self.assertIsNone(estimate_duration(100, None))
+
+        text = format_progress({
+            "done": 20, "total": 100, "elapsed": 10.0,
+            "rows_per_second": 2.0, "tokens_per_second": 200.0, "eta_seconds": 40.0
+        })
+        self.assertIn("20 из 100", text)
+        self.assertIn("2.0 строк/с", text)
+        self.assertIn("осталось ~40 с", text)
+
+if __name__ == '__main__':
+    unittest.main()
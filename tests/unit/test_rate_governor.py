@@ -0,0 +1,85 @@
+# tests/unit/test_rate_governor.py
+
+import unittest
+import asyncio
+import time
+import sys
+import os
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.rate_governor import RateGovernor, get_rate_governor, parse_retry_after
+
+class TestRateGovernor(unittest.TestCase):
+    def test_requests_per_second(self):
+        """Проверяет, что запросы пропускаются со скоростью не выше заданной"""
+        governor = RateGovernor("test", requests_per_second=20.0)
+
+        started = time.monotonic()
+        for _ in range(6):
+            governor.acquire()
+        elapsed = time.monotonic() - started
+
+        # Первый запрос проходит сразу, остальные пять - с интервалом 0.05 сек.
+        self.assertGreaterEqual(elapsed, 0.2)
+
+    def test_tokens_per_minute(self):
+        """Проверяет ожидание, когда исчерпан лимит токенов"""
+        governor = RateGovernor("test", requests_per_second=100.0, tokens_per_minute=6000)
+
+        self.assertEqual(governor._reserve(6000), 0.0)
+        # После расхода всего ведра 100 токенов накапливаются примерно за секунду
+        self.assertGreater(governor._reserve(100), 0.5)
+
+    def test_aimd(self):
+        """Проверяет рост скорости при успехе и снижение при ответе 429"""
+        governor = RateGovernor("test", requests_per_second=4.0, max_requests_per_second=5.0, increase_step=0.5)
+
+        governor.on_success(0.1)
+        self.assertEqual(governor.rate, 4.5)
+        for _ in range(5):
+            governor.on_success(0.1)
+        self.assertEqual(governor.rate, 5.0)
+
+        governor.on_rate_limited()
+        self.assertEqual(governor.rate, 2.5)
+        # Повторные 429 в пределах cooldown не снижают скорость многократно
+        governor.on_rate_limited()
+        self.assertEqual(governor.rate, 2.5)
+        self.assertEqual(governor.stats()["rate_limited"], 2)
+
+    def test_latency_decrease(self):
+        """Проверяет снижение скорости при большой задержке ответа"""
+        governor = RateGovernor("test", requests_per_second=4.0, latency_threshold=1.0)
+
+        governor.on_success(5.0)
+
+        self.assertEqual(governor.rate, 2.0)
+
+    def test_retry_after_pauses_requests(self):
+        """Проверяет паузу из заголовка Retry-After"""
+        governor = RateGovernor("test", requests_per_second=100.0)
+
+        governor.record_response(429, {"retry-after": "0.2"}, 0.1)
+        waited = asyncio.run(governor.aacquire())
+
+        self.assertGreaterEqual(waited, 0.15)
+
+    def test_parse_retry_after(self):
+        """Проверяет разбор заголовка Retry-After"""
+        self.assertEqual(parse_retry_after("3"), 3.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("не дата"))
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+
+    def test_shared_per_endpoint(self):
+        """Проверяет, что регулятор общий для одного API"""
+        first = get_rate_governor("http://api.test/v1/", requests_per_second=3.0)
+        second = get_rate_governor("http://api.test/v1", requests_per_second=3.0)
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, get_rate_governor("http://other.test", requests_per_second=3.0))
+
+if __name__ == '__main__':
+    unittest.main()
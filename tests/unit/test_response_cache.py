@@ -0,0 +1,98 @@
+# tests/unit/test_response_cache.py
+
+import unittest
+import tempfile
+import time
+import sys
+import os
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.response_cache import ResponseCache
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "responses.sqlite")
+        self.messages = [{"role": "user", "content": "Определи тональность: отличный сервис"}]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _key(self, **overrides):
+        params = {
+            "provider": "cloud:https://api.deepseek.com",
+            "model": "deepseek-chat",
+            "messages": self.messages,
+            "temperature": 0.3,
+            "top_p": 1.0,
+            "frequency_penalty": 0.0,
+            "presence_penalty": 0.0,
+            "max_tokens": 300
+        }
+        params.update(overrides)
+        return ResponseCache.make_key(**params)
+
+    def test_get_and_set(self):
+        """Проверяет сохранение ответа и подсчет попаданий"""
+        cache = ResponseCache(self.path)
+        key = self._key()
+
+        self.assertIsNone(cache.get(key))
+        cache.set(key, "Позитивный")
+        self.assertEqual(cache.get(key), "Позитивный")
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+        cache.close()
+
+    def test_key_depends_on_parameters(self):
+        """Проверяет, что ключ меняется при изменении модели, сообщений или параметров"""
+        base = self._key()
+
+        self.assertEqual(base, self._key())
+        self.assertNotEqual(base, self._key(model="deepseek-coder"))
+        self.assertNotEqual(base, self._key(temperature=0.7))
+        self.assertNotEqual(base, self._key(messages=[{"role": "user", "content": "Другой текст"}]))
+        self.assertNotEqual(base, self._key(provider="local:ollama:http://localhost:11434"))
+
+    def test_persists_between_instances(self):
+        """Проверяет, что ответы сохраняются на диске между запусками"""
+        cache = ResponseCache(self.path)
+        cache.set(self._key(), "Позитивный")
+        cache.close()
+
+        reopened = ResponseCache(self.path)
+        self.assertEqual(reopened.get(self._key()), "Позитивный")
+        reopened.close()
+
+    def test_ttl_expiration(self):
+        """Проверяет, что устаревшие записи не возвращаются"""
+        cache = ResponseCache(self.path, ttl_seconds=0.05)
+        cache.set(self._key(), "Позитивный")
+        time.sleep(0.1)
+
+        self.assertIsNone(cache.get(self._key()))
+        cache.close()
+
+    def test_size_eviction(self):
+        """Проверяет удаление давно не использованных записей при превышении размера"""
+        cache = ResponseCache(self.path, ttl_seconds=None, max_size_mb=0.002)
+        keys = [self._key(max_tokens=i) for i in range(5)]
+
+        for key in keys:
+            cache.set(key, "x" * 500)
+            time.sleep(0.01)
+        # Обращение к первой записи делает ее недавно использованной
+        cache.get(keys[0])
+        cache.evict()
+
+        stats = cache.stats()
+        self.assertLessEqual(stats["size_bytes"], 0.002 * 1024 * 1024)
+        self.assertEqual(cache.get(keys[0]), "x" * 500)
+        self.assertIsNone(cache.get(keys[1]))
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
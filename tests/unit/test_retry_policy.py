@@ -0,0 +1,143 @@
+# tests/unit/test_retry_policy.py
+
+import unittest
+import asyncio
+import time
+import sys
+import os
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.retry_policy import RetryPolicy, CircuitBreaker, LLMRequestError, is_retryable
+
+class FlakyFunction:
+    """Функция, которая завершается ошибкой заданное количество раз"""
+    def __init__(self, errors, result="ok"):
+        self.errors = list(errors)
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+class TestRetryPolicy(unittest.TestCase):
+    def setUp(self):
+        self.policy = RetryPolicy(max_attempts=3, initial_delay=0.01, max_delay=0.05, jitter=0.5, deadline=5)
+
+    def test_retries_transient_errors(self):
+        """Проверяет повтор после временной ошибки"""
+        func = FlakyFunction([LLMRequestError("Ошибка API: 503", status_code=503)])
+
+        result, error = self.policy.call(func)
+
+        self.assertEqual((result, error), ("ok", None))
+        self.assertEqual(func.calls, 2)
+
+    def test_no_retry_for_client_errors(self):
+        """Проверяет, что ошибки авторизации и некорректного запроса не повторяются"""
+        for status_code in (400, 401, 403):
+            func = FlakyFunction([LLMRequestError("Ошибка API", status_code=status_code)])
+
+            result, error = self.policy.call(func)
+
+            self.assertIsNone(result)
+            self.assertIn("Ошибка API", error)
+            self.assertEqual(func.calls, 1)
+
+    def test_max_attempts(self):
+        """Проверяет ограничение количества попыток"""
+        func = FlakyFunction([ConnectionError("нет соединения")] * 5)
+
+        result, error = self.policy.call(func)
+
+        self.assertIsNone(result)
+        self.assertEqual(func.calls, 3)
+
+    def test_deadline(self):
+        """Проверяет, что повторы прекращаются по общему лимиту времени"""
+        policy = RetryPolicy(max_attempts=10, initial_delay=0.2, jitter=0, deadline=0.3)
+        func = FlakyFunction([TimeoutError("таймаут")] * 10)
+
+        started = time.monotonic()
+        policy.call(func)
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(func.calls, 2)
+
+    def test_jitter_and_retry_after(self):
+        """Проверяет разброс задержки и учет Retry-After"""
+        policy = RetryPolicy(initial_delay=1.0, jitter=0.5)
+        delays = [policy.compute_delay(1) for _ in range(20)]
+
+        self.assertTrue(all(0.5 <= delay <= 1.0 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+        self.assertEqual(policy.compute_delay(1, retry_after=5.0), 5.0)
+
+    def test_is_retryable(self):
+        """Проверяет классификацию ошибок"""
+        self.assertTrue(is_retryable(LLMRequestError("", status_code=429)))
+        self.assertTrue(is_retryable(LLMRequestError("", status_code=502)))
+        self.assertTrue(is_retryable(ConnectionError()))
+        self.assertFalse(is_retryable(LLMRequestError("", status_code=422)))
+        self.assertFalse(is_retryable(ValueError("ошибка разбора ответа")))
+
+    def test_acall(self):
+        """Проверяет асинхронный вариант"""
+        func = FlakyFunction([LLMRequestError("", status_code=500)])
+
+        async def afunc():
+            return func()
+
+        self.assertEqual(asyncio.run(self.policy.acall(afunc)), ("ok", None))
+        self.assertEqual(func.calls, 2)
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_and_fails_fast(self):
+        """Проверяет размыкание после серии ошибок и быстрый отказ"""
+        breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+        policy = RetryPolicy(max_attempts=1)
+        failing = FlakyFunction([ConnectionError()] * 10)
+
+        policy.call(failing, breaker)
+        policy.call(failing, breaker)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        result, error = policy.call(failing, breaker)
+        self.assertIsNone(result)
+        self.assertIn("временно недоступен", error)
+        self.assertEqual(failing.calls, 2)
+
+    def test_half_open_probe(self):
+        """Проверяет пробный запрос после паузы"""
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow_request())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow_request())
+        # Пока пробный запрос выполняется, остальные не пропускаются
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_failed_probe_reopens(self):
+        """Проверяет повторное размыкание при неудачном пробном запросе"""
+        breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=0.05)
+        for _ in range(3):
+            breaker.record_failure()
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# tests/unit/test_row_batching.py
+
+import unittest
+import json
+import sys
+import os
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.row_batching import RowBatcher, get_context_limit
+
+class TestRowBatcher(unittest.TestCase):
+    def setUp(self):
+        self.batcher = RowBatcher(context_limit=4096, row_output_tokens=100, max_batch_size=10)
+        self.header = self.batcher.build_header("Определи тональность отзыва")
+        self.records = [(i, {"Отзыв": f"Текст отзыва номер {i}"}) for i in range(25)]
+
+    def test_plan_batches_respects_limits(self):
+        """Проверяет, что пакеты не превышают max_batch_size и покрывают все строки"""
+        batches = self.batcher.plan_batches(self.records, self.header)
+
+        self.assertEqual(sum(len(batch) for batch in batches), 25)
+        self.assertTrue(all(len(batch) <= 10 for batch in batches))
+
+    def test_plan_batches_token_budget(self):
+        """Проверяет, что размер пакета ограничен контекстным окном модели"""
+        batcher = RowBatcher(context_limit=1000, row_output_tokens=300, max_batch_size=50)
+        batches = batcher.plan_batches(self.records, batcher.build_header("Инструкция"))
+
+        # В контекст 1000 токенов помещается не более трех ответов по 300 токенов
+        self.assertTrue(all(len(batch) <= 3 for batch in batches))
+
+    def test_parse_response_maps_ids(self):
+        """Проверяет сопоставление ответов со строками пакета"""
+        batch = self.records[:3]
+        response = "```json\n" + json.dumps([
+            {"id": 2, "answer": "Нейтральный"},
+            {"id": 1, "answer": "Позитивный"}
+        ], ensure_ascii=False) + "\n```"
+
+        answers = self.batcher.parse_response(response, batch)
+
+        self.assertEqual(answers, {0: "Позитивный", 1: "Нейтральный"})
+
+    def test_parse_response_invalid_json(self):
+        """Проверяет, что некорректный ответ не дает совпадений"""
+        self.assertEqual(self.batcher.parse_response("Не JSON", self.records[:2]), {})
+        self.assertEqual(self.batcher.parse_response('[{"id": 7, "answer": "x"}]', self.records[:2]), {})
+        self.assertEqual(
+            self.batcher.parse_response('[{"id": 1e999, "answer": "x"}, {"id": 2, "answer": "y"}]', self.records[:2]),
+            {1: "y"}
+        )
+
+    def test_build_messages_contains_records(self):
+        """Проверяет, что каждая строка пакета попадает в запрос со своим id"""
+        messages = self.batcher.build_messages(self.records[:2], self.header)
+
+        self.assertEqual(messages[0]["role"], "system")
+        self.assertIn('"id": 1', messages[1]["content"])
+        self.assertIn('"id": 2', messages[1]["content"])
+        self.assertIn("Текст отзыва номер 1", messages[1]["content"])
+
+    def test_get_context_limit(self):
+        """Проверяет определение размера контекста модели"""
+        self.assertEqual(get_context_limit("deepseek-chat"), 65536)
+        self.assertEqual(get_context_limit("gpt-4-turbo-preview"), 128000)
+        self.assertEqual(get_context_limit(None), 4096)
+
+if __name__ == '__main__':
+    unittest.main()
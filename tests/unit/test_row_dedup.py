@@ -0,0 +1,125 @@
+# tests/unit/test_row_dedup.py
+
+import unittest
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.row_dedup import (
+    cluster_near_duplicates,
+    dedup_ratio,
+    group_duplicate_rows,
+    group_near_duplicate_rows,
+    lsh_bands,
+    minhash_signatures,
+    normalize_column,
+    normalize_text
+)
+
+class TestRowDedup(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            "Отзыв": ["Всё отлично", "  всё   ОТЛИЧНО ", None, "", "Долгая доставка", "Всё отлично"],
+            "Магазин": ["А", "А", "Б", "Б", "А", "Б"]
+        }, index=[10, 11, 12, 13, 14, 15])
+
+    def test_normalize_column(self):
+        """Проверяет нормализацию регистра, пробелов и пропусков"""
+        normalized = normalize_column(self.df["Отзыв"])
+
+        self.assertEqual(normalized[10], normalized[11])
+        self.assertEqual(normalized[12], "")
+
+    def test_group_by_target(self):
+        """Проверяет группировку по целевому столбцу"""
+        groups = group_duplicate_rows(self.df, ["Отзыв"])
+
+        self.assertEqual(groups, {10: [10, 11, 15], 12: [12, 13], 14: [14]})
+
+    def test_group_by_target_and_additional(self):
+        """Проверяет, что дополнительные столбцы участвуют в сравнении"""
+        groups = group_duplicate_rows(self.df, ["Отзыв", "Магазин"])
+
+        self.assertEqual(groups[10], [10, 11])
+        self.assertEqual(groups[15], [15])
+        self.assertEqual(sum(len(members) for members in groups.values()), len(self.df))
+
+    def test_dedup_ratio(self):
+        """Проверяет расчет доли дубликатов"""
+        self.assertEqual(dedup_ratio(6, 3), 0.5)
+        self.assertEqual(dedup_ratio(0, 0), 0.0)
+
+class TestNearDuplicates(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            "Отзыв": [
+                "Доставка опоздала на два дня, курьер не позвонил заранее.",
+                "ДОСТАВКА опоздала на два дня!!! Курьер не позвонил заранее",
+                "Товар пришёл сломанным, коробка была помята",
+                "Доставка опоздала на три дня, курьер не позвонил заранее",
+                "Отличный магазин, всё быстро",
+                "Ок",
+                "ок!"
+            ],
+            "Магазин": ["А", "А", "А", "Б", "А", "А", "А"]
+        }, index=[10, 11, 12, 13, 14, 15, 16])
+
+    def test_normalize_text(self):
+        """Проверяет удаление знаков препинания в тексте на кириллице"""
+        normalized = normalize_text(self.df["Отзыв"])
+
+        self.assertEqual(normalized[10], normalized[11])
+        self.assertEqual(normalized[15], normalized[16])
+
+    def test_signature_estimates_jaccard(self):
+        """Проверяет, что доля совпадений подписей оценивает сходство"""
+        texts = normalize_text(self.df["Отзыв"]).tolist()
+        signatures = minhash_signatures(texts, num_perm=128)
+
+        self.assertEqual((signatures[0] == signatures[1]).mean(), 1.0)
+        self.assertGreater((signatures[0] == signatures[3]).mean(), 0.6)
+        self.assertLess((signatures[0] == signatures[2]).mean(), 0.2)
+
+    def test_lsh_bands(self):
+        """Проверяет подбор полос LSH под порог"""
+        bands, rows = lsh_bands(64, 0.8)
+
+        self.assertEqual(bands * rows, 64)
+        self.assertAlmostEqual((1 / bands) ** (1 / rows), 0.8, delta=0.1)
+
+    def test_group_near_duplicates(self):
+        """Проверяет группировку почти одинаковых текстов"""
+        groups = group_near_duplicate_rows(self.df, "Отзыв", threshold=0.7)
+
+        self.assertEqual(groups[10], [10, 11, 13])
+        self.assertEqual(groups[12], [12])
+        self.assertEqual(groups[15], [15, 16])
+        self.assertEqual(sum(len(members) for members in groups.values()), len(self.df))
+
+    def test_exact_columns_and_threshold(self):
+        """Проверяет точное сравнение дополнительных столбцов и влияние порога"""
+        groups = group_near_duplicate_rows(self.df, "Отзыв", ["Отзыв", "Магазин"], threshold=0.7)
+        self.assertEqual(groups[10], [10, 11])
+        self.assertEqual(groups[13], [13])
+
+        strict = group_near_duplicate_rows(self.df, "Отзыв", threshold=0.95)
+        self.assertEqual(strict[10], [10, 11])
+
+    def test_templated_texts_at_scale(self):
+        """Проверяет кластеры шаблонных текстов среди уникальных"""
+        rng = np.random.default_rng(0)
+        templates = ["Прошу вернуть деньги за заказ номер {}, товар не подошёл", "Спасибо за быструю доставку заказа {}"]
+        texts = [templates[i % 2].format(rng.integers(100, 999)) for i in range(2000)]
+        texts += [f"уникальный текст {rng.integers(10 ** 9)} {rng.integers(10 ** 9)} {rng.integers(10 ** 9)}" for _ in range(100)]
+        labels = cluster_near_duplicates(normalize_text(pd.Series(texts)).tolist(), threshold=0.7)
+
+        self.assertEqual(len(set(labels[:2000])), 2)
+        self.assertNotIn(labels[0], labels[2000:])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# tests/unit/test_row_executor.py
+
+import unittest
+import asyncio
+import threading
+import time
+import sys
+import os
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.row_executor import RowExecutor, get_concurrency, DEFAULT_CONCURRENCY
+
+class TestRowExecutor(unittest.TestCase):
+    def test_results_for_all_items(self):
+        """Проверяет, что каждый элемент обработан ровно один раз"""
+        executor = RowExecutor(max_workers=4)
+        items = [(i, i) for i in range(20)]
+
+        results = {key: result for key, result, error in executor.run(items, lambda x: x * 2)}
+
+        self.assertEqual(results, {i: i * 2 for i in range(20)})
+
+    def test_concurrency_is_bounded(self):
+        """Проверяет, что одновременно выполняется не больше max_workers задач"""
+        executor = RowExecutor(max_workers=3)
+        lock = threading.Lock()
+        state = {"current": 0, "peak": 0}
+
+        def worker(x):
+            with lock:
+                state["current"] += 1
+                state["peak"] = max(state["peak"], state["current"])
+            time.sleep(0.02)
+            with lock:
+                state["current"] -= 1
+            return x
+
+        list(executor.run(((i, i) for i in range(12)), worker))
+
+        self.assertLessEqual(state["peak"], 3)
+        self.assertGreater(state["peak"], 1)
+
+    def test_errors_are_reported_per_item(self):
+        """Проверяет, что исключение в одной задаче не прерывает остальные"""
+        executor = RowExecutor(max_workers=2)
+
+        def worker(x):
+            if x == 3:
+                raise ValueError("Ошибка на значении 3")
+            return x
+
+        outcome = {key: (result, error) for key, result, error in executor.run([(i, i) for i in range(5)], worker)}
+
+        self.assertIsInstance(outcome[3][1], ValueError)
+        self.assertIsNone(outcome[3][0])
+        self.assertEqual(outcome[4], (4, None))
+
+    def test_map_preserves_input_order(self):
+        """Проверяет, что map возвращает результаты в порядке входных элементов"""
+        executor = RowExecutor(max_workers=4)
+
+        def worker(x):
+            time.sleep(0.01 * (5 - x))
+            return x
+
+        results = executor.map([(i, i) for i in range(5)], worker)
+
+        self.assertEqual(list(results.keys()), [0, 1, 2, 3, 4])
+        self.assertEqual(list(results.values()), [0, 1, 2, 3, 4])
+
+    def test_run_async_bounded(self):
+        """Проверяет асинхронное выполнение в одном цикле событий с ограничением"""
+        executor = RowExecutor(max_workers=5)
+        state = {"current": 0, "peak": 0, "threads": set()}
+
+        async def worker(x):
+            state["current"] += 1
+            state["peak"] = max(state["peak"], state["current"])
+            state["threads"].add(threading.get_ident())
+            await asyncio.sleep(0.01)
+            state["current"] -= 1
+            if x == 7:
+                raise ValueError("Ошибка на значении 7")
+            return x * 10
+
+        outcome = {key: (result, error) for key, result, error in executor.run_async(((i, i) for i in range(30)), worker)}
+
+        self.assertEqual(len(outcome), 30)
+        self.assertEqual(outcome[3], (30, None))
+        self.assertIsInstance(outcome[7][1], ValueError)
+        self.assertEqual(state["peak"], 5)
+        self.assertEqual(len(state["threads"]), 1)
+
+    def test_get_concurrency(self):
+        """Проверяет выбор количества одновременных запросов"""
+        self.assertEqual(get_concurrency("cloud"), DEFAULT_CONCURRENCY["cloud"])
+        self.assertEqual(get_concurrency("local"), DEFAULT_CONCURRENCY["local"])
+        self.assertEqual(get_concurrency("cloud", {"concurrency": 16}), 16)
+        self.assertEqual(get_concurrency("local", {"concurrency": 0}), DEFAULT_CONCURRENCY["local"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# tests/unit/test_row_sampling.py
+
+import unittest
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core.row_sampling import format_weighted_sample, hash_char_ngrams, minibatch_kmeans, sample_representative_rows
+from src.services.tokenizer import count_tokens
+
+TOPICS = ["доставка опоздала на два дня", "отличный сервис, всё понравилось", "курьер был груб", "товар пришёл сломанным"]
+
+class TestHashCharNgrams(unittest.TestCase):
+    def test_similar_texts_are_close(self):
+        """Проверяет, что похожие тексты ближе друг к другу, чем разные"""
+        vectors = hash_char_ngrams(["курьер был груб", "курьер был очень груб", "цена слишком высокая", ""])
+
+        self.assertEqual(vectors.shape, (4, 256))
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[0])), 1.0, places=5)
+        self.assertGreater(vectors[0] @ vectors[1], vectors[0] @ vectors[2])
+        self.assertFalse(vectors[3].any())
+
+class TestMiniBatchKMeans(unittest.TestCase):
+    def test_separates_clusters(self):
+        """Проверяет разделение хорошо разнесенных кластеров"""
+        rng = np.random.default_rng(0)
+        points = np.vstack([rng.normal(center, 0.1, (300, 2)) for center in (0, 5, 10)]).astype(np.float32)
+        _, labels = minibatch_kmeans(points, 3, batch_size=128)
+
+        for part in range(3):
+            self.assertEqual(len(set(labels[part * 300:(part + 1) * 300])), 1)
+        self.assertEqual(len(set(labels)), 3)
+
+class TestSampleRepresentativeRows(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 3000
+        self.df = pd.DataFrame({
+            "Отзыв": [f"{TOPICS[t]} заказ {i}" for i, t in enumerate(rng.integers(0, len(TOPICS), n))],
+            "Оценка": rng.integers(1, 6, n),
+            "Канал": rng.choice(["сайт", "приложение", "телефон"], n, p=[0.6, 0.3, 0.1])
+        })
+
+    def test_weights_cover_table(self):
+        """Проверяет, что веса выборки в сумме равны числу строк"""
+        sample = sample_representative_rows(self.df, 12)
+
+        self.assertLessEqual(len(sample), 12)
+        self.assertEqual(sum(weight for _, weight in sample), len(self.df))
+        self.assertEqual(len({position for position, _ in sample}), len(sample))
+
+    def test_stratified_by_category_columns(self):
+        """Проверяет, что каждая категория представлена пропорционально размеру"""
+        sample = sample_representative_rows(self.df, 12)
+        channels = self.df["Канал"].iloc[[position for position, _ in sample]]
+        counts = channels.value_counts()
+
+        self.assertEqual(set(channels), {"сайт", "приложение", "телефон"})
+        self.assertGreater(counts["сайт"], counts["телефон"])
+        for channel, size in self.df["Канал"].value_counts().items():
+            weight = sum(w for p, w in sample if self.df["Канал"].iloc[p] == channel)
+            self.assertEqual(weight, size)
+
+    def test_text_clusters_are_represented(self):
+        """Проверяет, что выборка покрывает все темы текстового столбца"""
+        sample = sample_representative_rows(self.df, 12, strata_columns=[])
+        topics = {next(t for t in TOPICS if text.startswith(t)) for text in self.df["Отзыв"].iloc[[p for p, _ in sample]]}
+
+        self.assertEqual(topics, set(TOPICS))
+
+    def test_small_table_returns_all_rows(self):
+        """Проверяет, что маленькая таблица попадает в выборку целиком"""
+        sample = sample_representative_rows(self.df.head(5), 20)
+
+        self.assertEqual(sorted(p for p, _ in sample), [0, 1, 2, 3, 4])
+        self.assertTrue(all(weight == 1 for _, weight in sample))
+
+    def test_format_respects_budget(self):
+        """Проверяет размер текста выборки и вывод весов"""
+        sample = sample_representative_rows(self.df, 20)
+        text = format_weighted_sample(self.df, sample, max_tokens=150)
+
+        self.assertLessEqual(count_tokens(text), 150)
+        self.assertTrue(text.startswith("Вес (строк таблицы) | № | Отзыв"))
+        self.assertIn(f"{sample[0][1]} (", text.splitlines()[1])
+
+    def test_format_missing_values(self):
+        """Проверяет выборку из таблицы с пропущенными значениями"""
+        df = self.df.astype({"Оценка": float})
+        df.loc[::7, "Оценка"] = np.nan
+        df.loc[::11, "Отзыв"] = None
+        df.loc[::13, "Канал"] = None
+        sample = sample_representative_rows(df, 20)
+        text = format_weighted_sample(df, sample)
+
+        self.assertEqual(len(text.splitlines()), len(sample) + 1)
+        self.assertNotIn("nan", text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# tests/unit/test_table_findings.py
+
+import unittest
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core.table_findings import (
+    COUNT_SERIES, change_points, compute_findings, describe_findings, detect_outliers, format_findings,
+    seasonal_decompose
+)
+from src.services.tokenizer import count_tokens
+
+class TestOutliers(unittest.TestCase):
+    def test_detects_injected_outliers(self):
+        """Проверяет, что IQR и робастный z находят вставленные выбросы"""
+        rng = np.random.default_rng(0)
+        values = rng.normal(100, 5, 1000)
+        values[[10, 500]] = [1000, -800]
+        df = pd.DataFrame({"Сумма": values, "Ровный": np.full(1000, 3.0)})
+
+        findings = detect_outliers(df, ["Сумма", "Ровный"])
+
+        self.assertEqual([item["column"] for item in findings], ["Сумма"])
+        self.assertGreaterEqual(findings[0]["count"], 2)
+        self.assertGreaterEqual(findings[0]["robust_count"], 2)
+        self.assertEqual({index for _, index in findings[0]["examples"][:2]}, {"10", "500"})
+
+class TestSeries(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(1)
+
+    def test_change_point_found_at_shift(self):
+        """Проверяет, что сдвиг уровня найден в правильном месте, а в шуме сдвигов нет"""
+        series = np.r_[self.rng.normal(10, 1, 40), self.rng.normal(16, 1, 40)]
+
+        self.assertEqual(change_points(series), [40])
+        self.assertEqual(change_points(self.rng.normal(10, 1, 80)), [])
+
+    def test_seasonal_strength(self):
+        """Проверяет, что сезонность отличается от шума"""
+        t = np.arange(48)
+        values = np.column_stack([
+            30 * np.sin(2 * np.pi * t / 12) + self.rng.normal(0, 2, 48),
+            self.rng.normal(0, 2, 48)
+        ])
+
+        pattern, strength = seasonal_decompose(values, 12)
+
+        self.assertGreater(strength[0], 0.8)
+        self.assertLess(strength[1], 0.3)
+        self.assertEqual(int(pattern[:, 0].argmax()), 3)
+
+    def test_monthly_table_findings(self):
+        """Проверяет тренд, сезонность и сдвиг по помесячной таблице"""
+        t = np.arange(48)
+        df = pd.DataFrame({
+            "Месяц": pd.date_range("2020-01-01", periods=48, freq="MS"),
+            "Продажи": 100 + 30 * np.sin(2 * np.pi * t / 12) + self.rng.normal(0, 2, 48),
+            "Клиенты": np.where(t >= 30, 200.0, 100.0) + self.rng.normal(0, 3, 48)
+        })
+
+        findings = compute_findings(df)
+
+        trend = findings["trends"][0]
+        self.assertEqual(trend["label"], "по месяцам")
+        series = {item["column"]: item for item in trend["series"]}
+        self.assertIn(COUNT_SERIES, series)
+        self.assertEqual(series["Продажи"]["season"], 12)
+        self.assertEqual(series["Продажи"]["peak_label"], "2020-04")
+        self.assertEqual([label for label, _, _ in series["Клиенты"]["change_points"]], ["2022-07"])
+
+        text = format_findings(findings)
+        self.assertIn("сезонность", text)
+        self.assertIn("с 2022-07", text)
+
+    def test_text_fits_token_budget(self):
+        """Проверяет ограничение размера текста и пустой результат без чисел"""
+        rng = np.random.default_rng(2)
+        df = pd.DataFrame({f"Столбец {i}": np.r_[rng.normal(0, 1, 500), [50.0]] for i in range(40)})
+
+        self.assertLessEqual(count_tokens(describe_findings(df, max_tokens=200)), 200)
+        self.assertEqual(describe_findings(pd.DataFrame({"Текст": ["а", "б"]})), "")
+        self.assertEqual(describe_findings(df, max_tokens=0), "")
+
+if __name__ == '__main__':
+    unittest.main()
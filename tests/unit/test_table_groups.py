@@ -0,0 +1,67 @@
+# tests/unit/test_table_groups.py
+
+import unittest
+import sys
+import os
+
+import pandas as pd
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core.table_groups import MISSING_GROUP, OTHER_GROUP, group_report_key, split_table
+
+class TestSplitTable(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            "Дата": pd.to_datetime(["2024-02-10", "2024-01-05", "2024-02-20", None, "2024-03-01"]),
+            "Магазин": ["Б", "А", "Б", None, "В"],
+            "Сумма": [10, 20, 30, 40, 50]
+        })
+
+    def test_split_by_values(self):
+        """Проверяет деление по значениям столбца: пропуски - последней группой"""
+        groups = split_table(self.df, "Магазин")
+
+        self.assertEqual([label for label, _ in groups], ["А", "Б", "В", MISSING_GROUP])
+        self.assertEqual(groups[1][1]["Сумма"].tolist(), [10, 30])
+        self.assertEqual(sum(len(part) for _, part in groups), len(self.df))
+
+    def test_split_by_period(self):
+        """Проверяет деление по месяцам в порядке времени"""
+        groups = split_table(self.df, "Дата", "M")
+
+        self.assertEqual([label for label, _ in groups], ["2024-01", "2024-02", "2024-03", MISSING_GROUP])
+        self.assertEqual(groups[1][1]["Сумма"].tolist(), [10, 30])
+
+    def test_max_groups_merges_smallest(self):
+        """Проверяет, что мелкие группы сверх лимита объединяются в одну"""
+        df = pd.DataFrame({"Категория": ["А"] * 5 + ["Б"] * 3 + ["В", "Г"]})
+        groups = split_table(df, "Категория", max_groups=3)
+
+        self.assertEqual([label for label, _ in groups], ["А", "Б", OTHER_GROUP])
+        self.assertEqual(groups[-1][1]["Категория"].tolist(), ["В", "Г"])
+
+    def test_invalid_arguments(self):
+        """Проверяет ошибки для неизвестного столбца, периода и столбца без дат"""
+        with self.assertRaises(ValueError):
+            split_table(self.df, "Нет такого")
+        with self.assertRaises(ValueError):
+            split_table(self.df, "Дата", "X")
+        with self.assertRaises(ValueError):
+            split_table(self.df, "Магазин", "M")
+
+    def test_report_key_stable_when_new_period_added(self):
+        """Проверяет, что ключи прежних групп не меняются при добавлении нового месяца"""
+        extended = pd.concat([self.df, pd.DataFrame({"Дата": pd.to_datetime(["2024-04-02"]), "Магазин": ["А"], "Сумма": [60]})], ignore_index=True)
+
+        before = {label: group_report_key(label, part, "промпт", {}) for label, part in split_table(self.df, "Дата", "M")}
+        after = {label: group_report_key(label, part, "промпт", {}) for label, part in split_table(extended, "Дата", "M")}
+
+        self.assertEqual(set(after) - set(before), {"2024-04"})
+        for label in ["2024-01", "2024-02", "2024-03"]:
+            self.assertEqual(before[label], after[label])
+        self.assertNotEqual(group_report_key("2024-01", self.df, "промпт", {}), group_report_key("2024-01", self.df, "другой", {}))
+
+if __name__ == '__main__':
+    unittest.main()
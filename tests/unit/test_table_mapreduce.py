@@ -0,0 +1,222 @@
+# tests/unit/test_table_mapreduce.py
+
+import unittest
+import threading
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.row_batching import estimate_tokens
+from src.services.table_mapreduce import StreamingTableReducer, TableMapReducer, partition_lines, serialize_row, serialize_rows, table_header
+
+class RecordingProvider:
+    """Провайдер, возвращающий число строк таблицы или отчетов в запросе"""
+    def __init__(self, fail_on=None):
+        self.lock = threading.Lock()
+        self.calls = []
+        self.fail_on = fail_on
+
+    def chat_completion(self, messages, **kwargs):
+        content = messages[-1]["content"]
+        with self.lock:
+            self.calls.append(content)
+        if self.fail_on and self.fail_on in content:
+            return None, "ошибка API"
+        if "Строки таблицы:" in content:
+            rows = content.split("Строки таблицы:\n", 1)[1].count("\n")
+            return f"строк: {rows}", None
+        total = sum(int(part.split("строк: ")[1].split("\n")[0]) for part in content.split("Отчет ")[1:])
+        return f"строк: {total}", None
+
+class TestPartitionLines(unittest.TestCase):
+    def setUp(self):
+        self.lines = [f"{i} | значение {i} | категория {i % 7}" for i in range(500)]
+
+    def test_partitions_cover_all_lines_within_budget(self):
+        """Проверяет, что части покрывают все строки и помещаются в бюджет"""
+        partitions = partition_lines(self.lines, budget_tokens=200)
+
+        self.assertEqual(partitions[0][0], 0)
+        self.assertEqual(partitions[-1][1], len(self.lines))
+        for (start, end), (next_start, _) in zip(partitions, partitions[1:]):
+            self.assertEqual(end, next_start)
+        for start, end in partitions:
+            self.assertLessEqual(sum(estimate_tokens(line) for line in self.lines[start:end]), 200)
+
+    def test_edit_changes_only_nearby_partitions(self):
+        """Проверяет, что правка одной строки сдвигает только соседние части"""
+        before = partition_lines(self.lines, budget_tokens=200)
+        edited = list(self.lines)
+        edited[250] = "250 | измененное значение | категория 0"
+        after = partition_lines(edited, budget_tokens=200)
+
+        unchanged = set(before) & set(after)
+        self.assertGreaterEqual(len(unchanged), len(before) - 3)
+
+class TestTableMapReducer(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            "Отзыв": [f"Отзыв покупателя номер {i}" for i in range(200)],
+            "Оценка": [i % 5 + 1 for i in range(200)]
+        })
+
+    def make_reducer(self, provider, **kwargs):
+        return TableMapReducer(
+            provider, {"model": "deepseek-chat", "max_tokens": 300},
+            context_limit=4096, max_partition_tokens=150, max_workers=4, **kwargs
+        )
+
+    def test_all_rows_reach_final_report(self):
+        """Проверяет, что итоговый отчет построен по всем строкам"""
+        provider = RecordingProvider()
+        result, error, stats = self.make_reducer(provider).run(self.df, "Проанализируй отзывы")
+
+        self.assertIsNone(error)
+        self.assertEqual(result, "строк: 200")
+        self.assertGreater(stats["partitions"], 4)
+        self.assertGreaterEqual(stats["levels"], 3)
+        self.assertEqual(stats["requests"], len(provider.calls))
+
+    def test_fan_in_is_respected(self):
+        """Проверяет, что узел объединяет не больше fan_in отчетов"""
+        provider = RecordingProvider()
+        self.make_reducer(provider, fan_in=3).run(self.df, "Проанализируй отзывы")
+
+        for content in provider.calls:
+            self.assertLessEqual(content.count("Отчет "), 3)
+
+    def test_small_table_single_request(self):
+        """Проверяет, что маленькая таблица анализируется одним запросом"""
+        provider = RecordingProvider()
+        result, error, stats = self.make_reducer(provider).run(self.df.head(3), "Проанализируй отзывы")
+
+        self.assertEqual(len(provider.calls), 1)
+        self.assertEqual(result, "строк: 3")
+        self.assertIn("детальные", provider.calls[0])
+
+    def test_failed_partition_gives_partial_result(self):
+        """Проверяет частичный успех при ошибке одной части"""
+        provider = RecordingProvider(fail_on="Отзыв покупателя номер 100 ")
+        result, error, stats = self.make_reducer(provider).run(self.df, "Проанализируй отзывы")
+
+        self.assertIsNotNone(result)
+        self.assertIn("Частичный успех", error)
+
+    def test_missing_values(self):
+        """Проверяет анализ таблицы с пропущенными значениями"""
+        df = self.df.astype({"Оценка": float})
+        df.loc[::7, "Оценка"] = np.nan
+        df.loc[3, "Отзыв"] = None
+        provider = RecordingProvider()
+        result, error, stats = self.make_reducer(provider).run(df, "Проанализируй отзывы")
+
+        self.assertIsNone(error)
+        self.assertEqual(result, "строк: 200")
+        self.assertEqual(serialize_rows(df.loc[[0, 3]]), ["0 | Отзыв покупателя номер 0 | ", "3 |  | 4.0"])
+        self.assertEqual(serialize_row(0, df.loc[0]), serialize_rows(df.loc[[0]])[0])
+
+    def test_serialize_rows_single_line(self):
+        """Проверяет, что переводы строк в ячейках не разбивают строку таблицы"""
+        lines = serialize_rows(pd.DataFrame({"A": ["первая\nвторая"]}, index=[7]))
+
+        self.assertEqual(lines, ["7 | первая вторая"])
+
+    def test_serialize_row_matches_serialize_rows(self):
+        """Проверяет, что одна строка представляется так же, как в serialize_rows"""
+        df = pd.DataFrame({"A": ["первая\r\nвторая"], "B": [1.5]}, index=[7])
+
+        self.assertEqual(serialize_row(7, df.iloc[0]), serialize_rows(df)[0])
+
+class TestStreamingTableReducer(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            "Отзыв": [f"Отзыв покупателя номер {i}" for i in range(200)],
+            "Оценка": [i % 5 + 1 for i in range(200)]
+        })
+        self.lines = serialize_rows(self.df)
+
+    def make_streaming(self, provider, **kwargs):
+        reducer = TableMapReducer(
+            provider, {"model": "deepseek-chat", "max_tokens": 300},
+            context_limit=4096, max_partition_tokens=150, max_workers=4, **kwargs
+        )
+        return StreamingTableReducer(reducer, "Проанализируй отзывы", table_header(self.df))
+
+    def test_rows_in_any_order_reach_final_report(self):
+        """Проверяет, что строки, поступающие в любом порядке, попадают в итоговый отчет"""
+        provider = RecordingProvider()
+        streaming = self.make_streaming(provider)
+        for line in reversed(self.lines):
+            streaming.add(line)
+        result, error, stats = streaming.finish()
+
+        self.assertIsNone(error)
+        self.assertEqual(result, "строк: 200")
+        self.assertEqual(stats["rows"], 200)
+        self.assertGreater(stats["partitions"], 4)
+        self.assertEqual(stats["requests"], len(provider.calls))
+
+    def test_positions_give_sequential_partitions(self):
+        """Проверяет, что строки с позициями образуют те же части, что и по порядку"""
+        ordered = RecordingProvider()
+        streaming = self.make_streaming(ordered)
+        for line in self.lines:
+            streaming.add(line)
+        streaming.finish()
+
+        shuffled = RecordingProvider()
+        streaming = self.make_streaming(shuffled)
+        order = np.random.default_rng(0).permutation(len(self.lines))
+        for position in order[:150]:
+            streaming.add(self.lines[position], int(position))
+        self.assertGreater(len(streaming.waiting), 0)
+        for position in order[150:]:
+            streaming.add(self.lines[position], int(position))
+        result, error, stats = streaming.finish()
+
+        maps = lambda calls: sorted(call for call in calls if "Строки таблицы:" in call)
+        self.assertEqual(maps(shuffled.calls), maps(ordered.calls))
+        self.assertEqual(result, "строк: 200")
+        self.assertFalse(streaming.waiting)
+
+    def test_partitions_start_before_finish(self):
+        """Проверяет, что анализ частей начинается до поступления всех строк"""
+        provider = RecordingProvider()
+        streaming = self.make_streaming(provider)
+        for line in self.lines[:100]:
+            streaming.add(line)
+
+        self.assertGreater(streaming.stats["partitions"], 0)
+        for line in self.lines[100:]:
+            streaming.add(line)
+        self.assertEqual(streaming.finish()[0], "строк: 200")
+
+    def test_small_input_single_request(self):
+        """Проверяет, что несколько строк анализируются одним итоговым запросом"""
+        provider = RecordingProvider()
+        streaming = self.make_streaming(provider)
+        for line in self.lines[:3]:
+            streaming.add(line)
+        result, error, stats = streaming.finish()
+
+        self.assertEqual(len(provider.calls), 1)
+        self.assertEqual(result, "строк: 3")
+
+    def test_failed_partition_gives_partial_result(self):
+        """Проверяет частичный успех при ошибке одной части"""
+        provider = RecordingProvider(fail_on="Отзыв покупателя номер 100 ")
+        streaming = self.make_streaming(provider)
+        for line in self.lines:
+            streaming.add(line)
+        result, error, stats = streaming.finish()
+
+        self.assertIsNotNone(result)
+        self.assertIn("Частичный успех", error)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# tests/unit/test_table_query.py
+
+import unittest
+import sys
+import os
+
+import pandas as pd
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.table_query import TableQueryEngine, TableQueryLoop, extract_queries, table_query_available, validate_query
+
+class ScriptedProvider:
+    """Провайдер, возвращающий заранее заданные ответы по очереди"""
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def chat_completion(self, messages, **kwargs):
+        self.calls.append([dict(message) for message in messages])
+        return self.responses.pop(0), None
+
+class TestQueryParsing(unittest.TestCase):
+    def test_extract_queries(self):
+        """Проверяет извлечение запросов из блоков sql"""
+        text = "Посчитаю:\n```sql\nSELECT 1;\n```\nи\n```SQL\nSELECT 2\n```\n```python\nprint(3)\n```"
+
+        self.assertEqual(extract_queries(text), ["SELECT 1", "SELECT 2"])
+        self.assertEqual(extract_queries("Итоговый отчет"), [])
+
+    def test_validate_query(self):
+        """Проверяет, что разрешены только запросы на чтение"""
+        self.assertIsNone(validate_query('SELECT "Магазин", count(*) FROM data GROUP BY 1'))
+        self.assertIsNone(validate_query("WITH t AS (SELECT 1 AS x) SELECT x FROM t"))
+        self.assertIsNone(validate_query('SELECT "update" FROM data WHERE "Текст" = \'drop; set\''))
+        self.assertIsNotNone(validate_query("DROP TABLE data"))
+        self.assertIsNotNone(validate_query("SELECT 1; DELETE FROM data"))
+        self.assertIsNotNone(validate_query("SELECT * FROM read_csv('/etc/passwd')"))
+
+@unittest.skipUnless(table_query_available(), "не установлен duckdb")
+class TestTableQueryLoop(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            "Магазин": ["А", "Б", "А", "В"] * 250,
+            "Сумма": [10.0, 20.0, 30.0, 40.0] * 250
+        })
+
+    def test_engine_limits_rows(self):
+        """Проверяет выполнение запроса и ограничение числа строк результата"""
+        with TableQueryEngine(self.df, max_rows=2) as engine:
+            frame, truncated, error = engine.execute('SELECT "Магазин", sum("Сумма") AS s FROM data GROUP BY 1 ORDER BY 1')
+
+        self.assertIsNone(error)
+        self.assertTrue(truncated)
+        self.assertEqual(frame.to_dict("records"), [{"Магазин": "А", "s": 10000.0}, {"Магазин": "Б", "s": 5000.0}])
+
+    def test_results_returned_to_model(self):
+        """Проверяет, что результаты запросов передаются модели, а итоговый ответ возвращается"""
+        provider = ScriptedProvider([
+            '```sql\nSELECT "Магазин", sum("Сумма") AS s FROM data GROUP BY 1 ORDER BY s DESC\n```',
+            "Итог: больше всего продаж в магазине А"
+        ])
+        loop = TableQueryLoop(provider, {"model": "deepseek-chat"})
+        messages = [{"role": "user", "content": f"Проанализируй продажи\n{loop.instructions(self.df)}"}]
+
+        result, error, stats = loop.run(self.df, messages)
+
+        self.assertIsNone(error)
+        self.assertEqual(result, "Итог: больше всего продаж в магазине А")
+        self.assertEqual(stats, {"rounds": 1, "queries": 1, "failed_queries": 0})
+        self.assertIn('"Магазин" (str)', messages[0]["content"])
+        self.assertIn("А | 10000", provider.calls[1][-1]["content"])
+
+    def test_errors_and_round_limit(self):
+        """Проверяет передачу ошибки запроса модели и завершение после лимита раундов"""
+        provider = ScriptedProvider([
+            "```sql\nSELECT \"Нет такого\" FROM data\n```",
+            "```sql\nSELECT count(*) FROM data\n```",
+            "Отчет по данным\n```sql\nSELECT 1\n```"
+        ])
+        loop = TableQueryLoop(provider, {}, max_rounds=2)
+
+        result, error, stats = loop.run(self.df, [{"role": "user", "content": "Проанализируй"}])
+
+        self.assertEqual(result, "Отчет по данным")
+        self.assertIsNone(error)
+        self.assertEqual(stats["rounds"], 2)
+        self.assertEqual(stats["failed_queries"], 1)
+        self.assertIn("ошибка", provider.calls[1][-1]["content"])
+        self.assertIn("Лимит запросов исчерпан", provider.calls[2][-1]["content"])
+
+if __name__ == '__main__':
+    unittest.main()
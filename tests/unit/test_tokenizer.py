@@ -0,0 +1,71 @@
+# tests/unit/test_tokenizer.py
+
+import unittest
+import json
+import tempfile
+import sys
+import os
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.tokenizer import BPETokenizer, TokenCounter, heuristic_token_count, count_message_tokens, MESSAGE_OVERHEAD_TOKENS
+
+class TestTokenizer(unittest.TestCase):
+    def test_heuristic_counts_cyrillic_denser(self):
+        """Проверяет, что кириллица дает больше токенов на символ, чем латиница"""
+        latin = heuristic_token_count("a" * 400)
+        cyrillic = heuristic_token_count("я" * 400)
+
+        self.assertAlmostEqual(latin, 101, delta=2)
+        self.assertAlmostEqual(cyrillic, 201, delta=2)
+
+    def test_bpe_from_file(self):
+        """Проверяет загрузку tokenizer.json и применение правил слияния"""
+        byte_space = "Ġ"  # пробел в байтовом BPE
+        data = {"model": {"type": "BPE", "vocab": {}, "merges": ["l o", "lo w", f"{byte_space} low"]}}
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+            json.dump(data, f)
+            path = f.name
+        try:
+            tokenizer = BPETokenizer.from_file(path)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(tokenizer.count("low"), 1)
+        self.assertEqual(tokenizer.count("low low"), 2)
+        self.assertEqual(tokenizer.count("lower"), 3)
+
+    def test_bpe_rejects_other_models(self):
+        """Проверяет ошибку для файла без BPE-модели"""
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+            json.dump({"model": {"type": "Unigram"}}, f)
+            path = f.name
+        try:
+            with self.assertRaises(ValueError):
+                BPETokenizer.from_file(path)
+        finally:
+            os.remove(path)
+
+    def test_counter_cache(self):
+        """Проверяет LRU-кэш количества токенов"""
+        counter = TokenCounter(cache_size=2)
+
+        counter.count("первый")
+        counter.count("второй")
+        counter.count("первый")
+        counter.count("третий")
+
+        stats = counter.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["size"], 2)
+        self.assertEqual(counter.count(""), 0)
+
+    def test_message_overhead(self):
+        """Проверяет учет служебной разметки сообщений"""
+        messages = [{"role": "system", "content": ""}, {"role": "user", "content": ""}]
+
+        self.assertEqual(count_message_tokens(messages), 2 * MESSAGE_OVERHEAD_TOKENS)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
 # tests/unit/test_unified_llm.py
 
 import unittest
-from unittest.mock import MagicMock, patch
+import asyncio
+import tempfile
+from unittest.mock import AsyncMock, MagicMock, patch
 import sys
 import os
 
@@ -9,8 +11,23 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 from src.llm.unified_provider import UnifiedLLM as UnifiedLLMProvider
+from src.services.response_cache import ResponseCache
+from src.services.retry_policy import RetryPolicy
+from src.llm.xinference_provider import XInferenceIntegration
 
 class TestUnifiedLLM(unittest.TestCase):
+    def setUp(self):
+        # Каждый тест работает с отдельным временным кэшем ответов
+        self.cache_dir = tempfile.TemporaryDirectory()
+        cache_path = os.path.join(self.cache_dir.name, "responses.sqlite")
+        patcher = patch(
+            'src.llm.unified_provider.get_response_cache',
+            side_effect=lambda path, **kwargs: ResponseCache(cache_path, **kwargs)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.cache_dir.cleanup)
+    
     @patch('src.llm.unified_provider.LocalLLMProvider')
     def test_init_local_provider(self, mock_local_provider):
         """Проверяет инициализацию локального провайдера"""
@@ -145,5 +162,98 @@ class TestUnifiedLLM(unittest.TestCase):
         
         self.assertIn("Тестовая ошибка", str(context.exception))
 
+    @patch('src.llm.unified_provider.LocalLLMProvider')
+    def test_achat_completion_local(self, mock_local_provider):
+        """Проверяет асинхронный вызов achat_completion"""
+        mock_instance = MagicMock()
+        mock_instance.achat_completion = AsyncMock(return_value=("Асинхронный ответ", None))
+        mock_local_provider.return_value = mock_instance
+        
+        provider = UnifiedLLMProvider({"provider_type": "local", "local_provider": "ollama"})
+        messages = [{"role": "user", "content": "Тестовый запрос"}]
+        result = asyncio.run(provider.achat_completion(messages, model="llama2"))
+        
+        self.assertEqual(result, ("Асинхронный ответ", None))
+        mock_instance.achat_completion.assert_awaited_once()
+        self.assertEqual(mock_instance.achat_completion.await_args.kwargs["model"], "llama2")
+    
+    @patch('src.llm.unified_provider.LocalLLMProvider')
+    def test_achat_completion_sync_fallback(self, mock_local_provider):
+        """Проверяет выполнение синхронного провайдера в потоке"""
+        mock_instance = MagicMock(spec=["chat_completion"])
+        mock_instance.chat_completion.return_value = ("Синхронный ответ", None)
+        mock_local_provider.return_value = mock_instance
+        
+        provider = UnifiedLLMProvider({"provider_type": "local", "local_provider": "ollama"})
+        result = asyncio.run(provider.achat_completion([{"role": "user", "content": "Запрос"}]))
+        
+        self.assertEqual(result, ("Синхронный ответ", None))
+        mock_instance.chat_completion.assert_called_once()
+    
+    @patch('src.llm.xinference_provider.ConfigManager')
+    def test_achat_completion_xinference_retry_policy(self, mock_config_manager):
+        """Проверяет повторы асинхронного запроса XInference через общую политику и предохранитель"""
+        mock_config_manager.return_value.get_config.return_value = {}
+        provider = XInferenceIntegration()
+        provider.retry_policy = RetryPolicy(max_attempts=3, initial_delay=0.01, jitter=0)
+        provider.circuit_breaker = MagicMock()
+        provider.circuit_breaker.allow_request.return_value = True
+        failure = MagicMock(status_code=503, text="Недоступен", headers={})
+        success = MagicMock(status_code=200, headers={})
+        success.json.return_value = {"choices": [{"message": {"content": " Ответ "}}]}
+        client = MagicMock()
+        client.post = AsyncMock(side_effect=[failure, success])
+        
+        with patch.object(provider, "_get_async_client", return_value=client):
+            result = asyncio.run(provider.achat_completion([{"role": "user", "content": "Запрос"}]))
+        
+        self.assertEqual(result, ("Ответ", None))
+        self.assertEqual(client.post.await_count, 2)
+        provider.circuit_breaker.record_failure.assert_called_once()
+        provider.circuit_breaker.record_success.assert_called_once()
+    
+    @patch('src.llm.unified_provider.LocalLLMProvider')
+    def test_chat_completion_cache(self, mock_local_provider):
+        """Проверяет, что повторный запрос берется из кэша без обращения к модели"""
+        mock_instance = MagicMock()
+        mock_instance.chat_completion.return_value = ("Ответ из модели", None)
+        mock_local_provider.return_value = mock_instance
+        
+        provider = UnifiedLLMProvider({"provider_type": "local", "local_provider": "ollama"})
+        messages = [{"role": "user", "content": "Запрос"}]
+        
+        first = provider.chat_completion(messages, model="llama2")
+        second = provider.chat_completion(messages, model="llama2")
+        provider.chat_completion(messages, model="llama2", temperature=0.1)
+        
+        self.assertEqual(first, second)
+        self.assertEqual(mock_instance.chat_completion.call_count, 2)
+        stats = provider.get_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+        
+        # Ошибки провайдера в кэш не попадают
+        mock_instance.chat_completion.return_value = (None, "Ошибка сети")
+        provider.chat_completion([{"role": "user", "content": "Другой запрос"}], model="llama2")
+        provider.chat_completion([{"role": "user", "content": "Другой запрос"}], model="llama2")
+        self.assertEqual(mock_instance.chat_completion.call_count, 4)
+    
+    @patch('src.llm.unified_provider.LocalLLMProvider')
+    def test_cache_skipped_without_model(self, mock_local_provider):
+        """Проверяет, что ответы локального сервера без известной модели не кэшируются"""
+        mock_instance = MagicMock()
+        mock_instance.chat_completion.side_effect = [("Ответ модели А", None), ("Ответ модели Б", None), ("Ответ", None)]
+        mock_local_provider.return_value = mock_instance
+        
+        provider = UnifiedLLMProvider({"provider_type": "local", "local_provider": "lmstudio"})
+        messages = [{"role": "user", "content": "Запрос"}]
+        
+        self.assertEqual(provider.chat_completion(messages), ("Ответ модели А", None))
+        self.assertEqual(provider.chat_completion(messages, model="local_model"), ("Ответ модели Б", None))
+        self.assertEqual(mock_instance.chat_completion.call_args.kwargs["model"], "local_model")
+        provider.chat_completion(messages, model="qwen2.5-7b")
+        self.assertEqual(provider.chat_completion(messages, model="qwen2.5-7b"), ("Ответ", None))
+        self.assertEqual(mock_instance.chat_completion.call_count, 3)
+        self.assertEqual(provider.get_cache_stats()["hits"], 1)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
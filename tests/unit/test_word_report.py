@@ -0,0 +1,77 @@
+# tests/unit/test_word_report.py
+
+import unittest
+import sys
+import os
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from docx import Document
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core.word_report import (
+    MATPLOTLIB_AVAILABLE, build_word_report, chart_columns, column_summary, submit_word_report
+)
+
+class TestWordReport(unittest.TestCase):
+    def setUp(self):
+        rows = 120
+        self.df = pd.DataFrame({
+            "Отзыв": [f"Отзыв <{i}> & \"текст\"\nвторая строка\x01" for i in range(rows)],
+            "Оценка": [i % 5 + 1 if i % 7 else np.nan for i in range(rows)],
+            "Отзыв_Обработано": ["Позитив" if i % 3 else "Негатив" for i in range(rows)]
+        })
+
+    def test_table_is_capped(self):
+        """Проверяет ограничение таблицы, экранирование текста и ссылку на выгрузку Excel"""
+        data = build_word_report(self.df, max_table_rows=50, excel_name="processed.xlsx")
+        doc = Document(BytesIO(data))
+
+        summary, table = doc.tables
+        self.assertEqual(len(summary.rows), len(self.df.columns) + 1)
+        self.assertEqual(len(table.rows), 51)
+        self.assertEqual(table.cell(0, 0).text, "Отзыв")
+        self.assertEqual(table.cell(1, 0).text, "Отзыв <0> & \"текст\"\nвторая строка")
+        self.assertEqual(table.cell(8, 1).text, "")
+        text = "\n".join(paragraph.text for paragraph in doc.paragraphs)
+        self.assertIn("первые 50 строк из 120", text)
+        self.assertIn("processed.xlsx", text)
+
+    @unittest.skipUnless(MATPLOTLIB_AVAILABLE, "matplotlib не установлен")
+    def test_analysis_and_charts(self):
+        """Проверяет анализ всей таблицы, отчеты по группам и диаграммы"""
+        data = build_word_report(
+            self.df,
+            "## Выводы\n- **Главное**: рост\n1. Шаг\nИтог",
+            {"Москва": "Отчет по Москве"}
+        )
+        doc = Document(BytesIO(data))
+
+        styles = {paragraph.text: paragraph.style.name for paragraph in doc.paragraphs}
+        self.assertEqual(styles["Выводы"], "Heading 4")
+        self.assertEqual(styles["Главное: рост"], "List Bullet")
+        self.assertEqual(styles["Шаг"], "List Number")
+        self.assertIn("Отчет по Москве", styles)
+        self.assertEqual(len(doc.inline_shapes), 1)
+
+    def test_summary_and_chart_columns(self):
+        """Проверяет сводку по столбцам и выбор столбцов для диаграмм"""
+        summary = column_summary(self.df).set_index("Столбец")
+
+        self.assertEqual(summary.loc["Оценка", "Заполнено"], "102 из 120")
+        self.assertIn("Позитив (80)", summary.loc["Отзыв_Обработано", "Значения"])
+        self.assertEqual(chart_columns(self.df), ["Отзыв_Обработано"])
+
+    def test_background_and_table_only(self):
+        """Проверяет формирование в фоновом потоке и отчет только с анализом таблицы"""
+        future = submit_word_report(None, "Анализ таблицы")
+        doc = Document(BytesIO(future.result(timeout=30)))
+
+        self.assertEqual(len(doc.tables), 0)
+        self.assertIn("Анализ таблицы", [paragraph.text for paragraph in doc.paragraphs])
+
+if __name__ == '__main__':
+    unittest.main()
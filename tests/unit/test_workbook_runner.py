@@ -0,0 +1,101 @@
+# tests/unit/test_workbook_runner.py
+
+import unittest
+import threading
+import time
+import sys
+import os
+from io import BytesIO
+
+import pandas as pd
+
+# Добавляем путь к src в sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core.analysis_engine import MODE_ROWS
+from src.core.workbook_runner import WorkbookRunner, result_sheet_names, write_workbook_result
+
+class FakeConfig:
+    """Конфигурация без контрольных точек"""
+    def __init__(self, values=None):
+        self.values = {"checkpoints.enabled": False, "processing.concurrency.cloud": 2}
+        self.values.update(values or {})
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+class CountingProvider:
+    """Провайдер, считающий одновременные запросы"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.calls = 0
+
+    def chat_completion(self, messages, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.calls += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        return f"ответ: {messages[-1]['content'][-10:]}", None
+
+class TestWorkbookRunner(unittest.TestCase):
+    def setUp(self):
+        self.workbook = BytesIO()
+        with pd.ExcelWriter(self.workbook, engine="openpyxl") as writer:
+            for branch in ("Москва", "Казань", "Без отзывов"):
+                rows = 4 if branch != "Без отзывов" else 1
+                column = "Отзыв" if branch != "Без отзывов" else "Комментарий"
+                pd.DataFrame({column: [f"{branch} {i}" for i in range(rows)]}).to_excel(writer, sheet_name=branch, index=False)
+        self.profile = {"mode": MODE_ROWS, "custom_prompt": "Оцени отзыв", "target_column": "Отзыв"}
+
+    def test_sheets_share_request_slots(self):
+        """Проверяет анализ листов с общим ограничением запросов и ошибку листа без нужного столбца"""
+        provider = CountingProvider()
+        progress = []
+        runner = WorkbookRunner(
+            provider,
+            {"provider_type": "cloud", "model": "deepseek-chat"},
+            FakeConfig(),
+            on_progress=lambda done, total, text: progress.append((done, total, threading.current_thread())),
+            max_parallel_sheets=3
+        )
+
+        result = runner.run(self.workbook, ["Москва", "Казань", "Без отзывов"], self.profile)
+
+        self.assertEqual(list(result.results), ["Москва", "Казань"])
+        self.assertIn("Без отзывов", result.errors)
+        self.assertEqual(provider.calls, 8)
+        self.assertLessEqual(provider.max_active, 2)
+        self.assertIn("Казань 0", result.results["Казань"].result_df["Отзыв_Обработано"].tolist()[0])
+        self.assertEqual(result.summary["sheets"], 3)
+        # Прогресс передается в вызывающем потоке
+        self.assertTrue(all(thread is threading.current_thread() for _, _, thread in progress))
+
+    def test_write_one_sheet_per_input_sheet(self):
+        """Проверяет запись листа результата для каждого исходного листа и листа ошибок"""
+        runner = WorkbookRunner(CountingProvider(), {"provider_type": "cloud"}, FakeConfig())
+        result = runner.run(self.workbook, ["Москва", "Без отзывов"], self.profile)
+
+        output = BytesIO()
+        write_workbook_result(result, output)
+        sheets = pd.read_excel(output, sheet_name=None)
+
+        self.assertEqual(list(sheets), ["Москва", "Ошибки"])
+        self.assertEqual(len(sheets["Москва"]), 4)
+        self.assertEqual(sheets["Ошибки"]["Лист"].tolist(), ["Без отзывов"])
+
+    def test_result_sheet_names(self):
+        """Проверяет ограничение длины названий листов и устранение повторов"""
+        long_name = "Очень длинное название листа филиала"
+        names = result_sheet_names([long_name, long_name[:31] + "!", "Ошибки"])
+
+        self.assertEqual(names[long_name], long_name[:31])
+        self.assertEqual(len(names[long_name[:31] + "!"]), 31)
+        self.assertNotEqual(names[long_name], names[long_name[:31] + "!"])
+
+if __name__ == '__main__':
+    unittest.main()